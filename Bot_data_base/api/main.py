@@ -1,4 +1,6 @@
-﻿from fastapi import FastAPI, Request
+﻿from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
@@ -12,7 +14,10 @@ from api.routes.registry import router as registry_router
 from api.routes.blocks import router as blocks_router
 from api.routes.status import router as status_router
 from api.routes.dashboard import router as dashboard_router
-from api.routes.query import router as query_router
+from api.routes.query import preload_blocks_fallback_index, router as query_router
+from jobs.ingestion_engine import shutdown_ingestion_engine
+from jobs.job_queue import get_job_queue, shutdown_job_queue
+from utils.query_executor import shutdown_query_executors
 
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".env"))
 load_dotenv(env_path, override=False)
@@ -23,7 +28,21 @@ root_logger.setLevel(_log_level)
 for handler in root_logger.handlers:
     handler.setLevel(_log_level)
 
-app = FastAPI(title="Bot_data_base Admin API", version="1.0.0")
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    preload_blocks_fallback_index()
+    # Воркеры очереди стартуют сразу: прерванные рестартом задания продолжаются с чекпоинта.
+    await get_job_queue().start()
+    try:
+        yield
+    finally:
+        await shutdown_job_queue()
+        shutdown_query_executors(wait=False)
+        shutdown_ingestion_engine(wait=False)
+
+
+app = FastAPI(title="Bot_data_base Admin API", version="1.0.0", lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,14 +1,17 @@
 ﻿import os
-from fastapi import APIRouter, BackgroundTasks, File, UploadFile, Form
+import uuid
+
+from fastapi import APIRouter, File, UploadFile, Form
 
 from api.schemas import JobResponse
-from jobs.job_manager import JobManager
+from jobs.job_manager import JobManager, JobRecord
+from jobs.job_queue import get_job_queue, register_job_handler
 from pipeline_runner import PipelineRunner
 
 router = APIRouter()
+UPLOADS_DIR = "data/uploads/books"
 ALLOWED_GOVERNANCE_PROFILES = {"general_book", "practice_manual", "architecture_notes", "transcript"}
 
-_job_manager = JobManager()
 _runner: PipelineRunner | None = None
 
 
@@ -22,12 +25,22 @@ def _job_to_response(job) -> JobResponse:
         finished_at=job.finished_at,
         error=job.error,
         result=job.result,
+        stage_metrics=getattr(job, "stage_metrics", None),
     )
 
 
+def _upload_path(source_id: str, filename: str | None) -> str:
+    """
+    Уникальный путь загрузки: задача может ждать в очереди, и одноименный файл
+    другой книги (book.pdf) не должен подменить содержимое до ее старта.
+    """
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    original = os.path.basename(filename or "") or "upload"
+    return os.path.join(UPLOADS_DIR, f"{source_id or 'book'}__{uuid.uuid4().hex[:8]}__{original}")
+
+
 @router.post("/book", response_model=JobResponse)
 async def ingest_book(
-    background_tasks: BackgroundTasks,
     author: str = Form(...),
     author_id: str = Form(...),
     book_title: str = Form(...),
@@ -43,49 +56,57 @@ async def ingest_book(
         profile = "general_book"
 
     runner = get_runner()
-    temp_dir = "data/uploads/books"
-    os.makedirs(temp_dir, exist_ok=True)
-    file_path = os.path.join(temp_dir, file.filename)
+    queue = get_job_queue()
+    source_id = runner._make_book_source_id(author_id or author, book_title)
+    dedup_key = f"book:{source_id}"
+    existing = await queue.job_manager.find_active(dedup_key)
+    if existing is not None:
+        # Та же книга уже в очереди/в работе: не перезаписываем загруженный файл.
+        return _job_to_response(existing)
+
+    file_path = _upload_path(source_id, file.filename)
     content = await file.read()
     with open(file_path, "wb") as f:
         f.write(content)
 
-    job_id = await _job_manager.create_job("book", file.filename)
-
-    async def _run():
-        result = await runner.run_book(
-            file_path=file_path,
-            author=author,
-            author_id=author_id,
-            book_title=book_title,
-            language=language,
-            job_id=job_id,
-            governance_profile=profile,
-            source_kind=source_kind,
-        )
-        if warnings:
-            result.setdefault("warnings", []).extend(warnings)
-        await _job_manager.update_job(
-            job_id=job_id,
-            status=result.get("status", "done"),
-            progress=100,
-            current_stage=result.get("status", "done"),
-            result=result,
-        )
-
-    background_tasks.add_task(_run)
-    job = await _job_manager.get_job(job_id)
+    job, _ = await queue.enqueue(
+        "book",
+        file.filename,
+        {
+            "file_path": file_path,
+            "author": author,
+            "author_id": author_id,
+            "book_title": book_title,
+            "language": language,
+            "governance_profile": profile,
+            "source_kind": source_kind,
+            "warnings": warnings,
+        },
+        dedup_key=dedup_key,
+    )
     return _job_to_response(job)
 
 
+async def _run_book_job(job: JobRecord) -> dict:
+    payload = dict(job.payload or {})
+    warnings = payload.pop("warnings", [])
+    result = await get_runner().run_book(job_id=job.job_id, **payload)
+    if warnings:
+        result.setdefault("warnings", []).extend(warnings)
+    return result
+
+
+register_job_handler("book", _run_book_job)
+
+
 def get_job_manager() -> JobManager:
-    return _job_manager
+    return get_job_queue().job_manager
 
 
 def get_runner() -> PipelineRunner:
     global _runner
     if _runner is None:
-        _runner = PipelineRunner(config_path="config.yaml", job_manager=_job_manager)
+        _runner = PipelineRunner(config_path="config.yaml", job_manager=get_job_manager())
     return _runner
 
 
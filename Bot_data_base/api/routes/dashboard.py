@@ -9,6 +9,7 @@ from fastapi import APIRouter
 
 from pipeline_runner import PipelineRunner
 from storage.chroma_runtime_health import get_chroma_runtime_health
+from storage.kb_snapshot import MANIFEST_NAME, iter_kb_blocks, resolve_kb_path
 
 router = APIRouter()
 
@@ -87,8 +88,10 @@ def _extract_source_id(block: dict[str, Any]) -> str:
 
 
 def _load_blocks_payload(runner: PipelineRunner) -> dict[str, Any] | None:
-    merged_path = Path(runner.json_exporter.base_dir) / "all_blocks_merged.json"
-    payload = _read_json(merged_path)
+    kb_path = resolve_kb_path(runner.json_exporter.base_dir)
+    if kb_path is not None and kb_path.name == MANIFEST_NAME:
+        return {"blocks": list(iter_kb_blocks(kb_path))}
+    payload = _read_json(kb_path) if kb_path is not None else None
     if payload is not None:
         return payload
     fallback = _resolve_existing_path("Bot_data_base/data/processed/all_blocks_merged.json")
@@ -1,4 +1,4 @@
-import json
+import asyncio
 import logging
 import os
 import time
@@ -10,7 +10,11 @@ from fastapi import APIRouter, HTTPException
 from api.schemas import QueryRequest, QueryResponse, ChunkResult
 from api.retrieval_policy import apply_retrieval_governance_policy
 from pipeline_runner import PipelineRunner
-from utils.reranker import VoyageReranker
+from utils.reranker import get_reranker_service
+from utils.query_executor import embed_query_texts, run_chroma_read
+from storage.kb_snapshot import resolve_kb_path
+from utils.bm25_index import get_blocks_bm25_index, preload_in_background
+from utils.tfidf_index import get_corpus_tfidf_index
 
 logger = logging.getLogger(__name__)
 
@@ -159,78 +163,54 @@ def _fallback_candidates_from_collection(collection: object, limit: int) -> List
     return candidates
 
 
-def _fallback_candidates_from_blocks_file(query: str, limit: int) -> List[dict]:
-    merged_path: Path | None = None
-    path_candidates: list[Path] = []
+def _resolve_blocks_file() -> Optional[Path]:
+    base_candidates: list[Path] = []
     try:
         runner = _get_runner()
-        path_candidates.append(Path(runner.json_exporter.base_dir) / "all_blocks_merged.json")
+        base_candidates.append(Path(runner.json_exporter.base_dir))
     except Exception:
         pass
-    path_candidates.extend(
+    base_candidates.extend(
         [
-            Path.cwd() / "data" / "processed" / "all_blocks_merged.json",
-            Path(__file__).resolve().parents[2] / "data" / "processed" / "all_blocks_merged.json",
-            Path(__file__).resolve().parents[3] / "Bot_data_base" / "data" / "processed" / "all_blocks_merged.json",
+            Path.cwd() / "data" / "processed",
+            Path(__file__).resolve().parents[2] / "data" / "processed",
+            Path(__file__).resolve().parents[3] / "Bot_data_base" / "data" / "processed",
         ]
     )
-    for candidate in path_candidates:
-        if candidate.exists():
-            merged_path = candidate
-            break
+    for base_dir in base_candidates:
+        # Шардированный снапшот (snapshot/manifest.json) или legacy all_blocks_merged.json.
+        candidate = resolve_kb_path(base_dir)
+        if candidate is not None:
+            return candidate
+    return None
+
+
+def preload_blocks_fallback_index() -> None:
+    """Построить BM25-индекс all_blocks_merged.json в фоне при старте API."""
+    preload_in_background(_resolve_blocks_file)
+
+
+def _fallback_candidates_from_blocks_file(query: str, limit: int) -> List[dict]:
+    merged_path = _resolve_blocks_file()
     if merged_path is None:
         return []
-    try:
-        payload = json.loads(merged_path.read_text(encoding="utf-8"))
-    except Exception:
-        return []
-    blocks = payload.get("blocks") if isinstance(payload, dict) and isinstance(payload.get("blocks"), list) else []
-    if not blocks:
+    # Снапшот разбирается один раз в BM25-индекс; пересборка только при смене файла.
+    index = get_blocks_bm25_index(merged_path)
+    if index is None:
         return []
+    # Без совпадений индекс отдает детерминированный топ, чтобы не уходить в hard 503.
+    return [{**document, "distance": None} for _, document in index.search(query, limit)]
 
-    query_terms = [part for part in str(query or "").lower().split() if part]
-    scored: list[tuple[int, dict]] = []
-    for idx, block in enumerate(blocks):
-        if not isinstance(block, dict):
-            continue
-        text = str(block.get("text") or "")
-        if not text.strip():
-            continue
-        text_lower = text.lower()
-        overlap = sum(1 for term in query_terms if term in text_lower)
-        metadata = block.get("metadata") if isinstance(block.get("metadata"), dict) else {}
-        score_base = overlap if overlap > 0 else 0
-        scored.append(
-            (
-                score_base,
-                {
-                    "chunk_id": block.get("id") or block.get("chunk_id") or f"blocks_fallback_{idx}",
-                    "content": text,
-                    "metadata": metadata,
-                    "distance": None,
-                },
-            )
-        )
 
-    if not scored:
-        return []
-    scored.sort(key=lambda item: item[0], reverse=True)
-    # If there is no term overlap, still return deterministic top rows to avoid hard 503 fallback.
-    return [item[1] for item in scored[: max(1, int(limit))]]
+async def _blocks_file_fallback(query: str, limit: int) -> List[dict]:
+    # Разбор снапшота и сборка BM25 (если preload не успел или файл сменился) — вне event loop.
+    return await asyncio.to_thread(_fallback_candidates_from_blocks_file, query, limit)
 
 
-def _apply_hybrid_scores(query: str, candidates: List[dict]) -> None:
-    if not candidates:
-        return
-    try:
-        from sklearn.feature_extraction.text import TfidfVectorizer
-        from sklearn.metrics.pairwise import cosine_similarity
-    except Exception as exc:
-        logger.warning("[QUERY] TF-IDF unavailable, fallback to semantic only: %s", exc)
-        for c in candidates:
-            distance = c.get("distance")
-            c["score"] = float(1.0 - distance) if distance is not None else 0.0
-        return
+def _fit_candidate_tfidf_scores(query: str, candidates: List[dict]):
+    """Legacy path: fit on candidate texts when corpus index is unavailable."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
 
     texts = [c["content"] for c in candidates]
     vectorizer = TfidfVectorizer(
@@ -242,7 +222,27 @@ def _apply_hybrid_scores(query: str, candidates: List[dict]) -> None:
     )
     tfidf_matrix = vectorizer.fit_transform(texts)
     query_vec = vectorizer.transform([query])
-    tfidf_scores = cosine_similarity(query_vec, tfidf_matrix).flatten()
+    return cosine_similarity(query_vec, tfidf_matrix).flatten()
+
+
+def _apply_hybrid_scores(query: str, candidates: List[dict], collection: object = None) -> None:
+    if not candidates:
+        return
+    try:
+        tfidf_scores = None
+        if collection is not None:
+            chroma_manager = getattr(_get_runner(), "chroma_manager", None)
+            index = get_corpus_tfidf_index(collection, chroma_manager)
+            if index is not None:
+                tfidf_scores = index.score(query, candidates)
+        if tfidf_scores is None:
+            tfidf_scores = _fit_candidate_tfidf_scores(query, candidates)
+    except Exception as exc:
+        logger.warning("[QUERY] TF-IDF unavailable, fallback to semantic only: %s", exc)
+        for c in candidates:
+            distance = c.get("distance")
+            c["score"] = float(1.0 - distance) if distance is not None else 0.0
+        return
 
     for i, c in enumerate(candidates):
         distance = c.get("distance")
@@ -370,11 +370,12 @@ async def semantic_query(request: QueryRequest) -> QueryResponse:
     collection = None
     query_embedding = None
     try:
-        collection = _get_collection()
-        query_embedding = _get_runner().chroma_manager._embed_texts([request.query])
+        # Chroma и encode блокирующие: уводим их с event loop в отдельные пулы.
+        collection = await run_chroma_read(_get_collection)
+        query_embedding = await embed_query_texts(_get_runner().chroma_manager._embed_texts, [request.query])
     except Exception as exc:
         logger.error("[QUERY] ChromaDB unavailable: %s", exc)
-        candidates = _fallback_candidates_from_blocks_file(request.query, request.top_k)
+        candidates = await _blocks_file_fallback(request.query, request.top_k)
         if candidates:
             logger.warning("[QUERY] fallback all_blocks_merged path activated due chroma bootstrap failure")
             botdb_query_route_fallback_used = True
@@ -391,23 +392,23 @@ async def semantic_query(request: QueryRequest) -> QueryResponse:
 
     if not candidates:
         try:
-            results = _query_collection(where_filter)
+            results = await run_chroma_read(_query_collection, where_filter)
             candidates = _extract_candidates(results)
         except Exception as exc:
             logger.error("[QUERY] Chroma query failed: %s", exc)
             try:
-                candidates = _fallback_candidates_from_collection(collection, request.top_k)
+                candidates = await run_chroma_read(_fallback_candidates_from_collection, collection, request.top_k)
                 if candidates:
                     logger.warning("[QUERY] fallback get() path activated due query failure")
                     botdb_query_route_fallback_used = True
                 else:
-                    candidates = _fallback_candidates_from_blocks_file(request.query, request.top_k)
+                    candidates = await _blocks_file_fallback(request.query, request.top_k)
                     if candidates:
                         logger.warning("[QUERY] fallback all_blocks_merged path activated due query failure")
                         botdb_query_route_fallback_used = True
             except Exception as fallback_exc:
                 logger.error("[QUERY] Chroma fallback failed: %s", fallback_exc)
-                candidates = _fallback_candidates_from_blocks_file(request.query, request.top_k)
+                candidates = await _blocks_file_fallback(request.query, request.top_k)
                 if candidates:
                     logger.warning("[QUERY] fallback all_blocks_merged path activated after fallback exception")
                     botdb_query_route_fallback_used = True
@@ -423,26 +424,33 @@ async def semantic_query(request: QueryRequest) -> QueryResponse:
 
     # Scoring
     if request.search_mode == "hybrid":
-        _apply_hybrid_scores(request.query, candidates)
+        # Первое построение корпусного TF-IDF читает коллекцию целиком.
+        await run_chroma_read(
+            _apply_hybrid_scores,
+            request.query,
+            candidates,
+            collection=None if botdb_query_route_fallback_used else collection,
+        )
     else:
         _apply_semantic_scores(candidates)
 
     # Rerank
     reranked = False
     if request.use_rerank and candidates:
-        reranker = VoyageReranker()
+        reranker = get_reranker_service()
         try:
-            indices = reranker.rerank(
+            indices = await asyncio.to_thread(
+                reranker.rerank,
                 request.query,
                 [c["content"] for c in candidates],
                 top_k=min(request.top_k, len(candidates)),
+                ids=[str(c.get("chunk_id") or "") or str(idx) for idx, c in enumerate(candidates)],
             )
-            if getattr(reranker, "_client", None) is not None:
-                reranked = True
+            reranked = reranker.available
             if indices:
                 candidates = [candidates[i] for i in indices if i < len(candidates)]
         except Exception as exc:
-            logger.warning("[QUERY] Voyage rerank failed: %s", exc)
+            logger.warning("[QUERY] rerank failed: %s", exc)
             reranked = False
 
     # Top-K + retrieval governance policy.
@@ -11,6 +11,7 @@ from api.schemas import RegistryListResponse, StatsResponse
 from pipeline_runner import PipelineRunner
 from storage.chroma_runtime_health import get_chroma_runtime_health
 from storage.json_export import JSONExporter
+from storage.kb_snapshot import iter_kb_blocks, resolve_kb_path
 
 router = APIRouter()
 
@@ -56,16 +57,6 @@ def _resolve_existing_path(relative_path: str) -> Path:
     return candidates[1]
 
 
-def _read_json(path: Path) -> dict[str, Any] | None:
-    try:
-        if not path.exists():
-            return None
-        payload = json.loads(path.read_text(encoding="utf-8"))
-        return payload if isinstance(payload, dict) else None
-    except Exception:
-        return None
-
-
 def _is_focus_source(source_row: dict[str, Any]) -> bool:
     source_id = _normalize(source_row.get("source_id")).lower()
     title = _normalize(source_row.get("title")).lower()
@@ -104,12 +95,18 @@ def _extract_source_id(block: dict[str, Any]) -> str:
 
 
 def _load_production_source_ids(runner: PipelineRunner) -> set[str]:
-    merged_path = Path(runner.json_exporter.base_dir) / "all_blocks_merged.json"
-    payload = _read_json(merged_path)
-    if payload is None:
-        payload = _read_json(_resolve_existing_path("Bot_data_base/data/processed/all_blocks_merged.json"))
-    blocks = payload.get("blocks") if isinstance((payload or {}).get("blocks"), list) else []
-    return {sid for sid in (_extract_source_id(block) for block in blocks) if sid}
+    kb_path = resolve_kb_path(runner.json_exporter.base_dir)
+    if kb_path is None:
+        kb_path = _resolve_existing_path("Bot_data_base/data/processed/all_blocks_merged.json")
+    try:
+        # Потоковый проход по блокам: снапшот не материализуется в памяти целиком.
+        return {
+            sid
+            for sid in (_extract_source_id(block) for block in iter_kb_blocks(kb_path) if isinstance(block, dict))
+            if sid
+        }
+    except (OSError, ValueError):
+        return set()
 
 
 def _safe_chroma_source_exists(runner: PipelineRunner, source_id: str) -> tuple[bool | None, str | None]:
@@ -400,7 +397,7 @@ def _create_registry_snapshot(runner: PipelineRunner, reason: str) -> str:
     safe_reason = "".join(ch for ch in reason if ch.isalnum() or ch in {"_", "-"}) or "delete"
     stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     target = out_dir / f"registry_snapshot_before_{safe_reason}_{stamp}.json"
-    target.write_text(registry_path.read_text(encoding="utf-8"), encoding="utf-8")
+    runner.registry.export_json(str(target))
     return str(target.as_posix())
 
 
@@ -1,18 +1,19 @@
 ﻿from fastapi import APIRouter, HTTPException
 
-from api.routes.youtube import get_job_manager as get_job_manager_youtube
-from api.routes.books import get_job_manager as get_job_manager_books
+from api.routes.youtube import get_job_manager
+from jobs.job_queue import job_queue_stats
+from utils.bm25_index import bm25_index_stats
+from utils.embedding_cache import get_query_embedding_cache_stats
+from utils.query_executor import query_executor_stats
+from utils.reranker import reranker_stats
+from utils.tfidf_index import corpus_tfidf_index_stats
 
 router = APIRouter()
 
 
 @router.get("/{job_id}")
 async def get_job_status(job_id: str):
-    jm = get_job_manager_youtube()
-    job = await jm.get_job(job_id)
-    if not job:
-        jm = get_job_manager_books()
-        job = await jm.get_job(job_id)
+    job = await get_job_manager().get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job.to_dict()
@@ -20,6 +21,10 @@ async def get_job_status(job_id: str):
 
 @router.get("/")
 async def list_jobs():
-    jm = get_job_manager_youtube()
-    jobs = await jm.list_jobs(limit=20)
-    return {"jobs": [j.to_dict() for j in jobs]}
+    jobs = await get_job_manager().list_jobs(limit=20)
+    query_runtime = query_executor_stats()
+    query_runtime["hybrid_tfidf"] = corpus_tfidf_index_stats()
+    query_runtime["query_embedding_cache"] = get_query_embedding_cache_stats()
+    query_runtime["rerank"] = reranker_stats()
+    query_runtime["blocks_fallback_bm25"] = bm25_index_stats()
+    return {"jobs": [j.to_dict() for j in jobs], "job_queue": job_queue_stats(), "query_runtime": query_runtime}
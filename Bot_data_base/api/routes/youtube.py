@@ -1,14 +1,14 @@
-﻿from fastapi import APIRouter, BackgroundTasks, HTTPException
+﻿from fastapi import APIRouter, HTTPException
 
 from api.schemas import YouTubeIngestRequest, JobResponse
 from ingestors.youtube_ingestor import YouTubeIngestor
-from jobs.job_manager import JobManager
+from jobs.job_manager import JobManager, JobRecord
+from jobs.job_queue import get_job_queue, register_job_handler
 from pipeline_runner import PipelineRunner
 
 router = APIRouter()
 ALLOWED_GOVERNANCE_PROFILES = {"general_book", "practice_manual", "architecture_notes", "transcript"}
 
-_job_manager = JobManager()
 _runner: PipelineRunner | None = None
 
 
@@ -22,11 +22,12 @@ def _job_to_response(job) -> JobResponse:
         finished_at=job.finished_at,
         error=job.error,
         result=job.result,
+        stage_metrics=getattr(job, "stage_metrics", None),
     )
 
 
 @router.post("/youtube", response_model=JobResponse)
-async def ingest_youtube(request: YouTubeIngestRequest, background_tasks: BackgroundTasks):
+async def ingest_youtube(request: YouTubeIngestRequest):
     warnings: list[str] = []
     profile = (request.governance_profile or "").strip().lower()
     if profile not in ALLOWED_GOVERNANCE_PROFILES:
@@ -35,45 +36,47 @@ async def ingest_youtube(request: YouTubeIngestRequest, background_tasks: Backgr
         )
         profile = "transcript"
 
-    runner = get_runner()
+    get_runner()
     ing = YouTubeIngestor()
     video_id = ing.extract_video_id(request.url)
     if not video_id:
         raise HTTPException(status_code=422, detail="Invalid YouTube URL")
 
-    job_id = await _job_manager.create_job("youtube", request.url)
+    job, _ = await get_job_queue().enqueue(
+        "youtube",
+        request.url,
+        {
+            "url": request.url,
+            "author": request.author,
+            "author_id": request.author_id,
+            "governance_profile": profile,
+            "source_kind": request.source_kind or "transcript",
+            "warnings": warnings,
+        },
+        dedup_key=f"youtube:{video_id}",
+    )
+    return _job_to_response(job)
 
-    async def _run():
-        result = await runner.run_youtube(
-            url=request.url,
-            author=request.author,
-            author_id=request.author_id,
-            job_id=job_id,
-            governance_profile=profile,
-            source_kind=request.source_kind or "transcript",
-        )
-        if warnings:
-            result.setdefault("warnings", []).extend(warnings)
-        await _job_manager.update_job(
-            job_id=job_id,
-            status=result.get("status", "done"),
-            progress=100,
-            current_stage=result.get("status", "done"),
-            result=result,
-        )
 
-    background_tasks.add_task(_run)
-    job = await _job_manager.get_job(job_id)
-    return _job_to_response(job)
+async def _run_youtube_job(job: JobRecord) -> dict:
+    payload = dict(job.payload or {})
+    warnings = payload.pop("warnings", [])
+    result = await get_runner().run_youtube(job_id=job.job_id, **payload)
+    if warnings:
+        result.setdefault("warnings", []).extend(warnings)
+    return result
+
+
+register_job_handler("youtube", _run_youtube_job)
 
 
 def get_job_manager() -> JobManager:
-    return _job_manager
+    return get_job_queue().job_manager
 
 
 def get_runner() -> PipelineRunner:
     global _runner
     if _runner is None:
-        _runner = PipelineRunner(config_path="config.yaml", job_manager=_job_manager)
+        _runner = PipelineRunner(config_path="config.yaml", job_manager=get_job_manager())
     return _runner
 
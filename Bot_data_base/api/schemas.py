@@ -26,6 +26,7 @@ class JobResponse(BaseModel):
     finished_at: Optional[str]
     error: Optional[str]
     result: Optional[dict]
+    stage_metrics: Optional[dict] = None
 
 
 class RegistryListResponse(BaseModel):
@@ -7,6 +7,7 @@ from typing import List, Tuple
 from chunkers.structure_parser import StructuredSection, parse_markdown_like_sections_v1
 from models.universal_block import UniversalBlock
 from utils.text_utils import count_tokens, clean_text, split_into_paragraphs
+from utils.tokenizer import get_tokenizer, split_to_token_budget, split_words_to_token_budget
 
 
 class BookChunker:
@@ -210,8 +211,8 @@ class BookChunker:
 
         parts = self._split_practice_steps(section_text)
         normalized_parts: list[str] = []
-        for part in parts:
-            if count_tokens(part) > max_tokens:
+        for part, part_tokens in zip(parts, get_tokenizer().count_batch(parts)):
+            if part_tokens > max_tokens:
                 normalized_parts.extend(self._split_long_text(part, max_tokens))
             elif part.strip():
                 normalized_parts.append(part.strip())
@@ -224,8 +225,7 @@ class BookChunker:
         current: list[str] = []
         current_tokens = 0
 
-        for part in normalized_parts:
-            piece_tokens = count_tokens(part)
+        for part, piece_tokens in zip(normalized_parts, get_tokenizer().count_batch(normalized_parts)):
             if current and current_tokens + piece_tokens > max_tokens:
                 chunks.append(clean_text("\n\n".join(current)))
                 current = []
@@ -284,9 +284,7 @@ class BookChunker:
         current_tokens = 0
         overlap_text = ""
 
-        for piece in pieces:
-            piece_tokens = count_tokens(piece)
-
+        for piece, piece_tokens in zip(pieces, get_tokenizer().count_batch(pieces)):
             if not current_parts and overlap_text:
                 current_parts.append(overlap_text)
                 current_tokens = count_tokens(overlap_text)
@@ -433,57 +431,20 @@ class BookChunker:
         return title.strip()
 
     def _split_long_text(self, text: str, max_tokens: int) -> List[str]:
-        if count_tokens(text) <= max_tokens:
-            return [text]
-        sentences = re.split(r"(?<=[.!?])\s+", text)
-        parts: List[str] = []
-        current = []
-        current_tokens = 0
-        for sentence in sentences:
-            if not sentence:
-                continue
-            sentence_tokens = count_tokens(sentence)
-            if current and current_tokens + sentence_tokens > max_tokens:
-                parts.append(" ".join(current))
-                current = []
-                current_tokens = 0
-            if sentence_tokens > max_tokens:
-                parts.extend(self._split_by_words(sentence, max_tokens))
-            else:
-                current.append(sentence)
-                current_tokens += sentence_tokens
-        if current:
-            parts.append(" ".join(current))
-        return parts
+        return split_to_token_budget(text, max_tokens)
 
     def _split_by_words(self, text: str, max_tokens: int) -> List[str]:
-        words = text.split()
-        parts: List[str] = []
-        current = []
-        current_tokens = 0
-        for word in words:
-            word_tokens = count_tokens(word)
-            if current and current_tokens + word_tokens > max_tokens:
-                parts.append(" ".join(current))
-                current = []
-                current_tokens = 0
-            current.append(word)
-            current_tokens += word_tokens
-        if current:
-            parts.append(" ".join(current))
-        return parts
+        return split_words_to_token_budget(text, max_tokens)
 
     def _take_last_tokens(self, text: str, n_tokens: int) -> str:
         if n_tokens <= 0 or not text:
             return ""
         try:
-            import tiktoken
-
-            enc = tiktoken.get_encoding("cl100k_base")
-            tokens = enc.encode(text)
+            tokenizer = get_tokenizer()
+            tokens = tokenizer.encode(text)
             if len(tokens) <= n_tokens:
                 return text
-            return enc.decode(tokens[-n_tokens:])
+            return tokenizer.decode(tokens[-n_tokens:])
         except Exception:
             words = text.split()
             return " ".join(words[-n_tokens:])
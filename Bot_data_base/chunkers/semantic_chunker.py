@@ -4,7 +4,8 @@ import re
 from typing import List
 
 from models.universal_block import UniversalBlock
-from utils.text_utils import count_tokens, clean_text, split_into_paragraphs
+from utils.text_utils import clean_text, split_into_paragraphs
+from utils.tokenizer import get_tokenizer, split_to_token_budget, split_words_to_token_budget
 
 
 class SemanticChunker:
@@ -30,8 +31,7 @@ class SemanticChunker:
         current_tokens = 0
         chunk_index = 0
 
-        for piece in pieces:
-            piece_tokens = count_tokens(piece)
+        for piece, piece_tokens in zip(pieces, get_tokenizer().count_batch(pieces)):
             if current_parts and current_tokens + piece_tokens > max_tokens:
                 if current_tokens >= min_tokens:
                     block_text = clean_text("\n\n".join(current_parts))
@@ -86,45 +86,10 @@ class SemanticChunker:
         return parts
 
     def _split_long_text(self, text: str, max_tokens: int) -> List[str]:
-        if count_tokens(text) <= max_tokens:
-            return [text]
-        sentences = re.split(r"(?<=[.!?])\s+", text)
-        parts: List[str] = []
-        current = []
-        current_tokens = 0
-        for s in sentences:
-            if not s:
-                continue
-            s_tokens = count_tokens(s)
-            if current and current_tokens + s_tokens > max_tokens:
-                parts.append(" ".join(current))
-                current = []
-                current_tokens = 0
-            if s_tokens > max_tokens:
-                parts.extend(self._split_by_words(s, max_tokens))
-            else:
-                current.append(s)
-                current_tokens += s_tokens
-        if current:
-            parts.append(" ".join(current))
-        return parts
+        return split_to_token_budget(text, max_tokens)
 
     def _split_by_words(self, text: str, max_tokens: int) -> List[str]:
-        words = text.split()
-        parts: List[str] = []
-        current = []
-        current_tokens = 0
-        for w in words:
-            w_tokens = count_tokens(w)
-            if current and current_tokens + w_tokens > max_tokens:
-                parts.append(" ".join(current))
-                current = []
-                current_tokens = 0
-            current.append(w)
-            current_tokens += w_tokens
-        if current:
-            parts.append(" ".join(current))
-        return parts
+        return split_words_to_token_budget(text, max_tokens)
 
     def _make_title(self, text: str) -> str:
         words = re.findall(r"[\w'-]+", text)
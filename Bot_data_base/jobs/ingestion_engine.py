@@ -0,0 +1,291 @@
+"""
+Поэтапный движок загрузки источников (книги, транскрипты).
+
+Стадии:
+  prepare  — чанкинг + нормализация + governance в пуле процессов
+             (CPU-bound код не держит GIL и event loop API);
+  export   — JSON-экспорт в потоке;
+  index    — эмбеддинг и запись в Chroma страницами фиксированного размера:
+             в памяти одновременно только векторы одной страницы.
+
+По каждой стадии копятся метрики (items, seconds, items_per_sec), которые
+PipelineRunner публикует в JobManager (JobRecord.stage_metrics).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from governance.chunking_quality import build_chunking_quality_v1
+from governance.governance_adapter import apply_governance_to_blocks_v1, normalize_governance_profile
+from models.universal_block import UniversalBlock
+
+try:  # pragma: no cover - platform dependent
+    import resource
+except Exception:  # pragma: no cover - Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESS_WORKERS = 2
+DEFAULT_EMBED_BATCH = 64
+# Воркер перезапускается после N задач: RSS не копится от книги к книге.
+_MAX_TASKS_PER_CHILD = 8
+
+
+@dataclass
+class PrepareRequest:
+    source_type: str  # "book" | "youtube"
+    source_id: str
+    text: str
+    author: str
+    author_id: str
+    title: str
+    language: str = ""
+    published_date: str = ""
+    governance_profile: Optional[str] = None
+    source_kind: str = ""
+
+
+def prepare_source_blocks(
+    request: PrepareRequest,
+    *,
+    chunker: Any,
+    block_normalizer: Any,
+    sd_labeler: Any = None,
+    apply_governance: Callable[..., List[UniversalBlock]] = apply_governance_to_blocks_v1,
+    normalize_profile: Callable[..., str] = normalize_governance_profile,
+    build_quality: Callable[[UniversalBlock], dict] = build_chunking_quality_v1,
+) -> List[UniversalBlock]:
+    """Чанкинг -> (legacy SD) -> нормализация -> governance -> chunking_quality."""
+    if request.source_type == "book":
+        blocks = chunker.chunk_file_from_text(
+            request.text,
+            author=request.author,
+            book_title=request.title,
+            language=request.language,
+            author_id=request.author_id,
+        )
+        fallback_profile, default_kind = "general_book", "book"
+    else:
+        blocks = chunker.chunk(
+            request.text,
+            author=request.author,
+            source_title=request.title,
+            source_id=request.source_id,
+        )
+        for block in blocks:
+            block.author_id = request.author_id
+            block.source_title = request.title
+            block.language = request.language or block.language
+            block.published_date = request.published_date
+        fallback_profile, default_kind = "transcript", "transcript"
+
+    if sd_labeler is not None:
+        blocks = sd_labeler.label_blocks(blocks)
+    else:
+        logger.debug("[PIPELINE] legacy SD labeling skipped (disabled by default)")
+
+    blocks = block_normalizer.normalize(blocks)
+    blocks = apply_governance(
+        blocks=blocks,
+        source_id=request.source_id,
+        source_title=request.title,
+        source_type=request.source_type,
+        source_kind=request.source_kind or default_kind,
+        governance_profile=normalize_profile(request.governance_profile, fallback=fallback_profile),
+    )
+    for block in blocks:
+        block.chunking_quality = build_quality(block)
+    return blocks
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает KiB, macOS — байты.
+    return round(peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0, 1)
+
+
+class IngestionMetrics:
+    """Накопитель пропускной способности по стадиям одного задания."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, stage: str, items: int, seconds: float, **extra: Any) -> None:
+        entry = self.stages.setdefault(stage, {"items": 0, "seconds": 0.0})
+        entry["items"] += int(items)
+        entry["seconds"] += float(seconds)
+        entry.update(extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {}
+        for stage, entry in self.stages.items():
+            seconds = entry["seconds"]
+            payload[stage] = {
+                **entry,
+                "seconds": round(seconds, 3),
+                "items_per_sec": round(entry["items"] / seconds, 2) if seconds > 0 else None,
+            }
+        payload["peak_rss_mb"] = _peak_rss_mb()
+        return payload
+
+
+def _picklable(*objects: Any) -> bool:
+    try:
+        pickle.dumps(objects)
+        return True
+    except Exception:
+        return False
+
+
+class IngestionEngine:
+    """Исполнитель стадий: пул процессов для prepare, страничная индексация."""
+
+    def __init__(
+        self,
+        *,
+        process_workers: int = DEFAULT_PROCESS_WORKERS,
+        embed_batch_size: int = DEFAULT_EMBED_BATCH,
+    ) -> None:
+        self.process_workers = max(0, int(process_workers))
+        self.embed_batch_size = max(1, int(embed_batch_size))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.process_workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                kwargs: Dict[str, Any] = {
+                    "max_workers": self.process_workers,
+                    # spawn: API держит потоки (Chroma, батчер эмбеддингов), fork с ними небезопасен.
+                    "mp_context": multiprocessing.get_context("spawn"),
+                }
+                if sys.version_info >= (3, 11):
+                    kwargs["max_tasks_per_child"] = _MAX_TASKS_PER_CHILD
+                self._executor = ProcessPoolExecutor(**kwargs)
+            return self._executor
+
+    async def prepare(
+        self,
+        request: PrepareRequest,
+        *,
+        chunker: Any,
+        block_normalizer: Any,
+        sd_labeler: Any = None,
+        metrics: Optional[IngestionMetrics] = None,
+        **steps: Any,
+    ) -> List[UniversalBlock]:
+        """
+        Подготовить блоки источника. Legacy SD (сетевые вызовы LLM) и
+        непиклуемые компоненты выполняются в потоке текущего процесса.
+        """
+        started = time.perf_counter()
+        executor = None
+        if sd_labeler is None and _picklable(chunker, block_normalizer, steps):
+            executor = self._get_executor()
+        blocks: Optional[List[UniversalBlock]] = None
+        mode = "thread"
+        if executor is not None:
+            try:
+                future = executor.submit(_prepare_in_worker, request, chunker, block_normalizer, steps)
+            except (OSError, RuntimeError) as exc:
+                # Не удалось поднять воркеры (spawn, лимиты ОС): дальше работаем в потоке.
+                logger.warning("[INGEST] process pool unavailable, falling back to thread: %s", exc)
+                self.shutdown(wait=False)
+                self.process_workers = 0
+            else:
+                try:
+                    blocks = await asyncio.wrap_future(future)
+                    mode = "process"
+                except BrokenProcessPool as exc:
+                    logger.warning("[INGEST] process pool broken, retrying in thread: %s", exc)
+                    self.shutdown(wait=False)
+        if blocks is None:
+            blocks = await asyncio.to_thread(
+                prepare_source_blocks,
+                request,
+                chunker=chunker,
+                block_normalizer=block_normalizer,
+                sd_labeler=sd_labeler,
+                **steps,
+            )
+        if metrics is not None:
+            metrics.record("prepare", len(blocks), time.perf_counter() - started, mode=mode, chars=len(request.text))
+        return blocks
+
+    async def index(
+        self,
+        chroma_manager: Any,
+        blocks: List[UniversalBlock],
+        *,
+        metrics: Optional[IngestionMetrics] = None,
+        on_page: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    ) -> int:
+        """Эмбеддинг + запись в Chroma страницами по embed_batch_size блоков."""
+        added = 0
+        total_pages = (len(blocks) + self.embed_batch_size - 1) // self.embed_batch_size
+        for page_no, start in enumerate(range(0, len(blocks), self.embed_batch_size), start=1):
+            page = blocks[start : start + self.embed_batch_size]
+            started = time.perf_counter()
+            added += int(await asyncio.to_thread(chroma_manager.add_blocks, page) or 0)
+            if metrics is not None:
+                metrics.record("index", len(page), time.perf_counter() - started, pages=page_no, page_size=self.embed_batch_size)
+            if on_page is not None:
+                await on_page(page_no, total_pages)
+        return added
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _prepare_in_worker(
+    request: PrepareRequest,
+    chunker: Any,
+    block_normalizer: Any,
+    steps: Dict[str, Any],
+) -> List[UniversalBlock]:
+    return prepare_source_blocks(request, chunker=chunker, block_normalizer=block_normalizer, **steps)
+
+
+_engine: Optional[IngestionEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_ingestion_engine() -> IngestionEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = IngestionEngine(
+                process_workers=int(os.getenv("BOT_DB_INGEST_PROCESS_WORKERS", str(DEFAULT_PROCESS_WORKERS))),
+                embed_batch_size=int(os.getenv("BOT_DB_INGEST_EMBED_BATCH", str(DEFAULT_EMBED_BATCH))),
+            )
+        return _engine
+
+
+def shutdown_ingestion_engine(wait: bool = True) -> None:
+    global _engine
+    with _engine_lock:
+        engine = _engine
+        _engine = None
+    if engine is not None:
+        engine.shutdown(wait=wait)
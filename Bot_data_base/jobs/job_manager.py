@@ -1,11 +1,21 @@
 ﻿from __future__ import annotations
 
-from dataclasses import dataclass, asdict
-from datetime import datetime
-from typing import Optional, List, Dict
+from dataclasses import dataclass, asdict, fields
+from datetime import datetime, timedelta
+from typing import Any, Optional, List, Dict, Iterable
 import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
 import uuid
 
+ACTIVE_STATUSES = ("queued", "running")
+TERMINAL_STATUSES = ("done", "failed", "skipped", "cancelled")
+DEFAULT_LEASE_SECONDS = 300.0
+
 
 @dataclass
 class JobRecord:
@@ -19,20 +29,56 @@ class JobRecord:
     finished_at: Optional[str]
     error: Optional[str]
     result: Optional[dict]
+    # Пропускная способность по стадиям загрузки (prepare/export/index).
+    stage_metrics: Optional[dict] = None
+    # Очередь: ключ дедупликации источника, входные параметры, попытки, чекпоинт стадий.
+    dedup_key: Optional[str] = None
+    payload: Optional[dict] = None
+    attempts: int = 0
+    checkpoint: Optional[dict] = None
+    started_at: Optional[str] = None
 
     def to_dict(self) -> dict:
         return asdict(self)
 
 
+_RECORD_FIELDS = tuple(f.name for f in fields(JobRecord))
+_JSON_FIELDS = {"result", "stage_metrics", "payload", "checkpoint"}
+
+
 class JobManager:
-    def __init__(self):
+    """
+    In-memory хранилище заданий (процесс-локальное). Запись обновляется на
+    месте; завершенные задания сверх max_finished вытесняются (старые первыми).
+
+    running-задание держит аренду (lease): воркер продлевает ее heartbeat'ом,
+    и requeue_interrupted возвращает в очередь только задания без живой аренды.
+    """
+
+    def __init__(
+        self,
+        max_finished: int = 500,
+        retention_days: float = 14.0,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
         self._jobs: Dict[str, JobRecord] = {}
         self._lock = asyncio.Lock()
+        self.max_finished = max(1, int(max_finished))
+        self.retention_days = float(retention_days)
+        self.lease_seconds = max(0.1, float(lease_seconds))
+        # job_id -> время последнего heartbeat (time.time()).
+        self._leases: Dict[str, float] = {}
 
-    async def create_job(self, source_type: str, source_ref: str) -> str:
-        job_id = str(uuid.uuid4())
-        record = JobRecord(
-            job_id=job_id,
+    def _new_record(
+        self,
+        source_type: str,
+        source_ref: str,
+        *,
+        dedup_key: Optional[str] = None,
+        payload: Optional[dict] = None,
+    ) -> JobRecord:
+        return JobRecord(
+            job_id=str(uuid.uuid4()),
             source_type=source_type,
             source_ref=source_ref,
             status="queued",
@@ -42,10 +88,22 @@ class JobManager:
             finished_at=None,
             error=None,
             result=None,
+            dedup_key=dedup_key,
+            payload=payload,
         )
+
+    async def create_job(
+        self,
+        source_type: str,
+        source_ref: str,
+        *,
+        dedup_key: Optional[str] = None,
+        payload: Optional[dict] = None,
+    ) -> str:
+        record = self._new_record(source_type, source_ref, dedup_key=dedup_key, payload=payload)
         async with self._lock:
-            self._jobs[job_id] = record
-        return job_id
+            self._jobs[record.job_id] = record
+        return record.job_id
 
     async def update_job(
         self,
@@ -59,18 +117,15 @@ class JobManager:
             record = self._jobs.get(job_id)
             if record is None:
                 return
-            data = record.to_dict()
-            data.update(
-                {
-                    "status": status,
-                    "progress": progress,
-                    "current_stage": current_stage,
-                }
-            )
+            record.status = status
+            record.progress = progress
+            record.current_stage = current_stage
             for key, value in kwargs.items():
-                if key in data:
-                    data[key] = value
-            self._jobs[job_id] = JobRecord(**data)
+                if key in _RECORD_FIELDS and key != "job_id":
+                    setattr(record, key, value)
+            if status in TERMINAL_STATUSES:
+                self._leases.pop(job_id, None)
+                self._prune_locked()
 
     async def get_job(self, job_id: str) -> Optional[JobRecord]:
         async with self._lock:
@@ -80,3 +135,370 @@ class JobManager:
         async with self._lock:
             values = list(self._jobs.values())
         return values[-limit:]
+
+    # --- очередь ---------------------------------------------------------
+
+    async def find_active(self, dedup_key: str) -> Optional[JobRecord]:
+        async with self._lock:
+            for record in self._jobs.values():
+                if record.dedup_key == dedup_key and record.status in ACTIVE_STATUSES:
+                    return record
+        return None
+
+    async def claim_next(self, source_types: Iterable[str]) -> Optional[JobRecord]:
+        """Атомарно перевести самое старое queued-задание в running."""
+        allowed = set(source_types)
+        async with self._lock:
+            for record in self._jobs.values():
+                if record.status == "queued" and record.source_type in allowed:
+                    record.status = "running"
+                    record.current_stage = "starting"
+                    record.attempts += 1
+                    record.started_at = datetime.utcnow().isoformat()
+                    self._leases[record.job_id] = time.time()
+                    return record
+        return None
+
+    async def requeue_interrupted(self, max_attempts: int) -> int:
+        """running без живой аренды -> queued (или failed, если попытки исчерпаны)."""
+        cutoff = time.time() - self.lease_seconds
+        async with self._lock:
+            records = [
+                record
+                for record in self._jobs.values()
+                if record.status == "running" and self._leases.get(record.job_id, 0.0) < cutoff
+            ]
+            for record in records:
+                self._leases.pop(record.job_id, None)
+            return self._requeue_records(records, max_attempts)
+
+    async def heartbeat(self, job_id: str) -> None:
+        """Продлить аренду running-задания, которое выполняет этот процесс."""
+        async with self._lock:
+            if job_id in self._leases:
+                self._leases[job_id] = time.time()
+
+    async def release_leases(self, job_ids: Iterable[str]) -> None:
+        """Отпустить аренду прерванных заданий: следующий requeue вернет их сразу."""
+        async with self._lock:
+            for job_id in job_ids:
+                self._leases.pop(job_id, None)
+
+    @staticmethod
+    def _requeue_records(records: List[JobRecord], max_attempts: int) -> int:
+        requeued = 0
+        for record in records:
+            if record.status != "running":
+                continue
+            if record.attempts >= max_attempts:
+                record.status = "failed"
+                record.current_stage = "failed"
+                record.error = f"interrupted after {record.attempts} attempts"
+                record.finished_at = datetime.utcnow().isoformat()
+            else:
+                record.status = "queued"
+                record.current_stage = "queued"
+                requeued += 1
+        return requeued
+
+    async def get_checkpoint(self, job_id: str) -> dict:
+        job = await self.get_job(job_id)
+        return dict(job.checkpoint or {}) if job is not None else {}
+
+    async def save_checkpoint(self, job_id: str, **data: Any) -> None:
+        async with self._lock:
+            record = self._jobs.get(job_id)
+            if record is not None:
+                record.checkpoint = {**(record.checkpoint or {}), **data}
+
+    def _prune_locked(self) -> None:
+        cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).isoformat()
+        finished = [r for r in self._jobs.values() if r.status in TERMINAL_STATUSES]
+        for record in finished:
+            if record.finished_at and record.finished_at < cutoff:
+                self._jobs.pop(record.job_id, None)
+        finished = [r for r in self._jobs.values() if r.status in TERMINAL_STATUSES]
+        for record in finished[: max(0, len(finished) - self.max_finished)]:
+            self._jobs.pop(record.job_id, None)
+
+    def checkpoint_dir(self) -> Optional[str]:
+        return None
+
+
+class SqliteJobManager(JobManager):
+    """
+    Персистентные задания в SQLite (WAL): очередь переживает рестарт,
+    running-задания после падения возвращаются в queued и продолжаются
+    с сохраненного чекпоинта стадий.
+
+    Запросы выполняются в asyncio.to_thread, _db_lock берется только внутри
+    потока и никогда не удерживается через await. Аренда хранится в строке
+    (worker_id = host:pid:token, heartbeat_at), поэтому requeue_interrupted
+    не трогает задания, которые еще выполняет другой процесс.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_finished: int = 500,
+        retention_days: float = 14.0,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
+        super().__init__(max_finished=max_finished, retention_days=retention_days, lease_seconds=lease_seconds)
+        self.db_path = db_path
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._db_lock = threading.RLock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                source_type TEXT NOT NULL,
+                source_ref TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL,
+                current_stage TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                finished_at TEXT,
+                error TEXT,
+                result TEXT,
+                stage_metrics TEXT,
+                dedup_key TEXT,
+                payload TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                checkpoint TEXT,
+                started_at TEXT,
+                worker_id TEXT,
+                heartbeat_at REAL
+            )
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("worker_id", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs(dedup_key, status)")
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row) -> JobRecord:
+        data = {key: row[key] for key in _RECORD_FIELDS}
+        for key in _JSON_FIELDS:
+            data[key] = json.loads(data[key]) if data[key] else None
+        return JobRecord(**data)
+
+    @staticmethod
+    def _encode(key: str, value: Any) -> Any:
+        if key in _JSON_FIELDS:
+            return json.dumps(value, ensure_ascii=False) if value is not None else None
+        return value
+
+    def _execute(self, sql: str, params: Iterable[Any] = ()) -> sqlite3.Cursor:
+        with self._db_lock:
+            return self._conn.execute(sql, tuple(params))
+
+    def _fetchone(self, sql: str, params: Iterable[Any] = ()) -> Optional[sqlite3.Row]:
+        with self._db_lock:
+            return self._conn.execute(sql, tuple(params)).fetchone()
+
+    def _fetchall(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        with self._db_lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    @staticmethod
+    def _owner_is_dead(worker_id: Optional[str]) -> bool:
+        """Владелец задания — завершившийся процесс на этом же хосте."""
+        host, _, rest = (worker_id or "").partition(":")
+        pid_text = rest.partition(":")[0]
+        # os.kill(pid, 0) на Windows завершает процесс, там ждем истечения аренды.
+        if os.name == "nt" or host != socket.gethostname() or not pid_text.isdigit():
+            return False
+        pid = int(pid_text)
+        if pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    async def create_job(
+        self,
+        source_type: str,
+        source_ref: str,
+        *,
+        dedup_key: Optional[str] = None,
+        payload: Optional[dict] = None,
+    ) -> str:
+        record = self._new_record(source_type, source_ref, dedup_key=dedup_key, payload=payload)
+        data = record.to_dict()
+        await asyncio.to_thread(
+            self._execute,
+            f"INSERT INTO jobs({', '.join(_RECORD_FIELDS)}) VALUES ({', '.join('?' for _ in _RECORD_FIELDS)})",
+            [self._encode(key, data[key]) for key in _RECORD_FIELDS],
+        )
+        return record.job_id
+
+    async def update_job(
+        self,
+        job_id: str,
+        status: str,
+        progress: int,
+        current_stage: str,
+        **kwargs,
+    ) -> None:
+        updates = {"status": status, "progress": progress, "current_stage": current_stage}
+        updates.update({k: v for k, v in kwargs.items() if k in _RECORD_FIELDS and k != "job_id"})
+        await asyncio.to_thread(self._update_job_sync, job_id, updates)
+
+    def _update_job_sync(self, job_id: str, updates: Dict[str, Any]) -> None:
+        assignments = ", ".join(f"{key} = ?" for key in updates)
+        self._execute(
+            f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+            [*(self._encode(key, value) for key, value in updates.items()), job_id],
+        )
+        if updates["status"] in TERMINAL_STATUSES:
+            self._prune()
+
+    async def get_job(self, job_id: str) -> Optional[JobRecord]:
+        row = await asyncio.to_thread(self._fetchone, "SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        return self._row_to_record(row) if row is not None else None
+
+    async def list_jobs(self, limit: int = 20) -> List[JobRecord]:
+        rows = await asyncio.to_thread(
+            self._fetchall,
+            "SELECT * FROM (SELECT * FROM jobs ORDER BY created_at DESC, rowid DESC LIMIT ?) "
+            "ORDER BY created_at ASC, rowid ASC",
+            (int(limit),),
+        )
+        return [self._row_to_record(row) for row in rows]
+
+    async def find_active(self, dedup_key: str) -> Optional[JobRecord]:
+        row = await asyncio.to_thread(
+            self._fetchone,
+            "SELECT * FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running') "
+            "ORDER BY created_at LIMIT 1",
+            (dedup_key,),
+        )
+        return self._row_to_record(row) if row is not None else None
+
+    async def claim_next(self, source_types: Iterable[str]) -> Optional[JobRecord]:
+        allowed = list(source_types)
+        if not allowed:
+            return None
+        return await asyncio.to_thread(self._claim_next_sync, allowed)
+
+    def _claim_next_sync(self, allowed: List[str]) -> Optional[JobRecord]:
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT job_id FROM jobs WHERE status = 'queued' AND source_type IN "
+                    f"({', '.join('?' for _ in allowed)}) ORDER BY created_at, rowid LIMIT 1",
+                    allowed,
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', current_stage = 'starting', "
+                    "attempts = attempts + 1, started_at = ?, worker_id = ?, heartbeat_at = ? WHERE job_id = ?",
+                    (datetime.utcnow().isoformat(), self.worker_id, time.time(), row["job_id"]),
+                )
+                claimed = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._row_to_record(claimed)
+
+    async def requeue_interrupted(self, max_attempts: int) -> int:
+        return await asyncio.to_thread(self._requeue_interrupted_sync, max_attempts)
+
+    def _requeue_interrupted_sync(self, max_attempts: int) -> int:
+        cutoff = time.time() - self.lease_seconds
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall()
+                records = [
+                    self._row_to_record(row)
+                    for row in rows
+                    if row["heartbeat_at"] is None
+                    or row["heartbeat_at"] < cutoff
+                    or self._owner_is_dead(row["worker_id"])
+                ]
+                requeued = self._requeue_records(records, max_attempts)
+                for record in records:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, current_stage = ?, error = ?, finished_at = ?, "
+                        "worker_id = NULL, heartbeat_at = NULL WHERE job_id = ? AND status = 'running'",
+                        (record.status, record.current_stage, record.error, record.finished_at, record.job_id),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if len(records) > requeued:
+            self._prune()
+        return requeued
+
+    async def heartbeat(self, job_id: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND worker_id = ? AND status = 'running'",
+            (time.time(), job_id, self.worker_id),
+        )
+
+    async def release_leases(self, job_ids: Iterable[str]) -> None:
+        ids = list(job_ids)
+        if ids:
+            await asyncio.to_thread(self._release_leases_sync, ids)
+
+    def _release_leases_sync(self, job_ids: Optional[List[str]] = None) -> None:
+        sql = "UPDATE jobs SET heartbeat_at = NULL WHERE worker_id = ? AND status = 'running'"
+        params: List[Any] = [self.worker_id]
+        if job_ids is not None:
+            sql += f" AND job_id IN ({', '.join('?' for _ in job_ids)})"
+            params.extend(job_ids)
+        self._execute(sql, params)
+
+    async def save_checkpoint(self, job_id: str, **data: Any) -> None:
+        await asyncio.to_thread(self._save_checkpoint_sync, job_id, data)
+
+    def _save_checkpoint_sync(self, job_id: str, data: Dict[str, Any]) -> None:
+        with self._db_lock:
+            row = self._conn.execute("SELECT checkpoint FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            current = json.loads(row["checkpoint"]) if row["checkpoint"] else {}
+            self._conn.execute(
+                "UPDATE jobs SET checkpoint = ? WHERE job_id = ?",
+                (json.dumps({**current, **data}, ensure_ascii=False), job_id),
+            )
+
+    def _prune(self) -> None:
+        cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).isoformat()
+        terminal = ", ".join(f"'{status}'" for status in TERMINAL_STATUSES)
+        with self._db_lock:
+            self._conn.execute(f"DELETE FROM jobs WHERE status IN ({terminal}) AND finished_at < ?", (cutoff,))
+            self._conn.execute(
+                f"DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE status IN ({terminal}) "
+                "ORDER BY created_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self.max_finished,),
+            )
+
+    def checkpoint_dir(self) -> Optional[str]:
+        return os.path.join(os.path.dirname(os.path.abspath(self.db_path)), "checkpoints")
+
+    def close(self) -> None:
+        with self._db_lock:
+            # Закрытый менеджер уже не продолжит свои задания: аренду отпускаем сразу.
+            self._release_leases_sync()
+            self._conn.close()
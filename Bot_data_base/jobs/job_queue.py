@@ -0,0 +1,238 @@
+"""
+Очередь заданий загрузки с ограниченным пулом воркеров.
+
+Загрузки (книги, YouTube) ставятся в очередь вместо неограниченных
+BackgroundTasks: одновременно выполняется не больше max_workers заданий,
+повторная загрузка того же источника возвращает уже активное задание
+(дедупликация по dedup_key), а при SQLite-хранилище очередь и чекпоинты
+стадий переживают рестарт — прерванные задания возвращаются в queued.
+Прерванным считается running-задание без живой аренды: воркер продлевает
+ее heartbeat'ом, поэтому задания другого живого процесса не перехватываются.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from jobs.job_manager import DEFAULT_LEASE_SECONDS, JobManager, JobRecord, SqliteJobManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DB_PATH = "data/jobs/jobs.sqlite3"
+DEFAULT_MAX_CONCURRENT_JOBS = 2
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETENTION_DAYS = 14.0
+DEFAULT_MAX_FINISHED = 500
+_IDLE_POLL_SECONDS = 5.0
+
+JobHandler = Callable[[JobRecord], Awaitable[dict]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(source_type: str, handler: JobHandler) -> None:
+    """Обработчик заданий типа source_type (регистрируется роутами при импорте)."""
+    _handlers[source_type] = handler
+
+
+class IngestionJobQueue:
+    def __init__(
+        self,
+        job_manager: JobManager,
+        *,
+        max_workers: int = DEFAULT_MAX_CONCURRENT_JOBS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        handlers: Optional[Dict[str, JobHandler]] = None,
+    ) -> None:
+        self.job_manager = job_manager
+        self.max_workers = max(1, int(max_workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self._handlers = handlers if handlers is not None else _handlers
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._active = 0
+        self._running_jobs: set[str] = set()
+        self._last_requeue = 0.0
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self.requeued = 0
+
+    async def enqueue(
+        self,
+        source_type: str,
+        source_ref: str,
+        payload: dict,
+        *,
+        dedup_key: Optional[str] = None,
+    ) -> Tuple[JobRecord, bool]:
+        """Поставить задание; (job, True) если источник уже в очереди/в работе."""
+        if dedup_key:
+            existing = await self.job_manager.find_active(dedup_key)
+            if existing is not None:
+                self.deduplicated += 1
+                return existing, True
+        job_id = await self.job_manager.create_job(source_type, source_ref, dedup_key=dedup_key, payload=payload)
+        self.enqueued += 1
+        await self.start()
+        self._wakeup.set()
+        return await self.job_manager.get_job(job_id), False
+
+    async def start(self) -> None:
+        """Поднять воркеры на текущем event loop (идемпотентно)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        await self._requeue_interrupted()
+        self._workers = [loop.create_task(self._worker(idx)) for idx in range(self.max_workers)]
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        workers, self._workers = self._workers, []
+        interrupted = set(self._running_jobs)
+        for task in workers:
+            task.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        if interrupted:
+            # Прерванные задания возобновит следующий start() без ожидания аренды.
+            await self.job_manager.release_leases(interrupted)
+        self._loop = None
+
+    async def _requeue_interrupted(self) -> None:
+        self._last_requeue = time.monotonic()
+        requeued = await self.job_manager.requeue_interrupted(self.max_attempts)
+        self.requeued += requeued
+        if requeued and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        interval = self.job_manager.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.job_manager.heartbeat(job_id)
+            except Exception as exc:
+                logger.warning("Ingestion job %s heartbeat failed: %s", job_id, exc)
+
+    async def _worker(self, idx: int) -> None:
+        while True:
+            self._wakeup.clear()
+            job = await self.job_manager.claim_next(self._handlers.keys())
+            if job is None:
+                # Аренды падавших процессов истекают без рестарта этого: проверяем на простое.
+                if time.monotonic() - self._last_requeue >= self.job_manager.lease_seconds / 2:
+                    await self._requeue_interrupted()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=_IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Другие воркеры тоже проверят очередь: задание могло быть не последним.
+            self._wakeup.set()
+            await self._run(job, idx)
+
+    async def _run(self, job: JobRecord, idx: int) -> None:
+        handler = self._handlers.get(job.source_type)
+        self._active += 1
+        self._running_jobs.add(job.job_id)
+        heartbeat = asyncio.create_task(self._heartbeat(job.job_id))
+        try:
+            result = await handler(job)
+            status = result.get("status", "done")
+            await self.job_manager.update_job(
+                job_id=job.job_id,
+                status=status,
+                progress=100,
+                current_stage=status,
+                result=result,
+                finished_at=datetime.utcnow().isoformat(),
+            )
+            if status == "failed":
+                self.failed += 1
+            else:
+                self.completed += 1
+        except asyncio.CancelledError:
+            # Остановка сервиса: задание остается running и будет возобновлено при старте.
+            raise
+        except Exception as exc:
+            logger.exception("Ingestion job %s failed in worker %d", job.job_id, idx)
+            self.failed += 1
+            await self.job_manager.update_job(
+                job_id=job.job_id,
+                status="failed",
+                progress=100,
+                current_stage="failed",
+                error=str(exc),
+                finished_at=datetime.utcnow().isoformat(),
+            )
+        finally:
+            heartbeat.cancel()
+            self._running_jobs.discard(job.job_id)
+            self._active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite" if isinstance(self.job_manager, SqliteJobManager) else "memory",
+            "max_workers": self.max_workers,
+            "running_workers": len([task for task in self._workers if not task.done()]),
+            "active_jobs": self._active,
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failed": self.failed,
+            "requeued": self.requeued,
+        }
+
+
+_queue: Optional[IngestionJobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> IngestionJobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            retention_days = float(os.getenv("BOT_DB_JOBS_RETENTION_DAYS", str(DEFAULT_RETENTION_DAYS)))
+            max_finished = int(os.getenv("BOT_DB_JOBS_MAX_FINISHED", str(DEFAULT_MAX_FINISHED)))
+            lease_seconds = float(os.getenv("BOT_DB_JOBS_LEASE_SECONDS", str(DEFAULT_LEASE_SECONDS)))
+            db_path = os.getenv("BOT_DB_JOBS_DB_PATH", DEFAULT_JOBS_DB_PATH).strip()
+            job_manager = (
+                SqliteJobManager(
+                    db_path,
+                    max_finished=max_finished,
+                    retention_days=retention_days,
+                    lease_seconds=lease_seconds,
+                )
+                if db_path
+                else JobManager(max_finished=max_finished, retention_days=retention_days, lease_seconds=lease_seconds)
+            )
+            _queue = IngestionJobQueue(
+                job_manager,
+                max_workers=int(os.getenv("BOT_DB_INGEST_MAX_CONCURRENT_JOBS", str(DEFAULT_MAX_CONCURRENT_JOBS))),
+                max_attempts=int(os.getenv("BOT_DB_JOBS_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))),
+            )
+        return _queue
+
+
+def job_queue_stats() -> dict:
+    with _queue_lock:
+        queue = _queue
+    return queue.stats() if queue is not None else {"started": False}
+
+
+async def shutdown_job_queue() -> None:
+    with _queue_lock:
+        queue = _queue
+    if queue is not None:
+        await queue.stop()
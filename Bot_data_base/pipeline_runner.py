@@ -1,9 +1,13 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import json
 import os
 import logging
+import time
+from dataclasses import asdict
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 import yaml
 from dotenv import load_dotenv
@@ -12,6 +16,7 @@ from chunkers.book_chunker import BookChunker
 from chunkers.semantic_chunker import SemanticChunker
 from ingestors.book_ingestor import BookIngestor
 from ingestors.youtube_ingestor import YouTubeIngestor
+from jobs.ingestion_engine import IngestionEngine, IngestionMetrics, PrepareRequest, get_ingestion_engine
 from jobs.job_manager import JobManager
 from models.universal_block import UniversalBlock
 from governance.chunking_quality import build_chunking_quality_v1
@@ -20,7 +25,12 @@ from processors.block_normalizer import BlockNormalizer
 from processors.sd_labeler import SDLabeler
 from storage.chroma_manager import ChromaManager
 from storage.json_export import JSONExporter
-from storage.registry import SourceRecord, SourceRegistry
+from storage.registry import (
+    SourceRecord,
+    SourceRegistry,
+    create_source_registry,
+    resolve_registry_backend,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +52,13 @@ class PipelineRunner:
         load_dotenv(env_path, override=False)
         self.config = self._load_config(config_path)
 
-        self.registry = SourceRegistry(self._resolve_path(self.config["storage"]["registry_path"]))
+        registry_path = self._resolve_path(self.config["storage"]["registry_path"])
+        registry_backend = resolve_registry_backend(registry_path, self.config["storage"].get("registry_backend"))
+        self.registry = (
+            SourceRegistry(registry_path)
+            if registry_backend == "json"
+            else create_source_registry(registry_path, backend=registry_backend)
+        )
         self.chroma_manager = ChromaManager(
             self._resolve_path(self.config["storage"]["chroma_db_path"]),
             self.config["storage"]["collection_name"],
@@ -70,6 +86,7 @@ class PipelineRunner:
         self.block_normalizer = BlockNormalizer()
 
         self.job_manager = job_manager
+        self.ingestion_engine = get_ingestion_engine()
 
     async def run_youtube(
         self,
@@ -90,6 +107,7 @@ class PipelineRunner:
             await self._update_progress(job_id, 100, "skipped")
             return {"status": "skipped", "source_id": video_id}
 
+        checkpoint = await self._load_checkpoint(job_id)
         record = SourceRecord(
             source_id=video_id,
             source_type="youtube",
@@ -106,51 +124,44 @@ class PipelineRunner:
             error_message=None,
             pipeline_version="bot_data_base_v1.0",
         )
-        self.registry.add_source(record)
+        if not checkpoint.get("registered"):
+            self.registry.add_source(record)
+            await self._save_checkpoint(job_id, registered=True)
 
         try:
-            raw_text, metadata = self.youtube_ingestor.fetch_raw_text(video_id)
-            await self._update_progress(job_id, 20, "chunking")
-
-            blocks = self.semantic_chunker.chunk(
-                raw_text,
-                author=author,
-                source_title=metadata.get("title", ""),
-                source_id=video_id,
-            )
-            for b in blocks:
-                b.author_id = author_id
-                b.source_title = metadata.get("title", "")
-                b.language = metadata.get("language", "") or b.language
-                b.published_date = metadata.get("published_date", "")
-
-            await self._update_progress(job_id, 40, "sd_labeling")
-            if self.legacy_sd_enabled and self.sd_labeler is not None:
-                blocks = self.sd_labeler.label_blocks(blocks)
-            else:
-                logger.debug("[PIPELINE] legacy SD labeling skipped (disabled by default)")
-
-            await self._update_progress(job_id, 60, "normalizing")
-            blocks = self.block_normalizer.normalize(blocks)
-
-            await self._update_progress(job_id, 70, "governance")
-            profile = normalize_governance_profile(governance_profile, fallback="transcript")
-            blocks = apply_governance_to_blocks_v1(
-                blocks=blocks,
-                source_id=video_id,
-                source_title=metadata.get("title", ""),
-                source_type="youtube",
-                source_kind=source_kind or "transcript",
-                governance_profile=profile,
-            )
-            for block in blocks:
-                block.chunking_quality = build_chunking_quality_v1(block)
-
-            await self._update_progress(job_id, 78, "exporting")
-            json_path = self.json_exporter.export(blocks, video_id, "youtube")
-
-            await self._update_progress(job_id, 90, "indexing")
-            added = self.chroma_manager.add_blocks(blocks)
+            metrics = IngestionMetrics()
+            blocks = await self._restore_checkpoint_blocks(checkpoint)
+            if blocks is None:
+                raw_text, metadata = await asyncio.to_thread(self.youtube_ingestor.fetch_raw_text, video_id)
+                await self._update_progress(job_id, 20, "chunking")
+
+                blocks = await self._prepare_blocks(
+                    PrepareRequest(
+                        source_type="youtube",
+                        source_id=video_id,
+                        text=raw_text,
+                        author=author,
+                        author_id=author_id,
+                        title=metadata.get("title", ""),
+                        language=metadata.get("language", ""),
+                        published_date=metadata.get("published_date", ""),
+                        governance_profile=governance_profile,
+                        source_kind=source_kind or "transcript",
+                    ),
+                    chunker=self.semantic_chunker,
+                    metrics=metrics,
+                )
+                await self._checkpoint_blocks(job_id, blocks)
+                checkpoint = {}
+
+            json_path = checkpoint.get("json_path")
+            if not json_path:
+                await self._update_progress(job_id, 78, "exporting", metrics)
+                json_path = await self._export_blocks(blocks, video_id, "youtube", metrics)
+                await self._save_checkpoint(job_id, json_path=json_path)
+
+            await self._update_progress(job_id, 90, "indexing", metrics)
+            added = await self._index_blocks(job_id, blocks, metrics, start=int(checkpoint.get("indexed_blocks") or 0))
 
             sd_dist = self._sd_distribution(blocks) if self.legacy_sd_enabled else {}
             self.registry.update_status(
@@ -163,7 +174,8 @@ class PipelineRunner:
                 error_message=None,
             )
 
-            await self._update_progress(job_id, 100, "done")
+            await self._clear_checkpoint(job_id)
+            await self._update_progress(job_id, 100, "done", metrics)
             return {
                 "status": "done",
                 "source_id": video_id,
@@ -178,6 +190,7 @@ class PipelineRunner:
                 processed_at=datetime.utcnow().isoformat(),
                 error_message=str(exc),
             )
+            await self._clear_checkpoint(job_id)
             await self._update_job_failed(job_id, str(exc))
             return {"status": "failed", "error": str(exc)}
 
@@ -203,6 +216,7 @@ class PipelineRunner:
             await self._update_progress(job_id, 100, "skipped")
             return {"status": "skipped", "source_id": source_id}
 
+        checkpoint = await self._load_checkpoint(job_id)
         record = SourceRecord(
             source_id=source_id,
             source_type="book",
@@ -219,48 +233,44 @@ class PipelineRunner:
             error_message=None,
             pipeline_version="bot_data_base_v1.0",
         )
-        self.registry.add_source(record)
+        if not checkpoint.get("registered"):
+            self.registry.add_source(record)
+            await self._save_checkpoint(job_id, registered=True)
 
         try:
-            await self._update_progress(job_id, 15, "loading")
-            text = self.book_ingestor.load_text(file_path)
-
-            await self._update_progress(job_id, 30, "chunking")
-            blocks = self.book_chunker.chunk_file_from_text(
-                text,
-                author=author,
-                book_title=book_title,
-                language=language,
-                author_id=author_id,
-            )
-
-            await self._update_progress(job_id, 50, "sd_labeling")
-            if self.legacy_sd_enabled and self.sd_labeler is not None:
-                blocks = self.sd_labeler.label_blocks(blocks)
-            else:
-                logger.debug("[PIPELINE] legacy SD labeling skipped (disabled by default)")
-
-            await self._update_progress(job_id, 70, "normalizing")
-            blocks = self.block_normalizer.normalize(blocks)
-
-            await self._update_progress(job_id, 76, "governance")
-            profile = normalize_governance_profile(governance_profile, fallback="general_book")
-            blocks = apply_governance_to_blocks_v1(
-                blocks=blocks,
-                source_id=source_id,
-                source_title=book_title,
-                source_type="book",
-                source_kind=source_kind or "book",
-                governance_profile=profile,
-            )
-            for block in blocks:
-                block.chunking_quality = build_chunking_quality_v1(block)
-
-            await self._update_progress(job_id, 82, "exporting")
-            json_path = self.json_exporter.export(blocks, source_id, "book")
-
-            await self._update_progress(job_id, 90, "indexing")
-            added = self.chroma_manager.add_blocks(blocks)
+            metrics = IngestionMetrics()
+            blocks = await self._restore_checkpoint_blocks(checkpoint)
+            if blocks is None:
+                await self._update_progress(job_id, 15, "loading")
+                text = await asyncio.to_thread(self.book_ingestor.load_text, file_path)
+
+                await self._update_progress(job_id, 30, "chunking")
+                blocks = await self._prepare_blocks(
+                    PrepareRequest(
+                        source_type="book",
+                        source_id=source_id,
+                        text=text,
+                        author=author,
+                        author_id=author_id,
+                        title=book_title,
+                        language=language,
+                        governance_profile=governance_profile,
+                        source_kind=source_kind or "book",
+                    ),
+                    chunker=self.book_chunker,
+                    metrics=metrics,
+                )
+                await self._checkpoint_blocks(job_id, blocks)
+                checkpoint = {}
+
+            json_path = checkpoint.get("json_path")
+            if not json_path:
+                await self._update_progress(job_id, 82, "exporting", metrics)
+                json_path = await self._export_blocks(blocks, source_id, "book", metrics)
+                await self._save_checkpoint(job_id, json_path=json_path)
+
+            await self._update_progress(job_id, 90, "indexing", metrics)
+            added = await self._index_blocks(job_id, blocks, metrics, start=int(checkpoint.get("indexed_blocks") or 0))
 
             sd_dist = self._sd_distribution(blocks) if self.legacy_sd_enabled else {}
             self.registry.update_status(
@@ -273,7 +283,8 @@ class PipelineRunner:
                 error_message=None,
             )
 
-            await self._update_progress(job_id, 100, "done")
+            await self._clear_checkpoint(job_id)
+            await self._update_progress(job_id, 100, "done", metrics)
             return {
                 "status": "done",
                 "source_id": source_id,
@@ -288,17 +299,136 @@ class PipelineRunner:
                 processed_at=datetime.utcnow().isoformat(),
                 error_message=str(exc),
             )
+            await self._clear_checkpoint(job_id)
             await self._update_job_failed(job_id, str(exc))
             return {"status": "failed", "error": str(exc)}
 
-    async def _update_progress(self, job_id: str, progress: int, stage: str) -> None:
+    def _engine(self) -> IngestionEngine:
+        engine = getattr(self, "ingestion_engine", None)
+        # Runner без __init__ (тесты, офлайн-скрипты) работает в потоках без пула процессов.
+        return engine if engine is not None else IngestionEngine(process_workers=0)
+
+    async def _prepare_blocks(
+        self,
+        request: PrepareRequest,
+        *,
+        chunker,
+        metrics: IngestionMetrics,
+    ) -> List[UniversalBlock]:
+        return await self._engine().prepare(
+            request,
+            chunker=chunker,
+            block_normalizer=self.block_normalizer,
+            sd_labeler=self.sd_labeler if self.legacy_sd_enabled else None,
+            metrics=metrics,
+            apply_governance=apply_governance_to_blocks_v1,
+            normalize_profile=normalize_governance_profile,
+            build_quality=build_chunking_quality_v1,
+        )
+
+    async def _export_blocks(
+        self,
+        blocks: List[UniversalBlock],
+        source_id: str,
+        source_type: str,
+        metrics: IngestionMetrics,
+    ) -> str:
+        started = time.perf_counter()
+        json_path = await asyncio.to_thread(self.json_exporter.export, blocks, source_id, source_type)
+        metrics.record("export", len(blocks), time.perf_counter() - started)
+        return json_path
+
+    async def _index_blocks(
+        self,
+        job_id: str,
+        blocks: List[UniversalBlock],
+        metrics: IngestionMetrics,
+        start: int = 0,
+    ) -> int:
+        """Индексация с места чекпоинта: уже записанные страницы повторно не эмбеддятся."""
+        engine = self._engine()
+        start = max(0, min(start, len(blocks)))
+        remaining = blocks[start:]
+
+        async def _on_page(page_no: int, total_pages: int) -> None:
+            done = start + min(len(remaining), page_no * engine.embed_batch_size)
+            await self._save_checkpoint(job_id, indexed_blocks=done)
+            progress = 90 + int(9 * done / max(1, len(blocks)))
+            await self._update_progress(job_id, min(99, progress), "indexing", metrics)
+
+        added = await engine.index(self.chroma_manager, remaining, metrics=metrics, on_page=_on_page)
+        return start + added
+
+    # --- чекпоинты стадий (возобновление задания после рестарта) --------
+
+    def _checkpoint_path(self, job_id: str) -> Optional[str]:
+        if not self.job_manager or not job_id:
+            return None
+        directory = self.job_manager.checkpoint_dir()
+        return os.path.join(directory, f"{job_id}.blocks.jsonl") if directory else None
+
+    async def _load_checkpoint(self, job_id: str) -> Dict[str, Any]:
+        if not self.job_manager or not job_id:
+            return {}
+        return await self.job_manager.get_checkpoint(job_id)
+
+    async def _save_checkpoint(self, job_id: str, **data: Any) -> None:
+        if not self.job_manager or not job_id:
+            return
+        await self.job_manager.save_checkpoint(job_id, **data)
+
+    async def _checkpoint_blocks(self, job_id: str, blocks: List[UniversalBlock]) -> None:
+        path = self._checkpoint_path(job_id)
+        if not path:
+            return
+
+        def _write() -> None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for block in blocks:
+                    f.write(json.dumps(asdict(block), ensure_ascii=False) + "\n")
+            os.replace(tmp_path, path)
+
+        await asyncio.to_thread(_write)
+        await self._save_checkpoint(job_id, blocks_path=path, blocks_count=len(blocks))
+
+    async def _restore_checkpoint_blocks(self, checkpoint: Dict[str, Any]) -> Optional[List[UniversalBlock]]:
+        path = checkpoint.get("blocks_path")
+        if not path or not os.path.exists(path):
+            return None
+
+        def _read() -> List[UniversalBlock]:
+            with open(path, "r", encoding="utf-8") as f:
+                return [UniversalBlock(**json.loads(line)) for line in f if line.strip()]
+
+        blocks = await asyncio.to_thread(_read)
+        if len(blocks) != int(checkpoint.get("blocks_count") or -1):
+            return None
+        logger.info("Resuming job from checkpoint %s (%d blocks)", path, len(blocks))
+        return blocks
+
+    async def _clear_checkpoint(self, job_id: str) -> None:
+        path = self._checkpoint_path(job_id)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    async def _update_progress(
+        self,
+        job_id: str,
+        progress: int,
+        stage: str,
+        metrics: Optional[IngestionMetrics] = None,
+    ) -> None:
         if not self.job_manager or not job_id:
             return
+        extra = {"stage_metrics": metrics.to_dict()} if metrics is not None else {}
         await self.job_manager.update_job(
             job_id=job_id,
             status="running" if progress < 100 else "done",
             progress=progress,
             current_stage=stage,
+            **extra,
         )
 
     async def _update_job_failed(self, job_id: str, error: str) -> None:
@@ -390,6 +520,7 @@ class PipelineRunner:
         set_if_env(["storage", "collection_name"], "CHROMA_COLLECTION_NAME")
         set_if_env(["storage", "json_export_dir"], "JSON_EXPORT_DIR")
         set_if_env(["storage", "registry_path"], "REGISTRY_PATH")
+        set_if_env(["storage", "registry_backend"], "REGISTRY_BACKEND")
 
         # API
         set_if_env(["api", "host"], "API_HOST")
@@ -2,13 +2,16 @@
 
 import logging
 import os
-from typing import Dict, List
+from typing import List
 
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 
 from models.universal_block import UniversalBlock
+from storage.collection_stats import CollectionStatsStore, stats_path_for
+from utils.embedding_cache import get_query_embedding_cache
+from utils.tfidf_index import forget_corpus_tfidf_rows, invalidate_corpus_tfidf_index
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +42,20 @@ class ChromaManager:
 
         self._collection = self.client.get_or_create_collection(name=self.collection_name)
         self._model = self._init_embedding_model()
+        # Монотонный счетчик изменений коллекции: по нему инвалидируются
+        # производные кэши (корпусный TF-IDF в /api/query/).
+        self.collection_version = 0
+        # Агрегаты для get_stats: обновляются в add_blocks/delete_source,
+        # лежат рядом с коллекцией и сверяются с count().
+        self.collection_stats = CollectionStatsStore(stats_path_for(self.db_path, self.collection_name))
+
+    def _bump_collection_version(self, chunk_ids: List[str] | None = None) -> None:
+        """Новая версия коллекции; chunk_ids=None — коллекция заменена целиком."""
+        self.collection_version = int(getattr(self, "collection_version", 0) or 0) + 1
+        if chunk_ids is None:
+            invalidate_corpus_tfidf_index()
+        else:
+            forget_corpus_tfidf_rows(chunk_ids)
 
     def _ensure_collection(self):
         self._collection = self.client.get_or_create_collection(name=self.collection_name)
@@ -56,6 +73,8 @@ class ChromaManager:
             else:
                 self.client = chromadb.PersistentClient(path=self.db_path, settings=settings)
             self._collection = self.client.get_or_create_collection(name=self.collection_name)
+            # Данные те же: прежний индекс обслуживает запросы до фонового переобучения.
+            self._bump_collection_version([])
             return {"status": "ok", "refreshed": True, "error_code": None, "error_message": None}
         except Exception as exc:
             return {
@@ -125,7 +144,7 @@ class ChromaManager:
         embedding_probe_dimension = None
         embedding_probe_error = None
         try:
-            probe = self._embed_texts(["probe"])
+            probe = self._embed_texts(["probe"], use_cache=False)
             if probe and probe[0]:
                 embedding_probe_dimension = int(len(probe[0]))
         except Exception as exc:
@@ -155,44 +174,51 @@ class ChromaManager:
         except Exception:
             pass
         self._collection = self.client.get_or_create_collection(name=self.collection_name)
-
-    def add_blocks(self, blocks: List[UniversalBlock]) -> int:
+        self.collection_stats.reset()
+        self._bump_collection_version()
+
+    def add_blocks(self, blocks: List[UniversalBlock], batch_size: int | None = None) -> int:
+        """
+        Эмбеддинг и запись страницами по batch_size блоков
+        (BOT_DB_INGEST_EMBED_BATCH): в памяти только векторы текущей страницы.
+        """
         if not blocks:
             return 0
         collection = self._ensure_collection()
-        texts = [b.text for b in blocks]
-        embeddings = self._embed_texts(texts)
-        ids = [b.block_id for b in blocks]
-        metadatas = [self._to_metadata(b) for b in blocks]
-
-        collection.add(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+        page_size = max(1, int(batch_size or os.getenv("BOT_DB_INGEST_EMBED_BATCH", "64")))
+        for start in range(0, len(blocks), page_size):
+            page = blocks[start : start + page_size]
+            texts = [b.text for b in page]
+            embeddings = self._embed_texts(texts, use_cache=False)
+            ids = [b.block_id for b in page]
+            metadatas = [self._to_metadata(b) for b in page]
+
+            with self.collection_stats.mutation(metadatas, +1):
+                collection.add(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+            self._bump_collection_version(ids)
         return len(blocks)
 
     def delete_source(self, source_id: str) -> int:
         if not source_id:
             return 0
         collection = self._ensure_collection()
-        existing = collection.get(where={"source_id": source_id})
+        existing = collection.get(where={"source_id": {"$eq": source_id}}, include=["metadatas"])
         ids = existing.get("ids", []) if existing else []
         if not ids:
             return 0
-        collection.delete(ids=ids)
+        with self.collection_stats.mutation(existing.get("metadatas") or [None] * len(ids), -1):
+            collection.delete(ids=ids)
+        self._bump_collection_version(ids)
         return len(ids)
 
     def get_stats(self) -> dict:
+        """Агрегаты из инкрементальных счетчиков; полный проход только при reconcile."""
         collection = self._ensure_collection()
-        total = int(collection.count())
-        data = collection.get(limit=max(1, total), include=["metadatas"]) if total > 0 else {"metadatas": []}
-        by_sd_level: Dict[str, int] = {}
-        by_source_type: Dict[str, int] = {}
-        for meta in data.get("metadatas", []) if data else []:
-            sd = meta.get("sd_level") if meta else None
-            st = meta.get("source_type") if meta else None
-            if sd:
-                by_sd_level[sd] = by_sd_level.get(sd, 0) + 1
-            if st:
-                by_source_type[st] = by_source_type.get(st, 0) + 1
-        return {"total": total, "by_sd_level": by_sd_level, "by_source_type": by_source_type}
+        self.collection_stats.ensure_fresh(collection)
+        return self.collection_stats.snapshot()
+
+    def reconcile_stats(self, page_size: int | None = None) -> dict:
+        return self.collection_stats.reconcile(self._ensure_collection(), page_size=page_size)
 
     def get_stats_safe(self, refresh_on_error: bool = True) -> dict:
         try:
@@ -246,7 +272,7 @@ class ChromaManager:
         if not source_id:
             return False
         collection = self._ensure_collection()
-        res = collection.get(where={"source_id": source_id})
+        res = collection.get(where={"source_id": {"$eq": source_id}})
         return bool(res and res.get("ids"))
 
     def _to_metadata(self, block: UniversalBlock) -> dict:
@@ -351,10 +377,24 @@ class ChromaManager:
             logger.error(f"[ChromaManager] failed to load embedding model: {exc}")
             raise
 
-    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
-        if not texts:
-            return []
+    def _encode(self, texts: List[str]) -> List[List[float]]:
         embeddings = self._model.encode(texts, convert_to_numpy=True)
         if hasattr(embeddings, "tolist"):
             return embeddings.tolist()
         return embeddings
+
+    def _embed_texts(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
+        """
+        Эмбеддинги без префиксов. Запросы идут через общий LRU; пассажи при
+        индексации (use_cache=False) кэш не засоряют.
+        """
+        if not texts:
+            return []
+        if not use_cache:
+            return self._encode(texts)
+        return get_query_embedding_cache().get_or_compute_many(
+            self.embedding_model_name,
+            "raw",
+            texts,
+            self._encode,
+        )
@@ -0,0 +1,247 @@
+"""
+Инкрементальные агрегаты по коллекции Chroma (sd_level, source_type,
+governance-поля) вместо полного скана метаданных на каждый get_stats().
+
+Счетчики меняются в add_blocks/delete_source по метаданным затронутых
+блоков и сохраняются JSON-файлом рядом с коллекцией. Мутация оформлена как
+журнал: перед записью в Chroma в файл пишется pending-маркер, после успеха —
+новые счетчики и снятый маркер. Если процесс упал между этими шагами (или
+total разошелся с collection.count()), агрегаты помечаются устаревшими и
+пересчитываются постранично (reconcile).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+STATS_SCHEMA_VERSION = 1
+DEFAULT_RECONCILE_PAGE_SIZE = 1000
+
+# bucket -> (metadata key, значение — CSV-список)
+TRACKED_FIELDS: Dict[str, tuple[str, bool]] = {
+    "by_sd_level": ("sd_level", False),
+    "by_source_type": ("source_type", False),
+    "by_chunk_type": ("governance_chunk_type", False),
+    "by_allowed_use": ("governance_allowed_use", True),
+    "by_lens_family": ("governance_lens_family", True),
+    "by_safety_flags": ("governance_safety_flags", True),
+}
+
+
+def _safe_count(collection: Any) -> Optional[int]:
+    try:
+        return int(collection.count())
+    except Exception as exc:  # noqa: BLE001 - без count() reconcile идет до пустой страницы
+        logger.warning("[CHROMA_STATS] collection.count() failed during reconcile: %s", exc)
+        return None
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def stats_path_for(db_path: str, collection_name: str) -> Optional[Path]:
+    if not db_path or db_path == ":memory:":
+        return None
+    return Path(db_path) / f"{collection_name}.stats.json"
+
+
+def _empty_counters() -> Dict[str, Dict[str, int]]:
+    return {bucket: {} for bucket in TRACKED_FIELDS}
+
+
+def metadata_delta(metadatas: Iterable[Optional[dict]]) -> tuple[int, Dict[str, Dict[str, int]]]:
+    """Вклад набора метаданных в агрегаты: (число блоков, счетчики)."""
+    total = 0
+    counters = _empty_counters()
+    for meta in metadatas:
+        total += 1
+        if not isinstance(meta, dict):
+            continue
+        for bucket, (key, is_csv) in TRACKED_FIELDS.items():
+            raw = meta.get(key)
+            if raw is None or raw == "":
+                continue
+            values = [part.strip() for part in str(raw).split(",")] if is_csv else [str(raw)]
+            target = counters[bucket]
+            for value in values:
+                if value:
+                    target[value] = target.get(value, 0) + 1
+    return total, counters
+
+
+class CollectionStatsStore:
+    """Персистентные счетчики коллекции с pending-журналом и постраничным reconcile."""
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self.total = 0
+        self.counters = _empty_counters()
+        self.pending_writes = 0
+        self.stale = True
+        self.reconciled_at: Optional[str] = None
+        self.reconcile_runs = 0
+        self._load()
+
+    # --- persistence -----------------------------------------------------
+
+    def _load(self) -> None:
+        # Без валидного файла (или для :memory:) первый get_stats делает reconcile.
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception as exc:
+            logger.warning("[CHROMA_STATS] unreadable stats file %s: %s", self.path, exc)
+            return
+        if not isinstance(payload, dict) or payload.get("schema_version") != STATS_SCHEMA_VERSION:
+            return
+        counters = payload.get("counters") if isinstance(payload.get("counters"), dict) else {}
+        self.total = int(payload.get("total") or 0)
+        self.counters = {
+            bucket: {str(k): int(v) for k, v in (counters.get(bucket) or {}).items()} for bucket in TRACKED_FIELDS
+        }
+        self.pending_writes = int(payload.get("pending_writes") or 0)
+        self.reconciled_at = payload.get("reconciled_at")
+        # Незакрытая мутация = процесс упал между записью в Chroma и фиксацией счетчиков.
+        self.stale = self.pending_writes > 0
+
+    def _persist(self) -> None:
+        if self.path is None:
+            return
+        payload = {
+            "schema_version": STATS_SCHEMA_VERSION,
+            "total": self.total,
+            "counters": self.counters,
+            "pending_writes": self.pending_writes,
+            "reconciled_at": self.reconciled_at,
+            "updated_at": _utc_now_iso(),
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except Exception as exc:
+            logger.warning("[CHROMA_STATS] failed to persist %s: %s", self.path, exc)
+
+    # --- mutations -------------------------------------------------------
+
+    def _apply(self, total: int, counters: Dict[str, Dict[str, int]], sign: int) -> None:
+        self.total = max(0, self.total + sign * total)
+        for bucket, values in counters.items():
+            target = self.counters.setdefault(bucket, {})
+            for value, count in values.items():
+                updated = target.get(value, 0) + sign * count
+                if updated > 0:
+                    target[value] = updated
+                else:
+                    target.pop(value, None)
+
+    @contextmanager
+    def mutation(self, metadatas: Iterable[Optional[dict]], sign: int) -> Iterator[None]:
+        """
+        Обернуть запись в Chroma: sign=+1 для add, -1 для delete.
+        При исключении внутри блока счетчики помечаются устаревшими.
+        """
+        total, counters = metadata_delta(metadatas)
+        with self._lock:
+            self.pending_writes += 1
+            self._persist()
+            try:
+                yield
+            except BaseException:
+                # pending-маркер остается в файле: reconcile будет и после рестарта.
+                self.stale = True
+                raise
+            self._apply(total, counters, sign)
+            self.pending_writes = max(0, self.pending_writes - 1)
+            self._persist()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.total = 0
+            self.counters = _empty_counters()
+            self.pending_writes = 0
+            self.stale = False
+            self.reconciled_at = _utc_now_iso()
+            self._persist()
+
+    def reconcile(self, collection: Any, page_size: Optional[int] = None) -> dict:
+        """Пересчитать агрегаты постраничным проходом по метаданным коллекции."""
+        page_size = max(
+            1,
+            int(page_size or os.getenv("BOT_DB_STATS_RECONCILE_PAGE_SIZE", str(DEFAULT_RECONCILE_PAGE_SIZE))),
+        )
+        with self._lock:
+            total = 0
+            counters = _empty_counters()
+            offset = 0
+            pages = 0
+            expected = _safe_count(collection)
+            previous_ids: Optional[list] = None
+            while True:
+                page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+                metadatas = (page or {}).get("metadatas") or []
+                if not metadatas:
+                    break
+                ids = list((page or {}).get("ids") or [])
+                if ids and ids == previous_ids:
+                    # Бэкенд игнорирует offset: иначе цикл крутился бы бесконечно.
+                    logger.warning(
+                        "[CHROMA_STATS] reconcile page at offset=%s repeats previous ids; stopping after %s pages",
+                        offset,
+                        pages,
+                    )
+                    break
+                previous_ids = ids
+                page_total, page_counters = metadata_delta(metadatas)
+                total += page_total
+                for bucket, values in page_counters.items():
+                    target = counters[bucket]
+                    for value, count in values.items():
+                        target[value] = target.get(value, 0) + count
+                pages += 1
+                offset += len(metadatas)
+                if len(metadatas) < page_size:
+                    break
+                if expected is not None and offset >= expected:
+                    break
+            drifted = total != self.total or counters != self.counters
+            self.total = total
+            self.counters = counters
+            self.pending_writes = 0
+            self.stale = False
+            self.reconciled_at = _utc_now_iso()
+            self.reconcile_runs += 1
+            self._persist()
+        if drifted:
+            logger.info("[CHROMA_STATS] reconciled total=%s pages=%s (drift corrected)", total, pages)
+        return {"total": total, "pages": pages, "page_size": page_size, "drift_corrected": drifted}
+
+    # --- reads -----------------------------------------------------------
+
+    def ensure_fresh(self, collection: Any) -> None:
+        """Reconcile, если счетчики устарели или total разошелся с count()."""
+        with self._lock:
+            if not self.stale and int(collection.count()) == self.total:
+                return
+            self.reconcile(collection)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "total": self.total,
+                **{bucket: dict(values) for bucket, values in self.counters.items()},
+                "reconciled_at": self.reconciled_at,
+            }
@@ -6,6 +6,7 @@ from datetime import datetime
 from typing import List
 
 from models.universal_block import UniversalBlock
+from storage.kb_snapshot import build_kb_snapshot, write_merged_from_snapshot
 
 
 class JSONExporter:
@@ -39,31 +40,14 @@ class JSONExporter:
         return path
 
     def export_all_merged(self) -> str:
-        merged_blocks = []
-        for subdir in ("youtube", "books"):
-            dir_path = os.path.join(self.base_dir, subdir)
-            if not os.path.isdir(dir_path):
-                continue
-            for name in os.listdir(dir_path):
-                if not name.endswith("_blocks.json"):
-                    continue
-                path = os.path.join(dir_path, name)
-                try:
-                    with open(path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    merged_blocks.extend(data.get("blocks", []))
-                except Exception:
-                    continue
-
-        payload = {
-            "schema_version": "bot_data_base_v1.0",
-            "generated_at": datetime.utcnow().isoformat(),
-            "blocks_count": len(merged_blocks),
-            "blocks": merged_blocks,
-        }
-
+        """
+        Инкрементально обновить шардированный снапшот (snapshot/manifest.json)
+        и, для совместимости с инструментами, потоково собрать из него
+        all_blocks_merged.json (BOT_DB_WRITE_LEGACY_MERGED=0 отключает).
+        """
+        snapshot = build_kb_snapshot(self.base_dir)
+        if os.getenv("BOT_DB_WRITE_LEGACY_MERGED", "1").strip() == "0":
+            return snapshot["manifest_path"]
         out_path = os.path.join(self.base_dir, "all_blocks_merged.json")
-        os.makedirs(self.base_dir, exist_ok=True)
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        write_merged_from_snapshot(snapshot["manifest_path"], out_path)
         return out_path
@@ -0,0 +1,243 @@
+"""
+Шардированный снапшот базы знаний.
+
+Вместо одного all_blocks_merged.json снапшот хранит по шарду JSONL на источник
+(`snapshot/shards/<youtube|books>/<source_id>.jsonl`, один компактный блок на
+строку) и manifest.json со списком шардов, их sha256 и отпечатком исходного
+`*_blocks.json` (size, mtime_ns). Пересборка инкрементальная: перезаписываются
+только шарды источников, чей файл изменился, и удаляются шарды исчезнувших
+источников. Потребители читают блоки потоково через iter_kb_blocks().
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+SNAPSHOT_SCHEMA_VERSION = "bot_data_base_snapshot_v1"
+SNAPSHOT_DIRNAME = "snapshot"
+MANIFEST_NAME = "manifest.json"
+# Отпечаток all_blocks_merged.json, собранного из снапшота (size, mtime_ns).
+LEGACY_STAMP_NAME = "legacy_merged.stamp.json"
+SOURCE_SUBDIRS = ("youtube", "books")
+
+
+def snapshot_manifest_path(base_dir: str | Path) -> Path:
+    return Path(base_dir) / SNAPSHOT_DIRNAME / MANIFEST_NAME
+
+
+def load_manifest(path: str | Path) -> Optional[Dict[str, Any]]:
+    try:
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get("schema_version") != SNAPSHOT_SCHEMA_VERSION:
+        return None
+    return payload
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _write_shard(source_path: Path, shard_path: Path) -> Dict[str, Any]:
+    """Переложить `*_blocks.json` в JSONL-шард; вернуть sha256 и число блоков."""
+    with open(source_path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    blocks = payload.get("blocks") if isinstance(payload, dict) and isinstance(payload.get("blocks"), list) else []
+    hasher = hashlib.sha256()
+    shard_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = shard_path.with_name(f"{shard_path.name}.tmp")
+    with open(tmp_path, "wb") as out:
+        for block in blocks:
+            line = (json.dumps(block, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            hasher.update(line)
+            out.write(line)
+    os.replace(tmp_path, shard_path)
+    return {
+        "source_id": str(payload.get("source_id") or source_path.name[: -len("_blocks.json")]),
+        "source_type": str(payload.get("source_type") or ""),
+        "blocks_count": len(blocks),
+        "content_hash": hasher.hexdigest(),
+    }
+
+
+def build_kb_snapshot(base_dir: str | Path) -> Dict[str, Any]:
+    """
+    Инкрементально обновить снапшот по `<base_dir>/{youtube,books}/*_blocks.json`.
+    Неизмененные источники проверяются только через stat().
+    """
+    base = Path(base_dir)
+    snapshot_dir = base / SNAPSHOT_DIRNAME
+    manifest_path = snapshot_dir / MANIFEST_NAME
+    previous = load_manifest(manifest_path) or {}
+    previous_shards = {
+        entry.get("source_file"): entry for entry in previous.get("shards", []) if isinstance(entry, dict)
+    }
+
+    shards: List[Dict[str, Any]] = []
+    rebuilt = reused = failed = 0
+    for subdir in SOURCE_SUBDIRS:
+        dir_path = base / subdir
+        if not dir_path.is_dir():
+            continue
+        for name in sorted(os.listdir(dir_path)):
+            if not name.endswith("_blocks.json"):
+                continue
+            source_path = dir_path / name
+            rel_source = f"{subdir}/{name}"
+            try:
+                stat = source_path.stat()
+            except OSError:
+                continue
+            shard_rel = f"shards/{subdir}/{name[: -len('_blocks.json')]}.jsonl"
+            old = previous_shards.get(rel_source)
+            if (
+                old is not None
+                and old.get("source_size") == stat.st_size
+                and old.get("source_mtime_ns") == stat.st_mtime_ns
+                and (snapshot_dir / old.get("path", "")).is_file()
+            ):
+                shards.append(old)
+                reused += 1
+                continue
+            try:
+                info = _write_shard(source_path, snapshot_dir / shard_rel)
+            except (OSError, ValueError):
+                failed += 1
+                continue
+            shards.append(
+                {
+                    **info,
+                    "path": shard_rel,
+                    "source_file": rel_source,
+                    "source_size": stat.st_size,
+                    "source_mtime_ns": stat.st_mtime_ns,
+                }
+            )
+            rebuilt += 1
+
+    live_paths = {entry["path"] for entry in shards}
+    removed = 0
+    for entry in previous_shards.values():
+        if entry.get("path") and entry["path"] not in live_paths:
+            try:
+                (snapshot_dir / entry["path"]).unlink()
+                removed += 1
+            except OSError:
+                pass
+
+    content_hash = hashlib.sha256("".join(entry["content_hash"] for entry in shards).encode("ascii")).hexdigest()
+    # Без изменений содержимого manifest не переписывается: его mtime — дешевый отпечаток KB.
+    generated_at = previous.get("generated_at") if content_hash == previous.get("content_hash") else None
+    manifest = {
+        "schema_version": SNAPSHOT_SCHEMA_VERSION,
+        "generated_at": generated_at or datetime.utcnow().isoformat(),
+        "content_hash": content_hash,
+        "blocks_count": sum(int(entry.get("blocks_count") or 0) for entry in shards),
+        "shards": shards,
+    }
+    if manifest != previous:
+        _atomic_write_text(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return {
+        "manifest_path": str(manifest_path),
+        "shards": len(shards),
+        "rebuilt": rebuilt,
+        "reused": reused,
+        "removed": removed,
+        "failed": failed,
+        "blocks_count": manifest["blocks_count"],
+    }
+
+
+def resolve_kb_path(base_dir: str | Path) -> Optional[Path]:
+    """
+    Актуальный источник блоков в base_dir: manifest снапшота, если он не старше
+    all_blocks_merged.json (офлайн-инструменты правят merged-файл напрямую).
+    """
+    manifest_path = snapshot_manifest_path(base_dir)
+    merged_path = Path(base_dir) / "all_blocks_merged.json"
+    try:
+        manifest_mtime = manifest_path.stat().st_mtime_ns
+    except OSError:
+        return merged_path if merged_path.exists() else None
+    try:
+        merged_stat = merged_path.stat()
+    except OSError:
+        return manifest_path
+    try:
+        stamp = json.loads((manifest_path.parent / LEGACY_STAMP_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        stamp = {}
+    if stamp.get("size") == merged_stat.st_size and stamp.get("mtime_ns") == merged_stat.st_mtime_ns:
+        return manifest_path
+    return manifest_path if manifest_mtime >= merged_stat.st_mtime_ns else merged_path
+
+
+def iter_snapshot_blocks(
+    manifest_path: str | Path,
+    source_ids: Optional[Iterable[str]] = None,
+) -> Iterator[dict]:
+    """Потоковое чтение блоков снапшота (опционально только заданных источников)."""
+    manifest = load_manifest(manifest_path)
+    if manifest is None:
+        return
+    wanted = set(source_ids) if source_ids is not None else None
+    snapshot_dir = Path(manifest_path).parent
+    for entry in manifest.get("shards", []):
+        if wanted is not None and entry.get("source_id") not in wanted:
+            continue
+        with open(snapshot_dir / entry["path"], "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_kb_blocks(path: str | Path) -> Iterator[dict]:
+    """
+    Блоки базы знаний из manifest.json снапшота или (совместимость) из
+    монолитного all_blocks_merged.json.
+    """
+    path = Path(path)
+    if path.name == MANIFEST_NAME:
+        yield from iter_snapshot_blocks(path)
+        return
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    blocks = payload.get("blocks") if isinstance(payload, dict) and isinstance(payload.get("blocks"), list) else []
+    yield from blocks
+
+
+def write_merged_from_snapshot(manifest_path: str | Path, out_path: str | Path) -> int:
+    """Собрать legacy all_blocks_merged.json потоково, не держа KB в памяти."""
+    manifest = load_manifest(manifest_path) or {"blocks_count": 0}
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(f"{out_path.name}.tmp")
+    written = 0
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        header = {
+            "schema_version": "bot_data_base_v1.0",
+            "generated_at": datetime.utcnow().isoformat(),
+            "blocks_count": int(manifest.get("blocks_count") or 0),
+        }
+        out.write(json.dumps(header, ensure_ascii=False, indent=2)[:-2])
+        out.write(',\n  "blocks": [')
+        for block in iter_snapshot_blocks(manifest_path):
+            out.write("," if written else "")
+            out.write("\n    " + json.dumps(block, ensure_ascii=False, indent=2).replace("\n", "\n    "))
+            written += 1
+        out.write("\n  ]\n}" if written else "]\n}")
+    os.replace(tmp_path, out_path)
+    stat = out_path.stat()
+    _atomic_write_text(
+        Path(manifest_path).parent / LEGACY_STAMP_NAME,
+        json.dumps({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}),
+    )
+    return written
@@ -1,11 +1,17 @@
 ﻿from __future__ import annotations
 
+from contextlib import contextmanager
 from dataclasses import dataclass, asdict
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable, Iterator, Tuple
 import json
+import logging
 import os
+import sqlite3
+import threading
 import uuid
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class SourceRecord:
@@ -31,77 +37,125 @@ class SourceRecord:
     def from_dict(data: dict) -> "SourceRecord":
         return SourceRecord(**data)
 
+    def copy(self) -> "SourceRecord":
+        data = dict(self.__dict__)
+        data["sd_distribution"] = dict(self.sd_distribution or {})
+        data["file_paths"] = dict(self.file_paths or {})
+        return SourceRecord(**data)
+
+
+def _statistics(records: Iterable[SourceRecord]) -> dict:
+    total_sources = 0
+    total_blocks = 0
+    sd_distribution: Dict[str, int] = {}
+    sources_by_type: Dict[str, int] = {}
+    for r in records:
+        total_sources += 1
+        total_blocks += r.blocks_count
+        sources_by_type[r.source_type] = sources_by_type.get(r.source_type, 0) + 1
+        for k, v in (r.sd_distribution or {}).items():
+            sd_distribution[k] = sd_distribution.get(k, 0) + int(v)
+
+    return {
+        "total_sources": total_sources,
+        "total_blocks": total_blocks,
+        "sd_distribution": sd_distribution,
+        "sources_by_type": sources_by_type,
+    }
+
 
 class SourceRegistry:
+    """
+    JSON-реестр источников (формат, который читают и правят offline-инструменты).
+
+    Разобранный файл кэшируется в процессе по (mtime_ns, size) вместе с
+    индексом source_id -> record: get_source/is_processed больше не парсят
+    файл на каждый вызов, а внешняя правка файла инвалидирует кэш.
+    """
+
     def __init__(self, registry_path: str):
         self.registry_path = registry_path
+        self._lock = threading.RLock()
+        self._cache_key: Optional[Tuple[int, int]] = None
+        self._cache_records: List[SourceRecord] = []
+        self._cache_index: Dict[str, SourceRecord] = {}
         os.makedirs(os.path.dirname(registry_path) or ".", exist_ok=True)
         if not os.path.exists(self.registry_path):
             self._save([])
 
     def add_source(self, record: SourceRecord) -> None:
-        records = self._load()
-        records.append(record)
-        self._save(records)
+        with self._lock:
+            records = self._load()
+            records.append(record)
+            self._save(records)
 
     def get_source(self, source_id: str) -> Optional[SourceRecord]:
-        records = self._load()
-        for rec in records:
-            if rec.source_id == source_id:
-                return rec
-        return None
+        with self._lock:
+            self._refresh()
+            rec = self._cache_index.get(source_id)
+            return rec.copy() if rec is not None else None
 
     def update_status(self, source_id: str, status: str, **kwargs) -> None:
-        records = self._load()
-        updated = False
-        for i, rec in enumerate(records):
-            if rec.source_id == source_id:
-                data = rec.to_dict()
-                data["status"] = status
-                for key, value in kwargs.items():
-                    if key in data:
-                        data[key] = value
-                records[i] = SourceRecord.from_dict(data)
-                updated = True
-                break
-        if updated:
-            self._save(records)
+        with self._lock:
+            records = self._load()
+            updated = False
+            for i, rec in enumerate(records):
+                if rec.source_id == source_id:
+                    data = rec.to_dict()
+                    data["status"] = status
+                    for key, value in kwargs.items():
+                        if key in data:
+                            data[key] = value
+                    records[i] = SourceRecord.from_dict(data)
+                    updated = True
+                    break
+            if updated:
+                self._save(records)
 
     def is_processed(self, source_id: str) -> bool:
-        rec = self.get_source(source_id)
-        return bool(rec and rec.status == "done")
+        with self._lock:
+            self._refresh()
+            rec = self._cache_index.get(source_id)
+            return bool(rec and rec.status == "done")
 
     def list_all(self) -> List[SourceRecord]:
         return self._load()
 
     def get_statistics(self) -> dict:
-        records = self._load()
-        total_sources = len(records)
-        total_blocks = sum(r.blocks_count for r in records)
-
-        sd_distribution: Dict[str, int] = {}
-        sources_by_type: Dict[str, int] = {}
-        for r in records:
-            sources_by_type[r.source_type] = sources_by_type.get(r.source_type, 0) + 1
-            for k, v in (r.sd_distribution or {}).items():
-                sd_distribution[k] = sd_distribution.get(k, 0) + int(v)
-
-        return {
-            "total_sources": total_sources,
-            "total_blocks": total_blocks,
-            "sd_distribution": sd_distribution,
-            "sources_by_type": sources_by_type,
-        }
+        with self._lock:
+            self._refresh()
+            return _statistics(self._cache_records)
 
     def delete_source(self, source_id: str) -> bool:
-        records = self._load()
-        new_records = [r for r in records if r.source_id != source_id]
-        if len(new_records) == len(records):
-            return False
-        self._save(new_records)
-        return True
+        with self._lock:
+            records = self._load()
+            new_records = [r for r in records if r.source_id != source_id]
+            if len(new_records) == len(records):
+                return False
+            self._save(new_records)
+            return True
 
-    def _load(self) -> List[SourceRecord]:
+    def _file_key(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.registry_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self) -> None:
+        key = self._file_key()
+        if key is not None and key == self._cache_key:
+            return
+        records = self._read_file()
+        index: Dict[str, SourceRecord] = {}
+        for rec in records:
+            # Как и линейный поиск раньше: при дубликатах выигрывает первая запись.
+            index.setdefault(rec.source_id, rec)
+        self._cache_records = records
+        self._cache_index = index
+        self._cache_key = key
+
+    def _read_file(self) -> List[SourceRecord]:
         if not os.path.exists(self.registry_path):
             return []
         with open(self.registry_path, "r", encoding="utf-8") as f:
@@ -111,9 +165,283 @@ class SourceRegistry:
             data = json.loads(content)
         return [SourceRecord.from_dict(item) for item in data]
 
+    def _load(self) -> List[SourceRecord]:
+        with self._lock:
+            self._refresh()
+            return [rec.copy() for rec in self._cache_records]
+
     def _save(self, records: List[SourceRecord]) -> None:
         data = [r.to_dict() for r in records]
         tmp_path = f"{self.registry_path}.{uuid.uuid4().hex}.tmp"
         with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         os.replace(tmp_path, self.registry_path)
+        with self._lock:
+            self._cache_key = None
+
+    def export_json(self, target_path: str) -> str:
+        with open(self.registry_path, "r", encoding="utf-8") as src:
+            payload = src.read()
+        with open(target_path, "w", encoding="utf-8") as dst:
+            dst.write(payload)
+        return target_path
+
+
+_SQLITE_COLUMNS = (
+    "source_id",
+    "source_type",
+    "title",
+    "author",
+    "author_id",
+    "language",
+    "status",
+    "added_at",
+    "processed_at",
+    "blocks_count",
+    "sd_distribution",
+    "file_paths",
+    "error_message",
+    "pipeline_version",
+)
+_SQLITE_JSON_COLUMNS = {"sd_distribution", "file_paths"}
+
+
+class SqliteSourceRegistry:
+    """
+    SQLite-реестр с тем же API, что и SourceRegistry.
+
+    source_id — PRIMARY KEY, вторичные индексы по status и source_type.
+    Мутации — отдельные транзакции без перезаписи всего файла. Чтения идут
+    из in-process кэша, который обновляется при собственных записях и
+    перечитывается, если файл изменило другое соединение (PRAGMA data_version).
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, registry_path: str, migrate_from_json: Optional[str] = None):
+        self.registry_path = registry_path
+        os.makedirs(os.path.dirname(registry_path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(registry_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._cache: Optional[Dict[str, SourceRecord]] = None
+        self._cache_data_version: Optional[int] = None
+        self._ensure_schema()
+        if migrate_from_json:
+            self.migrate_from_json(migrate_from_json)
+
+    def _ensure_schema(self) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sources (
+                    source_id TEXT PRIMARY KEY,
+                    source_type TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    author_id TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    added_at TEXT NOT NULL,
+                    processed_at TEXT,
+                    blocks_count INTEGER NOT NULL DEFAULT 0,
+                    sd_distribution TEXT NOT NULL DEFAULT '{}',
+                    file_paths TEXT NOT NULL DEFAULT '{}',
+                    error_message TEXT,
+                    pipeline_version TEXT NOT NULL,
+                    position INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sources_status ON sources(status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sources_source_type ON sources(source_type)")
+            conn.execute("CREATE TABLE IF NOT EXISTS registry_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute(
+                "INSERT OR IGNORE INTO registry_meta(key, value) VALUES ('schema_version', ?)",
+                (str(self.SCHEMA_VERSION),),
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._cache = None
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _row_values(record: SourceRecord) -> list:
+        data = record.to_dict()
+        values = []
+        for column in _SQLITE_COLUMNS:
+            value = data.get(column)
+            if column in _SQLITE_JSON_COLUMNS:
+                value = json.dumps(value or {}, ensure_ascii=False)
+            values.append(value)
+        return values
+
+    @staticmethod
+    def _record_from_row(row: sqlite3.Row) -> SourceRecord:
+        data = {column: row[column] for column in _SQLITE_COLUMNS}
+        for column in _SQLITE_JSON_COLUMNS:
+            data[column] = json.loads(data[column] or "{}")
+        data["blocks_count"] = int(data["blocks_count"] or 0)
+        return SourceRecord.from_dict(data)
+
+    def _data_version(self) -> int:
+        return int(self._conn.execute("PRAGMA data_version").fetchone()[0])
+
+    def _records(self) -> Dict[str, SourceRecord]:
+        with self._lock:
+            version = self._data_version()
+            if self._cache is None or version != self._cache_data_version:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_SQLITE_COLUMNS)} FROM sources ORDER BY position"
+                ).fetchall()
+                self._cache = {row["source_id"]: self._record_from_row(row) for row in rows}
+                self._cache_data_version = version
+            return self._cache
+
+    def _next_position(self, conn: sqlite3.Connection) -> int:
+        return int(conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM sources").fetchone()[0])
+
+    def add_source(self, record: SourceRecord) -> None:
+        # Повторное добавление того же source_id (reprocess) заменяет запись.
+        placeholders = ", ".join("?" for _ in range(len(_SQLITE_COLUMNS) + 1))
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO sources({', '.join(_SQLITE_COLUMNS)}, position) VALUES ({placeholders})",
+                [*self._row_values(record), self._next_position(conn)],
+            )
+            if self._cache is not None:
+                self._cache.pop(record.source_id, None)
+                self._cache[record.source_id] = record.copy()
+
+    def get_source(self, source_id: str) -> Optional[SourceRecord]:
+        with self._lock:
+            rec = self._records().get(source_id)
+            return rec.copy() if rec is not None else None
+
+    def update_status(self, source_id: str, status: str, **kwargs) -> None:
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(_SQLITE_COLUMNS)} FROM sources WHERE source_id = ?",
+                (source_id,),
+            ).fetchone()
+            if row is None:
+                return
+            data = self._record_from_row(row).to_dict()
+            data["status"] = status
+            for key, value in kwargs.items():
+                if key in data:
+                    data[key] = value
+            updated = SourceRecord.from_dict(data)
+            assignments = ", ".join(f"{column} = ?" for column in _SQLITE_COLUMNS[1:])
+            conn.execute(
+                f"UPDATE sources SET {assignments} WHERE source_id = ?",
+                [*self._row_values(updated)[1:], source_id],
+            )
+            if self._cache is not None and source_id in self._cache:
+                self._cache[source_id] = updated
+
+    def is_processed(self, source_id: str) -> bool:
+        with self._lock:
+            rec = self._records().get(source_id)
+            return bool(rec and rec.status == "done")
+
+    def list_all(self) -> List[SourceRecord]:
+        with self._lock:
+            return [rec.copy() for rec in self._records().values()]
+
+    def list_by_status(self, status: str) -> List[SourceRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_SQLITE_COLUMNS)} FROM sources WHERE status = ? ORDER BY position",
+                (status,),
+            ).fetchall()
+        return [self._record_from_row(row) for row in rows]
+
+    def get_statistics(self) -> dict:
+        with self._lock:
+            return _statistics(self._records().values())
+
+    def delete_source(self, source_id: str) -> bool:
+        with self._transaction() as conn:
+            removed = conn.execute("DELETE FROM sources WHERE source_id = ?", (source_id,)).rowcount
+            if removed and self._cache is not None:
+                self._cache.pop(source_id, None)
+        return bool(removed)
+
+    def migrate_from_json(self, json_path: str) -> dict:
+        """
+        Одноразовый импорт JSON-реестра. Повторный вызов для того же файла —
+        no-op (отметка в registry_meta). При дубликатах source_id побеждает
+        первая запись, как в JSON-реестре.
+        """
+        marker = f"json_migrated:{os.path.abspath(json_path)}"
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM registry_meta WHERE key = ?", (marker,)).fetchone():
+                return {"migrated": False, "reason": "already_migrated", "imported": 0}
+            if not os.path.exists(json_path):
+                return {"migrated": False, "reason": "json_missing", "imported": 0}
+            with open(json_path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            items = json.loads(content) if content else []
+            position = self._next_position(conn)
+            imported = 0
+            skipped = 0
+            placeholders = ", ".join("?" for _ in range(len(_SQLITE_COLUMNS) + 1))
+            for item in items:
+                record = SourceRecord.from_dict(item)
+                cursor = conn.execute(
+                    f"INSERT OR IGNORE INTO sources({', '.join(_SQLITE_COLUMNS)}, position) VALUES ({placeholders})",
+                    [*self._row_values(record), position],
+                )
+                if cursor.rowcount:
+                    imported += 1
+                    position += 1
+                else:
+                    skipped += 1
+            conn.execute(
+                "INSERT INTO registry_meta(key, value) VALUES (?, ?)",
+                (marker, json.dumps({"imported": imported, "skipped_duplicates": skipped})),
+            )
+            self._cache = None
+        logger.info("[REGISTRY] migrated %s sources from %s (skipped=%s)", imported, json_path, skipped)
+        return {"migrated": True, "imported": imported, "skipped_duplicates": skipped}
+
+    def export_json(self, target_path: str) -> str:
+        data = [rec.to_dict() for rec in self.list_all()]
+        with open(target_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return target_path
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def resolve_registry_backend(registry_path: str, backend: Optional[str] = None) -> str:
+    name = str(backend or os.getenv("REGISTRY_BACKEND") or "").strip().lower()
+    if name in {"json", "sqlite"}:
+        return name
+    return "sqlite" if registry_path.endswith((".sqlite", ".db")) else "json"
+
+
+def create_source_registry(registry_path: str, backend: Optional[str] = None):
+    """
+    Реестр по backend ('json' | 'sqlite'). Для sqlite с путем *.json база
+    кладется рядом (*.sqlite) и при первом открытии импортирует JSON.
+    """
+    if resolve_registry_backend(registry_path, backend) == "json":
+        return SourceRegistry(registry_path)
+    if registry_path.endswith(".json"):
+        sqlite_path = registry_path[: -len(".json")] + ".sqlite"
+        return SqliteSourceRegistry(sqlite_path, migrate_from_json=registry_path)
+    return SqliteSourceRegistry(registry_path)
@@ -56,6 +56,15 @@ except Exception:
     chroma_stub = types.ModuleType("chromadb")
     chroma_stub.__spec__ = ModuleSpec(name="chromadb", loader=None)
 
+    def _source_id_filter(where):
+        # Chroma принимает и {"source_id": value}, и {"source_id": {"$eq": value}}.
+        if not isinstance(where, dict) or "source_id" not in where:
+            return None
+        source_where = where["source_id"]
+        if isinstance(source_where, dict):
+            return source_where.get("$eq")
+        return source_where
+
     class DummyCollection:
         def __init__(self, name="dummy"):
             self.name = name
@@ -77,13 +86,13 @@ except Exception:
                     }
                 )
 
-        def get(self, where=None, include=None, **kwargs):  # noqa: ARG002
+        def get(self, where=None, include=None, limit=None, offset=None, **kwargs):  # noqa: ARG002
             rows = list(self._records)
-            if isinstance(where, dict):
-                source_where = where.get("source_id")
-                if isinstance(source_where, dict) and "$eq" in source_where:
-                    expected = source_where["$eq"]
-                    rows = [r for r in rows if (r.get("metadata") or {}).get("source_id") == expected]
+            expected = _source_id_filter(where)
+            if expected is not None:
+                rows = [r for r in rows if (r.get("metadata") or {}).get("source_id") == expected]
+            start = int(offset or 0)
+            rows = rows[start : start + int(limit)] if limit is not None else rows[start:]
             return {
                 "ids": [r["id"] for r in rows],
                 "documents": [r["document"] for r in rows],
@@ -104,14 +113,12 @@ except Exception:
                 ids_set = set(ids)
                 self._records = [r for r in self._records if r["id"] not in ids_set]
                 return
-            if isinstance(where, dict):
-                source_where = where.get("source_id")
-                if isinstance(source_where, dict) and "$eq" in source_where:
-                    expected = source_where["$eq"]
-                    self._records = [
-                        r for r in self._records if (r.get("metadata") or {}).get("source_id") != expected
-                    ]
-                    return
+            expected = _source_id_filter(where)
+            if expected is not None:
+                self._records = [
+                    r for r in self._records if (r.get("metadata") or {}).get("source_id") != expected
+                ]
+                return
             self._records = []
 
     class DummyClient:
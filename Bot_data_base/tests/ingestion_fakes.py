@@ -0,0 +1,22 @@
+"""
+Picklable fakes for process-pool tests of jobs.ingestion_engine.
+
+Spawn-воркер восстанавливает эти классы импортом модуля, а stub'ы из
+conftest (yt_dlp, chromadb) в дочерний процесс не попадают, поэтому здесь
+нельзя импортировать pipeline_runner и ingestors.
+"""
+
+from __future__ import annotations
+
+from models.universal_block import UniversalBlock
+
+
+class ParagraphChunker:
+    """Picklable chunker: one block per paragraph."""
+
+    def chunk_file_from_text(self, text: str, **kwargs):
+        return [
+            UniversalBlock(text=part, source_type="book", author=kwargs.get("author", ""))
+            for part in text.split("\n\n")
+            if part.strip()
+        ]
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import os
+
+from api.routes import query as query_route
+from utils import bm25_index
+from utils.bm25_index import BM25Index, get_blocks_bm25_index, tokenize
+
+
+def _write_blocks(path, texts):
+    blocks = [{"id": f"b{idx}", "text": text, "metadata": {"n": idx}} for idx, text in enumerate(texts)]
+    path.write_text(json.dumps({"blocks": blocks}, ensure_ascii=False), encoding="utf-8")
+
+
+def test_tokenize_normalizes_russian_forms():
+    assert tokenize("Тревога") == tokenize("тревоги") == tokenize("тревогой")
+    assert tokenize("ёлка") == tokenize("елка")
+    assert tokenize("и в на") == []
+
+
+def test_bm25_ranks_by_relevance_not_snapshot_order():
+    index = BM25Index.build(
+        [
+            {"chunk_id": "a", "content": "про сон и отдых"},
+            {"chunk_id": "b", "content": "тревога упоминается один раз среди многих других слов текста"},
+            {"chunk_id": "c", "content": "тревога и тревожные мысли: работа с тревогой"},
+        ]
+    )
+
+    ranked = [doc["chunk_id"] for _, doc in index.search("как справиться с тревогой", 3)]
+
+    assert ranked == ["c", "b"]
+
+
+def test_bm25_without_matches_returns_deterministic_top():
+    index = BM25Index.build([{"chunk_id": "a", "content": "один"}, {"chunk_id": "b", "content": "два"}])
+
+    assert [doc["chunk_id"] for _, doc in index.search("zzz", 1)] == ["a"]
+
+
+def test_index_is_reused_until_file_changes(tmp_path):
+    bm25_index.reset_bm25_indexes()
+    path = tmp_path / "all_blocks_merged.json"
+    _write_blocks(path, ["поток и осознанность", "другое"])
+
+    first = get_blocks_bm25_index(path)
+    assert get_blocks_bm25_index(path) is first
+
+    _write_blocks(path, ["другое", "поток и осознанность", "еще один блок"])
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second = get_blocks_bm25_index(path)
+
+    assert second is not first
+    assert second.size == 3
+    bm25_index.reset_bm25_indexes()
+
+
+def test_route_fallback_uses_bm25_index(tmp_path, monkeypatch):
+    bm25_index.reset_bm25_indexes()
+    path = tmp_path / "all_blocks_merged.json"
+    _write_blocks(path, ["про сон", "быть в потоке значит полностью погрузиться в поток", ""])
+    monkeypatch.setattr(query_route, "_resolve_blocks_file", lambda: path)
+
+    candidates = query_route._fallback_candidates_from_blocks_file("что значит быть в потоке", 5)
+
+    assert [item["chunk_id"] for item in candidates] == ["b1"]
+    assert candidates[0]["metadata"] == {"n": 1}
+    assert candidates[0]["distance"] is None
+    bm25_index.reset_bm25_indexes()
+
+
+def test_semantic_query_runs_blocks_fallback_off_event_loop(monkeypatch):
+    import asyncio
+    import threading
+
+    from api.routes.query import QueryRequest, semantic_query
+
+    fallback_threads = []
+
+    def _fallback(query, limit):  # noqa: ARG001
+        fallback_threads.append(threading.current_thread())
+        return [{"chunk_id": "b0", "content": "тревога", "metadata": {}, "distance": None}]
+
+    def _unavailable():
+        raise RuntimeError("chroma down")
+
+    async def _run():
+        payload = await semantic_query(QueryRequest(query="тревога", top_k=1, use_rerank=False, search_mode="semantic"))
+        return payload, threading.current_thread()
+
+    monkeypatch.setattr(query_route, "_get_collection", _unavailable)
+    monkeypatch.setattr(query_route, "_fallback_candidates_from_blocks_file", _fallback)
+    monkeypatch.setattr(query_route, "apply_retrieval_governance_policy", lambda q, c, top_k: (c[:top_k], {"ok": True}))
+    payload, loop_thread = asyncio.run(_run())
+
+    assert payload.chunks[0].chunk_id == "b0"
+    assert fallback_threads and fallback_threads[0] is not loop_thread
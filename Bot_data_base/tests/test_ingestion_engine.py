@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+from jobs.ingestion_engine import IngestionEngine, IngestionMetrics, PrepareRequest
+from jobs.job_manager import JobManager
+from models.universal_block import UniversalBlock
+from pipeline_runner import PipelineRunner
+from processors.block_normalizer import BlockNormalizer
+from tests.ingestion_fakes import ParagraphChunker
+
+
+class _RecordingChroma:
+    def __init__(self) -> None:
+        self.pages: list[int] = []
+
+    def add_blocks(self, blocks) -> int:
+        self.pages.append(len(blocks))
+        return len(blocks)
+
+
+def _request(text: str) -> PrepareRequest:
+    return PrepareRequest(
+        source_type="book",
+        source_id="author__book",
+        text=text,
+        author="Автор",
+        author_id="author",
+        title="Книга",
+        language="ru",
+    )
+
+
+def test_prepare_runs_chunking_and_governance_in_process_pool() -> None:
+    engine = IngestionEngine(process_workers=1)
+    metrics = IngestionMetrics()
+    text = "\n\n".join(f"Абзац номер {idx} про внимание и присутствие." for idx in range(5))
+    try:
+        blocks = asyncio.run(
+            engine.prepare(_request(text), chunker=ParagraphChunker(), block_normalizer=BlockNormalizer(), metrics=metrics)
+        )
+    finally:
+        engine.shutdown()
+
+    assert len(blocks) == 5
+    assert all(block.governance for block in blocks)
+    assert all(block.chunking_quality for block in blocks)
+    assert metrics.to_dict()["prepare"]["mode"] == "process"
+    assert metrics.to_dict()["prepare"]["items"] == 5
+
+
+def test_process_pool_fakes_import_without_optional_dependencies() -> None:
+    # Так модуль видит spawn-воркер: без conftest-stub'ов yt_dlp/chromadb.
+    code = (
+        "import sys\n"
+        "sys.modules.update({'yt_dlp': None, 'chromadb': None})\n"
+        "import jobs.ingestion_engine, tests.ingestion_fakes\n"
+        "assert 'pipeline_runner' not in sys.modules\n"
+    )
+    root = Path(__file__).resolve().parents[1]
+    completed = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, timeout=60)
+    assert completed.returncode == 0, completed.stderr
+
+
+def test_prepare_falls_back_to_thread_for_unpicklable_steps() -> None:
+    engine = IngestionEngine(process_workers=1)
+    metrics = IngestionMetrics()
+    blocks = asyncio.run(
+        engine.prepare(
+            _request("один\n\nдва"),
+            chunker=ParagraphChunker(),
+            block_normalizer=BlockNormalizer(),
+            metrics=metrics,
+            apply_governance=lambda **kwargs: kwargs["blocks"],
+            build_quality=lambda _block: {"stub": True},
+        )
+    )
+
+    assert [block.chunking_quality for block in blocks] == [{"stub": True}, {"stub": True}]
+    assert metrics.to_dict()["prepare"]["mode"] == "thread"
+    assert engine._executor is None
+
+
+def test_index_writes_fixed_size_pages() -> None:
+    engine = IngestionEngine(process_workers=0, embed_batch_size=4)
+    chroma = _RecordingChroma()
+    metrics = IngestionMetrics()
+    seen: list[tuple[int, int]] = []
+
+    async def on_page(page_no: int, total: int) -> None:
+        seen.append((page_no, total))
+
+    blocks = [UniversalBlock(text=f"b{idx}") for idx in range(10)]
+    added = asyncio.run(engine.index(chroma, blocks, metrics=metrics, on_page=on_page))
+
+    assert added == 10
+    assert chroma.pages == [4, 4, 2]
+    assert seen == [(1, 3), (2, 3), (3, 3)]
+    assert metrics.to_dict()["index"]["pages"] == 3
+
+
+def test_run_book_publishes_stage_metrics_to_job_manager(tmp_path) -> None:
+    class _Ingestor:
+        def validate_file(self, _path):
+            return True, None
+
+        def load_text(self, _path):
+            return "первый абзац\n\nвторой абзац\n\nтретий абзац"
+
+    class _Registry:
+        def is_processed(self, _source_id):
+            return False
+
+        def add_source(self, _record):
+            return None
+
+        def update_status(self, *_args, **_kwargs):
+            return None
+
+    class _Exporter:
+        def export(self, _blocks, _source_id, _source_type):
+            return str(tmp_path / "book.json")
+
+    job_manager = JobManager()
+    runner = PipelineRunner.__new__(PipelineRunner)
+    runner.job_manager = job_manager
+    runner.ingestion_engine = IngestionEngine(process_workers=0, embed_batch_size=2)
+    runner.legacy_sd_enabled = False
+    runner.sd_labeler = None
+    runner.book_ingestor = _Ingestor()
+    runner.book_chunker = ParagraphChunker()
+    runner.block_normalizer = BlockNormalizer()
+    runner.registry = _Registry()
+    runner.json_exporter = _Exporter()
+    runner.chroma_manager = _RecordingChroma()
+
+    async def _run():
+        job_id = await job_manager.create_job("book", "book.txt")
+        result = await runner.run_book(
+            file_path="book.txt",
+            author="Автор",
+            author_id="author",
+            book_title="Книга",
+            language="ru",
+            job_id=job_id,
+        )
+        return result, await job_manager.get_job(job_id)
+
+    result, job = asyncio.run(_run())
+
+    assert result["status"] == "done"
+    assert runner.chroma_manager.pages == [2, 1]
+    assert set(job.stage_metrics) >= {"prepare", "export", "index", "peak_rss_mb"}
+    assert job.stage_metrics["index"]["items"] == 3
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from jobs.ingestion_engine import IngestionEngine
+from jobs.job_manager import JobManager, SqliteJobManager
+from jobs.job_queue import IngestionJobQueue
+from models.universal_block import UniversalBlock
+from pipeline_runner import PipelineRunner
+from processors.block_normalizer import BlockNormalizer
+
+
+async def _wait_for_status(manager, job_id: str, status: str, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await manager.get_job(job_id)
+        if job.status == status or asyncio.get_running_loop().time() > deadline:
+            return job
+        await asyncio.sleep(0.01)
+
+
+def test_queue_limits_concurrency_and_deduplicates(tmp_path) -> None:
+    manager = SqliteJobManager(str(tmp_path / "jobs.sqlite3"))
+    running = {"now": 0, "peak": 0}
+
+    async def _scenario():
+        gate = asyncio.Event()
+
+        async def handler(job):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await gate.wait()
+            running["now"] -= 1
+            return {"status": "done", "source_id": job.payload["source_id"]}
+
+        queue = IngestionJobQueue(manager, max_workers=2, handlers={"book": handler})
+        first, dup_first = await queue.enqueue("book", "a.txt", {"source_id": "a"}, dedup_key="book:a")
+        again, dup_again = await queue.enqueue("book", "a.txt", {"source_id": "a"}, dedup_key="book:a")
+        others = [
+            (await queue.enqueue("book", f"{name}.txt", {"source_id": name}, dedup_key=f"book:{name}"))[0]
+            for name in ("b", "c", "d")
+        ]
+        await asyncio.sleep(0.1)
+        queued = [(await manager.get_job(job.job_id)).status for job in others]
+        gate.set()
+        done = [await _wait_for_status(manager, job.job_id, "done") for job in [first, *others]]
+        await queue.stop()
+        return first, dup_first, again, dup_again, queued, done, queue.stats()
+
+    first, dup_first, again, dup_again, queued, done, stats = asyncio.run(_scenario())
+
+    assert (dup_first, dup_again) == (False, True)
+    assert again.job_id == first.job_id
+    assert running["peak"] == 2
+    assert queued.count("queued") == 2
+    assert all(job.status == "done" and job.finished_at for job in done)
+    assert stats["deduplicated"] == 1 and stats["completed"] == 4
+
+
+def test_interrupted_job_is_requeued_after_restart(tmp_path) -> None:
+    db_path = str(tmp_path / "jobs.sqlite3")
+
+    async def _crash():
+        manager = SqliteJobManager(db_path)
+        job_id = await manager.create_job("youtube", "url", dedup_key="youtube:x", payload={"url": "url"})
+        await manager.claim_next(["youtube"])
+        await manager.save_checkpoint(job_id, registered=True, json_path="x.json")
+        manager.close()
+        return job_id
+
+    job_id = asyncio.run(_crash())
+
+    async def _restart():
+        manager = SqliteJobManager(db_path)
+        seen = {}
+
+        async def handler(job):
+            seen["checkpoint"] = await manager.get_checkpoint(job.job_id)
+            seen["attempts"] = job.attempts
+            return {"status": "done"}
+
+        queue = IngestionJobQueue(manager, max_workers=1, handlers={"youtube": handler})
+        await queue.start()
+        job = await _wait_for_status(manager, job_id, "done")
+        await queue.stop()
+        return job, seen, queue.stats()
+
+    job, seen, stats = asyncio.run(_restart())
+
+    assert job.status == "done"
+    assert seen == {"checkpoint": {"registered": True, "json_path": "x.json"}, "attempts": 2}
+    assert stats["requeued"] == 1
+
+
+def test_requeue_skips_jobs_leased_by_live_workers(tmp_path) -> None:
+    db_path = str(tmp_path / "jobs.sqlite3")
+    other = SqliteJobManager(db_path, lease_seconds=60)
+    restarted = SqliteJobManager(db_path, lease_seconds=60)
+
+    async def _scenario():
+        live_id = await other.create_job("book", "live.txt")
+        await other.claim_next(["book"])
+        requeued_live = await restarted.requeue_interrupted(max_attempts=3)
+
+        other._execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (time.time() - 120, live_id))
+        requeued_expired = await restarted.requeue_interrupted(max_attempts=3)
+        return live_id, requeued_live, requeued_expired
+
+    live_id, requeued_live, requeued_expired = asyncio.run(_scenario())
+
+    assert (requeued_live, requeued_expired) == (0, 1)
+    assert asyncio.run(restarted.get_job(live_id)).status == "queued"
+    other.close()
+    restarted.close()
+
+
+def test_stopped_queue_releases_leases_of_interrupted_jobs(tmp_path) -> None:
+    manager = SqliteJobManager(str(tmp_path / "jobs.sqlite3"), lease_seconds=3600)
+    attempts: list[int] = []
+
+    async def _scenario():
+        started = asyncio.Event()
+
+        async def _hangs(job):
+            attempts.append(job.attempts)
+            started.set()
+            await asyncio.Event().wait()
+
+        first = IngestionJobQueue(manager, max_workers=1, handlers={"book": _hangs})
+        job, _ = await first.enqueue("book", "a.txt", {"source_id": "a"})
+        await asyncio.wait_for(started.wait(), timeout=5)
+        await first.stop()
+
+        async def _done(job):
+            attempts.append(job.attempts)
+            return {"status": "done"}
+
+        second = IngestionJobQueue(manager, max_workers=1, handlers={"book": _done})
+        await second.start()
+        finished = await _wait_for_status(manager, job.job_id, "done")
+        await second.stop()
+        return finished, second.stats()
+
+    finished, stats = asyncio.run(_scenario())
+
+    assert finished.status == "done"
+    assert attempts == [1, 2]
+    assert stats["requeued"] == 1
+    manager.close()
+
+
+def test_requeue_takes_over_jobs_of_dead_local_process(tmp_path) -> None:
+    db_path = str(tmp_path / "jobs.sqlite3")
+    manager = SqliteJobManager(db_path, lease_seconds=3600)
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    dead_worker = f"{socket.gethostname()}:{int(dead.stdout)}:gone"
+
+    async def _scenario():
+        job_id = await manager.create_job("book", "a.txt")
+        await manager.claim_next(["book"])
+        manager._execute("UPDATE jobs SET worker_id = ? WHERE job_id = ?", (dead_worker, job_id))
+        return job_id, await manager.requeue_interrupted(max_attempts=3)
+
+    job_id, requeued = asyncio.run(_scenario())
+
+    assert requeued == (0 if os.name == "nt" else 1)
+    manager.close()
+
+
+def test_sqlite_manager_runs_queries_off_the_event_loop(tmp_path) -> None:
+    manager = SqliteJobManager(str(tmp_path / "jobs.sqlite3"))
+    threads: list[str] = []
+    save_sync = manager._save_checkpoint_sync
+
+    def _recording_save(job_id, data):
+        threads.append(threading.current_thread().name)
+        save_sync(job_id, data)
+
+    manager._save_checkpoint_sync = _recording_save
+
+    async def _scenario():
+        job_id = await manager.create_job("book", "a.txt")
+        await asyncio.gather(*(manager.save_checkpoint(job_id, **{f"k{idx}": idx}) for idx in range(5)))
+        return await manager.get_checkpoint(job_id)
+
+    checkpoint = asyncio.run(_scenario())
+
+    assert checkpoint == {f"k{idx}": idx for idx in range(5)}
+    assert threads and threading.main_thread().name not in threads
+    manager.close()
+
+
+def test_sqlite_manager_adds_lease_columns_to_existing_db(tmp_path) -> None:
+    db_path = str(tmp_path / "jobs.sqlite3")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE jobs (job_id TEXT PRIMARY KEY, source_type TEXT NOT NULL, source_ref TEXT NOT NULL, "
+        "status TEXT NOT NULL, progress INTEGER NOT NULL, current_stage TEXT NOT NULL, created_at TEXT NOT NULL, "
+        "finished_at TEXT, error TEXT, result TEXT, stage_metrics TEXT, dedup_key TEXT, payload TEXT, "
+        "attempts INTEGER NOT NULL DEFAULT 0, checkpoint TEXT, started_at TEXT)"
+    )
+    conn.execute(
+        "INSERT INTO jobs (job_id, source_type, source_ref, status, progress, current_stage, created_at, attempts) "
+        "VALUES ('old', 'book', 'a.txt', 'running', 10, 'index', '2026-01-01T00:00:00', 1)"
+    )
+    conn.commit()
+    conn.close()
+
+    manager = SqliteJobManager(db_path)
+    assert asyncio.run(manager.requeue_interrupted(max_attempts=3)) == 1
+    manager.close()
+
+
+def test_finished_jobs_are_pruned_by_retention(tmp_path) -> None:
+    async def _scenario(manager):
+        ids = []
+        for idx in range(4):
+            job_id = await manager.create_job("book", f"{idx}.txt")
+            await manager.update_job(job_id, "done", 100, "done", finished_at=f"2099-01-0{idx + 1}T00:00:00")
+            ids.append(job_id)
+        return ids, [job.job_id for job in await manager.list_jobs(limit=10)]
+
+    for manager in (JobManager(max_finished=2), SqliteJobManager(str(tmp_path / "jobs.sqlite3"), max_finished=2)):
+        ids, kept = asyncio.run(_scenario(manager))
+        assert kept == ids[-2:]
+
+
+def test_run_book_resumes_indexing_from_checkpoint(tmp_path) -> None:
+    class _Ingestor:
+        def validate_file(self, _path):
+            return True, None
+
+        def load_text(self, _path):
+            raise AssertionError("prepared blocks must come from the checkpoint")
+
+    class _Registry:
+        def __init__(self):
+            self.added = 0
+
+        def is_processed(self, _source_id):
+            return False
+
+        def add_source(self, _record):
+            self.added += 1
+
+        def update_status(self, *_args, **_kwargs):
+            return None
+
+    class _Chroma:
+        def __init__(self):
+            self.indexed: list[str] = []
+
+        def add_blocks(self, blocks):
+            self.indexed.extend(block.text for block in blocks)
+            return len(blocks)
+
+    manager = SqliteJobManager(str(tmp_path / "jobs" / "jobs.sqlite3"))
+    runner = PipelineRunner.__new__(PipelineRunner)
+    runner.job_manager = manager
+    runner.ingestion_engine = IngestionEngine(process_workers=0, embed_batch_size=2)
+    runner.legacy_sd_enabled = False
+    runner.sd_labeler = None
+    runner.book_ingestor = _Ingestor()
+    runner.block_normalizer = BlockNormalizer()
+    runner.registry = _Registry()
+    runner.chroma_manager = _Chroma()
+
+    async def _run():
+        job_id = await manager.create_job("book", "book.txt")
+        await manager.claim_next(["book"])
+        await runner._checkpoint_blocks(job_id, [UniversalBlock(text=f"b{idx}") for idx in range(5)])
+        await manager.save_checkpoint(job_id, registered=True, json_path="book.json", indexed_blocks=2)
+        result = await runner.run_book(
+            file_path="book.txt",
+            author="Автор",
+            author_id="author",
+            book_title="Книга",
+            language="ru",
+            job_id=job_id,
+        )
+        return result, runner._checkpoint_path(job_id)
+
+    result, blocks_path = asyncio.run(_run())
+
+    assert result["status"] == "done"
+    assert result["blocks_count"] == 5 and result["added_to_chroma"] == 5
+    assert runner.chroma_manager.indexed == ["b2", "b3", "b4"]
+    assert runner.registry.added == 0
+    assert blocks_path.startswith(str(tmp_path / "jobs" / "checkpoints"))
+    assert not os.path.exists(blocks_path)
+
+
+def test_book_uploads_with_same_filename_get_distinct_paths(tmp_path, monkeypatch) -> None:
+    from api.routes import books
+
+    monkeypatch.setattr(books, "UPLOADS_DIR", str(tmp_path / "uploads"))
+    first = books._upload_path("author__book_one", "book.pdf")
+    second = books._upload_path("author__book_two", "book.pdf")
+    nested = books._upload_path("author__book_one", "../../etc/book.pdf")
+
+    assert first != second
+    assert os.path.dirname(nested) == str(tmp_path / "uploads")
+    assert all(path.endswith("__book.pdf") for path in (first, second, nested))
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import numpy as np
+
+from storage.chroma_manager import ChromaManager
+from utils.embedding_cache import QueryEmbeddingCache
+from utils import embedding_cache
+
+
+class _CountingModel:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts, convert_to_numpy=True):  # noqa: ARG002
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), 0.5] for text in texts], dtype=np.float32)
+
+
+def _manager(monkeypatch) -> tuple[ChromaManager, _CountingModel]:
+    monkeypatch.setattr(embedding_cache, "_shared_cache", QueryEmbeddingCache(max_entries=8))
+    manager = ChromaManager.__new__(ChromaManager)
+    manager.embedding_model_name = "test-model"
+    model = _CountingModel()
+    manager._model = model
+    return manager, model
+
+
+def test_embed_texts_reuses_cached_query_vectors(monkeypatch) -> None:
+    manager, model = _manager(monkeypatch)
+
+    first = manager._embed_texts(["как справиться с тревогой"])
+    second = manager._embed_texts(["как  справиться с тревогой "])
+    mixed = manager._embed_texts(["как справиться с тревогой", "новый запрос"])
+
+    assert first == second == [mixed[0]]
+    assert model.calls == [["как справиться с тревогой"], ["новый запрос"]]
+    stats = embedding_cache.get_query_embedding_cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == 0.5
+
+
+def test_embed_texts_without_cache_for_indexing(monkeypatch) -> None:
+    manager, model = _manager(monkeypatch)
+
+    manager._embed_texts(["пассаж"], use_cache=False)
+    manager._embed_texts(["пассаж"], use_cache=False)
+
+    assert len(model.calls) == 2
+    assert embedding_cache.get_query_embedding_cache_stats()["size"] == 0
+
+
+def test_disk_hit_refreshes_spill_touched(tmp_path) -> None:
+    cache = QueryEmbeddingCache(max_entries=1, spill_path=tmp_path / "spill.sqlite")
+    compute = lambda batch: [[float(len(text))] for text in batch]  # noqa: E731
+    try:
+        cache.get_or_compute_many("m", "raw", ["a", "bb"], compute)
+        conn = cache._spill_conn()
+        conn.execute("UPDATE query_embeddings SET touched = 0")
+        conn.commit()
+
+        cache.get_or_compute_many("m", "raw", ["a"], compute)
+        touched = conn.execute(
+            "SELECT touched FROM query_embeddings WHERE key = ?",
+            (cache._spill_key(("m", "raw", "a")),),
+        ).fetchone()[0]
+    finally:
+        cache.close()
+
+    assert cache.stats()["disk_hits"] == 1
+    assert touched > 0
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.query_executor import ChromaReadPool, EmbeddingBatcher
+
+
+def test_batcher_coalesces_concurrent_queries_into_one_encode() -> None:
+    calls: list[list[str]] = []
+
+    def _encode(texts: list[str]) -> list[list[float]]:
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(window_ms=50, max_batch=16)
+
+    async def _run() -> list:
+        return await asyncio.gather(*(batcher.embed(_encode, [f"q{'x' * i}"]) for i in range(6)))
+
+    try:
+        results = asyncio.run(_run())
+    finally:
+        batcher.shutdown()
+
+    assert results == [[[float(1 + i)]] for i in range(6)]
+    assert len(calls) == 1
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["max_batch_size"] == 6
+    assert stats["queue_depth"] == 0
+
+
+def test_batcher_respects_max_batch_and_propagates_errors() -> None:
+    sizes: list[int] = []
+
+    def _encode(texts: list[str]) -> list[list[float]]:
+        sizes.append(len(texts))
+        return [[0.0] for _ in texts]
+
+    def _broken(texts: list[str]) -> list[list[float]]:
+        raise RuntimeError("encode failed")
+
+    batcher = EmbeddingBatcher(window_ms=30, max_batch=2)
+    try:
+        futures = [batcher.submit(_encode, ["a"]) for _ in range(5)]
+        assert [len(future.result(timeout=5)) for future in futures] == [1] * 5
+        with pytest.raises(RuntimeError, match="encode failed"):
+            batcher.submit(_broken, ["b"]).result(timeout=5)
+    finally:
+        batcher.shutdown()
+
+    assert max(sizes) <= 2
+    assert batcher.stats()["errors"] == 1
+
+
+def test_chroma_read_pool_runs_off_loop_and_reports_depth() -> None:
+    pool = ChromaReadPool(max_workers=1)
+    release = threading.Event()
+    seen: list[str] = []
+
+    def _slow_query(tag: str) -> str:
+        seen.append(threading.current_thread().name)
+        release.wait(timeout=5)
+        return tag
+
+    async def _run() -> list:
+        tasks = [asyncio.create_task(pool.run(_slow_query, tag)) for tag in ("a", "b")]
+        await asyncio.sleep(0.05)
+        snapshot = pool.stats()
+        assert snapshot["in_flight"] == 1
+        assert snapshot["queue_depth"] == 1
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    started = time.perf_counter()
+    try:
+        assert asyncio.run(_run()) == ["a", "b"]
+    finally:
+        pool.shutdown()
+
+    assert time.perf_counter() - started < 5
+    assert all(name.startswith("botdb-chroma-read") for name in seen)
+    assert pool.stats()["completed"] == 2
+
+
+def test_chroma_read_pool_does_not_retry_runtime_error_from_fn() -> None:
+    pool = ChromaReadPool(max_workers=1)
+    calls: list[int] = []
+
+    def _fails() -> None:
+        calls.append(1)
+        raise RuntimeError("cannot schedule new futures after shutdown")
+
+    try:
+        with pytest.raises(RuntimeError):
+            asyncio.run(pool.run(_fails))
+    finally:
+        pool.shutdown()
+
+    assert calls == [1]
+    stats = pool.stats()
+    assert (stats["queue_depth"], stats["errors"]) == (0, 1)
+
+
+def test_chroma_read_pool_falls_back_when_executor_is_shut_down() -> None:
+    pool = ChromaReadPool(max_workers=1)
+    executor = pool._get_executor()
+    executor.shutdown()
+
+    assert asyncio.run(pool.run(lambda: "ok")) == "ok"
+    assert pool.stats()["queue_depth"] == 0
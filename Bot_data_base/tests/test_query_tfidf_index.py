@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from api.routes import query as query_route
+from utils import tfidf_index
+
+
+class _FakeCollection:
+    name = "bot_knowledge"
+
+    def __init__(self, docs: dict[str, str]) -> None:
+        self.docs = dict(docs)
+        self.get_calls = 0
+
+    def count(self) -> int:
+        return len(self.docs)
+
+    def get(self, limit: int, offset: int = 0, include=None):  # noqa: ARG002
+        self.get_calls += 1
+        ids = list(self.docs)[offset : offset + limit]
+        return {"ids": ids, "documents": [self.docs[i] for i in ids]}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_index():
+    tfidf_index.invalidate_corpus_tfidf_index()
+    yield
+    tfidf_index.wait_for_rebuild()
+    tfidf_index.invalidate_corpus_tfidf_index()
+
+
+def _candidates(collection: _FakeCollection, *ids: str) -> list[dict]:
+    return [{"chunk_id": i, "content": collection.docs[i], "distance": 0.5} for i in ids]
+
+
+def test_hybrid_scores_reuse_corpus_index_across_requests(monkeypatch) -> None:
+    collection = _FakeCollection(
+        {
+            "c1": "осознанность и внимание к телу",
+            "c2": "тревога перед встречей и дыхание",
+            "c3": "практика наблюдения за мыслями",
+        }
+    )
+    manager = SimpleNamespace(collection_name="bot_knowledge", collection_version=0)
+    monkeypatch.setattr(query_route, "_get_runner", lambda: SimpleNamespace(chroma_manager=manager))
+    builds_before = tfidf_index.corpus_tfidf_index_stats()["builds"]
+
+    first = _candidates(collection, "c1", "c2")
+    query_route._apply_hybrid_scores("осознанность", first, collection=collection)
+    tfidf_index.wait_for_rebuild()
+    assert tfidf_index.corpus_tfidf_index_stats()["ready"] is True
+    second = _candidates(collection, "c2", "c3")
+    query_route._apply_hybrid_scores("дыхание", second, collection=collection)
+
+    assert collection.get_calls == 1
+    assert first[0]["score"] > first[1]["score"]
+    assert second[0]["score"] > second[1]["score"]
+    assert tfidf_index.corpus_tfidf_index_stats()["builds"] == builds_before + 1
+
+
+def test_collection_version_change_rebuilds_in_background(monkeypatch) -> None:
+    collection = _FakeCollection({"c1": "осознанность", "c2": "тревога"})
+    manager = SimpleNamespace(collection_name="bot_knowledge", collection_version=0)
+    monkeypatch.setattr(query_route, "_get_runner", lambda: SimpleNamespace(chroma_manager=manager))
+    before = tfidf_index.corpus_tfidf_index_stats()
+    query_route._apply_hybrid_scores("тревога", _candidates(collection, "c1"), collection=collection)
+    tfidf_index.wait_for_rebuild()
+
+    collection.docs["c3"] = "новый блок про тревогу"
+    manager.collection_version = 1
+    fresh = _candidates(collection, "c3")
+    query_route._apply_hybrid_scores("тревога", fresh, collection=collection)
+    tfidf_index.wait_for_rebuild()
+
+    assert fresh[0]["score"] > 0.35  # новый блок векторизован старым векторайзером
+    stats = tfidf_index.corpus_tfidf_index_stats()
+    assert stats["stale_serves"] == before["stale_serves"] + 1
+    assert stats["builds"] == before["builds"] + 2
+    assert stats["rows"] == 3
+
+
+def test_cold_start_build_does_not_block_queries(monkeypatch) -> None:
+    release = threading.Event()
+
+    class _SlowCollection(_FakeCollection):
+        def get(self, limit: int, offset: int = 0, include=None):
+            release.wait(timeout=5.0)
+            return super().get(limit, offset, include)
+
+    collection = _SlowCollection({"c1": "осознанность", "c2": "совсем другое"})
+    manager = SimpleNamespace(collection_name="bot_knowledge", collection_version=0)
+    monkeypatch.setattr(query_route, "_get_runner", lambda: SimpleNamespace(chroma_manager=manager))
+
+    # Пока корпус грузится, запросы скорятся локальным fit и не ждут lock.
+    for _ in range(2):
+        candidates = _candidates(collection, "c1", "c2")
+        query_route._apply_hybrid_scores("осознанность", candidates, collection=collection)
+        assert candidates[0]["score"] > candidates[1]["score"]
+    assert tfidf_index.corpus_tfidf_index_stats()["rebuilding"] is True
+
+    release.set()
+    tfidf_index.wait_for_rebuild()
+    assert tfidf_index.get_corpus_tfidf_index(collection, manager) is not None
+    assert collection.get_calls == 1
+
+
+def test_rewritten_chunk_is_scored_by_new_text_before_rebuild(monkeypatch) -> None:
+    collection = _FakeCollection({"c1": "осознанность и внимание", "c2": "тревога перед встречей"})
+    manager = SimpleNamespace(collection_name="bot_knowledge", collection_version=0)
+    monkeypatch.setattr(query_route, "_get_runner", lambda: SimpleNamespace(chroma_manager=manager))
+    query_route._apply_hybrid_scores("тревога", _candidates(collection, "c1"), collection=collection)
+    tfidf_index.wait_for_rebuild()
+    index = tfidf_index.get_corpus_tfidf_index(collection, manager)
+    stale = index.score("тревога", _candidates(collection, "c1"))[0]
+
+    # Переиндексация того же chunk_id с новым текстом (ChromaManager.add_blocks).
+    collection.docs["c1"] = "тревога и тревожность"
+    tfidf_index.forget_corpus_tfidf_rows(["c1"])
+
+    assert "c1" not in index.row_by_id
+    assert index.score("тревога", _candidates(collection, "c1"))[0] > stale + 0.3
+
+
+def test_hybrid_scores_fall_back_to_candidate_fit_without_collection() -> None:
+    candidates = [
+        {"chunk_id": "x", "content": "осознанность", "distance": 0.2},
+        {"chunk_id": "y", "content": "совсем другое", "distance": 0.2},
+    ]
+    query_route._apply_hybrid_scores("осознанность", candidates)
+    assert candidates[0]["score"] > candidates[1]["score"]
+    assert tfidf_index.corpus_tfidf_index_stats()["ready"] is False
+
+
+def test_chroma_manager_bumps_version_on_mutation(monkeypatch) -> None:
+    from storage import chroma_manager as chroma_manager_module
+    from storage.chroma_manager import ChromaManager
+    from storage.collection_stats import CollectionStatsStore
+
+    manager = ChromaManager.__new__(ChromaManager)
+    manager.collection_version = 0
+    manager.collection_stats = CollectionStatsStore(None)
+    manager._collection = None
+    deleted = SimpleNamespace(
+        get=lambda where, include=None: {"ids": ["a", "b"], "metadatas": [{}, {}]},
+        delete=lambda ids: None,
+    )
+    manager.client = SimpleNamespace(get_or_create_collection=lambda name: deleted)
+    manager.collection_name = "bot_knowledge"
+
+    forgotten: list[list[str]] = []
+    monkeypatch.setattr(chroma_manager_module, "forget_corpus_tfidf_rows", forgotten.append)
+
+    assert manager.delete_source("src") == 2
+    assert manager.collection_version == 1
+    assert forgotten == [["a", "b"]]
@@ -1,7 +1,14 @@
 import os
+import time
 from unittest.mock import MagicMock, patch
 
-from utils.reranker import VoyageReranker
+from utils.reranker import (
+    CrossEncoderReranker,
+    RerankerService,
+    VoyageReranker,
+    get_reranker_service,
+    reset_reranker_service,
+)
 
 DOCS = ["документ первый", "документ второй", "документ третий"]
 
@@ -35,3 +42,83 @@ class TestVoyageReranker:
         reranker = VoyageReranker()
         indices = reranker.rerank("запрос", [], top_k=5)
         assert indices == []
+
+
+class _CountingBackend:
+    name = "fake"
+    model = "fake-model"
+    available = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def rerank(self, query, documents, top_k=5, raise_errors=False):
+        self.calls += 1
+        return sorted(range(len(documents)), key=lambda idx: documents[idx])[:top_k]
+
+
+class TestRerankerService:
+    def test_result_cache_is_keyed_by_candidate_set(self):
+        backend = _CountingBackend()
+        service = RerankerService(backend, cache_size=8)
+
+        first = service.rerank("запрос", ["в", "а", "б"], top_k=2, ids=["c1", "c2", "c3"])
+        permuted = service.rerank("запрос", ["б", "в", "а"], top_k=2, ids=["c3", "c1", "c2"])
+        other = service.rerank("запрос", ["в", "а"], top_k=2, ids=["c1", "c2"])
+
+        assert first == [1, 2]
+        assert permuted == [2, 0]
+        assert other == [1, 0]
+        assert backend.calls == 2
+        assert service.stats()["cache_hits"] == 1
+
+    def test_backend_errors_propagate_and_are_not_cached(self):
+        backend = _CountingBackend()
+        backend.rerank = MagicMock(side_effect=RuntimeError("boom"))
+        service = RerankerService(backend)
+
+        for _ in range(2):
+            try:
+                service.rerank("запрос", DOCS, top_k=2)
+            except RuntimeError:
+                pass
+        assert backend.rerank.call_count == 2
+        assert service.stats()["errors"] == 2
+
+    def test_singleton_reuses_voyage_client(self):
+        reset_reranker_service()
+        try:
+            with patch.dict(os.environ, {"VOYAGE_API_KEY": "test", "BOT_DB_RERANK_BACKEND": "voyage"}), \
+                patch("utils.reranker.voyageai.Client") as mock_client:
+                assert get_reranker_service() is get_reranker_service()
+            assert mock_client.call_count == 1
+        finally:
+            reset_reranker_service()
+
+
+class TestCrossEncoderReranker:
+    def _reranker(self, scores, budget_ms=0.0, delay=0.0):
+        reranker = CrossEncoderReranker(budget_ms=budget_ms, batch_size=2)
+
+        class _Model:
+            def predict(self, pairs, show_progress_bar=False):
+                time.sleep(delay)
+                return [scores[doc] for _, doc in pairs]
+
+        reranker._model = _Model()
+        return reranker
+
+    def test_orders_by_cross_encoder_score(self):
+        reranker = self._reranker({"a": 0.1, "b": 0.9, "c": 0.5})
+        assert reranker.rerank("q", ["a", "b", "c"], top_k=3) == [1, 2, 0]
+
+    def test_latency_budget_keeps_unscored_tail_in_original_order(self):
+        reranker = self._reranker({"a": 0.1, "b": 0.9, "c": 0.8, "d": 0.7}, budget_ms=1.0, delay=0.01)
+        assert reranker.rerank("q", ["a", "b", "c", "d"], top_k=4) == [1, 0, 2, 3]
+        assert reranker.budget_exhausted == 1
+
+    def test_missing_model_degrades_to_original_order(self):
+        reranker = CrossEncoderReranker()
+        reranker._load_error = "ImportError"
+        assert reranker.available is False
+        assert reranker.rerank("q", DOCS, top_k=2) == [0, 1]
@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pytest
+
+from models.universal_block import UniversalBlock
+from storage.chroma_manager import ChromaManager
+from storage.collection_stats import CollectionStatsStore
+
+
+class DummyModel:
+    def encode(self, texts, convert_to_numpy=True):
+        return np.zeros((len(texts), 3), dtype=float)
+
+
+def _block(idx, source_id, sd_level="GREEN", source_type="book", chunk_type="practice"):
+    return UniversalBlock(
+        text=f"Блок {source_id} {idx}",
+        sd_level=sd_level,
+        source_id=source_id,
+        source_type=source_type,
+        governance={"chunk_type": chunk_type, "allowed_use": ["writer", "retrieval"]},
+    )
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(ChromaManager, "_init_embedding_model", lambda self: DummyModel())
+    return ChromaManager(str(tmp_path / "chroma"), "stats_col")
+
+
+def test_counters_follow_add_and_delete_without_rescans(manager, monkeypatch):
+    manager.add_blocks([_block(i, "src1") for i in range(3)])
+    manager.add_blocks([_block(i, "src2", sd_level="BLUE", source_type="youtube", chunk_type="theory") for i in range(2)])
+    manager.get_stats()  # первый read сверяет счетчики с коллекцией
+
+    runs = manager.collection_stats.reconcile_runs
+    manager.delete_source("src1")
+    stats = manager.get_stats()
+
+    assert manager.collection_stats.reconcile_runs == runs
+    assert stats["total"] == 2
+    assert stats["by_sd_level"] == {"BLUE": 2}
+    assert stats["by_source_type"] == {"youtube": 2}
+    assert stats["by_chunk_type"] == {"theory": 2}
+    assert stats["by_allowed_use"] == {"writer": 2, "retrieval": 2}
+
+
+def test_counters_persist_next_to_collection(manager, tmp_path):
+    manager.add_blocks([_block(i, "src1") for i in range(2)])
+    manager.get_stats()
+
+    reloaded = CollectionStatsStore(manager.collection_stats.path)
+
+    assert manager.collection_stats.path.parent == tmp_path / "chroma"
+    assert reloaded.stale is False
+    assert reloaded.snapshot()["by_source_type"] == {"book": 2}
+
+
+def test_unfinished_mutation_triggers_paged_reconcile(manager):
+    manager.add_blocks([_block(i, "src1") for i in range(5)])
+    manager.get_stats()
+    path = manager.collection_stats.path
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    payload["pending_writes"] = 1
+    payload["counters"]["by_sd_level"] = {"RED": 99}
+    path.write_text(json.dumps(payload), encoding="utf-8")
+
+    store = CollectionStatsStore(path)
+    assert store.stale is True
+    result = store.reconcile(manager._ensure_collection(), page_size=2)
+
+    assert result["pages"] == 3
+    assert result["drift_corrected"] is True
+    assert store.snapshot()["by_sd_level"] == {"GREEN": 5}
+    assert json.loads(path.read_text(encoding="utf-8"))["pending_writes"] == 0
+
+
+def test_failed_write_marks_stats_stale(manager, monkeypatch):
+    manager.get_stats()
+    collection = manager._ensure_collection()
+
+    def boom(**_kwargs):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(type(collection), "add", lambda self, **kwargs: boom(**kwargs))
+    with pytest.raises(RuntimeError):
+        manager.add_blocks([_block(0, "src1")])
+
+    assert manager.collection_stats.stale is True
+    assert json.loads(manager.collection_stats.path.read_text(encoding="utf-8"))["pending_writes"] == 1
+
+
+def test_reconcile_stops_when_backend_ignores_offset(tmp_path, caplog):
+    class OffsetIgnoringCollection:
+        def count(self):
+            return 5
+
+        def get(self, limit=None, offset=None, include=None):  # noqa: ARG002
+            return {"ids": ["a", "b"], "metadatas": [{"sd_level": "GREEN"}, {"sd_level": "GREEN"}]}
+
+    store = CollectionStatsStore(tmp_path / "stats.json")
+    with caplog.at_level("WARNING", logger="storage.collection_stats"):
+        result = store.reconcile(OffsetIgnoringCollection(), page_size=2)
+
+    assert result["pages"] == 1
+    assert "repeats previous ids" in caplog.text
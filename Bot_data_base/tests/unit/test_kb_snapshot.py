@@ -0,0 +1,71 @@
+import json
+import os
+
+from models.universal_block import UniversalBlock
+from storage.json_export import JSONExporter
+from storage.kb_snapshot import (
+    build_kb_snapshot,
+    iter_kb_blocks,
+    iter_snapshot_blocks,
+    load_manifest,
+    resolve_kb_path,
+    snapshot_manifest_path,
+)
+
+
+def _export(exporter, source_id, source_type, texts):
+    blocks = [UniversalBlock(text=text, source_type=source_type, source_id=source_id) for text in texts]
+    return exporter.export(blocks, source_id, source_type)
+
+
+def test_snapshot_rebuilds_only_changed_sources(tmp_path):
+    exporter = JSONExporter(base_dir=str(tmp_path))
+    _export(exporter, "book_a", "book", ["а1", "а2"])
+    _export(exporter, "video_b", "youtube", ["б1"])
+
+    first = build_kb_snapshot(tmp_path)
+    assert (first["rebuilt"], first["reused"], first["blocks_count"]) == (2, 0, 3)
+
+    manifest_mtime = snapshot_manifest_path(tmp_path).stat().st_mtime_ns
+    unchanged = build_kb_snapshot(tmp_path)
+    assert (unchanged["rebuilt"], unchanged["reused"]) == (0, 2)
+    assert snapshot_manifest_path(tmp_path).stat().st_mtime_ns == manifest_mtime
+
+    path = _export(exporter, "book_a", "book", ["а1", "а2", "а3"])
+    os.utime(path, ns=(1, 1))
+    os.remove(tmp_path / "youtube" / "video_b_blocks.json")
+    changed = build_kb_snapshot(tmp_path)
+
+    assert (changed["rebuilt"], changed["reused"], changed["removed"]) == (1, 0, 1)
+    manifest = load_manifest(snapshot_manifest_path(tmp_path))
+    assert [entry["source_id"] for entry in manifest["shards"]] == ["book_a"]
+    assert not (tmp_path / "snapshot" / "shards" / "youtube" / "video_b.jsonl").exists()
+
+
+def test_streaming_reader_and_legacy_merged_file_agree(tmp_path):
+    exporter = JSONExporter(base_dir=str(tmp_path))
+    _export(exporter, "book_a", "book", ["а1", "а2"])
+    _export(exporter, "video_b", "youtube", ["б1"])
+
+    merged_path = exporter.export_all_merged()
+    with open(merged_path, "r", encoding="utf-8") as f:
+        merged = json.load(f)
+    manifest_path = snapshot_manifest_path(tmp_path)
+
+    assert merged["blocks_count"] == 3
+    assert list(iter_snapshot_blocks(manifest_path)) == merged["blocks"]
+    assert [block["text"] for block in iter_snapshot_blocks(manifest_path, source_ids=["video_b"])] == ["б1"]
+    assert resolve_kb_path(tmp_path) == manifest_path
+
+
+def test_resolve_prefers_externally_edited_merged_file(tmp_path):
+    exporter = JSONExporter(base_dir=str(tmp_path))
+    _export(exporter, "book_a", "book", ["а1"])
+    merged_path = exporter.export_all_merged()
+
+    with open(merged_path, "w", encoding="utf-8") as f:
+        json.dump({"blocks": [{"text": "правка инструмента"}]}, f)
+    os.utime(merged_path, ns=(10**19, 10**19))
+
+    assert str(resolve_kb_path(tmp_path)) == merged_path
+    assert [block["text"] for block in iter_kb_blocks(merged_path)] == ["правка инструмента"]
@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+from storage.registry import (
+    SourceRecord,
+    SourceRegistry,
+    SqliteSourceRegistry,
+    create_source_registry,
+)
+
+
+def _record(source_id: str, status: str = "pending", source_type: str = "book", blocks: int = 0) -> SourceRecord:
+    return SourceRecord(
+        source_id=source_id,
+        source_type=source_type,
+        title=f"Title {source_id}",
+        author="Author",
+        author_id="avtor",
+        language="ru",
+        status=status,
+        added_at="2026-01-01",
+        processed_at=None,
+        blocks_count=blocks,
+        sd_distribution={"GREEN": blocks},
+        file_paths={"raw": f"{source_id}.txt"},
+        error_message=None,
+        pipeline_version="v1.0",
+    )
+
+
+def test_json_registry_reuses_parsed_file_until_it_changes(tmp_path, monkeypatch):
+    reg = SourceRegistry(str(tmp_path / "registry.json"))
+    reg.add_source(_record("a", status="done"))
+    reads = []
+    original = reg._read_file
+    monkeypatch.setattr(reg, "_read_file", lambda: reads.append(1) or original())
+
+    for _ in range(10):
+        assert reg.get_source("a").title == "Title a"
+    assert reg.is_processed("a") is True
+    assert len(reads) == 1
+
+    # Внешняя правка файла (offline-инструменты) видна без перезапуска.
+    payload = json.loads((tmp_path / "registry.json").read_text(encoding="utf-8"))
+    payload[0]["status"] = "archived"
+    (tmp_path / "registry.json").write_text(json.dumps(payload), encoding="utf-8")
+    os.utime(tmp_path / "registry.json", ns=(1, 1))
+    assert reg.get_source("a").status == "archived"
+
+
+def test_json_registry_returns_copies(tmp_path):
+    reg = SourceRegistry(str(tmp_path / "registry.json"))
+    reg.add_source(_record("a"))
+    reg.get_source("a").sd_distribution["RED"] = 1
+    assert "RED" not in reg.get_source("a").sd_distribution
+
+
+def test_sqlite_registry_crud_and_statistics(tmp_path):
+    reg = SqliteSourceRegistry(str(tmp_path / "registry.sqlite"))
+    reg.add_source(_record("a", source_type="youtube", blocks=3))
+    reg.add_source(_record("b", blocks=2))
+    reg.update_status("a", "done", blocks_count=5, processed_at="2026-02-02")
+
+    assert reg.is_processed("a") is True
+    assert reg.get_source("a").blocks_count == 5
+    assert [r.source_id for r in reg.list_by_status("pending")] == ["b"]
+    assert reg.get_statistics() == {
+        "total_sources": 2,
+        "total_blocks": 7,
+        "sd_distribution": {"GREEN": 5},
+        "sources_by_type": {"youtube": 1, "book": 1},
+    }
+    assert reg.delete_source("b") is True
+    assert reg.delete_source("b") is False
+    assert [r.source_id for r in reg.list_all()] == ["a"]
+
+    indexes = {row[1] for row in reg._conn.execute("PRAGMA index_list('sources')")}
+    assert {"idx_sources_status", "idx_sources_source_type"} <= indexes
+    reg.close()
+
+
+def test_sqlite_registry_sees_writes_from_other_connections(tmp_path):
+    path = str(tmp_path / "registry.sqlite")
+    first = SqliteSourceRegistry(path)
+    second = SqliteSourceRegistry(path)
+    first.add_source(_record("a"))
+    assert second.get_source("a") is not None
+
+    second.update_status("a", "done")
+    assert first.is_processed("a") is True
+    first.close()
+    second.close()
+
+
+def test_sqlite_registry_rolls_back_failed_mutation(tmp_path):
+    reg = SqliteSourceRegistry(str(tmp_path / "registry.sqlite"))
+    reg.add_source(_record("a"))
+    with pytest.raises(RuntimeError):
+        with reg._transaction() as conn:
+            conn.execute("DELETE FROM sources")
+            raise RuntimeError("boom")
+    assert reg.get_source("a") is not None
+    reg.close()
+
+
+def test_json_migration_runs_once_and_keeps_first_duplicate(tmp_path):
+    json_path = tmp_path / "registry.json"
+    json_path.write_text(
+        json.dumps([_record("a", status="done").to_dict(), _record("b").to_dict(), _record("a").to_dict()]),
+        encoding="utf-8",
+    )
+    reg = create_source_registry(str(json_path), backend="sqlite")
+    assert isinstance(reg, SqliteSourceRegistry)
+    assert reg.registry_path.endswith("registry.sqlite")
+    assert reg.is_processed("a") is True
+    assert [r.source_id for r in reg.list_all()] == ["a", "b"]
+    assert reg.migrate_from_json(str(json_path))["reason"] == "already_migrated"
+
+    exported = reg.export_json(str(tmp_path / "export.json"))
+    assert [item["source_id"] for item in json.loads(open(exported, encoding="utf-8").read())] == ["a", "b"]
+    reg.close()
+
+    assert isinstance(create_source_registry(str(json_path), backend="json"), SourceRegistry)
@@ -0,0 +1,108 @@
+import random
+import re
+
+import pytest
+
+from chunkers.book_chunker import BookChunker
+from chunkers.semantic_chunker import SemanticChunker
+from utils import tokenizer as tokenizer_module
+from utils.tokenizer import TokenizerService, pack_greedy, split_to_token_budget
+
+
+class WordEncoder:
+    """Детерминированный энкодер: токен = слово или знак препинания."""
+
+    def __init__(self):
+        self.encode_calls = 0
+        self.batch_calls = 0
+
+    def encode(self, text):
+        self.encode_calls += 1
+        return re.findall(r"\w+|[^\w\s]", text)
+
+    def encode_batch(self, texts):
+        self.batch_calls += 1
+        return [re.findall(r"\w+|[^\w\s]", text) for text in texts]
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def word_tokenizer():
+    service = TokenizerService(encoder=WordEncoder())
+    tokenizer_module.set_tokenizer(service)
+    yield service
+    tokenizer_module.set_tokenizer(None)
+
+
+def _naive_split(text, max_tokens, count):
+    if count(text) <= max_tokens:
+        return [text]
+    parts, current, current_tokens = [], [], 0
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        if not sentence:
+            continue
+        s_tokens = count(sentence)
+        if current and current_tokens + s_tokens > max_tokens:
+            parts.append(" ".join(current))
+            current, current_tokens = [], 0
+        if s_tokens > max_tokens:
+            words = sentence.split()
+            parts.extend(pack_greedy(words, [count(w) for w in words], max_tokens))
+        else:
+            current.append(sentence)
+            current_tokens += s_tokens
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+
+def test_count_batch_memoizes_and_batches_misses():
+    encoder = WordEncoder()
+    service = TokenizerService(encoder=encoder)
+    texts = [f"слово{i % 20} и ещё." for i in range(40)]
+
+    first = service.count_batch(texts)
+    second = service.count_batch(texts)
+
+    assert first == second == [len(encoder.encode(t)) for t in texts]
+    assert encoder.batch_calls == 1
+    assert service.stats()["hits"] >= 40
+
+
+def test_memo_respects_char_budget():
+    service = TokenizerService(encoder=WordEncoder(), memo_max_chars=10)
+    service.count_batch(["абвгд", "еёжзи", "клмно"])
+
+    assert service.stats()["memo_chars"] <= 10
+
+
+def test_split_matches_per_piece_tokenization():
+    rng = random.Random(7)
+    vocab = ["тревога", "внимание", "тело", "дыхание", "мысль", "осознанность", "здесь", "сейчас"]
+    sentences = [
+        " ".join(rng.choice(vocab) for _ in range(rng.randint(3, 60))) + rng.choice([".", "!", "?"])
+        for _ in range(60)
+    ]
+    text = " ".join(sentences)
+    service = TokenizerService(encoder=WordEncoder())
+
+    def naive_count(value):
+        return len(WordEncoder().encode(value))
+
+    assert split_to_token_budget(text, 40, service) == _naive_split(text, 40, naive_count)
+
+
+def test_chunkers_use_shared_tokenizer(word_tokenizer):
+    paragraphs = [" ".join(["слово"] * 30) + "." for _ in range(12)]
+    text = "\n\n".join(paragraphs)
+
+    youtube = SemanticChunker({"min_tokens": 20, "max_tokens": 80}).chunk(text, "a", "t", "s")
+    book = BookChunker({"target_tokens": 60, "min_tokens": 20, "max_tokens": 80, "overlap_tokens": 5})._chunk_text_budget(
+        text, 60, 20, 80, 5
+    )
+
+    assert youtube and book
+    assert all(word_tokenizer.count(block.text) <= 80 for block in youtube)
+    assert word_tokenizer.stats()["hits"] > 0
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from chunkers.book_chunker import BookChunker  # noqa: E402
+from chunkers.semantic_chunker import SemanticChunker  # noqa: E402
+from utils.tokenizer import TokenizerService, set_tokenizer  # noqa: E402
+
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+
+_VOCAB = (
+    "внимание тревога тело дыхание мысль чувство осознанность присутствие момент опыт страх радость "
+    "отношения границы практика наблюдение принятие сопротивление энергия покой ум эго сознание "
+    "состояние реакция привычка выбор свобода ответственность доверие напряжение расслабление"
+).split()
+_CONNECTORS = "и но когда если потому что чтобы как будто даже только уже снова".split()
+
+CHARS_PER_PAGE = 1800
+
+
+def synthetic_russian_book(pages: int, seed: int = 42) -> str:
+    """Детерминированная «книга»: главы, разделы, абзацы, шаги практик."""
+    rng = random.Random(seed)
+
+    def sentence() -> str:
+        words = [rng.choice(_VOCAB if rng.random() > 0.25 else _CONNECTORS) for _ in range(rng.randint(6, 24))]
+        words[0] = words[0].capitalize()
+        return " ".join(words) + rng.choice([".", ".", ".", "!", "?"])
+
+    chunks: list[str] = []
+    size = 0
+    chapter = 0
+    target = pages * CHARS_PER_PAGE
+    while size < target:
+        chapter += 1
+        chunks.append(f"# Глава {chapter}. {rng.choice(_VOCAB).capitalize()} и {rng.choice(_VOCAB)}")
+        for section in range(1, rng.randint(3, 6)):
+            chunks.append(f"## {chapter}.{section} {rng.choice(_VOCAB).capitalize()}")
+            for _ in range(rng.randint(3, 8)):
+                if rng.random() < 0.1:
+                    paragraph = "\n\n".join(f"Шаг {step}. {sentence()}" for step in range(1, 5))
+                else:
+                    paragraph = " ".join(sentence() for _ in range(rng.randint(2, 9)))
+                chunks.append(paragraph)
+                size += len(paragraph)
+    return "\n\n".join(chunks)
+
+
+def _timed(fn) -> tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def run_benchmark(pages: int, repeats: int, memo_max_chars: int | None) -> dict[str, Any]:
+    text = synthetic_russian_book(pages)
+    service = TokenizerService() if memo_max_chars is None else TokenizerService(memo_max_chars=memo_max_chars)
+    set_tokenizer(service)
+    try:
+        service.count("прогрев энкодера")
+        book_chunker = BookChunker({"target_tokens": 450, "min_tokens": 150, "max_tokens": 650, "overlap_tokens": 60})
+        semantic_chunker = SemanticChunker({"min_tokens": 200, "max_tokens": 800})
+
+        book_runs: list[dict[str, Any]] = []
+        semantic_runs: list[dict[str, Any]] = []
+        for _ in range(max(1, repeats)):
+            service.clear()
+            blocks, seconds = _timed(
+                lambda: book_chunker.chunk_file_from_text(text, author="Автор", book_title="Синтетическая книга")
+            )
+            book_runs.append({"blocks": len(blocks), "seconds": seconds, "tokenizer": service.stats()})
+            service.clear()
+            blocks, seconds = _timed(lambda: semantic_chunker.chunk(text, author="Автор", source_title="t", source_id="s"))
+            semantic_runs.append({"blocks": len(blocks), "seconds": seconds, "tokenizer": service.stats()})
+    finally:
+        set_tokenizer(None)
+
+    def summary(runs: list[dict[str, Any]]) -> dict[str, Any]:
+        best = min(runs, key=lambda run: run["seconds"])
+        return {
+            "blocks": best["blocks"],
+            "best_seconds": round(best["seconds"], 3),
+            "docs_per_sec": round(best["blocks"] / best["seconds"], 2) if best["seconds"] else None,
+            "chars_per_sec": round(len(text) / best["seconds"], 1) if best["seconds"] else None,
+            "tokenizer": best["tokenizer"],
+        }
+
+    return {
+        "pages": pages,
+        "chars": len(text),
+        "repeats": max(1, repeats),
+        "memo_max_chars": service.memo_max_chars,
+        "book_chunker": summary(book_runs),
+        "semantic_chunker": summary(semantic_runs),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark chunkers on a synthetic Russian book (docs/sec).")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--no-memo",
+        action="store_true",
+        help="disable token-count memo (baseline: every check re-encodes)",
+    )
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    report = run_benchmark(max(1, int(args.pages)), int(args.repeats), 0 if args.no_memo else None)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
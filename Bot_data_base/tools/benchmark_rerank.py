@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.run_retrieval_eval import _http_json, load_dataset  # noqa: E402
+from utils.reranker import RerankerService, create_rerank_backend  # noqa: E402
+
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return round(ordered[index], 2)
+
+
+def fetch_candidates(
+    api_base_url: str,
+    query: str,
+    pool_size: int,
+    timeout_seconds: float,
+) -> list[dict[str, Any]]:
+    """Кандидаты без rerank из живого /api/query/ (тот же пул, что видит реранкер)."""
+    response = _http_json(
+        "POST",
+        f"{api_base_url.rstrip('/')}/api/query/",
+        payload={"query": query, "top_k": pool_size, "use_rerank": False, "search_mode": "hybrid"},
+        timeout=timeout_seconds,
+    )
+    if not response["ok"] or not isinstance(response["body"], dict):
+        return []
+    return [chunk for chunk in response["body"].get("chunks") or [] if chunk.get("content")]
+
+
+def benchmark_backend(
+    backend_name: str,
+    cases: list[dict[str, Any]],
+    top_k: int,
+) -> dict[str, Any]:
+    service = RerankerService(create_rerank_backend(backend_name))
+    cold_ms: list[float] = []
+    warm_ms: list[float] = []
+    rankings: dict[str, list[str]] = {}
+    for case in cases:
+        candidates = case["candidates"]
+        documents = [chunk["content"] for chunk in candidates]
+        ids = [str(chunk.get("chunk_id") or idx) for idx, chunk in enumerate(candidates)]
+        for bucket in (cold_ms, warm_ms):
+            started = time.perf_counter()
+            try:
+                indices = service.rerank(case["query"], documents, top_k=top_k, ids=ids)
+            except Exception as exc:
+                return {"backend": backend_name, "error": f"{type(exc).__name__}: {exc}"}
+            bucket.append((time.perf_counter() - started) * 1000.0)
+        rankings[case["id"]] = [ids[idx] for idx in indices]
+
+    return {
+        "backend": backend_name,
+        "available": service.available,
+        "cases": len(cold_ms),
+        "cold_ms": {
+            "mean": round(statistics.fmean(cold_ms), 2) if cold_ms else 0.0,
+            "p50": _percentile(cold_ms, 50),
+            "p95": _percentile(cold_ms, 95),
+            "max": round(max(cold_ms), 2) if cold_ms else 0.0,
+        },
+        "warm_ms": {
+            "mean": round(statistics.fmean(warm_ms), 2) if warm_ms else 0.0,
+            "p95": _percentile(warm_ms, 95),
+        },
+        "service": service.stats(),
+        "rankings": rankings,
+    }
+
+
+def overlap_at_k(left: dict[str, list[str]], right: dict[str, list[str]], top_k: int) -> float:
+    shared = [case_id for case_id in left if case_id in right]
+    if not shared:
+        return 0.0
+    ratios = [len(set(left[c][:top_k]) & set(right[c][:top_k])) / float(top_k) for c in shared]
+    return round(statistics.fmean(ratios), 4)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark rerank backends on retrieval eval queries.")
+    parser.add_argument("--dataset", default="Bot_data_base/eval/retrieval_eval_v1.json")
+    parser.add_argument("--api-base-url", default="http://127.0.0.1:8013")
+    parser.add_argument("--backends", default="voyage,cross_encoder")
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--timeout-seconds", type=float, default=15.0)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    payload = load_dataset(Path(args.dataset))
+    cases: list[dict[str, Any]] = []
+    for case in payload.get("cases") or []:
+        candidates = fetch_candidates(
+            args.api_base_url,
+            str(case.get("query") or ""),
+            max(1, int(args.pool_size)),
+            float(args.timeout_seconds),
+        )
+        if candidates:
+            cases.append({"id": str(case.get("id")), "query": str(case.get("query") or ""), "candidates": candidates})
+    if not cases:
+        print(json.dumps({"error": "no candidates fetched", "api_base_url": args.api_base_url}, ensure_ascii=False))
+        return 2
+
+    top_k = max(1, int(args.top_k))
+    results = [
+        benchmark_backend(name.strip(), cases, top_k)
+        for name in str(args.backends).split(",")
+        if name.strip()
+    ]
+    report: dict[str, Any] = {
+        "dataset_cases": len(payload.get("cases") or []),
+        "benchmarked_cases": len(cases),
+        "pool_size": int(args.pool_size),
+        "top_k": top_k,
+        "backends": [{k: v for k, v in item.items() if k != "rankings"} for item in results],
+    }
+    ranked = [item for item in results if item.get("rankings")]
+    if len(ranked) >= 2:
+        report["overlap_at_k"] = {
+            f"{ranked[0]['backend']}~{other['backend']}": overlap_at_k(ranked[0]["rankings"], other["rankings"], top_k)
+            for other in ranked[1:]
+        }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from storage.collection_stats import CollectionStatsStore, stats_path_for  # noqa: E402
+
+
+def _resolve_botdb_path(botdb_dir: Path, value: str) -> Path:
+    raw = Path(value)
+    if raw.is_absolute():
+        return raw
+    return (botdb_dir / raw).resolve()
+
+
+def _load_config(config_path: Path) -> dict[str, Any]:
+    if not config_path.exists():
+        return {}
+    return yaml.safe_load(config_path.read_text(encoding="utf-8")) or {}
+
+
+def reconcile(botdb_dir: Path, config_path: Path, page_size: int) -> dict[str, Any]:
+    """Пересчитать персистентные агрегаты коллекции постраничным проходом (без эмбеддингов)."""
+    import chromadb  # type: ignore
+    from chromadb.config import Settings  # type: ignore
+
+    cfg = _load_config(config_path)
+    storage_cfg = cfg.get("storage") if isinstance(cfg.get("storage"), dict) else {}
+    db_path = _resolve_botdb_path(botdb_dir, str(storage_cfg.get("chroma_db_path") or "data/chroma_db"))
+    collection_name = str(storage_cfg.get("collection_name") or "").strip() or "bot_knowledge_base"
+
+    client = chromadb.PersistentClient(path=str(db_path), settings=Settings(anonymized_telemetry=False, allow_reset=True))
+    collection = client.get_or_create_collection(name=collection_name)
+    store = CollectionStatsStore(stats_path_for(str(db_path), collection_name))
+    before = store.snapshot()
+    result = store.reconcile(collection, page_size=page_size)
+    return {
+        "collection_name": collection_name,
+        "persist_directory": str(db_path),
+        "stats_path": str(store.path),
+        "collection_count": int(collection.count()),
+        "before_total": before["total"],
+        **result,
+        "stats": store.snapshot(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Re-derive persisted Chroma collection stats in paged batches.")
+    parser.add_argument("--botdb-dir", default="Bot_data_base")
+    parser.add_argument("--config-path", default="Bot_data_base/config.yaml")
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    payload = reconcile(Path(args.botdb_dir), Path(args.config_path), max(1, int(args.page_size)))
+    print(json.dumps(payload, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
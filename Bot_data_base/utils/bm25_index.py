@@ -0,0 +1,271 @@
+"""
+BM25-индекс по all_blocks_merged.json для деградированного пути /api/query/.
+
+Снапшот разбирается один раз: токены (нижний регистр, ё->е, стоп-слова,
+легкий русский стемминг окончаний) складываются в инвертированный индекс,
+где для каждого терма хранятся массивы doc_id и предрассчитанных BM25-весов.
+Запрос сводится к нескольким векторным сложениям и argpartition.
+
+Индекс пересобирается, только если изменился отпечаток файла
+(путь, mtime_ns, size).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from storage.kb_snapshot import iter_kb_blocks
+
+logger = logging.getLogger(__name__)
+
+try:  # pragma: no cover - optional dependency
+    import snowballstemmer  # type: ignore
+
+    _SNOWBALL = snowballstemmer.stemmer("russian")
+except Exception:  # pragma: no cover - optional dependency
+    _SNOWBALL = None
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-я]+")
+
+_STOPWORDS = frozenset(
+    """
+    и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по
+    только ее мне было вот от меня еще нет о из ему теперь когда даже ну вдруг ли если
+    уже или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей
+    может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего раз
+    тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом
+    один почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец
+    два об другой хоть после над больше тот через эти нас про всего них какая много
+    разве три эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой
+    им более всегда конечно всю между это
+    the a an and or of to in on for is are be with that this it as at by from
+    """.split()
+)
+
+# Окончания по убыванию длины: отрезаем самое длинное, оставляя основу >= 3 символов.
+_RU_ENDINGS = tuple(
+    sorted(
+        """
+        остью ости ость ешься иями ться ями ами ией иям ием иях ого его ому ему ыми ими
+        ешь ишь ете ите ется тся ют ут ят ат ая яя ое ее ые ие ый ий ой ую юю ом ем ам ям
+        ах ях ов ев ей ию ью ия ья ье ии ла ло ли ть ти а я о е ы и у ю ь й
+        """.split(),
+        key=len,
+        reverse=True,
+    )
+)
+
+
+def _light_stem(token: str) -> str:
+    if _SNOWBALL is not None:
+        return _SNOWBALL.stemWord(token)
+    if len(token) <= 3 or not ("а" <= token[0] <= "я"):
+        return token
+    for ending in _RU_ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= 3:
+            return token[: -len(ending)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Русско-ориентированная токенизация для лексического поиска."""
+    lowered = str(text or "").lower().replace("ё", "е")
+    return [
+        _light_stem(token)
+        for token in _TOKEN_RE.findall(lowered)
+        if token not in _STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+class BM25Index:
+    """Инвертированный индекс с предрассчитанными BM25-весами постингов."""
+
+    def __init__(
+        self,
+        documents: List[dict],
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        idf: Dict[str, float],
+        fingerprint: Optional[tuple] = None,
+    ) -> None:
+        self.documents = documents
+        self.postings = postings
+        self.idf = idf
+        self.fingerprint = fingerprint
+        self.built_at = time.time()
+
+    @property
+    def size(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def build(
+        cls,
+        documents: Sequence[dict],
+        *,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+        fingerprint: Optional[tuple] = None,
+    ) -> "BM25Index":
+        docs = list(documents)
+        term_docs: Dict[str, List[int]] = defaultdict(list)
+        term_tfs: Dict[str, List[int]] = defaultdict(list)
+        lengths = np.zeros(len(docs), dtype=np.float32)
+        for doc_id, document in enumerate(docs):
+            counts = Counter(tokenize(document.get("content") or ""))
+            lengths[doc_id] = float(sum(counts.values()))
+            for term, tf in counts.items():
+                term_docs[term].append(doc_id)
+                term_tfs[term].append(tf)
+
+        avgdl = float(lengths.mean()) if len(docs) and float(lengths.mean()) > 0 else 1.0
+        norm = k1 * (1.0 - b + b * lengths / avgdl)
+        n_docs = len(docs)
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        idf: Dict[str, float] = {}
+        for term, doc_ids in term_docs.items():
+            ids = np.asarray(doc_ids, dtype=np.int32)
+            tf = np.asarray(term_tfs[term], dtype=np.float32)
+            postings[term] = (ids, (tf * (k1 + 1.0) / (tf + norm[ids])).astype(np.float32))
+            df = len(doc_ids)
+            idf[term] = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        return cls(docs, postings, idf, fingerprint=fingerprint)
+
+    def search(self, query: str, limit: int) -> List[Tuple[float, dict]]:
+        limit = max(1, int(limit))
+        if not self.documents:
+            return []
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, weights = posting
+            scores[ids] += self.idf[term] * weights
+            matched = True
+        if not matched:
+            # Как и раньше: без совпадений отдаем детерминированный топ, а не 503.
+            return [(0.0, doc) for doc in self.documents[:limit]]
+
+        count = min(limit, len(self.documents))
+        top = np.argpartition(-scores, count - 1)[:count] if count < len(scores) else np.arange(len(scores))
+        # Стабильная сортировка: score desc, затем порядок в снапшоте.
+        order = top[np.lexsort((top, -scores[top]))]
+        return [(float(scores[idx]), self.documents[idx]) for idx in order if scores[idx] > 0]
+
+
+def blocks_file_fingerprint(path: Path) -> Optional[tuple]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+def _documents_from_snapshot(path: Path) -> List[dict]:
+    documents: List[dict] = []
+    # manifest.json шардированного снапшота читается потоково, merged-файл — целиком.
+    for idx, block in enumerate(iter_kb_blocks(path)):
+        if not isinstance(block, dict):
+            continue
+        text = str(block.get("text") or "")
+        if not text.strip():
+            continue
+        metadata = block.get("metadata") if isinstance(block.get("metadata"), dict) else {}
+        documents.append(
+            {
+                "chunk_id": block.get("id") or block.get("chunk_id") or f"blocks_fallback_{idx}",
+                "content": text,
+                "metadata": metadata,
+            }
+        )
+    return documents
+
+
+_INDEXES: Dict[str, BM25Index] = {}
+_FAILED: Dict[str, tuple] = {}
+_LOCK = threading.Lock()
+_STATS: Dict[str, Any] = {"builds": 0, "last_build_ms": 0.0, "last_error": None}
+
+
+def get_blocks_bm25_index(path: Path) -> Optional[BM25Index]:
+    """Индекс снапшота; пересборка только при смене отпечатка файла."""
+    fingerprint = blocks_file_fingerprint(path)
+    if fingerprint is None:
+        return None
+    key = fingerprint[0]
+    index = _INDEXES.get(key)
+    if index is not None and index.fingerprint == fingerprint:
+        return index
+    with _LOCK:
+        index = _INDEXES.get(key)
+        if index is not None and index.fingerprint == fingerprint:
+            return index
+        if _FAILED.get(key) == fingerprint:
+            return None
+        started = time.perf_counter()
+        try:
+            index = BM25Index.build(_documents_from_snapshot(path), fingerprint=fingerprint)
+        except Exception as exc:
+            _FAILED[key] = fingerprint
+            _STATS["last_error"] = str(exc)[:300]
+            logger.warning("[QUERY] BM25 fallback index build failed for %s: %s", path, exc)
+            return None
+        _INDEXES[key] = index
+        _FAILED.pop(key, None)
+        _STATS["builds"] += 1
+        _STATS["last_build_ms"] = round((time.perf_counter() - started) * 1000.0, 2)
+        _STATS["last_error"] = None
+        logger.info(
+            "[QUERY] BM25 fallback index built docs=%s terms=%s time_ms=%s",
+            index.size,
+            len(index.postings),
+            _STATS["last_build_ms"],
+        )
+        return index
+
+
+def bm25_index_stats() -> Dict[str, Any]:
+    return {
+        **_STATS,
+        "indexes": [
+            {"path": key, "docs": index.size, "terms": len(index.postings)} for key, index in _INDEXES.items()
+        ],
+    }
+
+
+def reset_bm25_indexes() -> None:
+    with _LOCK:
+        _INDEXES.clear()
+        _FAILED.clear()
+
+
+def preload_in_background(resolve_path: Callable[[], Optional[Path]]) -> Optional[threading.Thread]:
+    """Прогреть индекс на старте (BOT_DB_PRELOAD_FALLBACK_INDEX=0 отключает)."""
+    if os.getenv("BOT_DB_PRELOAD_FALLBACK_INDEX", "1").strip() == "0":
+        return None
+
+    def _preload() -> None:
+        try:
+            path = resolve_path()
+            if path is not None:
+                get_blocks_bm25_index(path)
+        except Exception as exc:
+            logger.warning("[QUERY] BM25 fallback index preload failed: %s", exc)
+
+    thread = threading.Thread(target=_preload, name="botdb-bm25-preload", daemon=True)
+    thread.start()
+    return thread
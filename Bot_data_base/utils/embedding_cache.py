@@ -0,0 +1,267 @@
+"""
+LRU-кэш эмбеддингов запросов для ChromaManager._embed_texts.
+
+Ключ: (model name, prefix mode, нормализованный текст). Ретраи бота
+(_api_retrieve_with_retry) и повторные /api/query/ с тем же текстом не
+пересчитывают вектор. Вытесненные из памяти векторы опционально
+сбрасываются в SQLite-файл (spill) и поднимаются оттуда при промахе.
+
+Копия модуля живет в bot_psychologist/bot_agent/embedding_cache.py
+(сервисы разворачиваются независимо): класс и публичные функции у обеих
+копий одинаковые, различается только чтение настроек.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_SPILL_TRIM_EVERY = 256
+
+
+def normalize_query_text(text: str) -> str:
+    """NFKC + схлопывание пробелов; регистр сохраняется (модели его различают)."""
+    normalized = unicodedata.normalize("NFKC", str(text or ""))
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of float32 query vectors with optional disk spill."""
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        *,
+        spill_path: Optional[str | Path] = None,
+        spill_max_entries: int = 50000,
+    ) -> None:
+        self.max_entries = max(0, int(max_entries))
+        self.spill_max_entries = max(0, int(spill_max_entries))
+        self._items: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._spill_path = Path(spill_path) if spill_path else None
+        self._spill: Optional[sqlite3.Connection] = None
+        self._spill_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spilled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # --- spill -----------------------------------------------------------
+
+    @staticmethod
+    def _spill_key(key: CacheKey) -> str:
+        return hashlib.sha1("\x1f".join(key).encode("utf-8")).hexdigest()
+
+    def _spill_conn(self) -> Optional[sqlite3.Connection]:
+        if self._spill_path is None:
+            return None
+        if self._spill is None:
+            try:
+                self._spill_path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self._spill_path), check_same_thread=False)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "key TEXT PRIMARY KEY, vector BLOB NOT NULL, touched REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_touched ON query_embeddings(touched)")
+                conn.commit()
+                self._spill = conn
+            except Exception as exc:
+                logger.warning("[EMBED_CACHE] spill disabled: %s", exc)
+                self._spill_path = None
+                return None
+        return self._spill
+
+    def _spill_put(self, key: CacheKey, vector: np.ndarray) -> None:
+        conn = self._spill_conn()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings(key, vector, touched) VALUES (?, ?, ?)",
+                (self._spill_key(key), vector.tobytes(), time.time()),
+            )
+            self._spill_writes += 1
+            self.spilled += 1
+            if self._spill_writes % _SPILL_TRIM_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM query_embeddings WHERE key IN ("
+                    "SELECT key FROM query_embeddings ORDER BY touched DESC LIMIT -1 OFFSET ?)",
+                    (self.spill_max_entries,),
+                )
+            conn.commit()
+        except Exception as exc:
+            logger.warning("[EMBED_CACHE] spill write failed: %s", exc)
+
+    def _spill_get(self, key: CacheKey) -> Optional[np.ndarray]:
+        conn = self._spill_conn()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT vector FROM query_embeddings WHERE key = ?",
+                (self._spill_key(key),),
+            ).fetchone()
+        except Exception as exc:
+            logger.warning("[EMBED_CACHE] spill read failed: %s", exc)
+            return None
+        if row is None:
+            return None
+        try:
+            # Частые disk-hit'ы не должны выглядеть холодными для обрезки spill.
+            conn.execute(
+                "UPDATE query_embeddings SET touched = ? WHERE key = ?",
+                (time.time(), self._spill_key(key)),
+            )
+            conn.commit()
+        except Exception as exc:
+            logger.warning("[EMBED_CACHE] spill touch failed: %s", exc)
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    # --- memory LRU ------------------------------------------------------
+
+    def _store(self, key: CacheKey, vector: np.ndarray) -> None:
+        self._items[key] = vector
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            old_key, old_vector = self._items.popitem(last=False)
+            self.evictions += 1
+            self._spill_put(old_key, old_vector)
+
+    def _lookup(self, key: CacheKey) -> Optional[np.ndarray]:
+        vector = self._items.get(key)
+        if vector is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return vector
+        vector = self._spill_get(key)
+        if vector is not None:
+            self.disk_hits += 1
+            self._store(key, vector)
+            return vector
+        self.misses += 1
+        return None
+
+    def get_or_compute_many(
+        self,
+        model_name: str,
+        prefix_mode: str,
+        texts: Sequence[str],
+        compute: Callable[[List[str]], Sequence[Sequence[float]]],
+    ) -> List[List[float]]:
+        """
+        Вернуть векторы для texts; промахи считаются одним вызовом compute
+        над нормализованными текстами (дубликаты внутри батча схлопываются).
+        """
+        normalized = [normalize_query_text(text) for text in texts]
+        if not self.enabled:
+            return [np.asarray(row, dtype=np.float32).tolist() for row in compute(normalized)]
+
+        resolved: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        with self._lock:
+            for text in dict.fromkeys(normalized):
+                vector = self._lookup((model_name, prefix_mode, text))
+                if vector is None:
+                    missing.append(text)
+                else:
+                    resolved[text] = vector
+
+        if missing:
+            computed = list(compute(list(missing)))
+            if len(computed) != len(missing):
+                raise RuntimeError(f"embedding size mismatch: {len(computed)} != {len(missing)}")
+            with self._lock:
+                for text, row in zip(missing, computed):
+                    vector = np.asarray(row, dtype=np.float32)
+                    vector.setflags(write=False)
+                    resolved[text] = vector
+                    self._store((model_name, prefix_mode, text), vector)
+
+        return [resolved[text].tolist() for text in normalized]
+
+    def get_or_compute(
+        self,
+        model_name: str,
+        prefix_mode: str,
+        text: str,
+        compute: Callable[[str], Sequence[float]],
+    ) -> List[float]:
+        return self.get_or_compute_many(
+            model_name,
+            prefix_mode,
+            [text],
+            lambda batch: [compute(item) for item in batch],
+        )[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._items),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "spill_enabled": self._spill_path is not None,
+                "spilled": self.spilled,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = self.spilled = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._spill is not None:
+                try:
+                    self._spill.close()
+                finally:
+                    self._spill = None
+
+
+_shared_cache: Optional[QueryEmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    # Env читается лениво: api.main загружает .env после импорта роутов.
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = QueryEmbeddingCache(
+                max_entries=int(os.getenv("BOT_DB_QUERY_EMBED_CACHE_MAX_ENTRIES", "2048")),
+                spill_path=os.getenv("BOT_DB_QUERY_EMBED_CACHE_SPILL_PATH", "") or None,
+                spill_max_entries=int(os.getenv("BOT_DB_QUERY_EMBED_CACHE_SPILL_MAX_ENTRIES", "50000")),
+            )
+        return _shared_cache
+
+
+def get_query_embedding_cache_stats() -> dict:
+    return get_query_embedding_cache().stats()
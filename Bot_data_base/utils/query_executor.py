@@ -0,0 +1,323 @@
+"""
+Пулы исполнения для /api/query/: эмбеддинги и чтения Chroma вне event loop.
+
+EmbeddingBatcher — один выделенный поток, который склеивает запросы,
+пришедшие в пределах окна BOT_DB_EMBED_BATCH_WINDOW_MS, в один вызов
+encode (SentenceTransformer эффективнее на батче, а модель не нужно делить
+между потоками). Чтения Chroma идут в отдельный ThreadPoolExecutor, чтобы
+медленный query/get не стоял в одной очереди с эмбеддингами.
+
+Метрики (глубина очередей, размеры батчей) отдаются через
+query_executor_stats() и публикуются на /api/status/.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBED_BATCH_WINDOW_MS = 5.0
+DEFAULT_EMBED_MAX_BATCH = 32
+DEFAULT_CHROMA_READ_WORKERS = 4
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def _embed_fn_key(embed_fn: EmbedFn) -> tuple:
+    # Bound-методы создаются заново при каждом обращении: группируем по (self, func).
+    return (id(getattr(embed_fn, "__self__", None)), id(getattr(embed_fn, "__func__", embed_fn)))
+
+
+class _EmbedRequest:
+    __slots__ = ("embed_fn", "texts", "future", "enqueued_at")
+
+    def __init__(self, embed_fn: EmbedFn, texts: List[str]) -> None:
+        self.embed_fn = embed_fn
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingBatcher:
+    """Микро-батчинг encode-вызовов в одном рабочем потоке."""
+
+    def __init__(
+        self,
+        *,
+        window_ms: float = DEFAULT_EMBED_BATCH_WINDOW_MS,
+        max_batch: int = DEFAULT_EMBED_MAX_BATCH,
+    ) -> None:
+        self.window_s = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self._queue: "queue.Queue[Optional[_EmbedRequest]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stats: Dict[str, Any] = {
+            "requests": 0,
+            "batches": 0,
+            "texts": 0,
+            "errors": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "max_queue_depth": 0,
+            "wait_ms_total": 0.0,
+            "encode_ms_total": 0.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="botdb-embed-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, embed_fn: EmbedFn, texts: Sequence[str]) -> Future:
+        request = _EmbedRequest(embed_fn, [str(text) for text in texts])
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+        self._ensure_worker()
+        self._queue.put(request)
+        with self._lock:
+            self._stats["requests"] += 1
+            depth = self._queue.qsize()
+            if depth > self._stats["max_queue_depth"]:
+                self._stats["max_queue_depth"] = depth
+        return request.future
+
+    async def embed(self, embed_fn: EmbedFn, texts: Sequence[str]) -> List[List[float]]:
+        return await asyncio.wrap_future(self.submit(embed_fn, texts))
+
+    def _collect(self, first: _EmbedRequest) -> List[_EmbedRequest]:
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.window_s
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            size += len(item.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            groups: Dict[tuple, List[_EmbedRequest]] = {}
+            for request in batch:
+                groups.setdefault(_embed_fn_key(request.embed_fn), []).append(request)
+            for requests in groups.values():
+                self._encode_group(requests)
+
+    def _encode_group(self, requests: List[_EmbedRequest]) -> None:
+        texts = [text for request in requests for text in request.texts]
+        started = time.perf_counter()
+        try:
+            vectors = requests[0].embed_fn(texts)
+            if hasattr(vectors, "tolist"):
+                vectors = vectors.tolist()
+            vectors = list(vectors)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"embedding batch size mismatch: {len(vectors)} != {len(texts)}")
+        except Exception as exc:
+            with self._lock:
+                self._stats["errors"] += 1
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(exc)
+            return
+
+        finished = time.perf_counter()
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["texts"] += len(texts)
+            self._stats["last_batch_size"] = len(texts)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(texts))
+            self._stats["encode_ms_total"] += (finished - started) * 1000.0
+            self._stats["wait_ms_total"] += sum((started - r.enqueued_at) * 1000.0 for r in requests)
+
+        offset = 0
+        for request in requests:
+            chunk = vectors[offset : offset + len(request.texts)]
+            offset += len(request.texts)
+            if not request.future.done():
+                request.future.set_result(chunk)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._stats)
+        batches = snapshot["batches"] or 0
+        requests = snapshot["requests"] or 0
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": snapshot["max_queue_depth"],
+            "requests": requests,
+            "batches": batches,
+            "texts": snapshot["texts"],
+            "errors": snapshot["errors"],
+            "avg_batch_size": round(snapshot["texts"] / batches, 2) if batches else 0.0,
+            "last_batch_size": snapshot["last_batch_size"],
+            "max_batch_size": snapshot["max_batch_size"],
+            "avg_wait_ms": round(snapshot["wait_ms_total"] / requests, 2) if requests else 0.0,
+            "avg_encode_ms": round(snapshot["encode_ms_total"] / batches, 2) if batches else 0.0,
+            "window_ms": round(self.window_s * 1000.0, 2),
+            "max_batch": self.max_batch,
+        }
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout=timeout)
+
+
+class ChromaReadPool:
+    """Отдельный пул потоков для блокирующих чтений Chroma."""
+
+    def __init__(self, max_workers: int = DEFAULT_CHROMA_READ_WORKERS) -> None:
+        self.max_workers = max(1, int(max_workers))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._errors = 0
+        self._max_pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="botdb-chroma-read",
+                )
+            return self._executor
+
+    def _wrap(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        executor = self._get_executor()
+        with self._lock:
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+        try:
+            future = executor.submit(self._wrap, fn, args, kwargs)
+        except RuntimeError:
+            # Пул закрыт (shutdown): fallback только при неудачной постановке,
+            # RuntimeError из самого fn сюда не попадает.
+            with self._lock:
+                self._pending -= 1
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future: "Future[Any]") -> None:
+        # Отмененная до старта задача не прошла через _wrap.
+        if future.cancelled():
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self._pending,
+                "max_queue_depth": self._max_pending,
+                "in_flight": self._running,
+                "completed": self._completed,
+                "errors": self._errors,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+_chroma_read_pool: Optional[ChromaReadPool] = None
+_singleton_lock = threading.Lock()
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    # Env читается лениво: api.main загружает .env после импорта роутов.
+    global _embedding_batcher
+    with _singleton_lock:
+        if _embedding_batcher is None:
+            _embedding_batcher = EmbeddingBatcher(
+                window_ms=float(os.getenv("BOT_DB_EMBED_BATCH_WINDOW_MS", str(DEFAULT_EMBED_BATCH_WINDOW_MS))),
+                max_batch=int(os.getenv("BOT_DB_EMBED_MAX_BATCH", str(DEFAULT_EMBED_MAX_BATCH))),
+            )
+        return _embedding_batcher
+
+
+def get_chroma_read_pool() -> ChromaReadPool:
+    global _chroma_read_pool
+    with _singleton_lock:
+        if _chroma_read_pool is None:
+            _chroma_read_pool = ChromaReadPool(
+                max_workers=int(os.getenv("BOT_DB_CHROMA_READ_WORKERS", str(DEFAULT_CHROMA_READ_WORKERS)))
+            )
+        return _chroma_read_pool
+
+
+async def embed_query_texts(embed_fn: EmbedFn, texts: Sequence[str]) -> List[List[float]]:
+    """Эмбеддинг через общий батчер (не блокирует event loop)."""
+    return await get_embedding_batcher().embed(embed_fn, texts)
+
+
+async def run_chroma_read(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Выполнить блокирующее чтение Chroma в пуле чтений."""
+    return await get_chroma_read_pool().run(fn, *args, **kwargs)
+
+
+def query_executor_stats() -> Dict[str, Any]:
+    return {
+        "embedding": get_embedding_batcher().stats(),
+        "chroma_reads": get_chroma_read_pool().stats(),
+    }
+
+
+def shutdown_query_executors(wait: bool = True) -> None:
+    global _embedding_batcher, _chroma_read_pool
+    with _singleton_lock:
+        batcher, pool = _embedding_batcher, _chroma_read_pool
+        _embedding_batcher = None
+        _chroma_read_pool = None
+    if batcher is not None:
+        batcher.shutdown()
+    if pool is not None:
+        pool.shutdown(wait=wait)
@@ -1,6 +1,10 @@
+import hashlib
 import logging
 import os
-from typing import List
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +22,7 @@ class VoyageReranker:
     """
 
     MODEL = "rerank-2"
+    name = "voyage"
 
     def __init__(self, model: str | None = None) -> None:
         self.model = model or self.MODEL
@@ -32,7 +37,17 @@ class VoyageReranker:
             return
         self._client = voyageai.Client(api_key=api_key)
 
-    def rerank(self, query: str, documents: List[str], top_k: int = 5) -> List[int]:
+    @property
+    def available(self) -> bool:
+        return self._client is not None
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[str],
+        top_k: int = 5,
+        raise_errors: bool = False,
+    ) -> List[int]:
         if not documents:
             return []
         top_k = max(1, min(int(top_k), len(documents)))
@@ -47,5 +62,234 @@ class VoyageReranker:
             )
             return [hit.index for hit in result.results]
         except Exception as exc:
+            if raise_errors:
+                raise
             logger.warning("[VoyageReranker] API error: %s", exc)
             return list(range(top_k))
+
+
+class CrossEncoderReranker:
+    """
+    Локальный офлайн-реранкер (sentence-transformers CrossEncoder на CPU).
+
+    Кандидаты скорятся пачками в исходном порядке (он уже отсортирован
+    hybrid/semantic скором); при превышении budget_ms оставшиеся кандидаты
+    не скорятся и идут после оцененных в исходном порядке.
+    """
+
+    MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    name = "cross_encoder"
+
+    def __init__(
+        self,
+        model: str | None = None,
+        *,
+        budget_ms: float = 250.0,
+        batch_size: int = 8,
+        device: str = "cpu",
+    ) -> None:
+        self.model = model or self.MODEL
+        self.budget_ms = max(0.0, float(budget_ms))
+        self.batch_size = max(1, int(batch_size))
+        self.device = device
+        self._model = None
+        self._load_error: Optional[str] = None
+        self._load_lock = threading.Lock()
+        self.budget_exhausted = 0
+
+    def _get_model(self):
+        if self._model is not None or self._load_error is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None and self._load_error is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model, device=self.device)
+                except Exception as exc:
+                    self._load_error = f"{type(exc).__name__}: {exc}"
+                    logger.warning("[CrossEncoderReranker] model unavailable, rerank отключён: %s", exc)
+        return self._model
+
+    @property
+    def available(self) -> bool:
+        # Модель грузится лениво при первом rerank; до этого считаем доступной.
+        return self._load_error is None
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[str],
+        top_k: int = 5,
+        raise_errors: bool = False,
+    ) -> List[int]:
+        if not documents:
+            return []
+        top_k = max(1, min(int(top_k), len(documents)))
+        model = self._get_model()
+        if model is None:
+            return list(range(top_k))
+
+        deadline = time.perf_counter() + self.budget_ms / 1000.0 if self.budget_ms else None
+        scores: List[float] = []
+        try:
+            for start in range(0, len(documents), self.batch_size):
+                if deadline is not None and scores and time.perf_counter() >= deadline:
+                    self.budget_exhausted += 1
+                    logger.info(
+                        "[CrossEncoderReranker] budget %.0fms exhausted after %s/%s docs",
+                        self.budget_ms,
+                        len(scores),
+                        len(documents),
+                    )
+                    break
+                batch = documents[start : start + self.batch_size]
+                predicted = model.predict([(query, doc) for doc in batch], show_progress_bar=False)
+                scores.extend(float(value) for value in predicted)
+        except Exception as exc:
+            if raise_errors:
+                raise
+            logger.warning("[CrossEncoderReranker] predict failed: %s", exc)
+            return list(range(top_k))
+
+        scored = sorted(range(len(scores)), key=lambda idx: (-scores[idx], idx))
+        tail = list(range(len(scores), len(documents)))
+        return (scored + tail)[:top_k]
+
+
+def _document_key(document: str) -> str:
+    return hashlib.sha1(str(document or "").encode("utf-8")).hexdigest()[:16]
+
+
+class RerankerService:
+    """
+    Процессный синглтон над одним backend'ом (Voyage или CrossEncoder) с
+    LRU-кэшем результатов по (query hash, множество id кандидатов, top_k).
+    Кэшируется порядок id, поэтому перестановка тех же кандидатов тоже
+    попадает в кэш. Ответы-заглушки (backend недоступен/ошибка) не кэшируются.
+    """
+
+    def __init__(self, backend, *, cache_size: int = 1024) -> None:
+        self.backend = backend
+        self.cache_size = max(0, int(cache_size))
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+    @property
+    def available(self) -> bool:
+        return bool(getattr(self.backend, "available", False))
+
+    def _cache_key(self, query: str, ids: Sequence[str], top_k: int) -> tuple:
+        query_hash = hashlib.sha1(" ".join(str(query or "").split()).encode("utf-8")).hexdigest()
+        return (
+            getattr(self.backend, "name", type(self.backend).__name__),
+            getattr(self.backend, "model", ""),
+            query_hash,
+            tuple(sorted(ids)),
+            int(top_k),
+        )
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[str],
+        top_k: int = 5,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[int]:
+        if not documents:
+            return []
+        top_k = max(1, min(int(top_k), len(documents)))
+        if not self.available:
+            return list(range(top_k))
+
+        doc_ids = [str(item) for item in ids] if ids is not None else [_document_key(doc) for doc in documents]
+        unique_ids = len(set(doc_ids)) == len(doc_ids)
+        key = self._cache_key(query, doc_ids, top_k) if unique_ids and self.cache_size else None
+        if key is not None:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.cache_hits += 1
+                    position = {doc_id: idx for idx, doc_id in enumerate(doc_ids)}
+                    return [position[doc_id] for doc_id in cached]
+
+        started = time.perf_counter()
+        try:
+            indices = self.backend.rerank(query, documents, top_k=top_k, raise_errors=True)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.total_ms += (time.perf_counter() - started) * 1000.0
+
+        indices = [int(idx) for idx in indices if 0 <= int(idx) < len(documents)]
+        if key is not None and indices and self.available:
+            with self._lock:
+                self._cache[key] = tuple(doc_ids[idx] for idx in indices)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return indices
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.calls + self.cache_hits
+            return {
+                "backend": getattr(self.backend, "name", type(self.backend).__name__),
+                "model": getattr(self.backend, "model", ""),
+                "available": self.available,
+                "calls": self.calls,
+                "cache_hits": self.cache_hits,
+                "cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+                "cache_size": len(self._cache),
+                "errors": self.errors,
+                "avg_backend_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+                "budget_exhausted": int(getattr(self.backend, "budget_exhausted", 0) or 0),
+            }
+
+
+def create_rerank_backend(backend: str | None = None):
+    """Backend по BOT_DB_RERANK_BACKEND: voyage (по умолчанию) | cross_encoder."""
+    name = str(backend or os.getenv("BOT_DB_RERANK_BACKEND", "voyage")).strip().lower()
+    if name in {"cross_encoder", "cross-encoder", "local"}:
+        return CrossEncoderReranker(
+            model=os.getenv("BOT_DB_CROSS_ENCODER_MODEL") or None,
+            budget_ms=float(os.getenv("BOT_DB_RERANK_BUDGET_MS", "250")),
+        )
+    return VoyageReranker(model=os.getenv("VOYAGE_MODEL") or None)
+
+
+_service: Optional[RerankerService] = None
+_service_lock = threading.Lock()
+
+
+def get_reranker_service() -> RerankerService:
+    """Общий реранкер процесса: клиент Voyage / модель CrossEncoder создаются один раз."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RerankerService(
+                create_rerank_backend(),
+                cache_size=int(os.getenv("BOT_DB_RERANK_CACHE_SIZE", "1024")),
+            )
+        return _service
+
+
+def reset_reranker_service() -> None:
+    global _service
+    with _service_lock:
+        _service = None
+
+
+def reranker_stats() -> dict:
+    with _service_lock:
+        service = _service
+    return service.stats() if service is not None else {"initialized": False}
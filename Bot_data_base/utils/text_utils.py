@@ -2,12 +2,13 @@
 
 import re
 from typing import List
-import tiktoken
+
+from utils.tokenizer import get_tokenizer
 
 
 def count_tokens(text: str) -> int:
-    enc = tiktoken.get_encoding("cl100k_base")
-    return len(enc.encode(text or ""))
+    # Кэшированный энкодер + мемо: повторные проверки одного текста бесплатны.
+    return get_tokenizer().count(text or "")
 
 
 def clean_text(text: str) -> str:
@@ -0,0 +1,280 @@
+"""
+Корпусный char n-gram TF-IDF индекс для hybrid-скоринга /api/query/.
+
+Векторайзер обучается один раз на версию коллекции Chroma, строки блоков
+хранятся как L2-нормированная CSR-матрица с отображением chunk_id -> row.
+Hybrid-скоринг запроса сводится к разреженному скалярному произведению.
+
+Версия коллекции = (имя, ChromaManager.collection_version, count()).
+При смене версии старый индекс продолжает обслуживать запросы (кандидаты,
+которых в нем нет, векторизуются на лету), а переобучение идет в фоне.
+Первое построение тоже фоновое: пока индекса нет, вызывающий код скорит
+кандидатов локальным fit, и холодный старт не держит глобальный lock.
+Записи в коллекцию (ChromaManager.add_blocks/delete_source) вычеркивают
+затронутые chunk_id из индекса, поэтому переиндексированный блок до
+переобучения векторизуется по новому тексту, а не по старой строке.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, Iterable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_FEATURES = 8000
+CORPUS_PAGE_SIZE = 2000
+_EXTRA_ROWS_LIMIT = 4096
+
+
+def _new_vectorizer():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer(
+        analyzer="char_wb",
+        ngram_range=(2, 4),
+        max_features=int(os.getenv("BOT_DB_HYBRID_TFIDF_MAX_FEATURES", str(DEFAULT_MAX_FEATURES))),
+        lowercase=True,
+        strip_accents="unicode",
+    )
+
+
+def _rows(value: object) -> list:
+    if not isinstance(value, list) or not value:
+        return []
+    return value[0] if isinstance(value[0], list) else value
+
+
+def load_collection_corpus(collection: Any, page_size: int = CORPUS_PAGE_SIZE) -> tuple[list[str], list[str]]:
+    """Постранично выгрузить (ids, documents) коллекции Chroma."""
+    ids: list[str] = []
+    documents: list[str] = []
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["documents"])
+        if not isinstance(page, dict):
+            break
+        page_ids = _rows(page.get("ids"))
+        page_docs = _rows(page.get("documents"))
+        if not page_ids:
+            break
+        for idx, chunk_id in enumerate(page_ids):
+            ids.append(str(chunk_id))
+            documents.append(str(page_docs[idx] or "") if idx < len(page_docs) else "")
+        if len(page_ids) < page_size:
+            break
+        offset += len(page_ids)
+    return ids, documents
+
+
+class CorpusTfidfIndex:
+    """Обученный векторайзер + кэш разреженных строк по chunk_id."""
+
+    def __init__(self, version: Hashable, vectorizer: Any, matrix: Any, row_by_id: Dict[str, int]) -> None:
+        self.version = version
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.row_by_id = row_by_id
+        self._extra_rows: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.built_at = time.time()
+
+    @classmethod
+    def build(cls, version: Hashable, ids: Sequence[str], documents: Sequence[str]) -> "CorpusTfidfIndex":
+        vectorizer = _new_vectorizer()
+        matrix = vectorizer.fit_transform(list(documents)).tocsr()
+        row_by_id = {str(chunk_id): row for row, chunk_id in enumerate(ids)}
+        return cls(version, vectorizer, matrix, row_by_id)
+
+    def forget(self, chunk_ids: Iterable[str]) -> None:
+        """Убрать строки chunk_id: кандидат с таким id будет векторизован заново."""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self.row_by_id.pop(chunk_id, None)
+                self._extra_rows.pop(chunk_id, None)
+
+    @property
+    def size(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def _candidate_rows(self, candidates: Sequence[dict]):
+        from scipy.sparse import vstack
+
+        rows = []
+        missing: list[tuple[int, str, str]] = []
+        for pos, candidate in enumerate(candidates):
+            chunk_id = str(candidate.get("chunk_id") or "")
+            row = self.row_by_id.get(chunk_id) if chunk_id else None
+            if row is not None:
+                rows.append(self.matrix[row])
+                continue
+            with self._lock:
+                cached = self._extra_rows.get(chunk_id) if chunk_id else None
+            if cached is not None:
+                rows.append(cached)
+                continue
+            rows.append(None)
+            missing.append((pos, chunk_id, str(candidate.get("content") or "")))
+
+        if missing:
+            # Кандидаты вне корпуса (новые блоки до переобучения, fallback-файл):
+            # только transform, без fit.
+            fresh = self.vectorizer.transform([text for _, _, text in missing])
+            with self._lock:
+                if len(self._extra_rows) > _EXTRA_ROWS_LIMIT:
+                    self._extra_rows.clear()
+                for offset, (pos, chunk_id, _) in enumerate(missing):
+                    row = fresh[offset]
+                    rows[pos] = row
+                    if chunk_id:
+                        self._extra_rows[chunk_id] = row
+        return vstack(rows, format="csr")
+
+    def score(self, query: str, candidates: Sequence[dict]) -> np.ndarray:
+        """Косинус (строки L2-нормированы) между запросом и кандидатами."""
+        if not candidates:
+            return np.zeros(0, dtype=np.float32)
+        query_vec = self.vectorizer.transform([query])
+        candidate_matrix = self._candidate_rows(candidates)
+        return np.asarray((candidate_matrix @ query_vec.T).toarray()).ravel()
+
+
+class _IndexHolder:
+    def __init__(self) -> None:
+        self.index: Optional[CorpusTfidfIndex] = None
+        self.lock = threading.Lock()
+        self.rebuild_thread: Optional[threading.Thread] = None
+        self.builds = 0
+        self.stale_serves = 0
+        self.last_build_ms = 0.0
+        self.last_error: Optional[str] = None
+        self.failed_version: Optional[Hashable] = None
+        # chunk_id, измененные во время фонового построения (его корпус мог быть прочитан до записи).
+        self.forgotten_during_build: set[str] = set()
+
+
+_HOLDER = _IndexHolder()
+
+
+def collection_version_key(collection: Any, chroma_manager: Any = None) -> Optional[Hashable]:
+    try:
+        count = int(collection.count())
+    except Exception:
+        return None
+    return (
+        str(getattr(chroma_manager, "collection_name", "") or getattr(collection, "name", "") or ""),
+        int(getattr(chroma_manager, "collection_version", 0) or 0),
+        count,
+    )
+
+
+def _build(collection: Any, version: Hashable) -> Optional[CorpusTfidfIndex]:
+    started = time.perf_counter()
+    try:
+        ids, documents = load_collection_corpus(collection)
+        if not ids or not any(doc.strip() for doc in documents):
+            return None
+        index = CorpusTfidfIndex.build(version, ids, documents)
+    except Exception as exc:
+        _HOLDER.last_error = str(exc)[:300]
+        logger.warning("[QUERY] corpus TF-IDF build failed: %s", exc)
+        return None
+    _HOLDER.builds += 1
+    _HOLDER.last_build_ms = round((time.perf_counter() - started) * 1000.0, 2)
+    _HOLDER.last_error = None
+    logger.info(
+        "[QUERY] corpus TF-IDF built rows=%s features=%s time_ms=%s",
+        index.size,
+        len(getattr(index.vectorizer, "vocabulary_", {}) or {}),
+        _HOLDER.last_build_ms,
+    )
+    return index
+
+
+def _rebuild_in_background(collection: Any, version: Hashable) -> None:
+    def _run() -> None:
+        index = _build(collection, version)
+        with _HOLDER.lock:
+            if index is not None:
+                index.forget(_HOLDER.forgotten_during_build)
+                _HOLDER.index = index
+                _HOLDER.failed_version = None
+            elif _HOLDER.index is None:
+                _HOLDER.failed_version = version
+            _HOLDER.forgotten_during_build = set()
+            _HOLDER.rebuild_thread = None
+
+    _HOLDER.forgotten_during_build = set()
+    thread = threading.Thread(target=_run, name="botdb-tfidf-rebuild", daemon=True)
+    _HOLDER.rebuild_thread = thread
+    thread.start()
+
+
+def get_corpus_tfidf_index(collection: Any, chroma_manager: Any = None) -> Optional[CorpusTfidfIndex]:
+    """
+    Индекс для текущей версии коллекции. Построение всегда фоновое: до
+    первого индекса возвращается None, при смене версии — прежний индекс.
+    """
+    version = collection_version_key(collection, chroma_manager)
+    if version is None:
+        return None
+    with _HOLDER.lock:
+        current = _HOLDER.index
+        if current is not None and current.version == version:
+            return current
+        if current is not None:
+            _HOLDER.stale_serves += 1
+            if _HOLDER.rebuild_thread is None:
+                _rebuild_in_background(collection, version)
+            return current
+        if _HOLDER.failed_version == version:
+            return None
+        if _HOLDER.rebuild_thread is None:
+            _rebuild_in_background(collection, version)
+        return None
+
+
+def forget_corpus_tfidf_rows(chunk_ids: Iterable[Any]) -> None:
+    """Вычеркнуть добавленные/удаленные/перезаписанные блоки из текущего индекса."""
+    ids = {str(chunk_id) for chunk_id in chunk_ids if chunk_id}
+    if not ids:
+        return
+    with _HOLDER.lock:
+        index = _HOLDER.index
+        if _HOLDER.rebuild_thread is not None:
+            _HOLDER.forgotten_during_build.update(ids)
+    if index is not None:
+        index.forget(ids)
+
+
+def invalidate_corpus_tfidf_index() -> None:
+    with _HOLDER.lock:
+        _HOLDER.index = None
+        _HOLDER.failed_version = None
+
+
+def corpus_tfidf_index_stats() -> Dict[str, Any]:
+    index = _HOLDER.index
+    return {
+        "ready": index is not None,
+        "rows": index.size if index is not None else 0,
+        "version": list(index.version) if index is not None and isinstance(index.version, tuple) else None,
+        "builds": _HOLDER.builds,
+        "stale_serves": _HOLDER.stale_serves,
+        "rebuilding": _HOLDER.rebuild_thread is not None,
+        "last_build_ms": _HOLDER.last_build_ms,
+        "last_error": _HOLDER.last_error,
+    }
+
+
+def wait_for_rebuild(timeout: float = 5.0) -> None:
+    """Дождаться фонового переобучения (тесты / shutdown)."""
+    thread = _HOLDER.rebuild_thread
+    if thread is not None:
+        thread.join(timeout=timeout)
+
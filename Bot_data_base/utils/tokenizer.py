@@ -0,0 +1,211 @@
+"""
+Сервис подсчета токенов для чанкеров.
+
+Энкодер tiktoken создается один раз на процесс; подсчеты мемоизируются
+(LRU с бюджетом по символам), а промахи считаются пачкой через
+encode_batch. Чанкеры нарезают текст жадным упаковщиком с бегущим
+счетчиком: каждое предложение/слово токенизируется один раз, а один и тот же
+текст секции, проверяемый несколькими ветками, берется из мемо.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Sequence
+
+DEFAULT_ENCODING = "cl100k_base"
+DEFAULT_MEMO_MAX_CHARS = 4_000_000
+# Ниже этого размера пачки encode_batch (с пулом потоков) не окупается.
+_BATCH_MIN_SIZE = 16
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+class TokenizerService:
+    """Кэшированный энкодер + мемо подсчетов + пакетное кодирование промахов."""
+
+    def __init__(
+        self,
+        encoding_name: str = DEFAULT_ENCODING,
+        *,
+        encoder: Any = None,
+        memo_max_chars: int = DEFAULT_MEMO_MAX_CHARS,
+    ) -> None:
+        self.encoding_name = encoding_name
+        self._encoder = encoder
+        self.memo_max_chars = max(0, int(memo_max_chars))
+        self._memo: "OrderedDict[str, int]" = OrderedDict()
+        self._memo_chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encoded_chars = 0
+
+    @property
+    def encoder(self) -> Any:
+        if self._encoder is None:
+            import tiktoken
+
+            self._encoder = tiktoken.get_encoding(self.encoding_name)
+        return self._encoder
+
+    def _remember(self, text: str, count: int) -> None:
+        if len(text) > self.memo_max_chars:
+            return
+        if text not in self._memo:
+            self._memo_chars += len(text)
+        self._memo[text] = count
+        self._memo.move_to_end(text)
+        while self._memo_chars > self.memo_max_chars and self._memo:
+            old_text, _ = self._memo.popitem(last=False)
+            self._memo_chars -= len(old_text)
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        """Число токенов для каждого текста; промахи кодируются одной пачкой."""
+        values = [text or "" for text in texts]
+        counts: List[Optional[int]] = [None] * len(values)
+        missing: "OrderedDict[str, List[int]]" = OrderedDict()
+        with self._lock:
+            for idx, text in enumerate(values):
+                if not text:
+                    counts[idx] = 0
+                    continue
+                cached = self._memo.get(text)
+                if cached is not None:
+                    self._memo.move_to_end(text)
+                    self.hits += 1
+                    counts[idx] = cached
+                else:
+                    missing.setdefault(text, []).append(idx)
+
+        if missing:
+            pending = list(missing)
+            if len(pending) >= _BATCH_MIN_SIZE and hasattr(self.encoder, "encode_batch"):
+                encoded = self.encoder.encode_batch(pending)
+            else:
+                encoded = [self.encoder.encode(text) for text in pending]
+            with self._lock:
+                for text, tokens in zip(pending, encoded):
+                    count = len(tokens)
+                    self.misses += 1
+                    self.encoded_chars += len(text)
+                    self._remember(text, count)
+                    for idx in missing[text]:
+                        counts[idx] = count
+        return [int(value or 0) for value in counts]
+
+    def encode(self, text: str) -> List[int]:
+        return list(self.encoder.encode(text or ""))
+
+    def decode(self, tokens: Iterable[int]) -> str:
+        return self.encoder.decode(list(tokens))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "encoding": self.encoding_name,
+                "memo_entries": len(self._memo),
+                "memo_chars": self._memo_chars,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "encoded_chars": self.encoded_chars,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+            self._memo_chars = 0
+            self.hits = self.misses = self.encoded_chars = 0
+
+
+def pack_greedy(
+    pieces: Sequence[str],
+    counts: Sequence[int],
+    max_tokens: int,
+    *,
+    joiner: str = " ",
+) -> List[str]:
+    """
+    Жадная упаковка кусков с бегущим счетчиком токенов (сумма счетчиков
+    кусков, как и раньше в чанкерах) — без повторной токенизации.
+    """
+    parts: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece, piece_tokens in zip(pieces, counts):
+        if current and current_tokens + piece_tokens > max_tokens:
+            parts.append(joiner.join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        parts.append(joiner.join(current))
+    return parts
+
+
+def split_to_token_budget(text: str, max_tokens: int, tokenizer: Optional[TokenizerService] = None) -> List[str]:
+    """
+    Разрезать текст по предложениям (а слишком длинные предложения — по словам)
+    так, чтобы куски укладывались в max_tokens.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    if tokenizer.count(text) <= max_tokens:
+        return [text]
+    sentences = [sentence for sentence in _SENTENCE_SPLIT_RE.split(text) if sentence]
+    sentence_counts = tokenizer.count_batch(sentences)
+    parts: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for sentence, sentence_tokens in zip(sentences, sentence_counts):
+        if current and current_tokens + sentence_tokens > max_tokens:
+            parts.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        if sentence_tokens > max_tokens:
+            parts.extend(split_words_to_token_budget(sentence, max_tokens, tokenizer))
+        else:
+            current.append(sentence)
+            current_tokens += sentence_tokens
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+
+def split_words_to_token_budget(
+    text: str,
+    max_tokens: int,
+    tokenizer: Optional[TokenizerService] = None,
+) -> List[str]:
+    tokenizer = tokenizer or get_tokenizer()
+    words = text.split()
+    return pack_greedy(words, tokenizer.count_batch(words), max_tokens)
+
+
+_tokenizer: Optional[TokenizerService] = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer() -> TokenizerService:
+    """Общий на процесс токенизатор (воркеры загрузки получают свой экземпляр)."""
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            _tokenizer = TokenizerService(
+                memo_max_chars=int(os.getenv("BOT_DB_TOKEN_MEMO_MAX_CHARS", str(DEFAULT_MEMO_MAX_CHARS))),
+            )
+        return _tokenizer
+
+
+def set_tokenizer(tokenizer: Optional[TokenizerService]) -> None:
+    global _tokenizer
+    with _tokenizer_lock:
+        _tokenizer = tokenizer
@@ -29,10 +29,8 @@ async def admin_threads_list(
     summary="Удалить активный тред пользователя",
 )
 async def admin_threads_delete(user_id: str):
-    active_path = _get_thread_storage_dir() / f"{user_id}_active.json"
-    if not active_path.exists():
+    if not thread_storage.delete_active(user_id):
         raise HTTPException(status_code=404, detail=f"No active thread for user: {user_id}")
-    active_path.unlink()
     return {"status": "ok", "user_id": user_id, "deleted": "active_thread"}
 
 
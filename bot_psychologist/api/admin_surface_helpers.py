@@ -197,9 +197,8 @@ def _list_active_threads() -> list[dict[str, Any]]:
     if not storage_dir.exists():
         return []
     threads: list[dict[str, Any]] = []
-    for file_path in sorted(storage_dir.glob("*_active.json")):
+    for payload in thread_storage.list_active_payloads():
         try:
-            payload = json.loads(file_path.read_text(encoding="utf-8"))
             threads.append(
                 {
                     "thread_id": str(payload.get("thread_id", "")),
@@ -225,22 +224,19 @@ def _list_archived_threads() -> list[dict[str, Any]]:
     if not storage_dir.exists():
         return []
     threads: list[dict[str, Any]] = []
-    for file_path in sorted(storage_dir.glob("*_archive.json")):
-        user_id = file_path.stem.replace("_archive", "")
+    for user_id, item in thread_storage.list_archived_payloads():
         try:
-            payload = json.loads(file_path.read_text(encoding="utf-8"))
-            for item in payload if isinstance(payload, list) else []:
-                threads.append(
-                    {
-                        "thread_id": str(item.get("thread_id", "")),
-                        "user_id": user_id,
-                        "final_phase": str(item.get("final_phase", "")),
-                        "core_direction": str(item.get("core_direction", "")),
-                        "archived_at": str(item.get("archived_at", "")),
-                        "archive_reason": str(item.get("archive_reason", "")),
-                        "status": "archived",
-                    }
-                )
+            threads.append(
+                {
+                    "thread_id": str(item.get("thread_id", "")),
+                    "user_id": user_id,
+                    "final_phase": str(item.get("final_phase", "")),
+                    "core_direction": str(item.get("core_direction", "")),
+                    "archived_at": str(item.get("archived_at", "")),
+                    "archive_reason": str(item.get("archive_reason", "")),
+                    "status": "archived",
+                }
+            )
         except Exception:
             continue
     return threads
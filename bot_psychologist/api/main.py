@@ -33,11 +33,18 @@ from .telegram_adapter.factory import build_polling_transport
 from .telegram_adapter.webhook_routes import router as telegram_webhook_router
 
 from bot_agent.config import config
+from bot_agent.config_context import pinned_config
 from bot_agent.config_validation import assert_runtime_config
 from bot_agent.data_loader import data_loader
+from bot_agent.db_api_client import aclose_shared_http_clients
 from bot_agent.graph_client import graph_client
+from bot_agent.metrics import start_metrics_flusher, stop_metrics_flusher
+from bot_agent.multiagent.agents.agent_llm_client import aclose_shared_async_clients
+from bot_agent.multiagent.agents.memory_retrieval import shutdown_loader_executor
+from bot_agent.multiagent.runtime_adapter import shutdown_runtime_loop
 from bot_agent.retriever import get_retriever
 from bot_agent.semantic_memory import SemanticMemory
+from bot_agent.storage import close_sqlite_pools
 
 # ===== LOGGING =====
 setup_logging()
@@ -76,6 +83,8 @@ async def lifespan(app: FastAPI):
     logger.info("[STARTUP] runtime config validation: OK")
     await get_database_bootstrap().run()
     _ensure_prompt_default_snapshots()
+    if start_metrics_flusher():
+        logger.info("[METRICS] multiprocess snapshots: %s", config.METRICS_MULTIPROC_DIR)
 
     if config.WARMUP_ON_START:
         logger.info("[WARMUP] starting warm preload")
@@ -128,6 +137,18 @@ async def lifespan(app: FastAPI):
             await _telegram_transport_task
         _telegram_transport = None
         _telegram_transport_task = None
+    try:
+        await aclose_shared_async_clients()
+    except Exception as exc:
+        logger.warning("shared LLM clients close failed: %s", exc)
+    try:
+        await aclose_shared_http_clients()
+    except Exception as exc:
+        logger.warning("Bot_data_base HTTP pool close failed: %s", exc)
+    await asyncio.to_thread(shutdown_runtime_loop)
+    shutdown_loader_executor(wait=False)
+    await asyncio.to_thread(close_sqlite_pools)
+    stop_metrics_flusher()
 
     uptime = time.time() - _startup_time if _startup_time else 0.0
     logger.info("API server shutting down | uptime=%.2fs", uptime)
@@ -236,6 +257,24 @@ async def log_requests(request: Request, call_next):
         )
 
 
+class PinnedConfigMiddleware:
+    """Закрепить снимок runtime-конфигурации (overrides + feature flags) на время запроса."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with pinned_config():
+            await self.app(scope, receive, send)
+
+
+# Добавлен последним — внешний слой, поэтому снимок виден и остальным middleware.
+app.add_middleware(PinnedConfigMiddleware)
+
+
 # ===== ROUTERS =====
 
 app.include_router(router)
@@ -6,6 +6,7 @@ from fastapi import APIRouter
 
 from bot_agent.config import config
 from bot_agent.multiagent.runtime_adapter import (
+    run_multiagent_adaptive_async as _default_run_multiagent_adaptive_async,
     run_multiagent_adaptive_sync as _default_run_multiagent_adaptive_sync,
 )
 
@@ -17,6 +18,7 @@ from .conversation_routes import router as conversation_router
 from .feedback import router as feedback_router
 from .health import health_check, router as health_router
 from .identity_routes import router as identity_router
+from .metrics import router as metrics_router
 from ..registration.routes import admin_router as registration_admin_router
 from ..registration.routes import router as registration_router
 from .telegram_mock_routes import router as telegram_mock_router
@@ -24,6 +26,7 @@ from .users import router as users_router
 
 # Совместимый экспорт для monkeypatch(routes.answer_question_adaptive)
 run_multiagent_adaptive_sync = _default_run_multiagent_adaptive_sync
+run_multiagent_adaptive_async = _default_run_multiagent_adaptive_async
 answer_question_adaptive = run_multiagent_adaptive_sync
 stream_answer_tokens = _chat.stream_answer_tokens
 
@@ -61,12 +64,14 @@ router.include_router(telegram_mock_router)
 router.include_router(registration_router)
 router.include_router(registration_admin_router)
 router.include_router(health_router)
+router.include_router(metrics_router)
 
 __all__ = [
     "router",
     "ask_adaptive_question",
     "ask_adaptive_question_stream",
     "run_multiagent_adaptive_sync",
+    "run_multiagent_adaptive_async",
     "answer_question_adaptive",
     "stream_answer_tokens",
     "config",
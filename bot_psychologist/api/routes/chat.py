@@ -1,5 +1,7 @@
 """Chat-роуты API: /questions/* и streaming."""
 
+import asyncio
+import inspect
 import json
 from datetime import datetime
 from typing import Any, Dict, Optional
@@ -10,7 +12,11 @@ from fastapi.responses import StreamingResponse
 from bot_agent.config import config
 from bot_agent.conversation_memory import get_conversation_memory
 from bot_agent.llm_streaming import stream_answer_tokens
-from bot_agent.multiagent.runtime_adapter import run_multiagent_adaptive_sync
+from bot_agent.multiagent.writer_stream import AnswerReplacement
+from bot_agent.multiagent.runtime_adapter import (
+    run_multiagent_adaptive_async,
+    run_multiagent_adaptive_sync,
+)
 from bot_agent.storage import SessionManager
 
 from ..auth import is_dev_key, verify_api_key
@@ -53,16 +59,35 @@ router = APIRouter(prefix="/api/v1", tags=["bot"])
 
 
 def _resolve_multiagent_runtime():
-    """Возвращает answer-функцию с учетом monkeypatch в api.routes."""
+    """
+    Возвращает answer-функцию с учетом monkeypatch в api.routes.
+
+    По умолчанию — нативный async runtime (без thread-join моста).
+    Подмененный sync runtime (тест-контракты) остается поддержанным.
+    """
     try:
         from api import routes as routes_pkg  # runtime import для избежания циклов
 
+        async_candidate = getattr(routes_pkg, "run_multiagent_adaptive_async", None)
+        if callable(async_candidate) and async_candidate is not run_multiagent_adaptive_async:
+            return async_candidate
         candidate = getattr(routes_pkg, "run_multiagent_adaptive_sync", None)
-        if callable(candidate):
+        if callable(candidate) and candidate is not run_multiagent_adaptive_sync:
             return candidate
     except Exception:
         pass
-    return run_multiagent_adaptive_sync
+    return run_multiagent_adaptive_async
+
+
+async def _call_multiagent_runtime(runtime_fn, **kwargs: Any) -> Dict[str, Any]:
+    """Await async runtime directly; sync runtime runs in a worker thread."""
+    if inspect.iscoroutinefunction(runtime_fn):
+        result = await runtime_fn(**kwargs)
+    else:
+        result = await asyncio.to_thread(runtime_fn, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+    return result if isinstance(result, dict) else {}
 
 
 def _resolve_stream_answer_tokens():
@@ -446,7 +471,8 @@ async def ask_adaptive_question(
             except Exception as exc:
                 logger.warning(f" Failed to pre-create session {session_key}: {exc}")
 
-        result = _resolve_multiagent_runtime()(
+        result = await _call_multiagent_runtime(
+            _resolve_multiagent_runtime(),
             query=request.query,
             user_id=runtime_user_scope,
             include_path_recommendation=request.include_path,
@@ -863,6 +889,10 @@ async def ask_adaptive_question_stream(
                 on_complete=_on_complete,
                 answer_fn=_resolve_multiagent_runtime(),
             ):
+                if isinstance(token, AnswerReplacement):
+                    # Финальный ответ отличается от стримленного префикса (validator/gate).
+                    yield f"data: {json.dumps({'replace': str(token)}, ensure_ascii=False)}\n\n"
+                    continue
                 yield f"data: {json.dumps({'token': token}, ensure_ascii=False)}\n\n"
 
             result = dict(_result_holder)
@@ -5,10 +5,16 @@ from datetime import datetime
 from fastapi import APIRouter, Depends
 
 from bot_agent.config import config
+from bot_agent.conversation_memory import get_conversation_memory_cache_stats
 from bot_agent.data_loader import data_loader
+from bot_agent.embedding_cache import get_query_embedding_cache_stats
+from bot_agent.multiagent.agents.memory_retrieval import speculative_rag_stats
+from bot_agent.multiagent.thread_storage import thread_storage
+from bot_agent.storage import sqlite_pool_stats
 
 from ..auth import verify_api_key
 from ..models import StatsResponse
+from ..telegram_adapter.dispatcher import telegram_dispatcher_stats
 from .common import _stats, logger
 
 router = APIRouter(prefix="/api/v1", tags=["bot"])
@@ -98,5 +104,11 @@ async def health_check():
             "path_builder": True,
             "api": True,
         },
+        "conversation_memory_cache": get_conversation_memory_cache_stats(),
+        "query_embedding_cache": get_query_embedding_cache_stats(),
+        "session_store": sqlite_pool_stats(),
+        "speculative_rag": speculative_rag_stats(),
+        "thread_storage": thread_storage.stats(),
+        "telegram_dispatcher": telegram_dispatcher_stats(),
     }
 
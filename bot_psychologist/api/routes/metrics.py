@@ -0,0 +1,96 @@
+"""Prometheus-совместимый ``/metrics``: гистограммы пайплайна + счетчики из ``*_stats()``."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Iterable
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from bot_agent import retriever as retriever_module
+from bot_agent.conversation_memory import get_conversation_memory_cache_stats
+from bot_agent.embedding_cache import get_query_embedding_cache_stats
+from bot_agent.metrics import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    MetricFamily,
+    counter_family,
+    gauge_family,
+    render_latest,
+)
+from bot_agent.multiagent.agents.memory_retrieval import speculative_rag_stats
+from bot_agent.multiagent.thread_storage import thread_storage
+
+from . import common as _common
+
+router = APIRouter(tags=["metrics"])
+
+
+def _cache_counts() -> dict[str, tuple[float, float]]:
+    embedding = get_query_embedding_cache_stats()
+    conversation = get_conversation_memory_cache_stats()
+    threads = thread_storage.stats()
+    speculative = speculative_rag_stats()
+    return {
+        "query_embedding": (embedding["hits"] + embedding["disk_hits"], embedding["misses"]),
+        "conversation_memory": (conversation["hits"], conversation["misses"]),
+        "thread_storage": (threads["cache_hits"], threads["cache_misses"]),
+        "speculative_rag": (speculative["hits"], speculative["misses"]),
+    }
+
+
+def _circuit_open() -> float:
+    # Не создаем retriever ради метрики: до первого запроса breaker закрыт.
+    instance = retriever_module._retriever_instance
+    return 1.0 if instance is not None and instance._is_circuit_open() else 0.0
+
+
+def collect_runtime_stats() -> Iterable[tuple[str, MetricFamily]]:
+    """Счетчики процесса на момент scrape (кэши, circuit breaker, /ask статистика)."""
+    caches = _cache_counts()
+    stats: dict[str, Any] = _common._stats
+    return [
+        counter_family(
+            "bot_cache_hits_total",
+            "Cache hits by cache",
+            ("cache",),
+            [((name,), hits) for name, (hits, _) in caches.items()],
+        ),
+        counter_family(
+            "bot_cache_misses_total",
+            "Cache misses by cache",
+            ("cache",),
+            [((name,), misses) for name, (_, misses) in caches.items()],
+        ),
+        gauge_family(
+            "bot_retrieval_circuit_open",
+            "1 if the Bot_data_base API circuit breaker is open",
+            (),
+            [((), _circuit_open())],
+            mode="max",
+        ),
+        counter_family("bot_chat_questions_total", "Answered chat questions", (), [((), stats["total_questions"])]),
+        counter_family(
+            "bot_chat_processing_seconds_total",
+            "Total chat processing time",
+            (),
+            [((), stats["total_processing_time"])],
+        ),
+    ]
+
+
+REGISTRY.register_collector(collect_runtime_stats)
+REGISTRY.register_ratio(
+    "bot_cache_hit_ratio",
+    "Cache hit ratio by cache (all workers)",
+    hits="bot_cache_hits_total",
+    misses="bot_cache_misses_total",
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Метрики в text exposition format (при METRICS_MULTIPROC_DIR — по всем воркерам)."""
+    payload = await asyncio.to_thread(render_latest)
+    return Response(content=payload, media_type=CONTENT_TYPE_LATEST)
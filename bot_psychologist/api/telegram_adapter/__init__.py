@@ -2,6 +2,7 @@
 
 from .adapter import TelegramUpdateAdapter
 from .config import TelegramAdapterSettings, telegram_settings
+from .dispatcher import TelegramUpdateDispatcher, telegram_dispatcher_stats
 from .factory import build_polling_transport
 from .models import TelegramAdapterResponse, TelegramUpdateModel
 from .outbound import TelegramOutboundSender
@@ -17,6 +18,8 @@ __all__ = [
     "TelegramAdapterService",
     "TelegramOutboundSender",
     "TelegramPollingTransport",
+    "TelegramUpdateDispatcher",
+    "telegram_dispatcher_stats",
     "process_raw_update",
     "build_polling_transport",
 ]
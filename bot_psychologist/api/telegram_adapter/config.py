@@ -15,6 +15,10 @@ TELEGRAM_POLLING_TIMEOUT_DEFAULT = 30
 TELEGRAM_POLLING_RETRY_DELAY_DEFAULT = 5.0
 TELEGRAM_POLLING_MAX_RETRY_DELAY_DEFAULT = 60.0
 TELEGRAM_ALLOWED_UPDATES_DEFAULT: tuple[str, ...] = ("message",)
+TELEGRAM_MAX_CONCURRENT_UPDATES_DEFAULT = 8
+TELEGRAM_PER_CHAT_QUEUE_SIZE_DEFAULT = 16
+TELEGRAM_MAX_PENDING_UPDATES_DEFAULT = 256
+TELEGRAM_SHUTDOWN_DRAIN_TIMEOUT_DEFAULT = 10.0
 
 
 def _parse_bool(value: str | None, default: bool) -> bool:
@@ -59,6 +63,10 @@ class TelegramAdapterSettings:
     polling_retry_delay: float = 5.0
     polling_max_retry_delay: float = 60.0
     allowed_updates: list[str] = field(default_factory=lambda: ["message"])
+    max_concurrent_updates: int = TELEGRAM_MAX_CONCURRENT_UPDATES_DEFAULT
+    per_chat_queue_size: int = TELEGRAM_PER_CHAT_QUEUE_SIZE_DEFAULT
+    max_pending_updates: int = TELEGRAM_MAX_PENDING_UPDATES_DEFAULT
+    shutdown_drain_timeout: float = TELEGRAM_SHUTDOWN_DRAIN_TIMEOUT_DEFAULT
 
     @classmethod
     def from_env(cls) -> "TelegramAdapterSettings":
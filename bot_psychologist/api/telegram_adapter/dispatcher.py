@@ -0,0 +1,204 @@
+﻿"""Concurrent per-chat dispatcher for Telegram updates."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+UpdateHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+_LATENCY_WINDOW = 1024
+_active_dispatcher: Optional["TelegramUpdateDispatcher"] = None
+
+
+def chat_key(raw_update: dict[str, Any]) -> str:
+    """Ключ сериализации: chat_id (контрактный или нативный формат), иначе update_id."""
+    if raw_update.get("chat_id") is not None:
+        return str(raw_update["chat_id"])
+    for field_name in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        message = raw_update.get(field_name)
+        if isinstance(message, dict) and isinstance(message.get("chat"), dict):
+            return str(message["chat"].get("id", ""))
+    callback = raw_update.get("callback_query")
+    if isinstance(callback, dict) and isinstance(callback.get("message"), dict):
+        return str(dict(callback["message"].get("chat") or {}).get("id", ""))
+    return f"update:{raw_update.get('update_id', '')}"
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return round(ordered[index], 2)
+
+
+class TelegramUpdateDispatcher:
+    """
+    Диспетчер апдейтов: FIFO-очередь на чат + общий лимит параллельности.
+
+    - порядок внутри одного чата сохраняется (один воркер на чат);
+    - разные чаты обрабатываются параллельно, не более ``max_concurrency``;
+    - ``submit`` ждет, если очередь чата заполнена или всего в работе
+      ``max_pending`` апдейтов — polling loop не забирает новые пачки,
+      пока обработка не догонит (back-pressure);
+    - воркер чата завершается, когда его очередь опустела.
+    """
+
+    def __init__(
+        self,
+        handler: UpdateHandler,
+        *,
+        max_concurrency: int = 8,
+        per_chat_queue_size: int = 16,
+        max_pending: int = 256,
+    ) -> None:
+        self._handler = handler
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.per_chat_queue_size = max(1, int(per_chat_queue_size))
+        self.max_pending = max(1, int(max_pending))
+        self._concurrency = asyncio.Semaphore(self.max_concurrency)
+        self._pending_slots = asyncio.Semaphore(self.max_pending)
+        self._queues: dict[str, asyncio.Queue[tuple[dict[str, Any], float]]] = {}
+        self._workers: dict[str, asyncio.Task[None]] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending = 0
+        self._in_flight = 0
+        self._submitted = 0
+        self._processed = 0
+        self._failed = 0
+        self._backpressure_waits = 0
+        self._max_queue_depth = 0
+        self._latencies_ms: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._waits_ms: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    async def submit(self, raw_update: dict[str, Any]) -> None:
+        """Поставить апдейт в очередь его чата (ждет при переполнении)."""
+        if self._pending_slots.locked():
+            self._backpressure_waits += 1
+        await self._pending_slots.acquire()
+        key = chat_key(raw_update)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.per_chat_queue_size)
+            self._queues[key] = queue
+        self._pending += 1
+        self._submitted += 1
+        self._idle.clear()
+        try:
+            if queue.full():
+                self._backpressure_waits += 1
+            await queue.put((raw_update, time.perf_counter()))
+        except BaseException:
+            self._finish_one()
+            raise
+        self._max_queue_depth = max(self._max_queue_depth, queue.qsize())
+        worker = self._workers.get(key)
+        if worker is None or worker.done():
+            self._workers[key] = asyncio.create_task(self._run_chat(key, queue))
+
+    async def _run_chat(self, key: str, queue: asyncio.Queue[tuple[dict[str, Any], float]]) -> None:
+        try:
+            while True:
+                raw_update, enqueued_at = queue.get_nowait()
+                try:
+                    await self._handle(raw_update, enqueued_at)
+                finally:
+                    queue.task_done()
+                    self._finish_one()
+                if queue.empty():
+                    break
+        finally:
+            # Между проверкой и удалением нет await: submit не может вклиниться.
+            if self._workers.get(key) is asyncio.current_task():
+                del self._workers[key]
+            if queue.empty() and self._queues.get(key) is queue:
+                del self._queues[key]
+
+    async def _handle(self, raw_update: dict[str, Any], enqueued_at: float) -> None:
+        async with self._concurrency:
+            started = time.perf_counter()
+            self._waits_ms.append((started - enqueued_at) * 1000.0)
+            self._in_flight += 1
+            try:
+                await self._handler(raw_update)
+                self._processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self._failed += 1
+                logger.warning("telegram.dispatcher.handler_failed: %s", exc)
+            finally:
+                self._in_flight -= 1
+                self._latencies_ms.append((time.perf_counter() - enqueued_at) * 1000.0)
+
+    def _finish_one(self) -> None:
+        self._pending -= 1
+        self._pending_slots.release()
+        if self._pending <= 0:
+            self._idle.set()
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться обработки всех принятых апдейтов; False при таймауте."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """Дать очередям догореть ``timeout`` секунд, затем отменить воркеры."""
+        if not await self.drain(timeout):
+            logger.warning("telegram.dispatcher.close_timeout pending=%s", self._pending)
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        latencies = list(self._latencies_ms)
+        waits = list(self._waits_ms)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "per_chat_queue_size": self.per_chat_queue_size,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "in_flight": self._in_flight,
+            "active_chats": len(self._workers),
+            "queue_depth": {key: queue.qsize() for key, queue in self._queues.items() if queue.qsize()},
+            "max_queue_depth": self._max_queue_depth,
+            "submitted": self._submitted,
+            "processed": self._processed,
+            "failed": self._failed,
+            "backpressure_waits": self._backpressure_waits,
+            "latency_ms": {
+                "count": len(latencies),
+                "p50": _percentile(latencies, 0.5),
+                "p95": _percentile(latencies, 0.95),
+                "max": round(max(latencies), 2) if latencies else 0.0,
+            },
+            "queue_wait_ms": {
+                "p50": _percentile(waits, 0.5),
+                "p95": _percentile(waits, 0.95),
+            },
+        }
+
+
+def set_active_dispatcher(dispatcher: Optional[TelegramUpdateDispatcher]) -> None:
+    global _active_dispatcher
+    _active_dispatcher = dispatcher
+
+
+def telegram_dispatcher_stats() -> dict[str, Any]:
+    """Метрики диспетчера запущенного polling transport (для /api/v1/health)."""
+    dispatcher = _active_dispatcher
+    if dispatcher is None:
+        return {"running": False}
+    return {"running": True, **dispatcher.stats()}
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 
 import httpx
@@ -11,12 +12,32 @@ logger = logging.getLogger(__name__)
 
 
 class TelegramOutboundSender:
-    """Отправляет сообщения пользователям через Telegram Bot API."""
+    """
+    Отправляет сообщения пользователям через Telegram Bot API.
+
+    Держит один httpx-клиент (keep-alive пул) на event loop: соединения
+    httpx привязаны к циклу, поэтому при смене цикла клиент пересоздается.
+    """
 
     BASE_URL = "https://api.telegram.org/bot{token}/{method}"
 
     def __init__(self, bot_token: str) -> None:
         self._token = bot_token
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(timeout=10.0)
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        """Закрыть пул соединений (при остановке транспорта/приложения)."""
+        client, self._client, self._client_loop = self._client, None, None
+        if client is not None:
+            await client.aclose()
 
     async def send_message(
         self,
@@ -38,9 +59,8 @@ class TelegramOutboundSender:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
+            response = await self._get_client().post(url, json=payload)
+            response.raise_for_status()
             return True
         except (httpx.HTTPStatusError, httpx.NetworkError, httpx.TimeoutException) as exc:
             logger.warning("telegram.outbound.send_failed: %s", exc)
@@ -6,7 +6,7 @@ import inspect
 import logging
 from typing import Any, Awaitable, Callable, Protocol
 
-from bot_agent.multiagent.runtime_adapter import run_multiagent_adaptive_sync
+from bot_agent.multiagent.runtime_adapter import run_multiagent_adaptive_async
 
 from api.conversations import ConversationService
 from api.identity import IdentityService
@@ -38,7 +38,9 @@ async def _default_chat_executor(
     conversation_id: str,
 ) -> str | dict[str, Any]:
     _ = (session_id, conversation_id)
-    return run_multiagent_adaptive_sync(
+    # Оркестратор async: ждем его прямо на loop диспетчера, без worker thread,
+    # поэтому параллельность Telegram не ограничена размером пула потоков.
+    return await run_multiagent_adaptive_async(
         query=query,
         user_id=user_id,
         include_path_recommendation=False,
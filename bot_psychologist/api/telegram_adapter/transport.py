@@ -11,6 +11,7 @@ import httpx
 
 from .adapter import TelegramUpdateAdapter
 from .config import TelegramAdapterSettings
+from .dispatcher import TelegramUpdateDispatcher, set_active_dispatcher
 from .outbound import TelegramOutboundSender
 from .service import TelegramAdapterService
 
@@ -59,7 +60,13 @@ async def process_raw_update(
 
 
 class TelegramPollingTransport:
-    """Long-polling worker. Только получение update и делегирование."""
+    """
+    Long-polling worker. Только получение update и делегирование.
+
+    Апдейты пачки раздаются через TelegramUpdateDispatcher: чаты
+    обрабатываются параллельно, порядок внутри чата сохраняется. getUpdates
+    идет через один долгоживущий httpx-клиент.
+    """
 
     def __init__(
         self,
@@ -75,6 +82,12 @@ class TelegramPollingTransport:
         self._settings = settings
         self._stop_event = asyncio.Event()
         self._offset = 0
+        self._client: httpx.AsyncClient | None = None
+        self._dispatcher: TelegramUpdateDispatcher | None = None
+
+    @property
+    def dispatcher(self) -> TelegramUpdateDispatcher | None:
+        return self._dispatcher
 
     async def start(self) -> None:
         """Запустить polling loop."""
@@ -82,8 +95,29 @@ class TelegramPollingTransport:
             logger.info("telegram.transport.skipped")
             return
 
-        delay = float(self._settings.polling_retry_delay)
+        self._dispatcher = TelegramUpdateDispatcher(
+            self._process_update,
+            max_concurrency=self._settings.max_concurrent_updates,
+            per_chat_queue_size=self._settings.per_chat_queue_size,
+            max_pending=self._settings.max_pending_updates,
+        )
+        set_active_dispatcher(self._dispatcher)
         logger.info("telegram.transport.polling_started")
+        try:
+            await self._poll_loop(self._dispatcher)
+        finally:
+            await self._dispatcher.close(timeout=self._settings.shutdown_drain_timeout)
+            set_active_dispatcher(None)
+            if self._client is not None:
+                await self._client.aclose()
+                self._client = None
+            close_outbound = getattr(self._outbound_sender, "aclose", None)
+            if close_outbound is not None:
+                await close_outbound()
+        logger.info("telegram.transport.polling_stopped")
+
+    async def _poll_loop(self, dispatcher: TelegramUpdateDispatcher) -> None:
+        delay = float(self._settings.polling_retry_delay)
         while not self._stop_event.is_set():
             try:
                 updates = await self._poll_once(self._offset)
@@ -102,11 +136,7 @@ class TelegramPollingTransport:
                         break
                     if not isinstance(raw_update, dict):
                         continue
-                    await process_raw_update(
-                        raw_update=raw_update,
-                        adapter_service=self._adapter_service,
-                        outbound_sender=self._outbound_sender,
-                    )
+                    await dispatcher.submit(raw_update)
             except (httpx.NetworkError, httpx.TimeoutException) as exc:
                 logger.warning(
                     "telegram.transport.network_error retry_in=%.1f: %s", delay, exc
@@ -120,8 +150,6 @@ class TelegramPollingTransport:
                 await asyncio.sleep(delay)
                 delay = min(delay * 2, float(self._settings.polling_max_retry_delay))
 
-        logger.info("telegram.transport.polling_stopped")
-
     async def stop(self) -> None:
         """Остановить polling loop."""
         self._stop_event.set()
@@ -134,10 +162,11 @@ class TelegramPollingTransport:
             "allowed_updates": json.dumps(self._settings.allowed_updates),
         }
         url = _build_get_updates_url(self._bot_token)
-        async with httpx.AsyncClient(timeout=self._settings.polling_timeout + 10.0) as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            payload = response.json()
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self._settings.polling_timeout + 10.0)
+        response = await self._client.get(url, params=params)
+        response.raise_for_status()
+        payload = response.json()
 
         if not isinstance(payload, dict) or payload.get("ok") is not True:
             return []
@@ -147,7 +176,7 @@ class TelegramPollingTransport:
         return [item for item in result if isinstance(item, dict)]
 
     async def _process_update(self, raw_update: dict[str, Any]) -> None:
-        """Прокси-метод для unit тестов."""
+        """Обработчик одного апдейта для диспетчера (и прокси для unit тестов)."""
         await process_raw_update(
             raw_update=raw_update,
             adapter_service=self._adapter_service,
@@ -144,6 +144,11 @@ class Config:
     ENABLE_STREAMING = os.getenv("ENABLE_STREAMING", "True").lower() == "true"
     ENABLE_KNOWLEDGE_GRAPH = os.getenv("ENABLE_KNOWLEDGE_GRAPH", "False").lower() == "true"
 
+    # === Metrics (/metrics) ===
+    # Каталог снимков воркеров для multi-worker uvicorn; пусто = метрики только процесса.
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+    METRICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "5"))
+
     # === Routing pipeline controls ===
     FAST_DETECTOR_ENABLED: bool = os.getenv("FAST_DETECTOR_ENABLED", "True").lower() == "true"
     FAST_DETECTOR_CONFIDENCE_THRESHOLD: float = float(
@@ -166,6 +171,10 @@ class Config:
     CONVERSATION_HISTORY_DEPTH = int(os.getenv("CONVERSATION_HISTORY_DEPTH", "3"))
     MAX_CONTEXT_SIZE = int(os.getenv("MAX_CONTEXT_SIZE", "2000"))
     MAX_CONVERSATION_TURNS = int(os.getenv("MAX_CONVERSATION_TURNS", "1000"))
+    CONVERSATION_MEMORY_CACHE_MAX_USERS = int(os.getenv("CONVERSATION_MEMORY_CACHE_MAX_USERS", "512"))
+    CONVERSATION_MEMORY_CACHE_IDLE_TTL_SECONDS = float(
+        os.getenv("CONVERSATION_MEMORY_CACHE_IDLE_TTL_SECONDS", "1800")
+    )
 
     # === Semantic memory ===
     ENABLE_SEMANTIC_MEMORY = os.getenv("ENABLE_SEMANTIC_MEMORY", "True").lower() == "true"
@@ -174,6 +183,16 @@ class Config:
     SEMANTIC_MAX_CHARS = int(os.getenv("SEMANTIC_MAX_CHARS", "1000"))
     EMBEDDING_MODEL = "intfloat/multilingual-e5-base"
     EMBEDDING_DEVICE = "auto"
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "2048"))
+    QUERY_EMBEDDING_CACHE_SPILL_PATH = os.getenv("QUERY_EMBEDDING_CACHE_SPILL_PATH", "")
+    QUERY_EMBEDDING_CACHE_SPILL_MAX_ENTRIES = int(
+        os.getenv("QUERY_EMBEDDING_CACHE_SPILL_MAX_ENTRIES", "50000")
+    )
+    # Local semantic fallback index: exact | ivf | auto (ivf from SEMANTIC_INDEX_IVF_MIN_BLOCKS).
+    SEMANTIC_INDEX_BACKEND = os.getenv("SEMANTIC_INDEX_BACKEND", "auto").strip().lower()
+    SEMANTIC_INDEX_IVF_MIN_BLOCKS = int(os.getenv("SEMANTIC_INDEX_IVF_MIN_BLOCKS", "20000"))
+    SEMANTIC_INDEX_IVF_LISTS = int(os.getenv("SEMANTIC_INDEX_IVF_LISTS", "0"))  # 0 -> sqrt(N)
+    SEMANTIC_INDEX_IVF_NPROBE = int(os.getenv("SEMANTIC_INDEX_IVF_NPROBE", "32"))
 
     # === Voyage rerank ===
     VOYAGE_API_KEY = os.getenv("VOYAGE_API_KEY")
@@ -0,0 +1,54 @@
+"""
+Request-scoped pinning of the runtime config view.
+
+`pinned_config()` закрепляет в contextvar текущий неизменяемый снимок
+override-слоя (RuntimeConfig) и пустой кэш feature-флагов. Пока снимок
+закреплен, все стадии хода читают один и тот же вид конфигурации без stat
+файла overrides и без повторного разбора env. Contextvar наследуется
+asyncio-задачами и `asyncio.to_thread`, поэтому снимок виден всему ходу.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+
+class PinnedConfig:
+    """Вид конфигурации, закрепленный за одним запросом/ходом."""
+
+    __slots__ = ("owner", "snapshot", "flags", "values")
+
+    def __init__(self, owner: Any, snapshot: Any) -> None:
+        self.owner = owner
+        self.snapshot = snapshot
+        self.flags: Dict[str, bool] = {}
+        self.values: Dict[tuple, str] = {}
+
+
+_PINNED: ContextVar[Optional[PinnedConfig]] = ContextVar("bot_agent_pinned_config", default=None)
+
+
+def current_pinned_config() -> Optional[PinnedConfig]:
+    return _PINNED.get()
+
+
+@contextmanager
+def pinned_config(runtime_config: Any = None) -> Iterator[PinnedConfig]:
+    """
+    Закрепить снимок конфигурации на время блока. Вложенные вызовы
+    переиспользуют уже закрепленный вид: ход видит одну версию целиком.
+    """
+    existing = _PINNED.get()
+    if existing is not None:
+        yield existing
+        return
+    if runtime_config is None:
+        from .config import config as runtime_config
+    view = PinnedConfig(runtime_config, runtime_config.current_snapshot())
+    token = _PINNED.set(view)
+    try:
+        yield view
+    finally:
+        _PINNED.reset(token)
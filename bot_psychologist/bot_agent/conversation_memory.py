@@ -10,15 +10,18 @@ Conversation Memory Module (Phase 4.2)
 import logging
 import json
 import asyncio
+import threading
 import time
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Tuple
 from dataclasses import dataclass, asdict, field
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 from .config import config
-from .semantic_memory import get_semantic_memory, SemanticMemory, TurnEmbedding
+from .semantic_memory import get_semantic_memory, release_semantic_memory, SemanticMemory, TurnEmbedding
 from .storage import SessionManager
 from .working_state import WorkingState
 from .multiagent.turn_summary_service import (
@@ -1286,14 +1289,188 @@ class ConversationMemory:
 
         return result
     
+class ConversationMemoryCache:
+    """
+    LRU-кэш инстансов ConversationMemory с ограничением по размеру и простою.
+
+    При вытеснении инстанс сохраняется (save_to_disk → JSON + SQLite
+    SessionManager), его SemanticMemory отпускается из кэша эмбеддингов;
+    при следующем обращении память лениво поднимается через load_from_disk.
+
+    Под общим lock инстанс только снимается с учета; checkpoint и release идут
+    после lock, чтобы запись одного пользователя не блокировала остальных.
+    Пользователи с ходом в работе (``in_flight``) не вытесняются, а обращение
+    к инстансу, который сейчас сохраняется, возвращает его же, а не копию с диска.
+    """
+
+    def __init__(self, max_size: int = 0, idle_ttl_seconds: float = 0.0) -> None:
+        self.max_size = int(max_size)
+        self.idle_ttl_seconds = float(idle_ttl_seconds)
+        self._items: "OrderedDict[str, Tuple[ConversationMemory, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.idle_evictions = 0
+        self.rehydrations = 0
+        self._evicted_ids: set[str] = set()
+        self._pins: Dict[str, int] = {}
+        self._evicting: Dict[str, ConversationMemory] = {}
+
+    def __contains__(self, user_id: object) -> bool:
+        with self._lock:
+            return user_id in self._items
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def __getitem__(self, user_id: str) -> ConversationMemory:
+        with self._lock:
+            return self._items[user_id][0]
+
+    def __setitem__(self, user_id: str, memory: ConversationMemory) -> None:
+        with self._lock:
+            self._items[user_id] = (memory, time.monotonic())
+            self._items.move_to_end(user_id)
+            victims = self._enforce_limits()
+        self._finish_evictions(victims)
+
+    def pop(self, user_id: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._items.pop(user_id, None)
+        return entry[0] if entry is not None else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._evicted_ids.clear()
+
+    @contextmanager
+    def in_flight(self, user_id: str) -> Iterator[None]:
+        """Закрепить память пользователя на время хода: вытеснение ее пропускает."""
+        with self._lock:
+            self._pins[user_id] = self._pins.get(user_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                remaining = self._pins.get(user_id, 1) - 1
+                if remaining > 0:
+                    self._pins[user_id] = remaining
+                else:
+                    self._pins.pop(user_id, None)
+
+    def get_or_load(self, user_id: str) -> ConversationMemory:
+        with self._lock:
+            victims = self._evict_idle()
+            entry = self._items.get(user_id)
+            evicting = self._evicting.get(user_id)
+            if entry is not None or evicting is not None:
+                memory = entry[0] if entry is not None else evicting
+                if entry is None:
+                    # Инстанс еще сохраняется после вытеснения: забираем его обратно.
+                    self._evicted_ids.discard(user_id)
+                self._items[user_id] = (memory, time.monotonic())
+                self._items.move_to_end(user_id)
+                self.hits += 1
+                logger.info(f"[CONV_MEMORY] cache_hit user_id={user_id} turns={len(memory.turns)}")
+            else:
+                self.misses += 1
+                rehydrated = user_id in self._evicted_ids
+                if rehydrated:
+                    self.rehydrations += 1
+                    self._evicted_ids.discard(user_id)
+                logger.info(f"[CONV_MEMORY] cache_miss user_id={user_id} rehydrate={rehydrated}")
+                memory = ConversationMemory(user_id)
+                memory.load_from_disk()
+                self._items[user_id] = (memory, time.monotonic())
+            victims += self._enforce_limits()
+        self._finish_evictions(victims)
+        return memory
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "idle_evictions": self.idle_evictions,
+                "rehydrations": self.rehydrations,
+            }
+
+    def _evict_idle(self) -> List[Tuple[str, ConversationMemory, str]]:
+        if self.idle_ttl_seconds <= 0:
+            return []
+        deadline = time.monotonic() - self.idle_ttl_seconds
+        victims = []
+        # OrderedDict упорядочен по последнему доступу: самые старые — в начале.
+        for user_id, (_, last_access) in list(self._items.items()):
+            if last_access > deadline:
+                break
+            if user_id in self._pins:
+                continue
+            victims.append(self._detach(user_id, reason="idle_ttl"))
+            self.idle_evictions += 1
+        return victims
+
+    def _enforce_limits(self) -> List[Tuple[str, ConversationMemory, str]]:
+        victims = self._evict_idle()
+        if self.max_size <= 0:
+            return victims
+        excess = len(self._items) - self.max_size
+        for user_id in list(self._items):
+            if excess <= 0:
+                break
+            if user_id in self._pins:
+                continue
+            victims.append(self._detach(user_id, reason="lru"))
+            excess -= 1
+        return victims
+
+    def _detach(self, user_id: str, *, reason: str) -> Tuple[str, ConversationMemory, str]:
+        memory, _ = self._items.pop(user_id)
+        self.evictions += 1
+        self._evicted_ids.add(user_id)
+        self._evicting[user_id] = memory
+        return user_id, memory, reason
+
+    def _finish_evictions(self, victims: List[Tuple[str, ConversationMemory, str]]) -> None:
+        for user_id, memory, reason in victims:
+            try:
+                memory.checkpoint(reason=f"cache_evict_{reason}", persist=True)
+            except Exception as exc:
+                logger.error(f"[CONV_MEMORY] evict checkpoint failed user_id={user_id}: {exc}", exc_info=True)
+            with self._lock:
+                if self._evicting.get(user_id) is memory:
+                    del self._evicting[user_id]
+                entry = self._items.get(user_id)
+                readopted = entry is not None and entry[0] is memory
+            if readopted:
+                logger.info(f"[CONV_MEMORY] cache_evict_cancelled user_id={user_id} reason={reason}")
+                continue
+            if memory.semantic_memory is not None:
+                release_semantic_memory(user_id)
+            logger.info(f"[CONV_MEMORY] cache_evict user_id={user_id} reason={reason}")
+
+
 # Глобальный кэш инстансов памяти
-_memory_instances: Dict[str, ConversationMemory] = {}
+_memory_instances = ConversationMemoryCache(
+    max_size=config.CONVERSATION_MEMORY_CACHE_MAX_USERS,
+    idle_ttl_seconds=config.CONVERSATION_MEMORY_CACHE_IDLE_TTL_SECONDS,
+)
 
 
 def get_conversation_memory(user_id: str = "default") -> ConversationMemory:
     """
     Получить экземпляр памяти диалога для пользователя.
-    спользует кэш для оптимизации.
+    Использует ограниченный LRU-кэш; вытесненные инстансы
+    поднимаются заново из SQLite/JSON при следующем обращении.
     
     Args:
         user_id: ID пользователя
@@ -1301,14 +1478,14 @@ def get_conversation_memory(user_id: str = "default") -> ConversationMemory:
     Returns:
         ConversationMemory для данного пользователя
     """
-    if user_id not in _memory_instances:
-        logger.info(f"[CONV_MEMORY] cache_miss user_id={user_id}")
-        memory = ConversationMemory(user_id)
-        memory.load_from_disk()
-        _memory_instances[user_id] = memory
-    else:
-        logger.info(
-            f"[CONV_MEMORY] cache_hit user_id={user_id} turns={len(_memory_instances[user_id].turns)}"
-        )
-    
-    return _memory_instances[user_id]
+    return _memory_instances.get_or_load(user_id)
+
+
+def conversation_memory_in_flight(user_id: str):
+    """Контекст хода: память пользователя не вытесняется, пока ход не завершен."""
+    return _memory_instances.in_flight(user_id)
+
+
+def get_conversation_memory_cache_stats() -> Dict[str, Any]:
+    """Счетчики кэша памяти диалогов (hits/misses/evictions) для сайзинга."""
+    return _memory_instances.stats()
@@ -9,16 +9,107 @@ import os
 import time
 import asyncio
 import logging
+import threading
+import weakref
 from dataclasses import dataclass
+from importlib.util import find_spec
 from typing import List, Optional
 
 import httpx
 
 BOT_DB_URL = os.getenv("BOT_DB_URL", "http://localhost:8003")
 QUERY_TIMEOUT = float(os.getenv("BOT_DB_TIMEOUT", "10.0"))
+POOL_MAX_CONNECTIONS = int(os.getenv("BOT_DB_POOL_MAX_CONNECTIONS", "32"))
+POOL_MAX_KEEPALIVE = int(os.getenv("BOT_DB_POOL_MAX_KEEPALIVE", "16"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("BOT_DB_POOL_KEEPALIVE_EXPIRY", "30.0"))
+HTTP2_ENABLED = os.getenv("BOT_DB_HTTP2", "False").lower() == "true"
 logger = logging.getLogger(__name__)
 
 
+# === Process-wide connection pool ===
+# Sync-клиент один на процесс (httpx.Client потокобезопасен). AsyncClient
+# привязан к event loop, поэтому кэшируется по loop — как shared AsyncOpenAI.
+_POOL_LOCK = threading.Lock()
+_SHARED_SYNC_CLIENT: Optional[httpx.Client] = None
+_SHARED_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_HTTP2_WARNED = False
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max(1, POOL_MAX_CONNECTIONS),
+        max_keepalive_connections=max(0, POOL_MAX_KEEPALIVE),
+        keepalive_expiry=max(0.0, POOL_KEEPALIVE_EXPIRY),
+    )
+
+
+def _http2_available() -> bool:
+    global _HTTP2_WARNED
+    if not HTTP2_ENABLED:
+        return False
+    if find_spec("h2") is not None:
+        return True
+    if not _HTTP2_WARNED:
+        _HTTP2_WARNED = True
+        logger.warning("[DB_API] BOT_DB_HTTP2=true but 'h2' is not installed; using HTTP/1.1")
+    return False
+
+
+def get_shared_http_client() -> httpx.Client:
+    """Пулированный sync-клиент к Bot_data_base (keep-alive между запросами)."""
+    global _SHARED_SYNC_CLIENT
+    with _POOL_LOCK:
+        if _SHARED_SYNC_CLIENT is None or _SHARED_SYNC_CLIENT.is_closed:
+            _SHARED_SYNC_CLIENT = httpx.Client(
+                timeout=QUERY_TIMEOUT,
+                limits=_pool_limits(),
+                http2=_http2_available(),
+            )
+        return _SHARED_SYNC_CLIENT
+
+
+def get_shared_async_http_client() -> httpx.AsyncClient:
+    """Пулированный AsyncClient для текущего event loop."""
+    loop = asyncio.get_running_loop()
+    with _POOL_LOCK:
+        client = _SHARED_ASYNC_CLIENTS.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=QUERY_TIMEOUT,
+                limits=_pool_limits(),
+                http2=_http2_available(),
+            )
+            _SHARED_ASYNC_CLIENTS[loop] = client
+        return client
+
+
+def close_shared_http_clients() -> None:
+    """Закрыть sync-пул (вызывается на shutdown)."""
+    global _SHARED_SYNC_CLIENT
+    with _POOL_LOCK:
+        client, _SHARED_SYNC_CLIENT = _SHARED_SYNC_CLIENT, None
+    if client is not None:
+        client.close()
+
+
+async def aclose_shared_http_clients() -> int:
+    """Закрыть sync-пул и AsyncClient текущего loop; вернуть число закрытых клиентов."""
+    loop = asyncio.get_running_loop()
+    with _POOL_LOCK:
+        async_client = _SHARED_ASYNC_CLIENTS.pop(loop, None)
+        sync_client = _SHARED_SYNC_CLIENT
+    closed = 0
+    if async_client is not None:
+        await async_client.aclose()
+        closed += 1
+    if sync_client is not None:
+        close_shared_http_clients()
+        closed += 1
+    return closed
+
+
 @dataclass
 class RetrievedChunk:
     chunk_id: str
@@ -49,10 +140,28 @@ class DBApiClient:
     При недоступности сервиса бросает DBApiUnavailableError.
     """
 
-    def __init__(self, base_url: str = BOT_DB_URL, timeout: float = QUERY_TIMEOUT, retries: int = 2):
+    def __init__(
+        self,
+        base_url: str = BOT_DB_URL,
+        timeout: float = QUERY_TIMEOUT,
+        retries: int = 2,
+        *,
+        http_client: Optional[httpx.Client] = None,
+        async_http_client: Optional[httpx.AsyncClient] = None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
         self.retries = max(1, int(retries))
+        self._http_client = http_client
+        self._async_http_client = async_http_client
+
+    def _client(self) -> httpx.Client:
+        return self._http_client if self._http_client is not None else get_shared_http_client()
+
+    def _async_client(self) -> httpx.AsyncClient:
+        if self._async_http_client is not None:
+            return self._async_http_client
+        return get_shared_async_http_client()
 
     def query(
         self,
@@ -78,11 +187,14 @@ class DBApiClient:
         last_error: Exception | None = None
         for attempt in range(1, self.retries + 1):
             try:
-                with httpx.Client(timeout=self.timeout) as client:
-                    response = client.post(f"{self.base_url}/api/query/", json=payload)
-                    response.raise_for_status()
-                    data = response.json()
-                    return [RetrievedChunk(**c) for c in data.get("chunks", [])]
+                response = self._client().post(
+                    f"{self.base_url}/api/query/",
+                    json=payload,
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                data = response.json()
+                return [RetrievedChunk(**c) for c in data.get("chunks", [])]
             except httpx.ConnectError as exc:
                 last_error = exc
             except httpx.TimeoutException as exc:
@@ -126,11 +238,14 @@ class DBApiClient:
         last_error: Exception | None = None
         for attempt in range(1, self.retries + 1):
             try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    response = await client.post(f"{self.base_url}/api/query/", json=payload)
-                    response.raise_for_status()
-                    data = response.json()
-                    return [RetrievedChunk(**c) for c in data.get("chunks", [])]
+                response = await self._async_client().post(
+                    f"{self.base_url}/api/query/",
+                    json=payload,
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                data = response.json()
+                return [RetrievedChunk(**c) for c in data.get("chunks", [])]
             except httpx.ConnectError as exc:
                 last_error = exc
             except httpx.TimeoutException as exc:
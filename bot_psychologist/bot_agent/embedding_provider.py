@@ -5,6 +5,8 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import List
 
+from .embedding_cache import get_query_embedding_cache
+
 
 class EmbeddingProvider(ABC):
     """Unified embedding interface used by bot components."""
@@ -25,6 +27,9 @@ class EmbeddingProvider(ABC):
 class SentenceTransformerEmbeddingProvider(EmbeddingProvider):
     """Generic sentence-transformers provider without special prefixes."""
 
+    query_prefix = ""
+    passage_prefix = ""
+
     def __init__(self, model_name: str, device: str = "auto", normalize: bool = True):
         from sentence_transformers import SentenceTransformer
 
@@ -55,20 +60,31 @@ class SentenceTransformerEmbeddingProvider(EmbeddingProvider):
         except Exception:
             return vectors
 
-    def embed_query(self, text: str) -> List[float]:
+    def _prefix_mode(self) -> str:
+        return f"{self.query_prefix or 'raw'}|norm={int(self._normalize)}"
+
+    def _encode_query(self, text: str) -> List[float]:
         vec = self._model.encode(
-            text,
+            f"{self.query_prefix}{text}",
             show_progress_bar=False,
             convert_to_numpy=True,
             normalize_embeddings=self._normalize,
         )
         return self._to_list(vec)
 
+    def embed_query(self, text: str) -> List[float]:
+        return get_query_embedding_cache().get_or_compute(
+            self._model_name,
+            self._prefix_mode(),
+            text,
+            self._encode_query,
+        )
+
     def embed_passages(self, texts: List[str]) -> List[List[float]]:
         if not texts:
             return []
         vecs = self._model.encode(
-            texts,
+            [f"{self.passage_prefix}{t}" for t in texts],
             show_progress_bar=False,
             convert_to_numpy=True,
             normalize_embeddings=self._normalize,
@@ -86,6 +102,9 @@ class E5EmbeddingProvider(SentenceTransformerEmbeddingProvider):
     - passages: "passage: <text>"
     """
 
+    query_prefix = "query: "
+    passage_prefix = "passage: "
+
     def __init__(self, model_name: str = "intfloat/multilingual-e5-base", device: str = "auto"):
         lowered = (model_name or "").lower()
         if "large" in lowered:
@@ -104,13 +123,6 @@ class E5EmbeddingProvider(SentenceTransformerEmbeddingProvider):
 
         super().__init__(model_name=model_name, device=device, normalize=True)
 
-    def embed_query(self, text: str) -> List[float]:
-        return super().embed_query(f"query: {text}")
-
-    def embed_passages(self, texts: List[str]) -> List[List[float]]:
-        prefixed = [f"passage: {t}" for t in texts]
-        return super().embed_passages(prefixed)
-
 
 def create_embedding_provider(
     model_name: str,
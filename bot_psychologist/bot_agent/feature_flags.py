@@ -9,6 +9,8 @@ from typing import Any, Dict
 
 from dotenv import load_dotenv
 
+from .config_context import current_pinned_config
+
 _PROJECT_ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(_PROJECT_ROOT / ".env")
 _PROCESS_START_TIME_UTC = datetime.now(timezone.utc).isoformat()
@@ -47,6 +49,10 @@ _DEFAULTS: Dict[str, bool] = {
     "WRITER_KB_PAYLOAD_ENABLED": False,
     "RETRIEVAL_CURRENT_TURN_FOCUS_ENABLED": False,
     "SEMANTIC_CARDS_PILOT_ENABLED": False,
+    # Writer provider deltas are streamed to /questions/adaptive-stream.
+    "WRITER_TOKEN_STREAMING_ENABLED": True,
+    # RAG for the pre-planner query runs concurrently with the retrieval planner LLM call.
+    "SPECULATIVE_RAG_ENABLED": True,
 }
 
 _STRING_DEFAULTS: Dict[str, str] = {
@@ -100,7 +106,12 @@ def _as_bool(value: str | None, default: bool) -> bool:
 
 
 class FeatureFlags:
-    """Env-backed feature flags (read on each access)."""
+    """Env-backed feature flags.
+
+    Вне закрепленного вида (config_context.pinned_config) env читается на
+    каждое обращение; внутри хода значение резолвится один раз и
+    запоминается в закрепленном виде до конца запроса.
+    """
 
     @staticmethod
     def app_env() -> str:
@@ -200,7 +211,13 @@ class FeatureFlags:
     def enabled(name: str) -> bool:
         if name not in _DEFAULTS:
             return False
-        return bool(FeatureFlags.resolve_bool(name)["effective_value"])
+        pinned = current_pinned_config()
+        if pinned is None:
+            return bool(FeatureFlags.resolve_bool(name)["effective_value"])
+        value = pinned.flags.get(name)
+        if value is None:
+            value = pinned.flags[name] = bool(FeatureFlags.resolve_bool(name)["effective_value"])
+        return value
 
     @staticmethod
     def is_enabled(name: str) -> bool:
@@ -216,6 +233,17 @@ class FeatureFlags:
 
     @staticmethod
     def value(name: str, default: str = "") -> str:
+        pinned = current_pinned_config()
+        if pinned is not None:
+            key = (name, default)
+            cached = pinned.values.get(key)
+            if cached is None:
+                cached = pinned.values[key] = FeatureFlags._read_value(name, default)
+            return cached
+        return FeatureFlags._read_value(name, default)
+
+    @staticmethod
+    def _read_value(name: str, default: str) -> str:
         if name in _STRING_DEFAULTS:
             return os.getenv(name, _STRING_DEFAULTS[name])
         return os.getenv(name, default)
@@ -0,0 +1,229 @@
+"""
+On-disk cache of the SimpleRetriever index.
+
+Валидность кэша определяется дешевым манифестом источников: для каждого
+файла хранится (path, size, mtime_ns, sha256), и sha256 пересчитывается
+только у файлов, чей size/mtime изменился. Артефакты лежат несжатыми
+`.npy` (CSR-компоненты TF-IDF матрицы, semantic-матрица, смещения блоков)
+и открываются через np.load(mmap_mode="r"): старт воркера почти мгновенный,
+а несколько воркеров делят страницы через page cache. Блоки хранятся в
+JSONL и гидратируются лениво при обращении по индексу.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import joblib
+import numpy as np
+
+from .data_loader import Block
+
+logger = logging.getLogger(__name__)
+
+INDEX_LAYOUT_VERSION = "retriever_index_v1"
+MANIFEST_NAME = "manifest.json"
+_HASH_CHUNK_BYTES = 1 << 20
+_BLOCK_FIELDS = {f.name for f in fields(Block)}
+
+
+def _sha256_file(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def fingerprint_sources(
+    files: Iterable[Path],
+    previous: Optional[Sequence[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    (path, size, mtime_ns, sha256) по каждому файлу; sha256 берется из
+    предыдущего манифеста, если size и mtime не изменились.
+    """
+    known = {entry.get("path"): entry for entry in (previous or []) if isinstance(entry, dict)}
+    entries: List[Dict[str, Any]] = []
+    for file_path in files:
+        try:
+            stat = file_path.stat()
+        except OSError:
+            continue
+        key = str(file_path.resolve())
+        old = known.get(key)
+        if old and old.get("size") == stat.st_size and old.get("mtime_ns") == stat.st_mtime_ns:
+            digest = old.get("sha256")
+        else:
+            digest = _sha256_file(file_path)
+        entries.append({"path": key, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest})
+    return entries
+
+
+def read_manifest(cache_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        manifest = json.loads((cache_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("layout_version") != INDEX_LAYOUT_VERSION:
+        return None
+    return manifest
+
+
+class LazyBlockList(Sequence[Block]):
+    """Read-only список блоков поверх mmap JSONL: Block собирается при первом обращении."""
+
+    def __init__(self, jsonl_path: Path, offsets: np.ndarray, max_hydrated: int = 4096) -> None:
+        self._path = jsonl_path
+        self._offsets = offsets
+        self._max_hydrated = max(1, int(max_hydrated))
+        self._hydrated: "OrderedDict[int, Block]" = OrderedDict()
+        self._lock = threading.Lock()
+        with open(jsonl_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self) -> int:
+        return max(0, len(self._offsets) - 1)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        with self._lock:
+            block = self._hydrated.get(idx)
+            if block is not None:
+                self._hydrated.move_to_end(idx)
+                return block
+        start, end = int(self._offsets[idx]), int(self._offsets[idx + 1])
+        data = json.loads(self._mmap[start:end].decode("utf-8"))
+        block = Block(**{key: value for key, value in data.items() if key in _BLOCK_FIELDS})
+        with self._lock:
+            self._hydrated[idx] = block
+            while len(self._hydrated) > self._max_hydrated:
+                self._hydrated.popitem(last=False)
+        return block
+
+    @property
+    def hydrated_count(self) -> int:
+        return len(self._hydrated)
+
+
+@dataclass
+class LoadedIndex:
+    vectorizer: Any
+    tfidf_matrix: Any
+    blocks: LazyBlockList
+    semantic_matrix: Optional[np.ndarray]
+    vector_index: Any
+    manifest: Dict[str, Any]
+
+
+def save_index(
+    cache_dir: Path,
+    *,
+    fingerprint: str,
+    sources: List[Dict[str, Any]],
+    vectorizer: Any,
+    tfidf_matrix: Any,
+    blocks: Sequence[Block],
+    semantic_matrix: Optional[np.ndarray],
+    embedding_model: str,
+    vector_index: Any = None,
+) -> None:
+    """Записать артефакты во временный каталог и атомарно подменить кэш."""
+    cache_dir = Path(cache_dir)
+    tmp_dir = cache_dir.with_name(f"{cache_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    try:
+        matrix = tfidf_matrix.tocsr()
+        np.save(tmp_dir / "tfidf_data.npy", matrix.data)
+        np.save(tmp_dir / "tfidf_indices.npy", matrix.indices)
+        np.save(tmp_dir / "tfidf_indptr.npy", matrix.indptr)
+        joblib.dump(vectorizer, tmp_dir / "vectorizer.joblib")
+        if semantic_matrix is not None:
+            np.save(tmp_dir / "semantic.npy", np.ascontiguousarray(semantic_matrix, dtype=np.float32))
+            if vector_index is not None:
+                vector_index.save(tmp_dir)
+
+        offsets = [0]
+        with open(tmp_dir / "blocks.jsonl", "wb") as out:
+            for block in blocks:
+                line = (json.dumps(asdict(block), ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+                out.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(tmp_dir / "blocks_offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+        manifest = {
+            "layout_version": INDEX_LAYOUT_VERSION,
+            "fingerprint": fingerprint,
+            "sources": sources,
+            "embedding_model": embedding_model,
+            "blocks_count": len(blocks),
+            "tfidf_shape": list(matrix.shape),
+            "has_semantic": semantic_matrix is not None,
+            "vector_index": vector_index.stats() if vector_index is not None else None,
+            "created_at": datetime.now().isoformat(),
+        }
+        (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        # Старый каталог убирается после подмены: открытые mmap других воркеров остаются валидными.
+        old_dir = cache_dir.with_name(f"{cache_dir.name}.old-{os.getpid()}")
+        if cache_dir.exists():
+            os.replace(cache_dir, old_dir)
+        os.replace(tmp_dir, cache_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_index(
+    cache_dir: Path,
+    fingerprint: str,
+    embedding_model: str,
+    *,
+    nprobe: int = 32,
+) -> Optional[LoadedIndex]:
+    """Открыть кэш через mmap, если отпечаток совпадает; иначе None."""
+    from scipy.sparse import csr_matrix
+
+    from .retrieval.vector_index import load_vector_index
+
+    cache_dir = Path(cache_dir)
+    manifest = read_manifest(cache_dir)
+    if manifest is None or manifest.get("fingerprint") != fingerprint:
+        return None
+    data = np.load(cache_dir / "tfidf_data.npy", mmap_mode="r")
+    indices = np.load(cache_dir / "tfidf_indices.npy", mmap_mode="r")
+    indptr = np.load(cache_dir / "tfidf_indptr.npy", mmap_mode="r")
+    matrix = csr_matrix((data, indices, indptr), shape=tuple(manifest["tfidf_shape"]), copy=False)
+    semantic = None
+    vector_index = None
+    if manifest.get("has_semantic") and manifest.get("embedding_model") == embedding_model:
+        semantic = np.load(cache_dir / "semantic.npy", mmap_mode="r")
+        vector_index = load_vector_index(cache_dir, semantic, nprobe=nprobe)
+    offsets = np.load(cache_dir / "blocks_offsets.npy", mmap_mode="r")
+    return LoadedIndex(
+        vectorizer=joblib.load(cache_dir / "vectorizer.joblib", mmap_mode="r"),
+        tfidf_matrix=matrix,
+        blocks=LazyBlockList(cache_dir / "blocks.jsonl", offsets),
+        semantic_matrix=semantic,
+        vector_index=vector_index,
+        manifest=manifest,
+    )
@@ -7,13 +7,19 @@ import inspect
 import logging
 from typing import Any, AsyncIterator, Callable, Optional
 
+from .multiagent.writer_stream import (
+    WriterStreamChannel,
+    writer_stream_scope,
+    writer_token_streaming_enabled,
+)
+
 logger = logging.getLogger(__name__)
 
 
-def _default_answer_fn() -> Callable[..., dict]:
-    from .multiagent.runtime_adapter import run_multiagent_adaptive_sync
+def _default_answer_fn() -> Callable[..., Any]:
+    from .multiagent.runtime_adapter import run_multiagent_adaptive_async
 
-    return run_multiagent_adaptive_sync
+    return run_multiagent_adaptive_async
 
 
 async def stream_answer_tokens(
@@ -25,15 +31,18 @@ async def stream_answer_tokens(
     include_feedback_prompt: bool = False,
     debug: bool = False,
     on_complete: Optional[Callable[[dict], None]] = None,
-    answer_fn: Optional[Callable[..., dict]] = None,
+    answer_fn: Optional[Callable[..., Any]] = None,
 ) -> AsyncIterator[str]:
     """
     Stream answer text as async tokens without blocking FastAPI event loop.
 
-    Current implementation executes sync runtime in thread pool and yields
-    word-split tokens. Native SDK token streaming is a next step (PRD-006).
+    Async runtimes (default: run_multiagent_adaptive_async) are awaited on the
+    current loop with a WriterStreamChannel bound to the turn: writer deltas
+    are yielded as they arrive (behind the validator holdback). After the run
+    the final answer is authoritative: the unstreamed tail is yielded, or an
+    AnswerReplacement token if post-processing changed the streamed prefix.
+    Sync runtimes run in thread pool and their answer is word-split.
     """
-    loop = asyncio.get_running_loop()
     runtime_fn = answer_fn or _default_answer_fn()
 
     runtime_kwargs = {
@@ -55,10 +64,34 @@ async def stream_answer_tokens(
     except (TypeError, ValueError):
         runtime_kwargs["schedule_summary_task"] = False
 
-    result: dict = await loop.run_in_executor(
-        None,
-        lambda: runtime_fn(**runtime_kwargs),
-    )
+    channel: Optional[WriterStreamChannel] = None
+    if inspect.iscoroutinefunction(runtime_fn):
+        if writer_token_streaming_enabled():
+            channel = WriterStreamChannel()
+        with writer_stream_scope(channel):
+            task = asyncio.ensure_future(runtime_fn(**runtime_kwargs))
+        if channel is not None:
+            try:
+                async for chunk in channel.drain_until(task):
+                    yield chunk
+            except BaseException:
+                task.cancel()
+                raise
+        result = await task
+    else:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None,
+            lambda: runtime_fn(**runtime_kwargs),
+        )
+        if inspect.isawaitable(result):
+            result = await result
+    if not isinstance(result, dict):
+        result = {}
+
+    answer = str(result.get("answer", "") or "")
+    if channel is not None and isinstance(result.get("debug"), dict):
+        result["debug"]["writer_stream"] = channel.trace(answer)
 
     if on_complete:
         try:
@@ -66,7 +99,11 @@ async def stream_answer_tokens(
         except Exception as cb_exc:
             logger.warning("[STREAM] on_complete callback failed: %s", cb_exc)
 
-    answer = str(result.get("answer", "") or "")
+    if channel is not None and channel.released_text:
+        for token in channel.reconcile(answer):
+            yield token
+        return
+
     words = answer.split(" ") if answer else []
     for idx, word in enumerate(words):
         token = word + (" " if idx < len(words) - 1 else "")
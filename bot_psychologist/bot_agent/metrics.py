@@ -0,0 +1,497 @@
+"""Process metrics registry with Prometheus text exposition (``/metrics``).
+
+Запись на горячем пути без блокировок: ``Histogram.observe`` и ``Counter.inc``
+только кладут кортеж в ``collections.deque`` (append атомарен под GIL);
+агрегация в бакеты происходит при снимке (scrape/flush) или когда очередь
+перерастает порог — тогда ее разбирает тот поток, которому достался
+неблокирующий ``acquire``.
+
+Multi-worker uvicorn: при заданном ``METRICS_MULTIPROC_DIR`` каждый процесс
+пишет свой снимок в ``<dir>/metrics_<pid>.json`` (фоновый поток раз в
+``METRICS_FLUSH_INTERVAL_SECONDS`` и на каждом scrape), а ``/metrics``
+складывает снимки всех воркеров: counters/histograms суммируются, включая
+завершившиеся процессы; gauges — ``sum``/``max`` только по свежим снимкам.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+GAUGE_MODES = ("sum", "max")
+
+_DRAIN_THRESHOLD = 4096
+_SNAPSHOT_PREFIX = "metrics_"
+
+# Снимок метрики (и формат файла воркера):
+# {"kind", "help", "labelnames", "mode", "buckets"?, "samples": [[labels, value]]},
+# где value — число, а для histogram — {"counts": [...], "sum": float, "count": int}.
+MetricFamily = dict[str, Any]
+
+
+def gauge_family(
+    name: str,
+    documentation: str,
+    labelnames: Iterable[str],
+    samples: Iterable[tuple[Iterable[Any], float]],
+    *,
+    mode: str = "sum",
+) -> tuple[str, MetricFamily]:
+    """Семейство gauge для collector'а (значения, считанные в момент снимка)."""
+    return name, {
+        "kind": "gauge",
+        "help": documentation,
+        "labelnames": list(labelnames),
+        "mode": mode,
+        "samples": [[[str(v) for v in labels], float(value)] for labels, value in samples],
+    }
+
+
+def counter_family(
+    name: str,
+    documentation: str,
+    labelnames: Iterable[str],
+    samples: Iterable[tuple[Iterable[Any], float]],
+) -> tuple[str, MetricFamily]:
+    """Семейство counter для collector'а (накопительные счетчики из ``*_stats()``)."""
+    name, family = gauge_family(name, documentation, labelnames, samples)
+    family.update({"kind": "counter", "mode": "sum"})
+    return name, family
+
+
+Collector = Callable[[], Iterable[tuple[str, MetricFamily]]]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, "_Metric"] = {}
+        self._collectors: list[Collector] = []
+        self._ratios: dict[str, tuple[str, str, str]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def register_collector(self, collector: Collector) -> None:
+        """Функция, отдающая семейства на момент снимка (gauge_family/counter_family)."""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def register_ratio(self, name: str, documentation: str, *, hits: str, misses: str) -> None:
+        """Производный gauge hits/(hits+misses), считается после слияния воркеров."""
+        with self._lock:
+            self._ratios[name] = (documentation, hits, misses)
+
+    def snapshot(self) -> dict[str, MetricFamily]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = {metric.name: metric.collect() for metric in metrics}
+        for collector in collectors:
+            try:
+                for name, family in collector():
+                    families[name] = family
+            except Exception as exc:  # noqa: BLE001 - сломанный collector не должен ронять /metrics
+                logger.warning("[METRICS] collector %s failed: %s", getattr(collector, "__name__", collector), exc)
+        return families
+
+    def derive_ratios(self, families: dict[str, MetricFamily]) -> dict[str, MetricFamily]:
+        with self._lock:
+            ratios = dict(self._ratios)
+        for name, (documentation, hits_name, misses_name) in ratios.items():
+            hits, misses = families.get(hits_name), families.get(misses_name)
+            if hits is None or misses is None:
+                continue
+            misses_by_labels = {tuple(labels): float(value) for labels, value in misses["samples"]}
+            samples = []
+            for labels, value in hits["samples"]:
+                lookups = float(value) + misses_by_labels.get(tuple(labels), 0.0)
+                samples.append((labels, float(value) / lookups if lookups else 0.0))
+            families[name] = gauge_family(name, documentation, hits["labelnames"], samples, mode="max")[1]
+        return families
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        *,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._pending: deque[tuple[tuple[Any, ...], float]] = deque()
+        self._drain_lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _push(self, labels: tuple[Any, ...], value: float) -> None:
+        pending = self._pending
+        pending.append((labels, value))
+        if len(pending) > _DRAIN_THRESHOLD and self._drain_lock.acquire(blocking=False):
+            try:
+                self._drain_locked()
+            finally:
+                self._drain_lock.release()
+
+    def _drain_locked(self) -> None:
+        pending = self._pending
+        while True:
+            try:
+                labels, value = pending.popleft()
+            except IndexError:
+                return
+            if len(labels) != len(self.labelnames):
+                logger.warning("[METRICS] %s: expected labels %s, got %r", self.name, self.labelnames, labels)
+                continue
+            self._apply(tuple(str(label) for label in labels), value)
+
+    def _apply(self, labels: tuple[str, ...], value: float) -> None:
+        raise NotImplementedError
+
+    def _samples(self) -> list[list[Any]]:
+        raise NotImplementedError
+
+    def collect(self) -> MetricFamily:
+        with self._drain_lock:
+            self._drain_locked()
+            samples = self._samples()
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "mode": "sum",
+            "samples": samples,
+        }
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("counter can only increase")
+        self._push(labels, amount)
+
+    def _apply(self, labels: tuple[str, ...], value: float) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + float(value)
+
+    def _samples(self) -> list[list[Any]]:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Gauge с прямой записью значения (присваивание в dict атомарно под GIL)."""
+
+    kind = "gauge"
+
+    def __init__(self, *args: Any, mode: str = "sum", **kwargs: Any) -> None:
+        if mode not in GAUGE_MODES:
+            raise ValueError(f"unknown gauge mode: {mode}")
+        super().__init__(*args, **kwargs)
+        self.mode = mode
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: Any) -> None:
+        self._values[tuple(str(label) for label in labels)] = float(value)
+
+    def _apply(self, labels: tuple[str, ...], value: float) -> None:  # pragma: no cover - set() пишет напрямую
+        self._values[labels] = float(value)
+
+    def _samples(self) -> list[list[Any]]:
+        return [[list(labels), value] for labels, value in dict(self._values).items()]
+
+    def collect(self) -> MetricFamily:
+        family = super().collect()
+        family["mode"] = self.mode
+        return family
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args: Any, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        # labels -> [counts по бакетам (+Inf последним), sum, count]
+        self._values: dict[tuple[str, ...], list[Any]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        self._push(labels, value)
+
+    def _apply(self, labels: tuple[str, ...], value: float) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self._values[labels] = state
+        value = float(value)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    def _samples(self) -> list[list[Any]]:
+        return [
+            [list(labels), {"counts": list(counts), "sum": total, "count": count}]
+            for labels, (counts, total, count) in self._values.items()
+        ]
+
+    def collect(self) -> MetricFamily:
+        family = super().collect()
+        family["buckets"] = list(self.buckets)
+        return family
+
+
+# --------------------------------------------------------------------------- #
+# Multiprocess snapshots
+# --------------------------------------------------------------------------- #
+
+
+def _multiproc_dir() -> Optional[Path]:
+    raw = str(getattr(config, "METRICS_MULTIPROC_DIR", "") or os.getenv("METRICS_MULTIPROC_DIR", "")).strip()
+    return Path(raw) if raw else None
+
+
+def _flush_interval() -> float:
+    return max(0.5, float(getattr(config, "METRICS_FLUSH_INTERVAL_SECONDS", 5.0) or 5.0))
+
+
+def flush_snapshot(registry: MetricsRegistry = REGISTRY, *, snapshot: Optional[dict] = None) -> Optional[Path]:
+    """Записать снимок процесса в ``METRICS_MULTIPROC_DIR`` (атомарно через replace)."""
+    directory = _multiproc_dir()
+    if directory is None:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{_SNAPSHOT_PREFIX}{os.getpid()}.json"
+    tmp_path = path.with_suffix(".tmp")
+    payload = {"pid": os.getpid(), "written_at": time.time(), "families": snapshot or registry.snapshot()}
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_worker_snapshots(directory: Path) -> list[dict[str, Any]]:
+    own_name = f"{_SNAPSHOT_PREFIX}{os.getpid()}.json"
+    snapshots: list[dict[str, Any]] = []
+    for path in sorted(directory.glob(f"{_SNAPSHOT_PREFIX}*.json")):
+        if path.name == own_name:
+            continue
+        try:
+            snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as exc:
+            logger.warning("[METRICS] skip unreadable snapshot %s: %s", path.name, exc)
+    return snapshots
+
+
+def _merge_family(target: MetricFamily, family: MetricFamily, *, include_gauges: bool) -> None:
+    kind = target["kind"]
+    if kind == "gauge" and not include_gauges:
+        return
+    by_labels = {tuple(labels): index for index, (labels, _) in enumerate(target["samples"])}
+    for labels, value in family.get("samples", []):
+        key = tuple(labels)
+        if key not in by_labels:
+            if kind == "histogram":
+                value = {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]}
+            target["samples"].append([list(labels), value])
+            by_labels[key] = len(target["samples"]) - 1
+            continue
+        current = target["samples"][by_labels[key]]
+        if kind == "histogram":
+            if list(family.get("buckets", [])) != list(target.get("buckets", [])):
+                continue
+            current[1]["counts"] = [a + b for a, b in zip(current[1]["counts"], value["counts"])]
+            current[1]["sum"] += value["sum"]
+            current[1]["count"] += value["count"]
+        elif kind == "gauge" and target.get("mode") == "max":
+            current[1] = max(float(current[1]), float(value))
+        else:
+            current[1] = float(current[1]) + float(value)
+
+
+def collect_merged(registry: MetricsRegistry = REGISTRY) -> dict[str, MetricFamily]:
+    """Снимок процесса + снимки остальных воркеров (если включен multiprocess)."""
+    families = registry.snapshot()
+    directory = _multiproc_dir()
+    if directory is not None:
+        try:
+            flush_snapshot(registry, snapshot=families)
+        except OSError as exc:
+            logger.warning("[METRICS] snapshot flush failed: %s", exc)
+        families = json.loads(json.dumps(families))
+        if directory.exists():
+            stale_after = 3 * _flush_interval()
+            now = time.time()
+            for worker in _read_worker_snapshots(directory):
+                fresh = now - float(worker.get("written_at", 0.0) or 0.0) <= stale_after
+                for name, family in dict(worker.get("families", {}) or {}).items():
+                    if name not in families:
+                        if family.get("kind") == "gauge" and not fresh:
+                            continue
+                        families[name] = {**family, "samples": []}
+                    _merge_family(families[name], family, include_gauges=fresh)
+    return registry.derive_ratios(families)
+
+
+# --------------------------------------------------------------------------- #
+# Text exposition
+# --------------------------------------------------------------------------- #
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(value)
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: tuple[str, str] | None = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_text(families: dict[str, MetricFamily]) -> str:
+    lines: list[str] = []
+    for name in sorted(families):
+        family = families[name]
+        kind = family["kind"]
+        labelnames = family.get("labelnames", [])
+        lines.append(f"# HELP {name} {_escape(str(family.get('help', '')))}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(family.get("samples", []), key=lambda item: list(item[0])):
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            bounds = [*family.get("buckets", []), math.inf]
+            for bound, count in zip(bounds, value["counts"]):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {_format_value(cumulative)}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(value['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {_format_value(value['count'])}")
+    return "\n".join(lines) + "\n"
+
+
+def render_latest(registry: MetricsRegistry = REGISTRY) -> str:
+    return render_text(collect_merged(registry))
+
+
+# --------------------------------------------------------------------------- #
+# Background flusher (только при METRICS_MULTIPROC_DIR)
+# --------------------------------------------------------------------------- #
+
+_flusher_lock = threading.Lock()
+_flusher_stop: Optional[threading.Event] = None
+
+
+def start_metrics_flusher(registry: MetricsRegistry = REGISTRY) -> bool:
+    """Запустить фоновую запись снимков процесса; False, если multiprocess выключен."""
+    global _flusher_stop
+    if _multiproc_dir() is None:
+        return False
+    with _flusher_lock:
+        if _flusher_stop is not None:
+            return True
+        stop = threading.Event()
+        _flusher_stop = stop
+
+    def _loop() -> None:
+        while not stop.wait(_flush_interval()):
+            try:
+                flush_snapshot(registry)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("[METRICS] snapshot flush failed: %s", exc)
+
+    threading.Thread(target=_loop, name="metrics-flusher", daemon=True).start()
+    return True
+
+
+def stop_metrics_flusher(registry: MetricsRegistry = REGISTRY) -> None:
+    """Остановить фоновую запись и сбросить финальный снимок процесса."""
+    global _flusher_stop
+    with _flusher_lock:
+        stop, _flusher_stop = _flusher_stop, None
+    if stop is None:
+        return
+    stop.set()
+    try:
+        flush_snapshot(registry)
+    except OSError as exc:
+        logger.warning("[METRICS] final snapshot flush failed: %s", exc)
+
+
+# --------------------------------------------------------------------------- #
+# Метрики пайплайна
+# --------------------------------------------------------------------------- #
+
+AGENT_LATENCY_SECONDS = Histogram(
+    "bot_agent_latency_seconds",
+    "Latency of multiagent pipeline stages",
+    ("agent",),
+)
+AGENT_ERRORS_TOTAL = Counter(
+    "bot_agent_errors_total",
+    "Failed multiagent pipeline stage runs",
+    ("agent",),
+)
+RETRIEVAL_LATENCY_SECONDS = Histogram(
+    "bot_retrieval_latency_seconds",
+    "RAG retrieval latency by the source that served the result",
+    ("source",),
+)
+LLM_CALLS_TOTAL = Counter(
+    "bot_llm_calls_total",
+    "LLM completions issued by agents",
+    ("model", "api_mode"),
+)
+LLM_TOKENS_TOTAL = Counter(
+    "bot_llm_tokens_total",
+    "LLM tokens reported by the provider",
+    ("model", "kind"),
+)
+LLM_COST_USD_TOTAL = Counter(
+    "bot_llm_cost_usd_total",
+    "Estimated LLM cost in USD",
+    ("model",),
+)
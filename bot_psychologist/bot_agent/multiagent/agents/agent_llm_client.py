@@ -6,11 +6,15 @@
 
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 import logging
-from typing import Any, Optional
+import threading
+from typing import Any, Callable, Optional
+import weakref
 
 from ...config import config
+from ...metrics import LLM_CALLS_TOTAL, LLM_COST_USD_TOTAL, LLM_TOKENS_TOTAL
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +27,21 @@ _JSON_INSTRUCTION = (
 )
 _SDK_CAPABILITY_LOG_KEYS: set[tuple[str, bool, bool, str]] = set()
 
+# USD за 1K токенов; неизвестные модели считаются по "default".
+_COST_PER_1K_TOKENS = {
+    "gpt-5-mini": {"input": 0.00025, "output": 0.00200},
+    "gpt-4o-mini": {"input": 0.00015, "output": 0.00060},
+    "default": {"input": 0.00125, "output": 0.01000},
+}
+
+# AsyncOpenAI держит httpx-пул, привязанный к event loop, поэтому общий клиент
+# кешируется отдельно для каждого loop (uvicorn loop + runtime loop адаптера).
+_SHARED_CLIENTS_LOCK = threading.Lock()
+_SHARED_CLIENTS_BY_LOOP: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+_SHARED_CLIENTS_NO_LOOP: dict[str, Any] = {}
+
 
 @dataclass
 class AgentLLMResult:
@@ -35,6 +54,34 @@ class AgentLLMResult:
     tokens_completion: Optional[int] = None
     tokens_total: Optional[int] = None
     raw_response: Optional[Any] = None
+    streamed: bool = False
+
+
+def estimate_llm_cost(
+    model: str,
+    *,
+    tokens_prompt: Optional[int],
+    tokens_completion: Optional[int],
+) -> Optional[float]:
+    """Estimated USD cost of one completion; None when the provider reported no usage."""
+    if tokens_prompt is None and tokens_completion is None:
+        return None
+    rates = _COST_PER_1K_TOKENS.get(str(model or "").lower(), _COST_PER_1K_TOKENS["default"])
+    prompt = float(tokens_prompt or 0)
+    completion = float(tokens_completion or 0)
+    return round((prompt / 1000.0) * float(rates["input"]) + (completion / 1000.0) * float(rates["output"]), 6)
+
+
+def _record_completion_metrics(result: "AgentLLMResult") -> None:
+    model = str(result.model or "unknown")
+    LLM_CALLS_TOTAL.inc(model, result.api_mode)
+    if result.tokens_prompt:
+        LLM_TOKENS_TOTAL.inc(model, "prompt", amount=result.tokens_prompt)
+    if result.tokens_completion:
+        LLM_TOKENS_TOTAL.inc(model, "completion", amount=result.tokens_completion)
+    cost = estimate_llm_cost(model, tokens_prompt=result.tokens_prompt, tokens_completion=result.tokens_completion)
+    if cost:
+        LLM_COST_USD_TOTAL.inc(model, amount=cost)
 
 
 def _to_int(value: Any) -> Optional[int]:
@@ -54,6 +101,64 @@ def _get_value(obj: Any, key: str, default: Any = None) -> Any:
     return getattr(obj, key, default)
 
 
+def _shared_clients_bucket() -> dict[str, Any]:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _SHARED_CLIENTS_NO_LOOP
+    bucket = _SHARED_CLIENTS_BY_LOOP.get(loop)
+    if bucket is None:
+        bucket = {}
+        _SHARED_CLIENTS_BY_LOOP[loop] = bucket
+    return bucket
+
+
+def get_shared_async_client(api_key: Optional[str] = None) -> Optional[Any]:
+    """Return process-wide AsyncOpenAI client for the current event loop.
+
+    Агенты переиспользуют один клиент (и его keep-alive пул) вместо создания
+    нового на каждый вызов. Возвращает None, если ключ не задан или SDK недоступен.
+    """
+    resolved_key = api_key if api_key is not None else getattr(config, "OPENAI_API_KEY", None)
+    if not resolved_key:
+        return None
+    with _SHARED_CLIENTS_LOCK:
+        bucket = _shared_clients_bucket()
+        client = bucket.get(resolved_key)
+        if client is not None:
+            return client
+        try:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(api_key=resolved_key)
+        except Exception as exc:
+            logger.warning("[AGENT_LLM] shared AsyncOpenAI client init failed: %s", exc)
+            return None
+        bucket[resolved_key] = client
+        return client
+
+
+async def aclose_shared_async_clients() -> int:
+    """Close shared clients bound to the current event loop. Returns closed count."""
+    with _SHARED_CLIENTS_LOCK:
+        bucket = _shared_clients_bucket()
+        clients = list(bucket.values())
+        bucket.clear()
+    closed = 0
+    for client in clients:
+        close = getattr(client, "close", None)
+        if not callable(close):
+            continue
+        try:
+            maybe_awaitable = close()
+            if asyncio.iscoroutine(maybe_awaitable):
+                await maybe_awaitable
+            closed += 1
+        except Exception as exc:
+            logger.warning("[AGENT_LLM] shared client close failed: %s", exc)
+    return closed
+
+
 def messages_to_input(messages: list[dict[str, str]]) -> str:
     """Convert chat-style messages into plain text input for Responses API."""
 
@@ -205,6 +310,74 @@ async def _call_chat_with_compat(
         return await client.chat.completions.create(**fallback_kwargs)
 
 
+def _is_async_stream(response: Any) -> bool:
+    return hasattr(response, "__aiter__")
+
+
+def _emit_delta(on_delta: Callable[[str], None], delta: Any) -> None:
+    if not delta:
+        return
+    try:
+        on_delta(str(delta))
+    except Exception as exc:  # pragma: no cover - sink must never break the LLM call
+        logger.warning("[AGENT_LLM] stream delta sink failed: %s", exc)
+
+
+async def _consume_chat_stream(
+    stream: Any,
+    on_delta: Callable[[str], None],
+) -> tuple[str, tuple[Optional[int], Optional[int], Optional[int]]]:
+    parts: list[str] = []
+    usage: tuple[Optional[int], Optional[int], Optional[int]] = (None, None, None)
+    async for chunk in stream:
+        if _get_value(chunk, "usage", None) is not None:
+            usage = _extract_usage_chat(chunk)
+        for choice in _get_value(chunk, "choices", []) or []:
+            delta = _get_value(_get_value(choice, "delta", None), "content", None)
+            if delta:
+                parts.append(str(delta))
+                _emit_delta(on_delta, delta)
+    return "".join(parts).strip(), usage
+
+
+async def _consume_responses_stream(
+    stream: Any,
+    on_delta: Callable[[str], None],
+) -> tuple[str, tuple[Optional[int], Optional[int], Optional[int]], Any]:
+    parts: list[str] = []
+    final_response: Any = None
+    async for event in stream:
+        event_type = str(_get_value(event, "type", "") or "")
+        if event_type == "response.output_text.delta":
+            delta = _get_value(event, "delta", "")
+            if delta:
+                parts.append(str(delta))
+                _emit_delta(on_delta, delta)
+        elif event_type == "response.completed":
+            final_response = _get_value(event, "response", None)
+    text = "".join(parts).strip()
+    if not text and final_response is not None:
+        text = _extract_text_from_responses(final_response)
+    return text, _extract_usage_responses(final_response), final_response
+
+
+async def _call_chat_streaming(
+    *,
+    client: Any,
+    request_kwargs: dict[str, Any],
+    on_delta: Callable[[str], None],
+) -> tuple[Any, bool]:
+    """Call chat.completions in stream mode; fall back to a plain call for legacy clients."""
+    stream_kwargs = dict(request_kwargs)
+    stream_kwargs["stream"] = True
+    stream_kwargs["stream_options"] = {"include_usage": True}
+    try:
+        response = await _call_chat_with_compat(client=client, request_kwargs=stream_kwargs)
+    except TypeError:
+        return await _call_chat_with_compat(client=client, request_kwargs=request_kwargs), False
+    return response, _is_async_stream(response)
+
+
 async def create_agent_completion(
     *,
     client: Any,
@@ -215,8 +388,42 @@ async def create_agent_completion(
     timeout: float | None = None,
     response_format: dict | None = None,
     require_json: bool = False,
+    on_delta: Callable[[str], None] | None = None,
+) -> AgentLLMResult:
+    """Execute model call with model-family-aware API routing.
+
+    With ``on_delta`` the provider is called in streaming mode and every text
+    delta is forwarded to the sink as it arrives; the returned result is the
+    same normalized AgentLLMResult (``streamed=True``). Calls, tokens and
+    estimated cost are recorded in the ``/metrics`` counters.
+    """
+    result = await _create_agent_completion(
+        client=client,
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        response_format=response_format,
+        require_json=require_json,
+        on_delta=on_delta,
+    )
+    _record_completion_metrics(result)
+    return result
+
+
+async def _create_agent_completion(
+    *,
+    client: Any,
+    model: str,
+    messages: list[dict[str, str]],
+    temperature: float | None,
+    max_tokens: int | None,
+    timeout: float | None,
+    response_format: dict | None,
+    require_json: bool,
+    on_delta: Callable[[str], None] | None,
 ) -> AgentLLMResult:
-    """Execute model call with model-family-aware API routing."""
     has_responses, has_chat_completions = _detect_capabilities(client)
 
     if not has_responses and not has_chat_completions:
@@ -245,7 +452,29 @@ async def create_agent_completion(
             has_chat_completions=has_chat_completions,
             selected_mode="chat_completions",
         )
-        response = await _call_chat_with_compat(client=client, request_kwargs=request_kwargs)
+        if on_delta is not None:
+            response, is_stream = await _call_chat_streaming(
+                client=client,
+                request_kwargs=request_kwargs,
+                on_delta=on_delta,
+            )
+            if is_stream:
+                text, (tokens_prompt, tokens_completion, tokens_total) = await _consume_chat_stream(
+                    response,
+                    on_delta,
+                )
+                return AgentLLMResult(
+                    text=text,
+                    model=model,
+                    api_mode="chat_completions",
+                    tokens_prompt=tokens_prompt,
+                    tokens_completion=tokens_completion,
+                    tokens_total=tokens_total,
+                    raw_response=None,
+                    streamed=True,
+                )
+        else:
+            response = await _call_chat_with_compat(client=client, request_kwargs=request_kwargs)
         text = _extract_text_from_chat(response)
         tokens_prompt, tokens_completion, tokens_total = _extract_usage_chat(response)
         return AgentLLMResult(
@@ -281,7 +510,27 @@ async def create_agent_completion(
             has_chat_completions=has_chat_completions,
             selected_mode="responses",
         )
-        response = await client.responses.create(**request_kwargs)
+        if on_delta is not None:
+            try:
+                response = await client.responses.create(**request_kwargs, stream=True)
+            except TypeError:
+                response = await client.responses.create(**request_kwargs)
+            if _is_async_stream(response):
+                text, (tokens_prompt, tokens_completion, tokens_total), final_response = (
+                    await _consume_responses_stream(response, on_delta)
+                )
+                return AgentLLMResult(
+                    text=text,
+                    model=model,
+                    api_mode="responses",
+                    tokens_prompt=tokens_prompt,
+                    tokens_completion=tokens_completion,
+                    tokens_total=tokens_total,
+                    raw_response=final_response,
+                    streamed=True,
+                )
+        else:
+            response = await client.responses.create(**request_kwargs)
         text = _extract_text_from_responses(response)
         tokens_prompt, tokens_completion, tokens_total = _extract_usage_responses(response)
         return AgentLLMResult(
@@ -318,7 +567,29 @@ async def create_agent_completion(
         has_chat_completions=has_chat_completions,
         selected_mode="chat_completions_compat",
     )
-    compat_response = await _call_chat_with_compat(client=client, request_kwargs=compat_kwargs)
+    if on_delta is not None:
+        compat_response, is_stream = await _call_chat_streaming(
+            client=client,
+            request_kwargs=compat_kwargs,
+            on_delta=on_delta,
+        )
+        if is_stream:
+            compat_text, (tokens_prompt, tokens_completion, tokens_total) = await _consume_chat_stream(
+                compat_response,
+                on_delta,
+            )
+            return AgentLLMResult(
+                text=compat_text,
+                model=model,
+                api_mode="chat_completions_compat",
+                tokens_prompt=tokens_prompt,
+                tokens_completion=tokens_completion,
+                tokens_total=tokens_total,
+                raw_response=None,
+                streamed=True,
+            )
+    else:
+        compat_response = await _call_chat_with_compat(client=client, request_kwargs=compat_kwargs)
     compat_text = _extract_text_from_chat(compat_response)
     tokens_prompt, tokens_completion, tokens_total = _extract_usage_chat(compat_response)
     return AgentLLMResult(
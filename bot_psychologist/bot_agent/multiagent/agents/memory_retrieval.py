@@ -3,11 +3,18 @@
 from __future__ import annotations
 
 import asyncio
+import contextvars
+import functools
 import inspect
 import logging
-from typing import Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
 
 from ...feature_flags import feature_flags
+from ...metrics import RETRIEVAL_LATENCY_SECONDS
 from ..contracts.memory_bundle import MemoryBundle, SemanticHit, UserProfile
 from ..contracts.hybrid_retrieval_planner_contract import HYBRID_RETRIEVAL_PLANNER_VERSION
 from ..contracts.thread_state import ThreadState
@@ -22,6 +29,7 @@ from .memory_retrieval_config import (
     CONVERSATION_TURNS_DEFAULT,
     CONVERSATION_TURNS_NEW_THREAD,
     CORE_DIRECTION_MIN_LEN,
+    MEMORY_LOADER_MAX_WORKERS,
     RAG_LOW_SCORE_SALVAGE_ENABLED,
     RAG_LOW_SCORE_SALVAGE_MAX_HITS,
     RAG_LOW_SCORE_SALVAGE_MIN_TOP_SCORE,
@@ -35,6 +43,80 @@ from .memory_retrieval_config import (
 logger = logging.getLogger(__name__)
 
 
+_LOADER_EXECUTOR: ThreadPoolExecutor | None = None
+_LOADER_EXECUTOR_LOCK = threading.Lock()
+
+
+def _loader_executor() -> ThreadPoolExecutor:
+    global _LOADER_EXECUTOR
+    with _LOADER_EXECUTOR_LOCK:
+        if _LOADER_EXECUTOR is None:
+            _LOADER_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, int(MEMORY_LOADER_MAX_WORKERS)),
+                thread_name_prefix="mra-loader",
+            )
+        return _LOADER_EXECUTOR
+
+
+async def run_blocking_loader(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking loader (SQLite, embeddings, HTTP) in the bounded MRA pool."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_loader_executor(), functools.partial(ctx.run, fn, *args))
+
+
+def shutdown_loader_executor(wait: bool = True) -> None:
+    """Stop the MRA loader pool (lifespan shutdown / tests)."""
+    global _LOADER_EXECUTOR
+    with _LOADER_EXECUTOR_LOCK:
+        executor, _LOADER_EXECUTOR = _LOADER_EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def _timed_loader(label: str, awaitable: Awaitable[Any], timings_ms: dict[str, float]) -> Any:
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings_ms[label] = round((time.perf_counter() - started) * 1000.0, 2)
+
+
+@dataclass
+class SpeculativeRag:
+    """RAG-загрузка, запущенная до ответа hybrid retrieval planner'а."""
+
+    query: str
+    task: "asyncio.Task[tuple[list[SemanticHit], dict[str, Any]]]"
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    def cancel(self) -> None:
+        if not self.task.done():
+            self.task.cancel()
+
+
+_SPECULATIVE_RAG_STATS = {"started": 0, "hits": 0, "misses": 0, "saved_ms": 0.0, "wasted_ms": 0.0}
+_SPECULATIVE_RAG_STATS_LOCK = threading.Lock()
+
+
+def _record_speculative_rag(counter: str, *, saved_ms: float = 0.0, wasted_ms: float = 0.0) -> None:
+    with _SPECULATIVE_RAG_STATS_LOCK:
+        _SPECULATIVE_RAG_STATS[counter] += 1
+        _SPECULATIVE_RAG_STATS["saved_ms"] += saved_ms
+        _SPECULATIVE_RAG_STATS["wasted_ms"] += wasted_ms
+
+
+def speculative_rag_stats() -> dict[str, Any]:
+    with _SPECULATIVE_RAG_STATS_LOCK:
+        stats = dict(_SPECULATIVE_RAG_STATS)
+    resolved = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / resolved, 4) if resolved else 0.0
+    stats["saved_ms"] = round(stats["saved_ms"], 2)
+    stats["wasted_ms"] = round(stats["wasted_ms"], 2)
+    return stats
+
+
 def _string_list(value: Any) -> list[str]:
     if isinstance(value, list):
         return [str(item).strip() for item in value if str(item).strip()]
@@ -210,6 +292,7 @@ class MemoryRetrievalAgent:
         last_assistant_offer_summary: str | None = None,
         dialogue_act: dict[str, Any] | None = None,
         inherited_topic: str | None = None,
+        speculative_rag: SpeculativeRag | None = None,
     ) -> MemoryBundle:
         n_turns = self._resolve_n_turns(thread_state)
         legacy_rag_query = self._build_rag_query(user_message, thread_state)
@@ -230,16 +313,37 @@ class MemoryRetrievalAgent:
         )
         rag_query = str(retrieval_runtime.get("executed_rag_query", "") or "")
         rag_should_load = bool(retrieval_runtime.get("rag_should_load", False))
+        rag_loader, speculative_rag_trace = self._claim_speculative_rag(
+            speculative_rag,
+            rag_query=rag_query,
+            rag_should_load=rag_should_load,
+            retrieval_action=str(retrieval_runtime.get("retrieval_action", "") or ""),
+        )
 
+        loader_timings_ms: dict[str, float] = {}
+        gather_started = time.perf_counter()
         results = await asyncio.gather(
-            self._load_conversation(user_id, n_turns, user_message),
-            self._load_profile(user_id),
-            self._load_rag(rag_query) if rag_should_load else self._skip_rag_load(),
-            self._load_recent_turns(user_id, n_turns),
-            self._load_personal_history_context(user_id),
-            self._load_semantic_memory_hits(user_id, user_message),
+            _timed_loader(
+                "conversation",
+                self._load_conversation(user_id, n_turns, user_message),
+                loader_timings_ms,
+            ),
+            _timed_loader("profile", self._load_profile(user_id), loader_timings_ms),
+            _timed_loader("rag", rag_loader, loader_timings_ms),
+            _timed_loader("recent_turns", self._load_recent_turns(user_id, n_turns), loader_timings_ms),
+            _timed_loader(
+                "personal_history",
+                self._load_personal_history_context(user_id),
+                loader_timings_ms,
+            ),
+            _timed_loader(
+                "semantic_memory",
+                self._load_semantic_memory_hits(user_id, user_message),
+                loader_timings_ms,
+            ),
             return_exceptions=True,
         )
+        loaders_wall_ms = round((time.perf_counter() - gather_started) * 1000.0, 2)
 
         conversation_context = results[0] if not isinstance(results[0], Exception) else ""
         user_profile = results[1] if not isinstance(results[1], Exception) else UserProfile()
@@ -326,6 +430,10 @@ class MemoryRetrievalAgent:
                 if isinstance(retrieval_runtime.get("retrieval_query_build_trace"), dict)
                 else {}
             ),
+            "loader_timings_ms": dict(loader_timings_ms),
+            "loaders_wall_ms": loaders_wall_ms,
+            "loaders_sum_ms": round(sum(loader_timings_ms.values()), 2),
+            "speculative_rag": speculative_rag_trace,
             "raw_hit_summaries": [
                 _summarize_raw_hit(hit, rank=index)
                 for index, hit in enumerate(list(raw_hits or [])[:10], start=1)
@@ -381,6 +489,87 @@ class MemoryRetrievalAgent:
             },
         )
 
+    def start_speculative_rag(
+        self,
+        *,
+        user_message: str,
+        thread_state: ThreadState,
+        previous_user_message: str | None = None,
+        last_assistant_offer_summary: str | None = None,
+        dialogue_act: dict[str, Any] | None = None,
+        inherited_topic: str | None = None,
+    ) -> SpeculativeRag | None:
+        """
+        Запустить RAG по запросу, который assemble() выполнит, если план
+        retrieval planner'а не изменит запрос. Вызывается до await планировщика;
+        результат забирается или отбрасывается в assemble(speculative_rag=...).
+        """
+        legacy_rag_query = self._build_rag_query(user_message, thread_state)
+        retrieval_runtime = self._resolve_retrieval_runtime(
+            retrieval_plan=None,
+            legacy_rag_query=legacy_rag_query,
+            retrieval_query_build_trace=self._build_retrieval_query_runtime(
+                user_message=user_message,
+                previous_user_message=previous_user_message,
+                thread_state=thread_state,
+                retrieval_plan=None,
+                dialogue_act=dialogue_act,
+                inherited_topic=inherited_topic,
+                last_assistant_offer_summary=last_assistant_offer_summary,
+                legacy_rag_query=legacy_rag_query,
+            ),
+        )
+        query = str(retrieval_runtime.get("executed_rag_query", "") or "")
+        if not retrieval_runtime.get("rag_should_load") or not query.strip():
+            return None
+        speculative = SpeculativeRag(query=query, task=asyncio.ensure_future(self._load_rag(query)))
+        speculative.task.add_done_callback(
+            lambda _task: setattr(speculative, "finished_at", time.perf_counter())
+        )
+        _record_speculative_rag("started")
+        return speculative
+
+    def _claim_speculative_rag(
+        self,
+        speculative_rag: SpeculativeRag | None,
+        *,
+        rag_query: str,
+        rag_should_load: bool,
+        retrieval_action: str,
+    ) -> tuple[Awaitable[Any], dict[str, Any]]:
+        """Переиспользовать спекулятивный RAG при совпадении запроса, иначе отменить."""
+        if speculative_rag is None:
+            loader = self._load_rag(rag_query) if rag_should_load else self._skip_rag_load()
+            return loader, {"started": False}
+
+        claimed_at = time.perf_counter()
+        finished_at = speculative_rag.finished_at or claimed_at
+        hit = rag_should_load and speculative_rag.query == rag_query and not speculative_rag.task.cancelled()
+        if hit:
+            # Экономия = часть загрузки, которая шла параллельно с планировщиком.
+            saved_ms = round((min(finished_at, claimed_at) - speculative_rag.started_at) * 1000.0, 2)
+            _record_speculative_rag("hits", saved_ms=saved_ms)
+            loader: Awaitable[Any] = speculative_rag.task
+            reason = "query_match"
+            wasted_ms = 0.0
+        else:
+            speculative_rag.cancel()
+            saved_ms = 0.0
+            wasted_ms = round((finished_at - speculative_rag.started_at) * 1000.0, 2)
+            _record_speculative_rag("misses", wasted_ms=wasted_ms)
+            loader = self._load_rag(rag_query) if rag_should_load else self._skip_rag_load()
+            reason = "query_mismatch" if rag_should_load else "rag_skipped_by_plan"
+        return loader, {
+            "started": True,
+            "hit": hit,
+            "reason": reason,
+            "retrieval_action": retrieval_action,
+            "speculative_query": _sanitize_query_preview(speculative_rag.query),
+            "completed_before_claim": speculative_rag.finished_at is not None,
+            "saved_ms": saved_ms,
+            "wasted_ms": wasted_ms,
+        }
+
     async def update(
         self,
         *,
@@ -619,6 +808,15 @@ class MemoryRetrievalAgent:
 
     @staticmethod
     async def _load_conversation(user_id: str, n_turns: int, user_message: str = "") -> str:
+        return await run_blocking_loader(
+            MemoryRetrievalAgent._load_conversation_sync,
+            user_id,
+            n_turns,
+            user_message,
+        )
+
+    @staticmethod
+    def _load_conversation_sync(user_id: str, n_turns: int, user_message: str = "") -> str:
         try:
             from ...conversation_memory import get_conversation_memory  # noqa: PLC0415
 
@@ -650,6 +848,13 @@ class MemoryRetrievalAgent:
 
     @staticmethod
     async def _load_profile(user_id: str) -> UserProfile:
+        return await run_blocking_loader(
+            MemoryRetrievalAgent._load_profile_sync,
+            user_id,
+        )
+
+    @staticmethod
+    def _load_profile_sync(user_id: str) -> UserProfile:
         try:
             from ...conversation_memory import get_conversation_memory  # noqa: PLC0415
 
@@ -683,6 +888,14 @@ class MemoryRetrievalAgent:
 
     @staticmethod
     async def _load_recent_turns(user_id: str, n_turns: int) -> list[dict[str, Any]]:
+        return await run_blocking_loader(
+            MemoryRetrievalAgent._load_recent_turns_sync,
+            user_id,
+            n_turns,
+        )
+
+    @staticmethod
+    def _load_recent_turns_sync(user_id: str, n_turns: int) -> list[dict[str, Any]]:
         try:
             from ...conversation_memory import get_conversation_memory  # noqa: PLC0415
 
@@ -713,6 +926,13 @@ class MemoryRetrievalAgent:
 
     @staticmethod
     async def _load_personal_history_context(user_id: str) -> list[dict[str, Any]]:
+        return await run_blocking_loader(
+            MemoryRetrievalAgent._load_personal_history_context_sync,
+            user_id,
+        )
+
+    @staticmethod
+    def _load_personal_history_context_sync(user_id: str) -> list[dict[str, Any]]:
         try:
             from ...conversation_memory import get_conversation_memory  # noqa: PLC0415
 
@@ -754,6 +974,14 @@ class MemoryRetrievalAgent:
 
     @staticmethod
     async def _load_semantic_memory_hits(user_id: str, query: str) -> list[dict[str, Any]]:
+        return await run_blocking_loader(
+            MemoryRetrievalAgent._load_semantic_memory_hits_sync,
+            user_id,
+            query,
+        )
+
+    @staticmethod
+    def _load_semantic_memory_hits_sync(user_id: str, query: str) -> list[dict[str, Any]]:
         try:
             from ...conversation_memory import get_conversation_memory  # noqa: PLC0415
 
@@ -803,13 +1031,23 @@ class MemoryRetrievalAgent:
                 return [], {}
 
             retriever = get_retriever()
-            results = retriever.retrieve(query, top_k=RAG_N_RESULTS)
+            started = time.perf_counter()
+            if hasattr(retriever, "aretrieve"):
+                results = await retriever.aretrieve(query, top_k=RAG_N_RESULTS)
+            else:
+                results = await asyncio.to_thread(retriever.retrieve, query, top_k=RAG_N_RESULTS)
+            retrieval_seconds = time.perf_counter() - started
             retrieval_debug = {}
             if hasattr(retriever, "get_last_retrieval_debug"):
                 try:
                     retrieval_debug = retriever.get_last_retrieval_debug()  # type: ignore[assignment]
                 except Exception:
                     retrieval_debug = {}
+            # Без API-пути (KNOWLEDGE_SOURCE=json) retriever отвечает TF-IDF и debug не пишет.
+            RETRIEVAL_LATENCY_SECONDS.observe(
+                retrieval_seconds,
+                str(retrieval_debug.get("retrieval_source_used") or "tfidf"),
+            )
             hits: list[SemanticHit] = []
             for item in results:
                 if isinstance(item, tuple) and len(item) >= 2:
@@ -30,3 +30,8 @@ RAG_LOW_SCORE_SALVAGE_MIN_TOP_SCORE: float = float(
 )
 
 CORE_DIRECTION_MIN_LEN: int = 10
+
+# Bounded thread pool for blocking MRA loaders (SQLite, embeddings).
+MEMORY_LOADER_MAX_WORKERS: int = int(
+    feature_flags.value("MEMORY_LOADER_MAX_WORKERS", "8") or "8"
+)
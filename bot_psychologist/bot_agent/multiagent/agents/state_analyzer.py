@@ -11,7 +11,7 @@ from typing import Any, Optional
 from ...config import config
 from ..contracts.state_snapshot import StateSnapshot
 from ..contracts.thread_state import ThreadState
-from .agent_llm_client import create_agent_completion
+from .agent_llm_client import create_agent_completion, get_shared_async_client
 from .agent_llm_config import get_model_for_agent, get_temperature_for_agent
 from .state_analyzer_prompts import STATE_ANALYZER_SYSTEM, STATE_ANALYZER_USER_TEMPLATE
 
@@ -742,16 +742,7 @@ class StateAnalyzerAgent:
     def _get_client(self) -> Optional[Any]:
         if self._client is not None:
             return self._client
-        try:
-            from openai import AsyncOpenAI
-
-            api_key = getattr(config, "OPENAI_API_KEY", None)
-            if not api_key:
-                return None
-            self._client = AsyncOpenAI(api_key=api_key)
-            return self._client
-        except Exception:
-            return None
+        return get_shared_async_client(getattr(config, "OPENAI_API_KEY", None))
 
     @staticmethod
     def _parse_json(text: str) -> dict:
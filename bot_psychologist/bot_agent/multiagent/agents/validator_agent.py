@@ -87,6 +87,29 @@ class ValidatorAgent:
             logger.error("[VALIDATOR] validate failed: %s", exc, exc_info=True)
             return ValidationResult(is_blocked=False, quality_flags=["validator_error"])
 
+    def check_partial(self, partial_text: str, contract: WriterContract) -> Optional[str]:
+        """Incremental safety/contract check for a streamed writer prefix."""
+        text = (partial_text or "").strip()
+        if not text:
+            return None
+        return self._check_safety(text) or self._check_contract(text, contract)
+
+    @staticmethod
+    def stream_holdback_chars(contract: WriterContract) -> int:
+        """Longest pattern length: streamed text is held back by this many chars."""
+        patterns: list[str] = [
+            *SELF_HARM_IN_ANSWER,
+            *MEDICAL_ADVICE_PATTERNS,
+            *DIAGNOSIS_PATTERNS,
+            *PROMISE_PATTERNS,
+            *BOT_REVEAL_PATTERNS,
+        ]
+        for spec in MODE_VIOLATION_PATTERNS.values():
+            patterns.extend(str(item) for item in spec.get("patterns", []))
+        thread_state = getattr(contract, "thread_state", None)
+        patterns.extend(str(item or "") for item in (getattr(thread_state, "must_avoid", None) or []))
+        return max((len(item) for item in patterns), default=0)
+
     def _check_safety(self, text: str) -> Optional[str]:
         hit = _contains_any(text, SELF_HARM_IN_ANSWER)
         if hit:
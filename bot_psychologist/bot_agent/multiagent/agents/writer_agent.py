@@ -17,6 +17,7 @@ from ..dialogue_policy import (
     detect_practice_overview_request,
 )
 from ..contracts.writer_contract import WriterContract
+from ..writer_stream import close_writer_stream_attempt, open_writer_stream_attempt
 from .agent_llm_client import create_agent_completion
 from .agent_llm_config import get_model_for_agent, get_temperature_for_agent
 from .writer_agent_constants import _contains_any
@@ -554,17 +555,26 @@ class WriterAgent(WriterAgentLifecycleMixin, WriterAgentFallbackStateMixin):
         runtime_settings = slice11_result.runtime_settings
         system_prompt = slice11_result.system_prompt
         self.last_debug.update(slice11_result.last_debug_patch)
-        result = await create_agent_completion(
-            client=client,
-            model=runtime_settings["model"],
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=runtime_settings["temperature"],
-            max_tokens=runtime_settings["max_tokens"],
-            timeout=runtime_settings["timeout"],
-        )
+        completion_kwargs: dict[str, Any] = {}
+        stream_sink = open_writer_stream_attempt(contract)
+        if stream_sink is not None:
+            completion_kwargs["on_delta"] = stream_sink
+        try:
+            result = await create_agent_completion(
+                client=client,
+                model=runtime_settings["model"],
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=runtime_settings["temperature"],
+                max_tokens=runtime_settings["max_tokens"],
+                timeout=runtime_settings["timeout"],
+                **completion_kwargs,
+            )
+        finally:
+            if stream_sink is not None:
+                close_writer_stream_attempt()
         slice12_result = _apply_call_llm_slice12_response_unpack_cost_and_bookkeeping(
             result=result,
             runtime_settings=runtime_settings,
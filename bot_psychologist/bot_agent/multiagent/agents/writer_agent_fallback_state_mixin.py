@@ -7,15 +7,10 @@ from typing import Any, Optional
 
 from ...config import config
 from ..contracts.writer_contract import WriterContract
+from .agent_llm_client import estimate_llm_cost, get_shared_async_client
 from .writer_agent_constants import _contains_any
 
 
-_COST_PER_1K_TOKENS = {
-    "gpt-5-mini": {"input": 0.00025, "output": 0.00200},
-    "gpt-4o-mini": {"input": 0.00015, "output": 0.00060},
-    "default": {"input": 0.00125, "output": 0.01000},
-}
-
 _RU_NAME_PATTERNS = (
     re.compile(r"\bменя\s+зовут\s+([А-ЯЁA-Z][А-ЯЁа-яёA-Za-z\-]{1,30})", re.IGNORECASE),
     re.compile(r"\bмое\s+имя\s+([А-ЯЁA-Z][А-ЯЁа-яёA-Za-z\-]{1,30})", re.IGNORECASE),
@@ -93,26 +88,11 @@ class WriterAgentFallbackStateMixin:
     def _get_client(self):
         if self._client is not None:
             return self._client
-        try:
-            from openai import AsyncOpenAI
-
-            api_key = getattr(config, "OPENAI_API_KEY", None)
-            if not api_key:
-                return None
-            self._client = AsyncOpenAI(api_key=api_key)
-            return self._client
-        except Exception:
-            return None
+        return get_shared_async_client(getattr(config, "OPENAI_API_KEY", None))
 
     def _estimate_cost(self, *, tokens_prompt: Optional[int], tokens_completion: Optional[int]) -> Optional[float]:
-        if tokens_prompt is None and tokens_completion is None:
-            return None
-        model = str(self.last_debug.get("model") or self._resolve_model()).lower()
-        rates = _COST_PER_1K_TOKENS.get(model, _COST_PER_1K_TOKENS["default"])
-        prompt = float(tokens_prompt or 0)
-        completion = float(tokens_completion or 0)
-        cost = (prompt / 1000.0) * float(rates["input"]) + (completion / 1000.0) * float(rates["output"])
-        return round(cost, 6)
+        model = str(self.last_debug.get("model") or self._resolve_model())
+        return estimate_llm_cost(model, tokens_prompt=tokens_prompt, tokens_completion=tokens_completion)
 
     def _apply_name_continuity(self, response_text: str, contract: WriterContract) -> str:
         """Добавляет обращение по имени, если имя найдено в контексте и отсутствует в ответе."""
@@ -9,7 +9,9 @@ import time
 from datetime import datetime, timezone
 
 from bot_agent.config import config
+from bot_agent.config_context import pinned_config
 from bot_agent.feature_flags import feature_flags
+from bot_agent.metrics import AGENT_ERRORS_TOTAL, AGENT_LATENCY_SECONDS
 from .agents.memory_retrieval import memory_retrieval_agent
 from .agents.state_analyzer import state_analyzer_agent
 from .agents.thread_manager import THREAD_DIAGNOSTICS_VERSION, thread_manager_agent
@@ -134,8 +136,10 @@ class MultiAgentOrchestrator:
         )
         metric["call_count"] = int(metric.get("call_count", 0)) + 1
         metric["total_ms"] = int(metric.get("total_ms", 0)) + int(latency_ms)
+        AGENT_LATENCY_SECONDS.observe(latency_ms / 1000.0, agent_id)
         if error:
             metric["error_count"] = int(metric.get("error_count", 0)) + 1
+            AGENT_ERRORS_TOTAL.inc(agent_id)
         metric["last_run"] = datetime.now(timezone.utc).isoformat()
         self._agent_traces.append(
             {
@@ -191,6 +195,14 @@ class MultiAgentOrchestrator:
         return query
 
     async def run(self, *, query: str, user_id: str) -> dict:
+        from ..conversation_memory import conversation_memory_in_flight  # noqa: PLC0415
+
+        # Один закрепленный снимок config/feature flags на весь ход; память
+        # диалога пользователя не вытесняется из кэша, пока ход не завершен.
+        with pinned_config(), conversation_memory_in_flight(user_id):
+            return await self._run_turn(query=query, user_id=user_id)
+
+    async def _run_turn(self, *, query: str, user_id: str) -> dict:
         query = self._normalize_query(query)
         t_total_start = time.perf_counter()
 
@@ -270,43 +282,70 @@ class MultiAgentOrchestrator:
             ),
         )
         retrieval_thread = ThreadState.from_dict(updated_thread.to_dict())
+        retrieval_offer_summary = str(pre_retrieval_last_offer.get("offer_text_summary", "") or "")
+        retrieval_inherited_topic = str(
+            dict(updated_thread.active_frame).get("active_concept", "")
+            if isinstance(updated_thread.active_frame, dict)
+            else ""
+        )
+        # Спекулятивный RAG по запросу без плана идет параллельно с LLM-вызовом
+        # планировщика; assemble() заберет результат или отбросит его.
+        speculative_rag = (
+            memory_retrieval_agent.start_speculative_rag(
+                user_message=query,
+                thread_state=retrieval_thread,
+                last_assistant_offer_summary=retrieval_offer_summary,
+                dialogue_act={},
+                inherited_topic=retrieval_inherited_topic,
+            )
+            if feature_flags.enabled("SPECULATIVE_RAG_ENABLED")
+            else None
+        )
         planner_client_getter = getattr(state_analyzer_agent, "_get_client", None)
         planner_client = planner_client_getter() if callable(planner_client_getter) else None
-        hybrid_retrieval_plan = await build_hybrid_retrieval_plan_v1(
-            user_message=query,
-            recent_turns_compact=[],
-            last_assistant_offer=pre_retrieval_last_offer,
-            thread_state_compact={
-                "thread_id": str(updated_thread.thread_id or ""),
-                "phase": str(updated_thread.phase or ""),
-                "response_mode": str(updated_thread.response_mode or ""),
-                "core_direction": str(updated_thread.core_direction or "")[:200],
-                "open_loops": [str(item) for item in list(updated_thread.open_loops or [])[:2]],
-                "active_concept": str(
-                    dict(updated_thread.active_frame).get("active_concept", "")
-                    if isinstance(updated_thread.active_frame, dict)
-                    else ""
-                ),
-                "safety_active": bool(updated_thread.safety_active),
-            },
-            state_snapshot_compact={
-                "nervous_state": str(state_snapshot.nervous_state or ""),
-                "intent": str(state_snapshot.intent or ""),
-                "safety_active": bool(state_snapshot.safety_flag or updated_thread.safety_active),
-            },
-            dialogue_pragmatics={},
-            fresh_chat_policy={},
-            constraints=[
-                item
-                for item, enabled in (
-                    ("no_theory", "без теории" in query.lower()),
-                    ("no_practice", ("без практик" in query.lower()) or ("без упражнений" in query.lower())),
-                    ("keep_brief", "короче" in query.lower()),
-                )
-                if enabled
-            ],
-            client=planner_client,
-        )
+        t_planner_start = time.perf_counter()
+        try:
+            hybrid_retrieval_plan = await build_hybrid_retrieval_plan_v1(
+                user_message=query,
+                recent_turns_compact=[],
+                last_assistant_offer=pre_retrieval_last_offer,
+                thread_state_compact={
+                    "thread_id": str(updated_thread.thread_id or ""),
+                    "phase": str(updated_thread.phase or ""),
+                    "response_mode": str(updated_thread.response_mode or ""),
+                    "core_direction": str(updated_thread.core_direction or "")[:200],
+                    "open_loops": [str(item) for item in list(updated_thread.open_loops or [])[:2]],
+                    "active_concept": str(
+                        dict(updated_thread.active_frame).get("active_concept", "")
+                        if isinstance(updated_thread.active_frame, dict)
+                        else ""
+                    ),
+                    "safety_active": bool(updated_thread.safety_active),
+                },
+                state_snapshot_compact={
+                    "nervous_state": str(state_snapshot.nervous_state or ""),
+                    "intent": str(state_snapshot.intent or ""),
+                    "safety_active": bool(state_snapshot.safety_flag or updated_thread.safety_active),
+                },
+                dialogue_pragmatics={},
+                fresh_chat_policy={},
+                constraints=[
+                    item
+                    for item, enabled in (
+                        ("no_theory", "без теории" in query.lower()),
+                        ("no_practice", ("без практик" in query.lower()) or ("без упражнений" in query.lower())),
+                        ("keep_brief", "короче" in query.lower()),
+                    )
+                    if enabled
+                ],
+                client=planner_client,
+            )
+        except BaseException:
+            if speculative_rag is not None:
+                speculative_rag.cancel()
+            raise
+        t_planner = int((time.perf_counter() - t_planner_start) * 1000)
+        AGENT_LATENCY_SECONDS.observe(t_planner / 1000.0, "retrieval_planner")
         pre_retrieval_composer["hybrid_retrieval_plan"] = (
             dict(hybrid_retrieval_plan.get("plan", {}))
             if isinstance(hybrid_retrieval_plan.get("plan"), dict)
@@ -323,14 +362,13 @@ class MultiAgentOrchestrator:
             thread_state=retrieval_thread,
             user_id=user_id,
             retrieval_plan=hybrid_retrieval_plan,
-            last_assistant_offer_summary=str(pre_retrieval_last_offer.get("offer_text_summary", "") or ""),
+            last_assistant_offer_summary=retrieval_offer_summary,
             dialogue_act={},
-            inherited_topic=str(
-                dict(updated_thread.active_frame).get("active_concept", "")
-                if isinstance(updated_thread.active_frame, dict)
-                else ""
-            ),
+            inherited_topic=retrieval_inherited_topic,
+            speculative_rag=speculative_rag,
         )
+        if speculative_rag is not None:
+            speculative_rag.cancel()  # no-op, если assemble() уже забрал результат
         t_memory = int((time.perf_counter() - t0) * 1000)
         self._record_agent_metric(
             agent_id="memory_retrieval",
@@ -1467,6 +1505,7 @@ class MultiAgentOrchestrator:
                 "timings": {
                     "state_analyzer_ms": t_state,
                     "thread_manager_ms": t_thread,
+                    "retrieval_planner_ms": t_planner,
                     "memory_retrieval_ms": t_memory,
                     "writer_ms": t_writer,
                     "validator_ms": t_validator,
@@ -8,39 +8,96 @@ import threading
 import time
 from typing import Any, Dict
 
+from ..db_api_client import aclose_shared_http_clients
+from .agents.agent_llm_client import aclose_shared_async_clients
 from .orchestrator import orchestrator
 
 logger = logging.getLogger(__name__)
 
 
-def _run_orchestrator_from_sync(*, query: str, user_id: str) -> Dict[str, Any]:
-    """Run async orchestrator from sync context, including active event loop cases."""
+_RUNTIME_LOOP_LOCK = threading.Lock()
+_runtime_loop: asyncio.AbstractEventLoop | None = None
+_runtime_loop_thread: threading.Thread | None = None
+
+
+def _get_runtime_loop() -> asyncio.AbstractEventLoop:
+    """Return the long-lived event loop used by sync callers of the orchestrator.
+
+    Один loop на процесс: фоновые задачи оркестратора (memory update, summary)
+    не отменяются вместе с временным loop, а общие AsyncOpenAI-клиенты
+    переиспользуют keep-alive соединения между вызовами.
+    """
+    global _runtime_loop, _runtime_loop_thread
+    with _RUNTIME_LOOP_LOCK:
+        if (
+            _runtime_loop is not None
+            and _runtime_loop_thread is not None
+            and _runtime_loop_thread.is_alive()
+            and not _runtime_loop.is_closed()
+        ):
+            return _runtime_loop
+
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def _serve() -> None:
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=_serve, name="multiagent-runtime-loop", daemon=True)
+        thread.start()
+        ready.wait()
+        _runtime_loop = loop
+        _runtime_loop_thread = thread
+        return loop
+
+
+async def _aclose_loop_clients() -> None:
+    await aclose_shared_async_clients()
+    await aclose_shared_http_clients()
+
+
+def shutdown_runtime_loop(timeout: float = 5.0) -> None:
+    """Stop the shared runtime loop (FastAPI lifespan shutdown / tests)."""
+    global _runtime_loop, _runtime_loop_thread
+    with _RUNTIME_LOOP_LOCK:
+        loop = _runtime_loop
+        thread = _runtime_loop_thread
+        _runtime_loop = None
+        _runtime_loop_thread = None
+    if loop is None or loop.is_closed():
+        return
     try:
-        asyncio.get_running_loop()
-        loop_is_running = True
-    except RuntimeError:
-        loop_is_running = False
-
-    if not loop_is_running:
-        return orchestrator.run_sync(query=query, user_id=user_id)
-
-    result_holder: Dict[str, Any] = {}
-    error_holder: Dict[str, Exception] = {}
-
-    def _runner() -> None:
-        try:
-            result_holder["result"] = orchestrator.run_sync(query=query, user_id=user_id)
-        except Exception as exc:  # pragma: no cover - defensive thread bridge
-            error_holder["error"] = exc
+        future = asyncio.run_coroutine_threadsafe(_aclose_loop_clients(), loop)
+        future.result(timeout=timeout)
+    except Exception as exc:  # pragma: no cover - best-effort shutdown
+        logger.warning("[MULTIAGENT_ADAPTER] shared client close failed: %s", exc)
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout=timeout)
+    if not loop.is_running():
+        loop.close()
 
-    thread = threading.Thread(target=_runner, name="multiagent-runtime-adapter", daemon=True)
-    thread.start()
-    thread.join()
 
-    if "error" in error_holder:
-        raise error_holder["error"]
-
-    result = result_holder.get("result")
+def _run_orchestrator_from_sync(*, query: str, user_id: str) -> Dict[str, Any]:
+    """Run async orchestrator from sync context on the shared runtime loop."""
+    loop = _get_runtime_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        raise RuntimeError(
+            "run_multiagent_adaptive_sync called from the runtime loop; "
+            "use run_multiagent_adaptive_async instead"
+        )
+
+    future = asyncio.run_coroutine_threadsafe(
+        orchestrator.run(query=query, user_id=user_id),
+        loop,
+    )
+    result = future.result()
     if isinstance(result, dict):
         return result
     return {}
@@ -2,13 +2,16 @@
 
 from __future__ import annotations
 
+import copy
 import json
 import logging
 import os
+import sqlite3
 import threading
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 from .contracts.thread_state import ArchivedThread, ThreadState
 
@@ -23,15 +26,73 @@ _DEFAULT_STORAGE_DIR = Path(
     )
 ).expanduser().resolve()
 
+THREAD_STORAGE_BACKENDS = ("json", "sqlite")
+THREAD_STORAGE_DB_NAME = "threads.db"
+_JSON_MIGRATION_KEY = "json_migrated_at"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
 
 class ThreadStorage:
-    """Persistent storage for active and archived thread states."""
+    """
+    Persistent storage for active and archived thread states.
+
+    Backends (``THREAD_STORAGE_BACKEND``):
+    - ``json`` — legacy: ``{user_id}_active.json`` и ``{user_id}_archive.json``,
+      архив переписывается целиком на каждый ``archive_thread``;
+    - ``sqlite`` — ``threads.db`` в том же каталоге: активный тред по PK,
+      архив — append-only таблица с индексом ``(user_id, id)``, поэтому
+      архивирование O(1), а чтение берет только последние N тредов.
+      Активные треды кэшируются в ограниченном LRU (write-through, кэш на
+      процесс) уже разобранными ``ThreadState``. Попадание — один
+      ``SELECT updated_at`` по PK и копия объекта, без чтения payload,
+      ``json.loads`` и ``from_dict``. Сверка с базой остается: внутрипроцессный
+      счетчик версий не видит записи других воркеров uvicorn.
+      При первом открытии базы существующие JSON-файлы каталога
+      импортируются один раз; сами файлы не удаляются.
+
+    ``load_archived`` по умолчанию возвращает только последние
+    ``THREAD_ARCHIVE_RECENT_LIMIT`` тредов (0 — без ограничения).
+    """
 
-    def __init__(self, storage_dir: Path = _DEFAULT_STORAGE_DIR):
+    def __init__(
+        self,
+        storage_dir: Path = _DEFAULT_STORAGE_DIR,
+        *,
+        backend: Optional[str] = None,
+        cache_size: Optional[int] = None,
+        archive_recent_limit: Optional[int] = None,
+    ):
         self._dir = Path(storage_dir).expanduser().resolve()
         self._dir.mkdir(parents=True, exist_ok=True)
         self._lock = threading.RLock()
-        logger.info("[THREAD_STORAGE] storage_dir=%s", self._dir)
+        self.backend = str(backend or os.getenv("THREAD_STORAGE_BACKEND", "json")).strip().lower()
+        if self.backend not in THREAD_STORAGE_BACKENDS:
+            raise ValueError(
+                f"Unknown THREAD_STORAGE_BACKEND={self.backend!r}; expected one of {THREAD_STORAGE_BACKENDS}"
+            )
+        self.archive_recent_limit = (
+            _env_int("THREAD_ARCHIVE_RECENT_LIMIT", 50)
+            if archive_recent_limit is None
+            else max(0, int(archive_recent_limit))
+        )
+        self._cache_size = _env_int("THREAD_STORAGE_CACHE_SIZE", 1024) if cache_size is None else max(0, cache_size)
+        # user_id -> (updated_at, ThreadState); None — тред отсутствует.
+        self._cache: "OrderedDict[str, Optional[tuple[str, ThreadState]]]" = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._pool = None
+        if self.backend == "sqlite":
+            from ..storage.sqlite_pool import get_sqlite_pool  # noqa: PLC0415
+
+            self._pool = get_sqlite_pool(str(self._dir / THREAD_STORAGE_DB_NAME))
+            self._pool.ensure_schema(self._init_database)
+        logger.info("[THREAD_STORAGE] storage_dir=%s backend=%s", self._dir, self.backend)
 
     def _active_path(self, user_id: str) -> Path:
         return self._dir / f"{user_id}_active.json"
@@ -39,11 +100,17 @@ class ThreadStorage:
     def _archive_path(self, user_id: str) -> Path:
         return self._dir / f"{user_id}_archive.json"
 
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+
     def load_active(self, user_id: str) -> Optional[ThreadState]:
-        path = self._active_path(user_id)
-        if not path.exists():
-            return None
         try:
+            if self._pool is not None:
+                return self._load_active_sql(user_id)
+            path = self._active_path(user_id)
+            if not path.exists():
+                return None
             payload = json.loads(path.read_text(encoding="utf-8"))
             return ThreadState.from_dict(payload)
         except Exception as exc:  # pragma: no cover - defensive guard
@@ -51,9 +118,27 @@ class ThreadStorage:
             return None
 
     def save_active(self, thread: ThreadState) -> None:
-        path = self._active_path(thread.user_id)
-        payload = json.dumps(thread.to_dict(), ensure_ascii=False, indent=2)
         try:
+            if self._pool is not None:
+                payload = json.dumps(thread.to_dict(), ensure_ascii=False)
+                updated_at = datetime.utcnow().isoformat()
+                self._pool.write(
+                    lambda conn: conn.execute(
+                        """
+                        INSERT INTO active_threads (user_id, thread_id, payload, updated_at)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(user_id) DO UPDATE SET
+                            thread_id = excluded.thread_id,
+                            payload = excluded.payload,
+                            updated_at = excluded.updated_at
+                        """,
+                        (thread.user_id, thread.thread_id, payload, updated_at),
+                    )
+                )
+                self._cache_put(thread.user_id, (updated_at, self._copy_thread(thread)))
+                return
+            path = self._active_path(thread.user_id)
+            payload = json.dumps(thread.to_dict(), ensure_ascii=False, indent=2)
             with self._lock:
                 path.write_text(payload, encoding="utf-8")
         except Exception as exc:  # pragma: no cover - defensive guard
@@ -64,40 +149,268 @@ class ThreadStorage:
                 exc,
             )
 
-    def load_archived(self, user_id: str) -> list[ArchivedThread]:
-        path = self._archive_path(user_id)
-        if not path.exists():
-            return []
+    def delete_active(self, user_id: str) -> bool:
+        """Удалить активный тред пользователя; False, если его не было."""
+        if self._pool is not None:
+            deleted = self._pool.write(
+                lambda conn: conn.execute("DELETE FROM active_threads WHERE user_id = ?", (user_id,)).rowcount
+            )
+            self._cache_put(user_id, None)
+            return bool(deleted)
+        path = self._active_path(user_id)
+        with self._lock:
+            if not path.exists():
+                return False
+            path.unlink()
+        return True
+
+    def load_archived(
+        self,
+        user_id: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> list[ArchivedThread]:
+        """
+        Архивные треды пользователя в хронологическом порядке.
+
+        Страница отсчитывается от самых свежих: ``offset`` последних тредов
+        пропускается, затем берется ``limit`` (по умолчанию
+        ``archive_recent_limit``; 0 — все).
+        """
+        limit = self.archive_recent_limit if limit is None else max(0, int(limit))
+        offset = max(0, int(offset))
         try:
+            if self._pool is not None:
+                rows = self._pool.reader().execute(
+                    """
+                    SELECT payload FROM archived_threads
+                    WHERE user_id = ?
+                    ORDER BY id DESC
+                    LIMIT ? OFFSET ?
+                    """,
+                    (user_id, limit or -1, offset),
+                ).fetchall()
+                return [ArchivedThread.from_dict(json.loads(row["payload"])) for row in reversed(rows)]
+            path = self._archive_path(user_id)
+            if not path.exists():
+                return []
             payload = json.loads(path.read_text(encoding="utf-8"))
-            return [ArchivedThread.from_dict(item) for item in payload]
+            archived = [ArchivedThread.from_dict(item) for item in payload]
+            end = len(archived) - offset
+            return archived[max(0, end - limit) if limit else 0 : max(0, end)]
         except Exception as exc:  # pragma: no cover - defensive guard
             logger.error("[THREAD_STORAGE] load_archived failed for user=%s: %s", user_id, exc)
             return []
 
     def archive_thread(self, thread: ThreadState, reason: str = "new_thread") -> None:
-        archived = self.load_archived(thread.user_id)
-        archived.append(
-            ArchivedThread(
-                thread_id=thread.thread_id,
-                core_direction=thread.core_direction,
-                closed_loops=list(thread.closed_loops),
-                open_loops=list(thread.open_loops),
-                final_phase=thread.phase,
-                archived_at=datetime.utcnow(),
-                archive_reason=reason,
-                pattern_core=thread.pattern_core,
-                active_frame=dict(thread.active_frame),
+        item = ArchivedThread(
+            thread_id=thread.thread_id,
+            core_direction=thread.core_direction,
+            closed_loops=list(thread.closed_loops),
+            open_loops=list(thread.open_loops),
+            final_phase=thread.phase,
+            archived_at=datetime.utcnow(),
+            archive_reason=reason,
+            pattern_core=thread.pattern_core,
+            active_frame=dict(thread.active_frame),
+        )
+        if self._pool is not None:
+            self._pool.write(lambda conn: self._insert_archived(conn, thread.user_id, item.to_dict()))
+            return
+        with self._lock:
+            archived = self.load_archived(thread.user_id, limit=0)
+            archived.append(item)
+            payload = json.dumps(
+                [entry.to_dict() for entry in archived],
+                ensure_ascii=False,
+                indent=2,
             )
+            self._archive_path(thread.user_id).write_text(payload, encoding="utf-8")
+
+    def list_active_payloads(self) -> list[dict[str, Any]]:
+        """Все активные треды (для admin-поверхности), отсортированные по user_id."""
+        if self._pool is not None:
+            rows = self._pool.reader().execute("SELECT payload FROM active_threads ORDER BY user_id").fetchall()
+            return [json.loads(row["payload"]) for row in rows]
+        payloads: list[dict[str, Any]] = []
+        for file_path in sorted(self._dir.glob("*_active.json")):
+            try:
+                payloads.append(json.loads(file_path.read_text(encoding="utf-8")))
+            except Exception:
+                continue
+        return payloads
+
+    def list_archived_payloads(self) -> list[tuple[str, dict[str, Any]]]:
+        """Все архивные треды как пары ``(user_id, payload)``."""
+        if self._pool is not None:
+            rows = self._pool.reader().execute(
+                "SELECT user_id, payload FROM archived_threads ORDER BY user_id, id"
+            ).fetchall()
+            return [(str(row["user_id"]), json.loads(row["payload"])) for row in rows]
+        items: list[tuple[str, dict[str, Any]]] = []
+        for file_path in sorted(self._dir.glob("*_archive.json")):
+            user_id = file_path.stem.replace("_archive", "")
+            try:
+                payload = json.loads(file_path.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            items.extend((user_id, item) for item in (payload if isinstance(payload, list) else []))
+        return items
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "storage_dir": str(self._dir),
+                "archive_recent_limit": self.archive_recent_limit,
+                "cache_size": len(self._cache),
+                "cache_max_size": self._cache_size,
+                "cache_hits": self._cache_hits,
+                "cache_misses": self._cache_misses,
+            }
+
+    # ------------------------------------------------------------------ #
+    # SQLite backend
+    # ------------------------------------------------------------------ #
+
+    def _load_active_sql(self, user_id: str) -> Optional[ThreadState]:
+        reader = self._pool.reader()
+        with self._lock:
+            cached = self._cache.get(user_id, False)
+        if cached is not False:
+            # Дешевая сверка по PK без чтения payload: строку мог переписать другой процесс.
+            row = reader.execute("SELECT updated_at FROM active_threads WHERE user_id = ?", (user_id,)).fetchone()
+            current = str(row["updated_at"]) if row is not None else None
+            if current == (cached[0] if cached is not None else None):
+                with self._lock:
+                    if user_id in self._cache:
+                        self._cache.move_to_end(user_id)
+                    self._cache_hits += 1
+                return self._copy_thread(cached[1]) if cached is not None else None
+        with self._lock:
+            self._cache_misses += 1
+        row = reader.execute(
+            "SELECT payload, updated_at FROM active_threads WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        if row is None:
+            self._cache_put(user_id, None)
+            return None
+        thread = ThreadState.from_dict(json.loads(row["payload"]))
+        self._cache_put(user_id, (str(row["updated_at"]), thread))
+        return self._copy_thread(thread)
+
+    @staticmethod
+    def _copy_thread(thread: ThreadState) -> ThreadState:
+        """Копия для вызывающего: изменяемы только списки и active_frame, остальные поля — строки/числа/datetime."""
+        clone = copy.copy(thread)
+        clone.open_loops = list(thread.open_loops)
+        clone.closed_loops = list(thread.closed_loops)
+        clone.must_avoid = list(thread.must_avoid)
+        clone.active_frame = dict(thread.active_frame)
+        return clone
+
+    def _cache_put(self, user_id: str, entry: Optional[tuple[str, ThreadState]]) -> None:
+        if not self._cache_size:
+            return
+        with self._lock:
+            self._cache[user_id] = entry
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _insert_archived(conn: sqlite3.Connection, user_id: str, payload: dict[str, Any]) -> None:
+        conn.execute(
+            """
+            INSERT INTO archived_threads (user_id, thread_id, archived_at, archive_reason, payload)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                user_id,
+                str(payload.get("thread_id", "")),
+                str(payload.get("archived_at", "")),
+                str(payload.get("archive_reason", "")),
+                json.dumps(payload, ensure_ascii=False),
+            ),
         )
-        path = self._archive_path(thread.user_id)
-        payload = json.dumps(
-            [item.to_dict() for item in archived],
-            ensure_ascii=False,
-            indent=2,
+
+    def _init_database(self, conn: sqlite3.Connection) -> None:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS active_threads (
+                user_id TEXT PRIMARY KEY,
+                thread_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS archived_threads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                archived_at TEXT NOT NULL,
+                archive_reason TEXT NOT NULL DEFAULT '',
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_archived_threads_user_id
+            ON archived_threads(user_id, id);
+            CREATE TABLE IF NOT EXISTS thread_store_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
         )
-        with self._lock:
-            path.write_text(payload, encoding="utf-8")
+        migrated = conn.execute(
+            "SELECT value FROM thread_store_meta WHERE key = ?",
+            (_JSON_MIGRATION_KEY,),
+        ).fetchone()
+        if migrated is None:
+            self._migrate_json_files(conn)
+
+    def _migrate_json_files(self, conn: sqlite3.Connection) -> None:
+        """Однократный импорт legacy JSON-файлов каталога (в той же транзакции, что и DDL)."""
+        active_count = 0
+        archived_count = 0
+        for file_path in sorted(self._dir.glob("*_active.json")):
+            try:
+                payload = json.loads(file_path.read_text(encoding="utf-8"))
+                user_id = str(payload.get("user_id") or file_path.name[: -len("_active.json")])
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO active_threads (user_id, thread_id, payload, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (
+                        user_id,
+                        str(payload.get("thread_id", "")),
+                        json.dumps(payload, ensure_ascii=False),
+                        datetime.utcnow().isoformat(),
+                    ),
+                )
+                active_count += 1
+            except Exception as exc:
+                logger.warning("[THREAD_STORAGE] skip active file %s during migration: %s", file_path.name, exc)
+        for file_path in sorted(self._dir.glob("*_archive.json")):
+            user_id = file_path.name[: -len("_archive.json")]
+            try:
+                payload = json.loads(file_path.read_text(encoding="utf-8"))
+            except Exception as exc:
+                logger.warning("[THREAD_STORAGE] skip archive file %s during migration: %s", file_path.name, exc)
+                continue
+            for item in payload if isinstance(payload, list) else []:
+                if isinstance(item, dict):
+                    self._insert_archived(conn, user_id, item)
+                    archived_count += 1
+        conn.execute(
+            "INSERT OR REPLACE INTO thread_store_meta (key, value) VALUES (?, ?)",
+            (_JSON_MIGRATION_KEY, datetime.utcnow().isoformat()),
+        )
+        if active_count or archived_count:
+            logger.info(
+                "[THREAD_STORAGE] migrated json threads: active=%s archived=%s",
+                active_count,
+                archived_count,
+            )
 
 
 thread_storage = ThreadStorage()
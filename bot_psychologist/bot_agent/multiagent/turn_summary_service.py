@@ -9,7 +9,7 @@ from pathlib import Path
 from typing import Any
 
 from ..config import config
-from .agents.agent_llm_client import create_agent_completion
+from .agents.agent_llm_client import create_agent_completion, get_shared_async_client
 from .contracts.turn_llm_summary import (
     TURN_LLM_SUMMARY_METHOD,
     TURN_LLM_SUMMARY_VERSION,
@@ -220,26 +220,23 @@ async def generate_turn_llm_summary_v1(
         )
 
     if client is None:
-        try:
-            from openai import AsyncOpenAI  # noqa: PLC0415
-
-            api_key = getattr(config, "OPENAI_API_KEY", None)
-            if not api_key:
-                return _build_failed_record(
-                    user_input=user_in,
-                    assistant_response=assistant_in,
-                    provider="openai",
-                    model=model_name,
-                    error="missing_openai_api_key",
-                )
-            client = AsyncOpenAI(api_key=api_key)
-        except Exception as exc:  # noqa: BLE001
+        api_key = getattr(config, "OPENAI_API_KEY", None)
+        if not api_key:
+            return _build_failed_record(
+                user_input=user_in,
+                assistant_response=assistant_in,
+                provider="openai",
+                model=model_name,
+                error="missing_openai_api_key",
+            )
+        client = get_shared_async_client(api_key)
+        if client is None:
             return _build_failed_record(
                 user_input=user_in,
                 assistant_response=assistant_in,
                 provider="openai",
                 model=model_name,
-                error=_safe_error(exc),
+                error="openai_client_unavailable",
             )
 
     system_prompt = _load_prompt()
@@ -0,0 +1,179 @@
+"""Token-level streaming channel from Writer LLM call to SSE consumers.
+
+Канал привязывается к текущему asyncio-контексту (contextvar) на время
+одного хода. Writer передает дельты провайдера в канал, канал выпускает их
+потребителю только после инкрементальной проверки валидатором и с удержанием
+хвоста (holdback), чтобы запрещенная фраза не могла уйти клиенту по частям.
+Финальный ответ оркестратора остается авторитетным: расхождение со
+стримленным префиксом закрывается событием замены (AnswerReplacement).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from ..feature_flags import feature_flags
+
+logger = logging.getLogger(__name__)
+
+WRITER_STREAM_VERSION = "writer_stream_v1"
+_MIN_HOLDBACK_CHARS = 16
+
+_ACTIVE_WRITER_STREAM: contextvars.ContextVar[Optional["WriterStreamChannel"]] = contextvars.ContextVar(
+    "active_writer_stream",
+    default=None,
+)
+
+
+class AnswerReplacement(str):
+    """Marker token: consumer must replace already streamed text with this value."""
+
+
+class WriterStreamChannel:
+    """Buffered bridge between writer deltas and one streaming consumer."""
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._buffer = ""
+        self._released_chars = 0
+        self._attempt_open = False
+        self._attempted = False
+        self._halted_reason: Optional[str] = None
+        self._check: Optional[Callable[[str], Optional[str]]] = None
+        self._holdback_chars = _MIN_HOLDBACK_CHARS
+        self.deltas_received = 0
+
+    @property
+    def released_text(self) -> str:
+        return self._buffer[: self._released_chars]
+
+    @property
+    def halted_reason(self) -> Optional[str]:
+        return self._halted_reason
+
+    def begin_attempt(
+        self,
+        *,
+        check: Optional[Callable[[str], Optional[str]]] = None,
+        holdback_chars: int = _MIN_HOLDBACK_CHARS,
+    ) -> Optional[Callable[[str], None]]:
+        """Open the single streamed writer attempt; retries are not streamed."""
+        if self._attempted:
+            return None
+        self._attempted = True
+        self._attempt_open = True
+        self._check = check
+        self._holdback_chars = max(int(holdback_chars), _MIN_HOLDBACK_CHARS)
+        return self.push
+
+    def end_attempt(self) -> None:
+        """Close the attempt; the held-back tail is reconciled from the final answer."""
+        self._attempt_open = False
+
+    def push(self, delta: str) -> None:
+        if not self._attempt_open or self._halted_reason or not delta:
+            return
+        self.deltas_received += 1
+        self._buffer += str(delta)
+        if self._check is not None:
+            try:
+                hit = self._check(self._buffer)
+            except Exception as exc:  # pragma: no cover - defensive
+                hit = f"stream_check_error: {exc}"
+            if hit:
+                self._halted_reason = str(hit)
+                logger.info("[WRITER_STREAM] halted: %s", hit)
+                return
+        releasable = len(self._buffer) - self._holdback_chars
+        if releasable <= self._released_chars:
+            return
+        # Выпускаем только до границы слова, чтобы не рвать токены посередине.
+        boundary = max(
+            self._buffer.rfind(" ", self._released_chars, releasable),
+            self._buffer.rfind("\n", self._released_chars, releasable),
+        )
+        if boundary < self._released_chars:
+            return
+        chunk = self._buffer[self._released_chars : boundary + 1]
+        self._released_chars = boundary + 1
+        self._queue.put_nowait(chunk)
+
+    async def drain_until(self, task: "asyncio.Future[Any]") -> AsyncIterator[str]:
+        """Yield released chunks until the producing task completes."""
+        while True:
+            getter = asyncio.ensure_future(self._queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield getter.result()
+                continue
+            getter.cancel()
+            while not self._queue.empty():
+                yield self._queue.get_nowait()
+            return
+
+    def reconcile(self, final_answer: str) -> list[str]:
+        """Return tokens that bring the consumer from released text to final answer."""
+        final_text = str(final_answer or "")
+        released = self.released_text
+        if not released:
+            return []
+        if final_text.startswith(released):
+            tail = final_text[len(released) :]
+            return [tail] if tail else []
+        return [AnswerReplacement(final_text)]
+
+    def trace(self, final_answer: str) -> dict[str, Any]:
+        released = self.released_text
+        return {
+            "version": WRITER_STREAM_VERSION,
+            "attempted": self._attempted,
+            "deltas_received": self.deltas_received,
+            "released_chars": len(released),
+            "halted_reason": self._halted_reason,
+            "replaced": bool(released) and not str(final_answer or "").startswith(released),
+        }
+
+
+def writer_token_streaming_enabled() -> bool:
+    return bool(feature_flags.enabled("WRITER_TOKEN_STREAMING_ENABLED"))
+
+
+@contextmanager
+def writer_stream_scope(channel: Optional[WriterStreamChannel]) -> Iterator[Optional[WriterStreamChannel]]:
+    """Bind channel to current context; tasks created inside inherit it."""
+    token = _ACTIVE_WRITER_STREAM.set(channel)
+    try:
+        yield channel
+    finally:
+        _ACTIVE_WRITER_STREAM.reset(token)
+
+
+def current_writer_stream() -> Optional[WriterStreamChannel]:
+    return _ACTIVE_WRITER_STREAM.get()
+
+
+def open_writer_stream_attempt(contract: Any) -> Optional[Callable[[str], None]]:
+    """Return delta sink for writer call, or None when streaming is not applicable."""
+    channel = current_writer_stream()
+    if channel is None:
+        return None
+    thread_state = getattr(contract, "thread_state", None)
+    if bool(getattr(thread_state, "safety_active", False)):
+        return None
+
+    from .agents.validator_agent import validator_agent
+
+    return channel.begin_attempt(
+        check=lambda text: validator_agent.check_partial(text, contract),
+        holdback_chars=validator_agent.stream_holdback_chars(contract),
+    )
+
+
+def close_writer_stream_attempt() -> None:
+    channel = current_writer_stream()
+    if channel is not None:
+        channel.end_attempt()
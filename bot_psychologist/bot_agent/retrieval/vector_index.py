@@ -0,0 +1,215 @@
+"""
+Vector index backends for the local semantic fallback.
+
+Все бэкенды работают по L2-нормированной матрице (косинус = скалярное
+произведение) и отдают (indices, scores) по убыванию score:
+
+- ``exact`` — полный проход ``matrix @ q`` + ``argpartition`` (O(N) без
+  полной сортировки);
+- ``ivf`` — IVF-Flat: сферический k-means делит корпус на ``n_lists``
+  кластеров, запрос сканирует только ``nprobe`` ближайших. Только NumPy/CPU,
+  артефакты — несжатые ``.npy`` рядом с кэшем индекса retriever'а.
+
+Качество приближенного бэкенда проверяется через ``recall_at_k`` против
+``exact`` (см. scripts/eval_vector_index.py).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IVF_META_NAME = "ivf_meta.json"
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    if top_k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k >= scores.size:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, top_k - 1)[:top_k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class VectorIndex:
+    """Базовый интерфейс: search(query_vec, top_k) -> (indices, scores)."""
+
+    backend = "base"
+
+    def __init__(self, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def search(self, query_vec: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    def save(self, directory: Path) -> None:
+        """Сохранить артефакты бэкенда (матрица сохраняется отдельно)."""
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "size": len(self)}
+
+
+class ExactVectorIndex(VectorIndex):
+    backend = "exact"
+
+    def search(self, query_vec: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = np.asarray(self.matrix @ query_vec, dtype=np.float32)
+        indices = _top_k(scores, top_k)
+        return indices, scores[indices]
+
+
+class IVFVectorIndex(VectorIndex):
+    backend = "ivf"
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        centroids: np.ndarray,
+        order: np.ndarray,
+        offsets: np.ndarray,
+        nprobe: int = 32,
+    ) -> None:
+        super().__init__(matrix)
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = max(1, int(nprobe))
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        *,
+        n_lists: Optional[int] = None,
+        nprobe: int = 32,
+        iterations: int = 10,
+        sample_per_list: int = 256,
+        seed: int = 13,
+    ) -> "IVFVectorIndex":
+        count = int(matrix.shape[0])
+        n_lists = max(1, min(count, int(n_lists or round(math.sqrt(count)))))
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, n_lists * max(1, sample_per_list))
+        sample_ids = np.sort(rng.choice(count, size=sample_size, replace=False))
+        sample = np.asarray(matrix[sample_ids], dtype=np.float32)
+
+        # Сферический k-means на выборке: центроиды — нормированные средние кластеров.
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+        for _ in range(max(1, iterations)):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            empty = norms == 0.0
+            if np.any(empty):
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+                norms[empty] = np.linalg.norm(sums[empty], axis=1)
+            centroids = sums / np.maximum(norms, 1e-12)[:, None]
+
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 65536):
+            chunk = np.asarray(matrix[start : start + 65536], dtype=np.float32)
+            assign[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=n_lists))
+        return cls(matrix, centroids.astype(np.float32), order, offsets, nprobe=nprobe)
+
+    def search(self, query_vec: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        probe = _top_k(self.centroids @ query_vec, min(self.nprobe, self.n_lists))
+        candidates = np.concatenate([self.order[self.offsets[i] : self.offsets[i + 1]] for i in probe])
+        if candidates.size == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        candidates.sort()
+        scores = np.asarray(self.matrix[candidates] @ query_vec, dtype=np.float32)
+        best = _top_k(scores, top_k)
+        return candidates[best], scores[best]
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        np.save(directory / "ivf_centroids.npy", self.centroids)
+        np.save(directory / "ivf_order.npy", self.order)
+        np.save(directory / "ivf_offsets.npy", self.offsets)
+        (directory / IVF_META_NAME).write_text(
+            json.dumps({"n_lists": self.n_lists, "size": len(self)}), encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, directory: Path, matrix: np.ndarray, nprobe: int = 32) -> Optional["IVFVectorIndex"]:
+        directory = Path(directory)
+        try:
+            meta = json.loads((directory / IVF_META_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if int(meta.get("size", -1)) != int(matrix.shape[0]):
+            return None
+        return cls(
+            matrix,
+            np.load(directory / "ivf_centroids.npy", mmap_mode="r"),
+            np.load(directory / "ivf_order.npy", mmap_mode="r"),
+            np.load(directory / "ivf_offsets.npy", mmap_mode="r"),
+            nprobe=nprobe,
+        )
+
+    def stats(self) -> dict:
+        return {**super().stats(), "n_lists": self.n_lists, "nprobe": self.nprobe}
+
+
+def resolve_backend(backend: str, size: int, ivf_min_size: int) -> str:
+    backend = (backend or "auto").strip().lower()
+    if backend == "auto":
+        return "ivf" if size >= ivf_min_size else "exact"
+    return backend if backend in {"exact", "ivf"} else "exact"
+
+
+def build_vector_index(
+    matrix: np.ndarray,
+    backend: str = "auto",
+    *,
+    ivf_min_size: int = 20000,
+    n_lists: Optional[int] = None,
+    nprobe: int = 32,
+) -> VectorIndex:
+    if resolve_backend(backend, int(matrix.shape[0]), ivf_min_size) == "ivf" and matrix.shape[0] > 1:
+        return IVFVectorIndex.build(matrix, n_lists=n_lists, nprobe=nprobe)
+    return ExactVectorIndex(matrix)
+
+
+def load_vector_index(directory: Path, matrix: np.ndarray, *, nprobe: int = 32) -> VectorIndex:
+    """Поднять сохраненный IVF (mmap); без артефактов — exact по той же матрице."""
+    index = IVFVectorIndex.load(directory, matrix, nprobe=nprobe)
+    return index if index is not None else ExactVectorIndex(matrix)
+
+
+def recall_at_k(
+    exact: VectorIndex,
+    candidate: VectorIndex,
+    queries: Sequence[np.ndarray],
+    top_k: int = 10,
+) -> float:
+    """Средняя доля точного top-k, найденная кандидатом."""
+    if not queries:
+        return 0.0
+    total = 0.0
+    for query in queries:
+        truth = set(exact.search(query, top_k)[0].tolist())
+        if not truth:
+            total += 1.0
+            continue
+        found = set(candidate.search(query, top_k)[0].tolist())
+        total += len(truth & found) / len(truth)
+    return total / len(queries)
@@ -2,14 +2,50 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Sequence, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from ..config import config
 
 logger = logging.getLogger(__name__)
 
+_RESULT_CACHE_SIZE = 512
+
+# voyageai.Client держит HTTP-сессию: один клиент на api key на процесс.
+_clients: Dict[str, object] = {}
+_clients_lock = threading.Lock()
+_result_cache: "OrderedDict[tuple, Tuple[Tuple[str, float], ...]]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def _get_client(api_key: str):
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            import voyageai  # type: ignore
+
+            client = voyageai.Client(api_key=api_key)
+            _clients[api_key] = client
+        return client
+
+
+def _item_id(item: "RerankItem") -> str:
+    payload = item.payload
+    for attr in ("block_id", "chunk_id", "id"):
+        value = getattr(payload, attr, None)
+        if value:
+            return str(value)
+    return hashlib.sha1(str(item.text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def clear_rerank_cache() -> None:
+    with _result_cache_lock:
+        _result_cache.clear()
+
 
 @dataclass
 class RerankItem:
@@ -45,14 +81,22 @@ class VoyageReranker:
             # Preserve candidate diversity when Voyage rerank is unavailable.
             return sorted(items, key=lambda x: x.score, reverse=True)
 
-        try:
-            import voyageai  # type: ignore
+        ids = [_item_id(item) for item in items]
+        cache_key = self._cache_key(query, ids, top_k)
+        cached = self._cached_hits(cache_key)
+        if cached is not None:
+            position = {item_id: idx for idx, item_id in enumerate(ids)}
+            return [
+                RerankItem(text=items[position[item_id]].text, payload=items[position[item_id]].payload, score=score)
+                for item_id, score in cached
+            ]
 
+        try:
             if not VoyageReranker._logged_enabled:
                 VoyageReranker._logged_enabled = True
                 logger.info("[VOYAGE] rerank enabled (model=%s). Calling Voyage API.", self.model)
 
-            client = voyageai.Client(api_key=self.api_key)
+            client = _get_client(self.api_key)
             texts = [item.text for item in items]
             result = client.rerank(
                 model=self.model,
@@ -70,12 +114,42 @@ class VoyageReranker:
                         score=float(hit.relevance_score),
                     )
                 )
+            if cache_key is not None:
+                self._store_hits(
+                    cache_key,
+                    tuple((ids[hit.index], float(hit.relevance_score)) for hit in result.results),
+                )
             return reranked
         except Exception as exc:
             logger.warning("[VOYAGE] fallback: %s: %s", type(exc).__name__, exc)
             # Preserve candidate diversity in local fallback.
             return sorted(items, key=lambda x: x.score, reverse=True)
 
+    def _cache_key(self, query: str, ids: List[str], top_k: int) -> Optional[tuple]:
+        # Дубликаты id делают отображение обратно в items неоднозначным.
+        if len(set(ids)) != len(ids):
+            return None
+        query_hash = hashlib.sha1(" ".join(str(query or "").split()).encode("utf-8")).hexdigest()
+        return (self.model, query_hash, tuple(sorted(ids)), int(top_k))
+
+    @staticmethod
+    def _cached_hits(key: Optional[tuple]) -> Optional[Tuple[Tuple[str, float], ...]]:
+        if key is None:
+            return None
+        with _result_cache_lock:
+            hits = _result_cache.get(key)
+            if hits is not None:
+                _result_cache.move_to_end(key)
+            return hits
+
+    @staticmethod
+    def _store_hits(key: tuple, hits: Tuple[Tuple[str, float], ...]) -> None:
+        with _result_cache_lock:
+            _result_cache[key] = hits
+            _result_cache.move_to_end(key)
+            while len(_result_cache) > _RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+
     def rerank_pairs(
         self,
         query: str,
@@ -6,13 +6,13 @@ Simple TF-IDF Retriever
 Поиск релевантных блоков на основе TF-IDF + косинусного сходства.
 """
 
+import asyncio
 import hashlib
 import logging
 from time import monotonic, sleep
 from pathlib import Path
 from typing import Any, List, Tuple, Optional
 
-import joblib
 import numpy as np
 
 from .data_loader import data_loader, Block
@@ -20,13 +20,16 @@ from .config import config
 from .db_api_client import DBApiClient, DBApiUnavailableError, RetrievedChunk
 from .embedding_provider import create_embedding_provider
 from .feature_flags import feature_flags
+from .index_cache import fingerprint_sources, load_index, read_manifest, save_index
 
 logger = logging.getLogger(__name__)
 
-CACHE_FORMAT_VERSION = "4.1.0"  # semantic fallback embeddings + model-aware cache
+CACHE_FORMAT_VERSION = "5.0.0"  # source manifest + mmap artifacts
 CACHE_DIR = config.CACHE_DIR
-TFIDF_CACHE_PATH = CACHE_DIR / "tfidf_cache.joblib"
-TFIDF_HASH_PATH = CACHE_DIR / "tfidf_cache.hash"
+INDEX_CACHE_DIR = CACHE_DIR / "retriever_index"
+# Монолитный joblib-кэш прошлых версий: удаляется после сохранения нового формата.
+LEGACY_TFIDF_CACHE_PATH = CACHE_DIR / "tfidf_cache.joblib"
+LEGACY_TFIDF_HASH_PATH = CACHE_DIR / "tfidf_cache.hash"
 
 
 class SimpleRetriever:
@@ -47,6 +50,7 @@ class SimpleRetriever:
         self.vectorizer = None
         self.tfidf_matrix = None
         self.semantic_matrix = None
+        self.vector_index = None
         self.blocks: List[Block] = []
         self._embedding_provider = None
         self._semantic_ready = False
@@ -117,38 +121,41 @@ class SimpleRetriever:
             return
         self._build_or_load_tfidf()
 
-    def _compute_data_hash(self) -> str:
+    def _source_files(self) -> List[Path]:
+        """Файлы знаний, от которых зависит индекс (по KNOWLEDGE_SOURCE)."""
+        if config.KNOWLEDGE_SOURCE == "json":
+            return sorted(config.SAG_FINAL_DIR.glob("**/*.for_vector.json"))
+        if config.KNOWLEDGE_SOURCE == "db_json":
+            db_dir = Path(config.DB_JSON_DIR) if config.DB_JSON_DIR else None
+            db_file = Path(config.DB_EXPORT_FILE) if config.DB_EXPORT_FILE else None
+            if db_file and db_file.exists():
+                return [db_file]
+            if db_dir and db_dir.exists():
+                return sorted(db_dir.glob("**/*_blocks.json"))
+            return []
+        merged_path = Path(getattr(config, "ALL_BLOCKS_MERGED_PATH", "") or "")
+        if str(merged_path) not in ("", ".") and merged_path.exists():
+            return [merged_path]
+        return []
+
+    def _compute_data_hash(self, sources: Optional[List[dict]] = None) -> str:
         """
-        Вычисляет хэш данных для инвалидации TF-IDF кэша.
-        Зависит от KNOWLEDGE_SOURCE и содержимого источников.
+        Вычисляет хэш данных для инвалидации кэша индекса.
+        Зависит от KNOWLEDGE_SOURCE и манифеста источников (path, size, mtime, sha256).
         """
         hasher = hashlib.md5()
         hasher.update(CACHE_FORMAT_VERSION.encode())
         hasher.update(config.KNOWLEDGE_SOURCE.encode())
         hasher.update(str(getattr(config, "EMBEDDING_MODEL", "")).encode())
+        hasher.update(self._vector_index_settings().encode())
 
-        if config.KNOWLEDGE_SOURCE == "json":
-            for file_path in sorted(
-                config.SAG_FINAL_DIR.glob("**/*.for_vector.json")
-            ):
-                hasher.update(file_path.read_bytes())
+        if sources is None:
+            sources = fingerprint_sources(self._source_files())
+        for entry in sources:
+            hasher.update(f"{entry['path']}:{entry['sha256']}".encode())
 
-        elif config.KNOWLEDGE_SOURCE == "db_json":
-            db_dir = Path(config.DB_JSON_DIR) if config.DB_JSON_DIR else None
-            db_file = Path(config.DB_EXPORT_FILE) if config.DB_EXPORT_FILE else None
-            if db_file and db_file.exists():
-                hasher.update(db_file.read_bytes())
-            elif db_dir and db_dir.exists():
-                for file_path in sorted(db_dir.glob("**/*_blocks.json")):
-                    hasher.update(file_path.read_bytes())
-
-        else:  # chromadb/api
+        if not sources and config.KNOWLEDGE_SOURCE not in ("json", "db_json"):  # chromadb/api
             try:
-                merged_path = Path(getattr(config, "ALL_BLOCKS_MERGED_PATH", "") or "")
-                if merged_path and merged_path.exists():
-                    hasher.update(merged_path.read_bytes())
-                    return hasher.hexdigest()
-
                 from .chroma_loader import chroma_loader
                 resp = chroma_loader._session.get(
                     f"{chroma_loader.api_url}{chroma_loader.STATS_URL}",
@@ -165,30 +172,32 @@ class SimpleRetriever:
 
     def _build_or_load_tfidf(self) -> None:
         CACHE_DIR.mkdir(parents=True, exist_ok=True)
-        current_hash = self._compute_data_hash()
-
-        if TFIDF_CACHE_PATH.exists() and TFIDF_HASH_PATH.exists():
-            saved_hash = TFIDF_HASH_PATH.read_text(encoding="utf-8").strip()
-            if saved_hash == current_hash:
-                try:
-                    cached = joblib.load(TFIDF_CACHE_PATH)
-                    self.vectorizer = cached.get("vectorizer")
-                    self.tfidf_matrix = cached.get("matrix")
-                    self.blocks = cached.get("blocks", [])
-                    cached_model = cached.get("embedding_model")
-                    if cached_model == str(getattr(config, "EMBEDDING_MODEL", "")):
-                        semantic = cached.get("semantic_matrix")
-                        if semantic is not None:
-                            self.semantic_matrix = np.asarray(semantic, dtype=np.float32)
-                            self._semantic_ready = bool(self.semantic_matrix.size)
-                    else:
-                        self.semantic_matrix = None
-                        self._semantic_ready = False
-                    self._is_built = True
-                    logger.info("[RETRIEVAL] TF-IDF loaded from cache (hash match)")
-                    return
-                except Exception as exc:
-                    logger.warning("[RETRIEVAL] cache load failed: %s. Rebuilding.", exc)
+        previous = read_manifest(INDEX_CACHE_DIR) or {}
+        # sha256 пересчитывается только у файлов с изменившимися size/mtime.
+        sources = fingerprint_sources(self._source_files(), previous.get("sources"))
+        current_hash = self._compute_data_hash(sources)
+        embedding_model = str(getattr(config, "EMBEDDING_MODEL", ""))
+
+        try:
+            cached = load_index(
+                INDEX_CACHE_DIR,
+                current_hash,
+                embedding_model,
+                nprobe=int(getattr(config, "SEMANTIC_INDEX_IVF_NPROBE", 32)),
+            )
+        except Exception as exc:
+            logger.warning("[RETRIEVAL] cache load failed: %s. Rebuilding.", exc)
+            cached = None
+        if cached is not None:
+            self.vectorizer = cached.vectorizer
+            self.tfidf_matrix = cached.tfidf_matrix
+            self.blocks = cached.blocks
+            self.semantic_matrix = cached.semantic_matrix
+            self.vector_index = cached.vector_index
+            self._semantic_ready = self.semantic_matrix is not None and bool(self.semantic_matrix.size)
+            self._is_built = True
+            logger.info("[RETRIEVAL] index mapped from cache (manifest match, blocks=%s)", len(self.blocks))
+            return
 
         logger.info("[RETRIEVAL] building TF-IDF index")
         self._build_tfidf()
@@ -199,20 +208,20 @@ class SimpleRetriever:
             return
 
         try:
-            joblib.dump(
-                {
-                    "vectorizer": self.vectorizer,
-                    "matrix": self.tfidf_matrix,
-                    "blocks": self.blocks,
-                    "semantic_matrix": self.semantic_matrix,
-                    "embedding_model": str(getattr(config, "EMBEDDING_MODEL", "")),
-                    "cache_version": CACHE_FORMAT_VERSION,
-                },
-                TFIDF_CACHE_PATH,
-                compress=3,
+            save_index(
+                INDEX_CACHE_DIR,
+                fingerprint=current_hash,
+                sources=sources,
+                vectorizer=self.vectorizer,
+                tfidf_matrix=self.tfidf_matrix,
+                blocks=self.blocks,
+                semantic_matrix=self.semantic_matrix,
+                embedding_model=embedding_model,
+                vector_index=self.vector_index,
             )
-            TFIDF_HASH_PATH.write_text(current_hash, encoding="utf-8")
-            logger.info("[RETRIEVER] TF-IDF matrix cached successfully")
+            for legacy_path in (LEGACY_TFIDF_CACHE_PATH, LEGACY_TFIDF_HASH_PATH):
+                legacy_path.unlink(missing_ok=True)
+            logger.info("[RETRIEVER] index cache saved (mmap layout)")
         except Exception as exc:
             logger.warning("[RETRIEVER] Could not save cache: %s", exc)
 
@@ -257,8 +266,46 @@ class SimpleRetriever:
             )
         return self._embedding_provider
 
+    @staticmethod
+    def _vector_index_settings() -> str:
+        return "|".join(
+            str(getattr(config, name, ""))
+            for name in (
+                "SEMANTIC_INDEX_BACKEND",
+                "SEMANTIC_INDEX_IVF_MIN_BLOCKS",
+                "SEMANTIC_INDEX_IVF_LISTS",
+            )
+        )
+
+    def _get_vector_index(self):
+        """Индекс по текущей semantic_matrix; без сохраненного — exact (argpartition)."""
+        index = self.vector_index
+        if index is None or index.matrix is not self.semantic_matrix:
+            from .retrieval.vector_index import ExactVectorIndex
+
+            index = self.vector_index = ExactVectorIndex(self.semantic_matrix)
+        return index
+
+    def _build_vector_index(self) -> None:
+        from .retrieval.vector_index import build_vector_index
+
+        started = monotonic()
+        self.vector_index = build_vector_index(
+            self.semantic_matrix,
+            str(getattr(config, "SEMANTIC_INDEX_BACKEND", "auto")),
+            ivf_min_size=int(getattr(config, "SEMANTIC_INDEX_IVF_MIN_BLOCKS", 20000)),
+            n_lists=int(getattr(config, "SEMANTIC_INDEX_IVF_LISTS", 0)) or None,
+            nprobe=int(getattr(config, "SEMANTIC_INDEX_IVF_NPROBE", 32)),
+        )
+        logger.info(
+            "[RETRIEVAL] vector index ready: %s (%.0f ms)",
+            self.vector_index.stats(),
+            (monotonic() - started) * 1000.0,
+        )
+
     def _build_semantic_index(self) -> None:
         self.semantic_matrix = None
+        self.vector_index = None
         self._semantic_ready = False
         if not feature_flags.enabled("ENABLE_EMBEDDING_PROVIDER"):
             logger.info("[RETRIEVAL] semantic index disabled by feature flag")
@@ -276,6 +323,7 @@ class SimpleRetriever:
                 return
             self.semantic_matrix = self._normalize_vectors(matrix)
             self._semantic_ready = True
+            self._build_vector_index()
             logger.info(
                 "[RETRIEVAL] semantic index built: model=%s dim=%s blocks=%s",
                 provider.model_name(),
@@ -299,11 +347,10 @@ class SimpleRetriever:
             if norm == 0.0:
                 return []
             query_vec = query_vec / norm
-            similarities = self.semantic_matrix @ query_vec
-            top_indices = np.argsort(-similarities)[: top_k * 2]
+            top_indices, top_scores = self._get_vector_index().search(query_vec, top_k * 2)
             results: List[Tuple[Block, float]] = []
-            for idx in top_indices:
-                score = float(similarities[idx])
+            for idx, score in zip(top_indices, top_scores):
+                score = float(score)
                 if score >= config.MIN_RELEVANCE_SCORE:
                     results.append((self.blocks[idx], score))
                 if len(results) >= top_k:
@@ -395,10 +442,39 @@ class SimpleRetriever:
             use_rerank=True,
             search_mode="hybrid",
         )
-        results: List[Tuple[Block, float]] = []
-        for chunk in chunks:
-            results.append((self._chunk_to_block(chunk), float(chunk.score)))
-        return results
+        return [(self._chunk_to_block(chunk), float(chunk.score)) for chunk in chunks]
+
+    async def _aapi_retrieve(
+        self,
+        query: str,
+        top_k: int,
+        author_id: Optional[str] = None,
+    ) -> List[Tuple[Block, float]]:
+        chunks = await self.db_client.aquery(
+            query=query,
+            top_k=top_k,
+            author_id=author_id,
+            use_rerank=True,
+            search_mode="hybrid",
+        )
+        return [(self._chunk_to_block(chunk), float(chunk.score)) for chunk in chunks]
+
+    def _should_retry_api(self, exc: DBApiUnavailableError, attempt: int, max_attempts: int) -> bool:
+        if (
+            exc.kind == "http_status"
+            and int(exc.status_code or 0) == 503
+            and self._fast_fail_on_503()
+        ):
+            return False
+        if exc.kind not in {"timeout", "connect", "http_status"} or attempt >= max_attempts:
+            return False
+        logger.warning(
+            "[RETRIEVAL] API retry %s/%s after transient error kind=%s",
+            attempt,
+            max_attempts,
+            exc.kind,
+        )
+        return True
 
     def _api_retrieve_with_retry(
         self,
@@ -410,7 +486,6 @@ class SimpleRetriever:
         Retry API retrieval for transient connectivity/timeout issues.
         """
         max_attempts = 2
-        last_exc: Optional[DBApiUnavailableError] = None
         for attempt in range(1, max_attempts + 1):
             try:
                 return self._api_retrieve(
@@ -419,43 +494,39 @@ class SimpleRetriever:
                     author_id=author_id,
                 )
             except DBApiUnavailableError as exc:
-                last_exc = exc
-                if (
-                    exc.kind == "http_status"
-                    and int(exc.status_code or 0) == 503
-                    and self._fast_fail_on_503()
-                ):
-                    raise
-                if exc.kind not in {"timeout", "connect", "http_status"} or attempt >= max_attempts:
+                if not self._should_retry_api(exc, attempt, max_attempts):
                     raise
-                logger.warning(
-                    "[RETRIEVAL] API retry %s/%s after transient error kind=%s",
-                    attempt,
-                    max_attempts,
-                    exc.kind,
-                )
                 sleep(0.2 * attempt)
-        if last_exc is not None:
-            raise last_exc
         return []
-    
-    def retrieve(
+
+    async def _aapi_retrieve_with_retry(
         self,
         query: str,
-        top_k: Optional[int] = None,
+        top_k: int,
         author_id: Optional[str] = None,
-        **legacy_kwargs,
     ) -> List[Tuple[Block, float]]:
-        """
-        Найти top_k релевантных блоков для запроса.
-
-        Args:
-            query: Текст запроса на русском языке
-            top_k: Количество результатов (по умолчанию из config)
+        """Async-вариант _api_retrieve_with_retry поверх пулированного AsyncClient."""
+        max_attempts = 2
+        for attempt in range(1, max_attempts + 1):
+            try:
+                return await self._aapi_retrieve(
+                    query=query,
+                    top_k=top_k,
+                    author_id=author_id,
+                )
+            except DBApiUnavailableError as exc:
+                if not self._should_retry_api(exc, attempt, max_attempts):
+                    raise
+                await asyncio.sleep(0.2 * attempt)
+        return []
 
-        Returns:
-            Список кортежей (Block, score), отсортированный по убыванию score
-        """
+    def _prepare_retrieve(
+        self,
+        query: str,
+        top_k: Optional[int],
+        legacy_kwargs: dict[str, Any],
+    ) -> tuple[int, bool]:
+        """Нормализовать top_k и legacy-аргументы; вернуть (top_k, degraded)."""
         if top_k is None:
             top_k = config.TOP_K_BLOCKS
 
@@ -475,18 +546,75 @@ class SimpleRetriever:
             logger.warning(
                 "[RETRIEVER] DEGRADED_MODE active. Retrieval returns 0 blocks. reason=no_data_source"
             )
-            return []
+            return int(top_k), True
+        return int(top_k), False
+
+    def _begin_api_debug(self) -> dict[str, Any]:
+        debug: dict[str, Any] = {
+            "retrieval_source_attempted": "api",
+            "retrieval_source_used": "api",
+            "bot_db_circuit_open": self._is_circuit_open(),
+            "bot_db_last_error_kind": self._bot_db_last_error_kind or None,
+            "bot_db_last_status_code": self._bot_db_last_status_code,
+            "bot_db_last_error_class": (
+                "ChromaDB unavailable"
+                if "chromadb unavailable" in (self._bot_db_last_error_message or "").lower()
+                else None
+            ),
+        }
+        self._last_retrieval_debug = debug
+        return debug
 
-        # ================================================================
-        # Новый путь: Bot_data_base HTTP API (cascading fallback)
-        # Активируется только для KNOWLEDGE_SOURCE=api|chromadb
-        # ================================================================
-        if config.KNOWLEDGE_SOURCE in ("api", "chromadb"):
-            self._last_retrieval_debug = {
-                "retrieval_source_attempted": "api",
-                "retrieval_source_used": "api",
-                "bot_db_circuit_open": self._is_circuit_open(),
-                "bot_db_last_error_kind": self._bot_db_last_error_kind or None,
+    def _mark_circuit_skip(self, debug: dict[str, Any]) -> None:
+        ttl_left = int(max(0.0, self._bot_db_circuit_open_until - self._now()))
+        logger.warning(
+            "[RETRIEVAL] BotDB circuit open: skip api for %ss reason=%s -> semantic fallback",
+            ttl_left,
+            self._bot_db_last_error_kind or "unknown",
+        )
+        debug.update(
+            {
+                "retrieval_source_used": "semantic_fallback",
+                "bot_db_circuit_open": True,
+            }
+        )
+
+    def _accept_api_results(self, api_results: List[Tuple[Block, float]], debug: dict[str, Any]) -> bool:
+        if api_results:
+            logger.info("[RETRIEVAL] API search: %d блоков", len(api_results))
+            self._bot_db_circuit_open_until = 0.0
+            debug.update(
+                {
+                    "retrieval_source_used": "api",
+                    "bot_db_circuit_open": False,
+                }
+            )
+            return True
+        logger.info("[RETRIEVAL] API search вернул 0 результатов → TF-IDF fallback")
+        debug["retrieval_source_used"] = "tfidf_fallback"
+        return False
+
+    def _record_api_failure(self, exc: DBApiUnavailableError, debug: dict[str, Any]) -> None:
+        if exc.kind == "http_status":
+            logger.warning(
+                "[RETRIEVAL] API fallback: kind=%s status=%s message=%s",
+                exc.kind,
+                exc.status_code,
+                exc,
+            )
+        else:
+            logger.warning(
+                "[RETRIEVAL] API fallback: kind=%s message=%s",
+                exc.kind,
+                exc,
+            )
+        self._bot_db_last_error_kind = str(exc.kind or "unknown")
+        self._bot_db_last_error_message = str(exc)
+        self._bot_db_last_status_code = int(exc.status_code) if exc.status_code is not None else None
+        debug.update(
+            {
+                "retrieval_source_used": "semantic_fallback",
+                "bot_db_last_error_kind": self._bot_db_last_error_kind,
                 "bot_db_last_status_code": self._bot_db_last_status_code,
                 "bot_db_last_error_class": (
                     "ChromaDB unavailable"
@@ -494,89 +622,110 @@ class SimpleRetriever:
                     else None
                 ),
             }
+        )
+        should_open, reason = self._should_open_circuit(exc)
+        if should_open:
+            self._open_circuit(exc=exc, reason=reason)
+            debug["bot_db_circuit_open"] = True
+
+    def _local_fallback(self, query: str, top_k: int, debug: dict[str, Any]) -> List[Tuple[Block, float]]:
+        """Semantic → TF-IDF fallback после недоступного/пустого API."""
+        if feature_flags.enabled("ENABLE_EMBEDDING_PROVIDER"):
+            semantic_results = self._semantic_fallback(query, top_k)
+            if semantic_results:
+                return semantic_results
+        else:
+            logger.info("[RETRIEVAL] semantic fallback disabled by feature flag")
+        debug["retrieval_source_used"] = "tfidf_fallback"
+        return self._tfidf_fallback(query, top_k)
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        author_id: Optional[str] = None,
+        **legacy_kwargs,
+    ) -> List[Tuple[Block, float]]:
+        """
+        Найти top_k релевантных блоков для запроса.
+
+        Args:
+            query: Текст запроса на русском языке
+            top_k: Количество результатов (по умолчанию из config)
+
+        Returns:
+            Список кортежей (Block, score), отсортированный по убыванию score
+        """
+        top_k, degraded = self._prepare_retrieve(query, top_k, legacy_kwargs)
+        if degraded:
+            return []
+
+        # ================================================================
+        # Новый путь: Bot_data_base HTTP API (cascading fallback)
+        # Активируется только для KNOWLEDGE_SOURCE=api|chromadb
+        # ================================================================
+        if config.KNOWLEDGE_SOURCE in ("api", "chromadb"):
+            debug = self._begin_api_debug()
             if self._is_circuit_open():
-                ttl_left = int(max(0.0, self._bot_db_circuit_open_until - self._now()))
-                logger.warning(
-                    "[RETRIEVAL] BotDB circuit open: skip api for %ss reason=%s -> semantic fallback",
-                    ttl_left,
-                    self._bot_db_last_error_kind or "unknown",
-                )
-                self._last_retrieval_debug.update(
-                    {
-                        "retrieval_source_used": "semantic_fallback",
-                        "bot_db_circuit_open": True,
-                    }
-                )
-                if feature_flags.enabled("ENABLE_EMBEDDING_PROVIDER"):
-                    semantic_results = self._semantic_fallback(query, top_k)
-                    if semantic_results:
-                        return semantic_results
-                else:
-                    logger.info("[RETRIEVAL] semantic fallback disabled by feature flag")
-                self._last_retrieval_debug["retrieval_source_used"] = "tfidf_fallback"
-                return self._tfidf_fallback(query, top_k)
+                self._mark_circuit_skip(debug)
+                return self._local_fallback(query, top_k, debug)
             try:
                 api_results = self._api_retrieve_with_retry(
                     query=query,
                     top_k=top_k,
                     author_id=author_id,
                 )
-                if api_results:
-                    logger.info("[RETRIEVAL] API search: %d блоков", len(api_results))
-                    self._bot_db_circuit_open_until = 0.0
-                    self._last_retrieval_debug.update(
-                        {
-                            "retrieval_source_used": "api",
-                            "bot_db_circuit_open": False,
-                        }
-                    )
+                if self._accept_api_results(api_results, debug):
                     return api_results
-                logger.info("[RETRIEVAL] API search вернул 0 результатов → TF-IDF fallback")
-                self._last_retrieval_debug["retrieval_source_used"] = "tfidf_fallback"
             except DBApiUnavailableError as exc:
-                if exc.kind == "http_status":
-                    logger.warning(
-                        "[RETRIEVAL] API fallback: kind=%s status=%s message=%s",
-                        exc.kind,
-                        exc.status_code,
-                        exc,
-                    )
-                else:
-                    logger.warning(
-                        "[RETRIEVAL] API fallback: kind=%s message=%s",
-                        exc.kind,
-                        exc,
-                    )
-                self._bot_db_last_error_kind = str(exc.kind or "unknown")
-                self._bot_db_last_error_message = str(exc)
-                self._bot_db_last_status_code = int(exc.status_code) if exc.status_code is not None else None
-                self._last_retrieval_debug.update(
-                    {
-                        "retrieval_source_used": "semantic_fallback",
-                        "bot_db_last_error_kind": self._bot_db_last_error_kind,
-                        "bot_db_last_status_code": self._bot_db_last_status_code,
-                        "bot_db_last_error_class": (
-                            "ChromaDB unavailable"
-                            if "chromadb unavailable" in (self._bot_db_last_error_message or "").lower()
-                            else None
-                        ),
-                    }
-                )
-                should_open, reason = self._should_open_circuit(exc)
-                if should_open:
-                    self._open_circuit(exc=exc, reason=reason)
-                    self._last_retrieval_debug["bot_db_circuit_open"] = True
-            if feature_flags.enabled("ENABLE_EMBEDDING_PROVIDER"):
-                semantic_results = self._semantic_fallback(query, top_k)
-                if semantic_results:
-                    return semantic_results
-            else:
-                logger.info("[RETRIEVAL] semantic fallback disabled by feature flag")
-            self._last_retrieval_debug["retrieval_source_used"] = "tfidf_fallback"
+                self._record_api_failure(exc, debug)
+            return self._local_fallback(query, top_k, debug)
         # ================================================================
 
         return self._tfidf_fallback(query, top_k)
 
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        author_id: Optional[str] = None,
+        **legacy_kwargs,
+    ) -> List[Tuple[Block, float]]:
+        """
+        Async-вариант retrieve: API-запрос идет через DBApiClient.aquery
+        (пулированный AsyncClient), CPU-bound fallback'и — в worker thread.
+        """
+        top_k, degraded = self._prepare_retrieve(query, top_k, legacy_kwargs)
+        if degraded:
+            return []
+
+        if config.KNOWLEDGE_SOURCE not in ("api", "chromadb"):
+            return await asyncio.to_thread(self._tfidf_fallback, query, top_k)
+
+        debug = self._begin_api_debug()
+        results: List[Tuple[Block, float]]
+        if self._is_circuit_open():
+            self._mark_circuit_skip(debug)
+            results = await asyncio.to_thread(self._local_fallback, query, top_k, debug)
+        else:
+            try:
+                api_results = await self._aapi_retrieve_with_retry(
+                    query=query,
+                    top_k=top_k,
+                    author_id=author_id,
+                )
+            except DBApiUnavailableError as exc:
+                self._record_api_failure(exc, debug)
+                api_results = []
+            else:
+                if self._accept_api_results(api_results, debug):
+                    self._last_retrieval_debug = debug
+                    return api_results
+            results = await asyncio.to_thread(self._local_fallback, query, top_k, debug)
+        # Параллельные вызовы могли перезаписать debug: возвращаем свой.
+        self._last_retrieval_debug = debug
+        return results
+
     def _tfidf_fallback(self, query: str, top_k: int) -> List[Tuple[Block, float]]:
         if not self._is_built:
             self.build_index()
@@ -585,13 +734,12 @@ class SimpleRetriever:
             logger.warning("[RETRIEVAL] empty index")
             return []
 
-        from sklearn.metrics.pairwise import cosine_similarity
-
         # Трансформируем запрос в TF-IDF вектор
         query_vec = self.vectorizer.transform([query])
 
-        # Считаем косинусное сходство с каждым блоком
-        similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
+        # Строки TF-IDF уже L2-нормированы: косинус = скалярное произведение.
+        # Матрица (в т.ч. mmap из кэша) не копируется и не нормируется заново.
+        similarities = np.asarray((self.tfidf_matrix @ query_vec.T).todense()).ravel()
 
         # Берём top_k индексов с наибольшим сходством
         top_indices = np.argsort(-similarities)[:top_k * 2]  # берём больше для фильтрации
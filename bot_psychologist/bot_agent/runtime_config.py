@@ -4,23 +4,68 @@ RuntimeConfig — горячая конфигурация с override-слоем
 
 Наследует Config, перехватывает обращения к редактируемым параметрам через
 __getattribute__ и возвращает override-значение если оно есть в JSON-файле.
-Кэширует JSON по mtime файла — перечитывает только при изменении.
-Thread-safe: кэш защищён threading.Lock.
+JSON превращается в неизменяемый версионированный ConfigSnapshot (с уже
+приведенными типами) один раз на изменение файла. Внутри хода снимок
+закреплен через config_context.pinned_config(), и чтение параметра —
+это поиск в словаре без stat файла и без блокировки.
+Thread-safe: пересборка снимка защищена threading.Lock.
 """
 
+import copy
 import json
 import os
 import tempfile
 import logging
 import threading
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping
 
 from .config import Config
+from .config_context import current_pinned_config
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
+_EMPTY_OVERRIDES = {"config": {}, "prompts": {}, "meta": {}, "history": []}
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Неизменяемый вид admin_overrides.json одной версии."""
+
+    version: int
+    path: str
+    mtime: float
+    data: Mapping[str, Any] = field(repr=False)  # сырой JSON, только для чтения
+    config: Mapping[str, Any] = field(default_factory=dict)  # типизированные overrides
+
+
+def _coerce_override(meta: dict, raw: Any) -> Any:
+    t = meta["type"]
+    if t == "int":
+        return int(raw)
+    elif t == "int_or_null":
+        return None if raw is None else int(raw)
+    elif t == "float":
+        return float(raw)
+    elif t == "bool":
+        return bool(raw)
+    else:  # "select", "string"
+        return str(raw)
+
+
+def _snapshot_is_fresh(snapshot: "ConfigSnapshot | None", path: str, mtime: float) -> bool:
+    # _cache_mtime = 0.0 (после записи / в тестах) принудительно инвалидирует снимок.
+    return (
+        snapshot is not None
+        and snapshot.mtime == mtime
+        and RuntimeConfig._cache_mtime == mtime
+        and snapshot.path == path
+    )
+
 
 class RuntimeConfig(Config):
     """
@@ -30,8 +75,8 @@ class RuntimeConfig(Config):
     используем __getattribute__ (не __getattr__), который вызывается
     при ЛЮБОМ доступе к атрибуту, включая классовые.
 
-    Thread safety: _lock защищает _cache и _cache_mtime от race conditions
-    в async FastAPI окружении.
+    Thread safety: _lock защищает _cache, _cache_mtime и _snapshot от race
+    conditions в async FastAPI окружении.
     """
 
     OVERRIDES_PATH: Path = Config.PROJECT_ROOT / "data" / "admin_overrides.json"
@@ -39,6 +84,8 @@ class RuntimeConfig(Config):
     # ── Кэш на уровне класса (shared между всеми инстансами) ──
     _cache: dict = {}
     _cache_mtime: float = 0.0
+    _snapshot: "ConfigSnapshot | None" = None
+    _snapshot_version: int = 0
     _lock: threading.Lock = threading.Lock()
 
     # ════════════════════════════════════════════════════════════
@@ -373,68 +420,96 @@ class RuntimeConfig(Config):
         if name.startswith("_"):
             return object.__getattribute__(self, name)
 
-        # Никогда не перехватываем чувствительные / служебные атрибуты
-        bypass = object.__getattribute__(self, "_BYPASS_ATTRS")
-        if name in bypass:
-            return object.__getattribute__(self, name)
-
-        # Проверяем: является ли имя редактируемым параметром
-        editable = object.__getattribute__(self, "EDITABLE_CONFIG")
-        if name in editable:
-            try:
-                loader = object.__getattribute__(self, "_load_overrides")
-                overrides = loader()
-                cfg_ov = overrides.get("config", {})
-                if name in cfg_ov:
-                    meta = editable[name]
-                    raw = cfg_ov[name]
-                    t = meta["type"]
-                    if t == "int":
-                        return int(raw)
-                    elif t == "int_or_null":
-                        return None if raw is None else int(raw)
-                    elif t == "float":
-                        return float(raw)
-                    elif t == "bool":
-                        return bool(raw)
-                    else:  # "select", "string"
-                        return str(raw)
-            except Exception as exc:
-                logger.warning(
-                    "[RuntimeConfig] Override read failed for '%s': %s", name, exc
-                )
+        # Редактируемый параметр, кроме чувствительных / служебных атрибутов
+        if (
+            name in object.__getattribute__(self, "EDITABLE_CONFIG")
+            and name not in object.__getattribute__(self, "_BYPASS_ATTRS")
+        ):
+            pinned = current_pinned_config()
+            if pinned is not None and pinned.owner is self:
+                snapshot = pinned.snapshot
+            else:
+                snapshot = object.__getattribute__(self, "current_snapshot")()
+            overrides = snapshot.config
+            if name in overrides:
+                return overrides[name]
 
         return object.__getattribute__(self, name)
 
     # ════════════════════════════════════════════════════════════
-    # КЭШИРОВАННОЕ ЧТЕНИЕ ФАЙЛА (mtime-based, thread-safe)
+    # СНИМОК OVERRIDES (mtime-based, thread-safe)
     # ════════════════════════════════════════════════════════════
 
-    def _load_overrides(self) -> dict:
+    def current_snapshot(self) -> ConfigSnapshot:
         """
-        Читает admin_overrides.json с кэшированием по mtime.
-        Перечитывает файл только если он изменился с последнего чтения.
-        Thread-safe: использует _lock.
-        Производительность: ~1μs (stat) если файл не менялся.
+        Актуальный ConfigSnapshot: stat файла и, только если файл изменился,
+        перечитывание JSON и пересборка снимка под _lock.
         """
         path = object.__getattribute__(self, "OVERRIDES_PATH")
-        lock = object.__getattribute__(self, "_lock")
-
         try:
             mtime = os.path.getmtime(path)
         except FileNotFoundError:
-            return {"config": {}, "prompts": {}, "meta": {}, "history": []}
+            mtime = 0.0  # файла нет — снимок с пустыми overrides
+
+        snapshot = RuntimeConfig._snapshot
+        if _snapshot_is_fresh(snapshot, str(path), mtime):
+            return snapshot
 
+        lock = object.__getattribute__(self, "_lock")
         with lock:
-            if mtime != RuntimeConfig._cache_mtime:
-                try:
+            snapshot = RuntimeConfig._snapshot
+            if _snapshot_is_fresh(snapshot, str(path), mtime):
+                return snapshot
+            try:
+                if mtime == 0.0:
+                    data = copy.deepcopy(_EMPTY_OVERRIDES)
+                else:
                     with open(path, "r", encoding="utf-8") as f:
-                        RuntimeConfig._cache = json.load(f)
-                    RuntimeConfig._cache_mtime = mtime
-                except Exception as exc:
-                    logger.error("[RuntimeConfig] Failed to load overrides: %s", exc)
-                    return {"config": {}, "prompts": {}, "meta": {}, "history": []}
-            return dict(RuntimeConfig._cache)  # shallow copy для безопасности
+                        data = json.load(f)
+            except Exception as exc:
+                logger.error("[RuntimeConfig] Failed to load overrides: %s", exc)
+                return self._build_snapshot(str(path), 0.0, _EMPTY_OVERRIDES)
+            snapshot = self._build_snapshot(str(path), mtime, data)
+            RuntimeConfig._cache = data
+            RuntimeConfig._cache_mtime = mtime
+            RuntimeConfig._snapshot = snapshot
+            return snapshot
+
+    def _build_snapshot(self, path: str, mtime: float, data: dict) -> ConfigSnapshot:
+        editable = object.__getattribute__(self, "EDITABLE_CONFIG")
+        typed = {}
+        for name, raw in (data.get("config") or {}).items():
+            meta = editable.get(name)
+            if meta is None:
+                continue
+            try:
+                typed[name] = _coerce_override(meta, raw)
+            except Exception as exc:
+                logger.warning(
+                    "[RuntimeConfig] Override read failed for '%s': %s", name, exc
+                )
+        RuntimeConfig._snapshot_version += 1
+        return ConfigSnapshot(
+            version=RuntimeConfig._snapshot_version,
+            path=path,
+            mtime=mtime,
+            data=MappingProxyType(data),
+            config=MappingProxyType(typed),
+        )
+
+    def _view_overrides(self) -> Mapping[str, Any]:
+        """Overrides закрепленного (или текущего) снимка — только для чтения."""
+        pinned = current_pinned_config()
+        if pinned is not None and pinned.owner is self:
+            return pinned.snapshot.data
+        return self.current_snapshot().data
+
+    def _load_overrides(self) -> dict:
+        """
+        Изменяемая копия overrides для read-modify-write в админ-API.
+        Снимок при этом не затрагивается.
+        """
+        return copy.deepcopy(dict(self.current_snapshot().data))
 
     def _save_overrides(self, data: dict) -> None:
         """
@@ -474,6 +549,10 @@ class RuntimeConfig(Config):
         # Сбрасываем кэш под блокировкой
         with lock:
             RuntimeConfig._cache_mtime = 0.0
+        # Запрос, изменивший overrides, дальше видит уже новую версию.
+        pinned = current_pinned_config()
+        if pinned is not None and pinned.owner is self:
+            pinned.snapshot = self.current_snapshot()
 
     def _append_history(
         self, data: dict, key: str, type_: str, old, new
@@ -520,7 +599,7 @@ class RuntimeConfig(Config):
                 }
             }
         """
-        overrides = self._load_overrides().get("config", {})
+        overrides = self._view_overrides().get("config", {})
         editable = object.__getattribute__(self, "EDITABLE_CONFIG")
 
         group_labels = {
@@ -675,7 +754,7 @@ class RuntimeConfig(Config):
 
         prompt_labels = object.__getattribute__(self, "PROMPT_LABELS")
         default_text = self._read_default_prompt(name)
-        overrides = self._load_overrides().get("prompts", {})
+        overrides = self._view_overrides().get("prompts", {})
         override_text = overrides.get(name)
 
         active_text = override_text if (override_text is not None) else default_text
@@ -695,7 +774,7 @@ class RuntimeConfig(Config):
         """
         editable_prompts = object.__getattribute__(self, "EDITABLE_PROMPTS")
         prompt_labels = object.__getattribute__(self, "PROMPT_LABELS")
-        overrides = self._load_overrides().get("prompts", {})
+        overrides = self._view_overrides().get("prompts", {})
 
         result = []
         for name in editable_prompts:
@@ -760,7 +839,7 @@ class RuntimeConfig(Config):
 
     def get_history(self) -> list:
         """Последние 50 изменений для отображения в UI."""
-        return self._load_overrides().get("history", [])
+        return list(self._view_overrides().get("history", []))
 
     def reload(self) -> None:
         """
@@ -37,6 +37,129 @@ class TurnEmbedding:
     embedding: np.ndarray
 
 
+class TurnEmbeddingMatrix:
+    """
+    Непрерывная float32-матрица эмбеддингов пользователя с предвычисленными нормами.
+
+    Строка i соответствует turn_embeddings[i]. Емкость растет удвоением, поэтому
+    добавление хода амортизированно O(dim), а поиск — одно умножение матрицы
+    на вектор без Python-цикла по ходам.
+    """
+
+    _MIN_CAPACITY = 16
+
+    def __init__(self) -> None:
+        self._rows: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self.size = 0
+        self.dim = 0
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._rows = None
+            self._norms = None
+            self.size = 0
+            self.dim = 0
+
+    def sync(self, turn_embeddings: List[TurnEmbedding]) -> None:
+        """Догнать список ходов: добавить недостающие строки или пересобрать."""
+        with self._lock:
+            if self.size > len(turn_embeddings):
+                self._rows = None
+                self._norms = None
+                self.size = 0
+                self.dim = 0
+            if self.size == len(turn_embeddings):
+                return
+            pending = [turn_emb.embedding for turn_emb in turn_embeddings[self.size :]]
+            self._extend(pending)
+
+    def _extend(self, vectors: List[np.ndarray]) -> None:
+        flat = [np.asarray(vec, dtype=np.float32).reshape(-1) for vec in vectors]
+        if not self.dim:
+            self.dim = next((vec.shape[0] for vec in flat if vec.shape[0]), 0)
+        if not self.dim:
+            return
+        needed = self.size + len(flat)
+        capacity = 0 if self._rows is None else self._rows.shape[0]
+        if needed > capacity:
+            new_capacity = max(self._MIN_CAPACITY, capacity * 2, needed)
+            rows = np.zeros((new_capacity, self.dim), dtype=np.float32)
+            norms = np.zeros(new_capacity, dtype=np.float32)
+            if self._rows is not None and self.size:
+                rows[: self.size] = self._rows[: self.size]
+                norms[: self.size] = self._norms[: self.size]
+            self._rows = rows
+            self._norms = norms
+        for offset, vec in enumerate(flat):
+            row = self.size + offset
+            if vec.shape[0] != self.dim:
+                # Эмбеддинг другой модели: строка остается нулевой (сходство 0).
+                logger.warning(
+                    "[SEMANTIC] embedding dim mismatch row=%s dim=%s expected=%s",
+                    row,
+                    vec.shape[0],
+                    self.dim,
+                )
+                self._rows[row] = 0.0
+                self._norms[row] = 0.0
+                continue
+            self._rows[row] = vec
+            self._norms[row] = np.linalg.norm(vec)
+        self.size = needed
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        *,
+        pool_size: int,
+        top_k: int,
+    ) -> Tuple[np.ndarray, np.ndarray, float]:
+        """
+        Top-k по косинусу среди первых pool_size строк.
+
+        Returns:
+            (индексы строк по убыванию сходства, их сходства, максимум по пулу)
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), 0.0)
+        with self._lock:
+            pool_size = min(int(pool_size), self.size)
+            if pool_size <= 0 or top_k <= 0 or self._rows is None:
+                return empty
+            query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+            if query.shape[0] != self.dim:
+                logger.warning(
+                    "[SEMANTIC] query dim mismatch dim=%s expected=%s",
+                    query.shape[0],
+                    self.dim,
+                )
+                return empty
+            query_norm = float(np.linalg.norm(query))
+            if query_norm == 0.0:
+                scores = np.zeros(pool_size, dtype=np.float32)
+            else:
+                norms = self._norms[:pool_size]
+                dots = self._rows[:pool_size] @ query
+                denom = norms * np.float32(query_norm)
+                scores = np.divide(
+                    dots,
+                    denom,
+                    out=np.zeros(pool_size, dtype=np.float32),
+                    where=denom > 0,
+                )
+
+        k = min(int(top_k), pool_size)
+        if k < pool_size:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(pool_size)
+        # Стабильный порядок при равных сходствах: более ранний ход первым.
+        order = np.lexsort((candidates, -scores[candidates]))
+        indices = candidates[order]
+        return indices, scores[indices], float(scores.max())
+
+
 class SemanticMemory:
     """
     Семантический поиск по истории диалога.
@@ -51,7 +174,8 @@ class SemanticMemory:
 
     def __init__(self, user_id: str = "default"):
         self.user_id = user_id
-        self.turn_embeddings: List[TurnEmbedding] = []
+        self._matrix = TurnEmbeddingMatrix()
+        self._turn_embeddings: List[TurnEmbedding] = []
         self.last_hits_count: int = 0
         self.last_hits_detail: List[Dict[str, object]] = []
 
@@ -68,6 +192,16 @@ class SemanticMemory:
 
         logger.debug(f"📦 SemanticMemory создан для пользователя: {user_id}")
 
+    @property
+    def turn_embeddings(self) -> List[TurnEmbedding]:
+        return self._turn_embeddings
+
+    @turn_embeddings.setter
+    def turn_embeddings(self, value: List[TurnEmbedding]) -> None:
+        # Замена списка целиком (load/rebuild/clear) — матрица собирается заново.
+        self._turn_embeddings = value
+        self._matrix.reset()
+
     @property
     def model(self):
         """Lazy loading модели эмбеддингов."""
@@ -209,6 +343,7 @@ class SemanticMemory:
             embedding=embedding,
         )
         self.turn_embeddings.append(turn_emb)
+        self._matrix.sync(self.turn_embeddings)
         logger.info(f"[SEMANTIC] embedding added turn_index={turn_index}")
 
     def _resolve_exclude_window(self, requested: int) -> int:
@@ -263,25 +398,23 @@ class SemanticMemory:
             self.last_hits_detail = []
             return []
 
-        search_pool = (
-            self.turn_embeddings[:-effective_exclude]
-            if effective_exclude > 0
-            else self.turn_embeddings
+        # Исключение последних N ходов — просто срез строк матрицы.
+        pool_size = len(self.turn_embeddings) - effective_exclude
+        if pool_size <= 0:
+            pool_size = len(self.turn_embeddings)
+        logger.info("[SEMANTIC] search_pool_size=%s", pool_size)
+
+        self._matrix.sync(self.turn_embeddings)
+        indices, scores, max_similarity = self._matrix.search(
+            query_embedding,
+            pool_size=pool_size,
+            top_k=top_k,
         )
-        if not search_pool:
-            search_pool = self.turn_embeddings
-        logger.info("[SEMANTIC] search_pool_size=%s", len(search_pool))
-
-        similarities: List[Tuple[TurnEmbedding, float]] = []
-        inspected_scores: List[float] = []
-        for turn_emb in search_pool:
-            similarity = self._cosine_similarity(query_embedding, turn_emb.embedding)
-            inspected_scores.append(float(similarity))
-            if similarity >= min_similarity:
-                similarities.append((turn_emb, float(similarity)))
-
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        top_results = similarities[:top_k]
+        top_results: List[Tuple[TurnEmbedding, float]] = [
+            (self.turn_embeddings[int(row)], float(score))
+            for row, score in zip(indices, scores)
+            if score >= min_similarity
+        ]
         self.last_hits_count = len(top_results)
         self.last_hits_detail = [
             {
@@ -297,7 +430,7 @@ class SemanticMemory:
             self.user_id,
             len(top_results),
             float(min_similarity),
-            max(inspected_scores) if inspected_scores else 0.0,
+            max_similarity,
         )
         for i, (turn_emb, score) in enumerate(top_results, 1):
             logger.info(
@@ -565,3 +698,11 @@ def get_semantic_memory(user_id: str = "default") -> SemanticMemory:
     else:
         logger.info(f"[SEMANTIC_MEMORY] cache_hit user_id={user_id}")
     return _semantic_memory_instances[user_id]
+
+
+def release_semantic_memory(user_id: str) -> Optional[SemanticMemory]:
+    """
+    Отпустить закэшированный инстанс (эмбеддинги уже сохранены на диск
+    в add_turn); следующий get_semantic_memory загрузит его заново.
+    """
+    return _semantic_memory_instances.pop(user_id, None)
@@ -1,5 +1,6 @@
 """Storage layer for persistent bot session data."""
 
 from .session_manager import SessionManager
+from .sqlite_pool import close_sqlite_pools, get_sqlite_pool, sqlite_pool_stats
 
-__all__ = ["SessionManager"]
+__all__ = ["SessionManager", "close_sqlite_pools", "get_sqlite_pool", "sqlite_pool_stats"]
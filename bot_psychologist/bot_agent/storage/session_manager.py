@@ -7,26 +7,39 @@ import pickle
 import sqlite3
 import uuid
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
+from .sqlite_pool import get_sqlite_pool
+
+# Эмбеддинги хранятся сырыми little-endian float32 байтами + размерность.
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+def encode_embedding(embedding: np.ndarray) -> Tuple[bytes, int]:
+    arr = np.ascontiguousarray(np.asarray(embedding, dtype=EMBEDDING_DTYPE).reshape(-1))
+    return arr.tobytes(), int(arr.shape[0])
+
+
+def decode_embedding(blob: bytes, dim: Optional[int]) -> np.ndarray:
+    """Read-only вектор поверх BLOB; строки без dim — легаси pickle."""
+    if dim is None:
+        return pickle.loads(blob)
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE, count=int(dim))
+
 
 class SessionManager:
-    """Persistent store for session metadata, turns and semantic embeddings."""
+    """Persistent store for session metadata, turns and semantic embeddings.
+
+    Экземпляр легкий: соединения берутся из общего на процесс пула
+    (``sqlite_pool.get_sqlite_pool``), DDL и миграция выполняются один раз на пул.
+    """
 
     def __init__(self, db_path: str = "data/bot_sessions.db"):
         self.db_path = db_path
-        self._shared_conn: Optional[sqlite3.Connection] = None
-        if db_path != ":memory:":
-            db_file = Path(db_path)
-            db_file.parent.mkdir(parents=True, exist_ok=True)
-        else:
-            self._shared_conn = sqlite3.connect(":memory:")
-            self._shared_conn.row_factory = sqlite3.Row
-            self._shared_conn.execute("PRAGMA foreign_keys = ON")
-        self._init_database()
+        self._pool = get_sqlite_pool(db_path)
+        self._pool.ensure_schema(self._init_database)
 
     @staticmethod
     def _utc_now_iso() -> str:
@@ -39,89 +52,83 @@ class SessionManager:
         return json.dumps(data, ensure_ascii=False)
 
     def _connect(self) -> sqlite3.Connection:
-        if self._shared_conn is not None:
-            return self._shared_conn
-
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
-
-    def _init_database(self) -> None:
-        with self._connect() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS sessions (
-                    session_id TEXT PRIMARY KEY,
-                    user_id TEXT,
-                    created_at TEXT NOT NULL,
-                    last_active TEXT NOT NULL,
-                    status TEXT NOT NULL DEFAULT 'active',
-                    working_state TEXT,
-                    conversation_summary TEXT,
-                    metadata TEXT
-                )
-                """
+        """Соединение текущего потока для чтения."""
+        return self._pool.reader()
+
+    def _init_database(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                created_at TEXT NOT NULL,
+                last_active TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'active',
+                working_state TEXT,
+                conversation_summary TEXT,
+                metadata TEXT
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS conversation_turns (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT NOT NULL,
-                    turn_number INTEGER NOT NULL,
-                    user_input TEXT NOT NULL,
-                    bot_response TEXT NOT NULL,
-                    mode TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    confidence REAL,
-                    chunks_used TEXT,
-                    reasoning TEXT,
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
-                    UNIQUE (session_id, turn_number)
-                )
-                """
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversation_turns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                turn_number INTEGER NOT NULL,
+                user_input TEXT NOT NULL,
+                bot_response TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                confidence REAL,
+                chunks_used TEXT,
+                reasoning TEXT,
+                FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
+                UNIQUE (session_id, turn_number)
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS semantic_embeddings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT NOT NULL,
-                    turn_number INTEGER NOT NULL,
-                    embedding BLOB NOT NULL,
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
-                    UNIQUE (session_id, turn_number)
-                )
-                """
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS semantic_embeddings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                turn_number INTEGER NOT NULL,
+                embedding BLOB NOT NULL,
+                FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
+                UNIQUE (session_id, turn_number)
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS session_summaries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    session_id TEXT NOT NULL,
-                    summary_date TEXT NOT NULL,
-                    key_themes TEXT,
-                    sd_level_end TEXT,
-                    state_end TEXT,
-                    notable_moments TEXT,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL,
-                    UNIQUE (user_id, session_id)
-                )
-                """
-            )
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions(last_active)")
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_turns_session_id ON conversation_turns(session_id)"
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                summary_date TEXT NOT NULL,
+                key_themes TEXT,
+                sd_level_end TEXT,
+                state_end TEXT,
+                notable_moments TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                UNIQUE (user_id, session_id)
             )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_embeddings_session_id ON semantic_embeddings(session_id)"
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_summaries_user_date ON session_summaries(user_id, summary_date DESC)"
-            )
-            self._migrate_schema(conn)
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions(last_active)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_turns_session_id ON conversation_turns(session_id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_session_id ON semantic_embeddings(session_id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_summaries_user_date ON session_summaries(user_id, summary_date DESC)"
+        )
+        self._migrate_schema(conn)
 
     def _migrate_schema(self, conn: sqlite3.Connection) -> None:
         """Add non-breaking columns for existing DBs."""
@@ -138,26 +145,42 @@ class SessionManager:
         if "turn_metadata" not in columns:
             conn.execute("ALTER TABLE conversation_turns ADD COLUMN turn_metadata TEXT")
 
+        embedding_columns = {
+            row["name"]
+            for row in conn.execute("PRAGMA table_info(semantic_embeddings)").fetchall()
+        }
+        if "embedding_dim" not in embedding_columns:
+            # NULL у старых строк = pickle-BLOB, читается через decode_embedding.
+            conn.execute("ALTER TABLE semantic_embeddings ADD COLUMN embedding_dim INTEGER")
+
     def create_session(
         self,
         session_id: str,
         user_id: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self._pool.write(lambda conn: self._upsert_session(conn, session_id, user_id, metadata))
+
+    def _upsert_session(
+        self,
+        conn: sqlite3.Connection,
+        session_id: str,
+        user_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
     ) -> None:
         now = self._utc_now_iso()
-        with self._connect() as conn:
-            conn.execute(
-                """
-                INSERT INTO sessions (
-                    session_id, user_id, created_at, last_active, status, metadata
-                ) VALUES (?, ?, ?, ?, 'active', ?)
-                ON CONFLICT(session_id) DO UPDATE SET
-                    last_active = excluded.last_active,
-                    user_id = COALESCE(sessions.user_id, excluded.user_id),
-                    metadata = COALESCE(sessions.metadata, excluded.metadata)
-                """,
-                (session_id, user_id, now, now, self._json_dumps(metadata)),
-            )
+        conn.execute(
+            """
+            INSERT INTO sessions (
+                session_id, user_id, created_at, last_active, status, metadata
+            ) VALUES (?, ?, ?, ?, 'active', ?)
+            ON CONFLICT(session_id) DO UPDATE SET
+                last_active = excluded.last_active,
+                user_id = COALESCE(sessions.user_id, excluded.user_id),
+                metadata = COALESCE(sessions.metadata, excluded.metadata)
+            """,
+            (session_id, user_id, now, now, self._json_dumps(metadata)),
+        )
 
     def save_turn(
         self,
@@ -179,8 +202,8 @@ class SessionManager:
         if timestamp is None:
             timestamp = self._utc_now_iso()
 
-        self.create_session(session_id=session_id)
-        with self._connect() as conn:
+        def _write(conn: sqlite3.Connection) -> None:
+            self._upsert_session(conn, session_id)
             conn.execute(
                 """
                 INSERT INTO conversation_turns (
@@ -218,16 +241,16 @@ class SessionManager:
             )
 
             if embedding is not None:
-                arr = np.asarray(embedding, dtype=np.float32)
-                embedding_blob = pickle.dumps(arr, protocol=pickle.HIGHEST_PROTOCOL)
+                embedding_blob, embedding_dim = encode_embedding(embedding)
                 conn.execute(
                     """
-                    INSERT INTO semantic_embeddings (session_id, turn_number, embedding)
-                    VALUES (?, ?, ?)
+                    INSERT INTO semantic_embeddings (session_id, turn_number, embedding, embedding_dim)
+                    VALUES (?, ?, ?, ?)
                     ON CONFLICT(session_id, turn_number) DO UPDATE SET
-                        embedding = excluded.embedding
+                        embedding = excluded.embedding,
+                        embedding_dim = excluded.embedding_dim
                     """,
-                    (session_id, turn_number, embedding_blob),
+                    (session_id, turn_number, embedding_blob, embedding_dim),
                 )
 
             conn.execute(
@@ -235,9 +258,11 @@ class SessionManager:
                 (self._utc_now_iso(), session_id),
             )
 
+        self._pool.write(_write)
+
     def update_working_state(self, session_id: str, working_state: Dict[str, Any]) -> None:
-        self.create_session(session_id=session_id)
-        with self._connect() as conn:
+        def _write(conn: sqlite3.Connection) -> None:
+            self._upsert_session(conn, session_id)
             conn.execute(
                 """
                 UPDATE sessions
@@ -247,9 +272,11 @@ class SessionManager:
                 (self._json_dumps(working_state), self._utc_now_iso(), session_id),
             )
 
+        self._pool.write(_write)
+
     def update_summary(self, session_id: str, summary: str) -> None:
-        self.create_session(session_id=session_id)
-        with self._connect() as conn:
+        def _write(conn: sqlite3.Connection) -> None:
+            self._upsert_session(conn, session_id)
             conn.execute(
                 """
                 UPDATE sessions
@@ -259,6 +286,8 @@ class SessionManager:
                 (summary, self._utc_now_iso(), session_id),
             )
 
+        self._pool.write(_write)
+
     def save_session_summary(self, user_id: str, summary: Dict[str, Any]) -> None:
         """Persist compact summary for cross-session context building."""
         session_id = str(summary.get("session_id") or user_id)
@@ -269,8 +298,8 @@ class SessionManager:
         state_end = summary.get("state_end")
         now = self._utc_now_iso()
 
-        with self._connect() as conn:
-            conn.execute(
+        self._pool.write(
+            lambda conn: conn.execute(
                 """
                 INSERT INTO session_summaries (
                     user_id, session_id, summary_date, key_themes, sd_level_end,
@@ -296,6 +325,7 @@ class SessionManager:
                     now,
                 ),
             )
+        )
 
     def load_recent_session_summaries(self, user_id: str, limit: int = 3) -> List[Dict[str, Any]]:
         """Load latest summaries for a user ordered by summary date."""
@@ -361,7 +391,7 @@ class SessionManager:
 
             embeddings = conn.execute(
                 """
-                SELECT turn_number, embedding
+                SELECT turn_number, embedding, embedding_dim
                 FROM semantic_embeddings
                 WHERE session_id = ?
                 ORDER BY turn_number ASC
@@ -396,7 +426,7 @@ class SessionManager:
             parsed_embeddings.append(
                 {
                     "turn_number": item["turn_number"],
-                    "embedding": pickle.loads(item["embedding"]),
+                    "embedding": decode_embedding(item["embedding"], item["embedding_dim"]),
                 }
             )
 
@@ -419,28 +449,28 @@ class SessionManager:
 
     def archive_old_sessions(self, days: int = 90) -> int:
         threshold = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
-        with self._connect() as conn:
-            cursor = conn.execute(
+        return self._pool.write(
+            lambda conn: conn.execute(
                 """
                 UPDATE sessions
                 SET status = 'archived'
                 WHERE status = 'active' AND last_active < ?
                 """,
                 (threshold,),
-            )
-            return cursor.rowcount
+            ).rowcount
+        )
 
     def delete_archived_sessions(self, days: int = 365) -> int:
         threshold = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
-        with self._connect() as conn:
-            cursor = conn.execute(
+        return self._pool.write(
+            lambda conn: conn.execute(
                 """
                 DELETE FROM sessions
                 WHERE status = 'archived' AND last_active < ?
                 """,
                 (threshold,),
-            )
-            return cursor.rowcount
+            ).rowcount
+        )
 
     def run_retention_cleanup(
         self,
@@ -455,11 +485,12 @@ class SessionManager:
         }
 
     def delete_session_data(self, session_id: str) -> bool:
-        with self._connect() as conn:
-            deleted = conn.execute(
+        deleted = self._pool.write(
+            lambda conn: conn.execute(
                 "DELETE FROM sessions WHERE session_id = ?",
                 (session_id,),
             ).rowcount
+        )
         return deleted > 0
 
     def list_user_sessions(
@@ -0,0 +1,210 @@
+"""Shared SQLite access layer: per-thread readers plus a single writer queue."""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_BUSY_TIMEOUT_MS = 5000
+_CACHED_STATEMENTS = 256
+
+
+class SqlitePool:
+    """
+    Пул соединений к одной SQLite-базе в рамках процесса.
+
+    - чтение: отдельное долгоживущее соединение на поток (WAL позволяет
+      читать параллельно с записью);
+    - запись: все транзакции сериализуются через очередь одного потока-писателя,
+      поэтому писатели не конкурируют за lock и не ловят ``database is locked``;
+    - соединения живут долго, и кэш подготовленных выражений sqlite3
+      (``cached_statements``) действительно переиспользуется между запросами.
+
+    ``:memory:`` — одно общее соединение под RLock (у каждой in-memory базы
+    своё содержимое, поэтому такие пулы не регистрируются глобально).
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self.memory = db_path == ":memory:"
+        self.pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._schema_lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._queue: "queue.Queue[Optional[Tuple[Callable[[sqlite3.Connection], Any], Future]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._schema_ready = False
+        self._closed = False
+        self.writes = 0
+        self._shared: Optional[sqlite3.Connection] = None
+        if self.memory:
+            self._shared = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False только ради close() из чужого потока:
+        # каждое соединение используется своим потоком (или под RLock для :memory:).
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=_BUSY_TIMEOUT_MS / 1000.0,
+            check_same_thread=False,
+            cached_statements=_CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        if not self.memory:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA busy_timeout = {_BUSY_TIMEOUT_MS}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def ensure_schema(self, init: Callable[[sqlite3.Connection], None]) -> None:
+        """Выполнить DDL/миграцию один раз на пул (т.е. один раз на процесс и файл)."""
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            self.write(init)
+            self._schema_ready = True
+
+    def reader(self) -> sqlite3.Connection:
+        if self._shared is not None:
+            return self._shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Выполнить ``fn(conn)`` в одной транзакции на соединении писателя."""
+        if self._shared is not None:
+            with self._lock, self._shared:
+                self.writes += 1
+                return fn(self._shared)
+        if threading.current_thread() is self._writer:
+            return fn(self._local.conn)
+        future: Future = Future()
+        self._ensure_writer()
+        self._queue.put((fn, future))
+        return future.result()
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError(f"SqlitePool is closed: {self.db_path}")
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._writer_loop,
+                    name=f"sqlite-writer:{Path(self.db_path).name}",
+                    daemon=True,
+                )
+                self._writer.start()
+
+    def _writer_loop(self) -> None:
+        conn = self._open()
+        self._local.conn = conn
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            fn, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with conn:
+                    result = fn(conn)
+            except BaseException as exc:  # noqa: BLE001 - пробрасывается вызывающему
+                future.set_exception(exc)
+            else:
+                self.writes += 1
+                future.set_result(result)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            writer = self._writer
+        if writer is not None and writer.is_alive():
+            self._queue.put(None)
+            writer.join(timeout=5)
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "db_path": self.db_path,
+            "connections": len(self._connections),
+            "pending_writes": self._queue.qsize(),
+            "writes": self.writes,
+            "writer_alive": bool(self._writer and self._writer.is_alive()),
+        }
+
+
+_POOLS: Dict[str, Tuple[SqlitePool, Optional[int]]] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _file_identity(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_ino
+    except OSError:
+        return None
+
+
+def get_sqlite_pool(db_path: str) -> SqlitePool:
+    """
+    Пул для файла базы (один на процесс). Пул пересоздается после fork и если
+    файл был удален/подменен, чтобы не писать в отвязанный inode.
+    """
+    if db_path == ":memory:":
+        return SqlitePool(db_path)
+    path = Path(db_path)
+    key = str(path.resolve())
+    identity = _file_identity(path)
+    with _POOLS_LOCK:
+        entry = _POOLS.get(key)
+        if entry is not None:
+            pool, known_identity = entry
+            if pool.pid == os.getpid() and not pool._closed and identity is not None and identity == known_identity:
+                return pool
+            if pool.pid == os.getpid():
+                pool.close()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pool = SqlitePool(db_path)
+        pool.reader()  # создает файл, чтобы зафиксировать его identity
+        _POOLS[key] = (pool, _file_identity(path))
+        return pool
+
+
+def sqlite_pool_stats() -> List[Dict[str, Any]]:
+    with _POOLS_LOCK:
+        return [pool.stats() for pool, _ in _POOLS.values() if pool.pid == os.getpid()]
+
+
+def close_sqlite_pools() -> None:
+    with _POOLS_LOCK:
+        pools = [pool for pool, _ in _POOLS.values()]
+        _POOLS.clear()
+    for pool in pools:
+        if pool.pid == os.getpid():
+            pool.close()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Microbenchmark: runtime config / feature flag reads per turn, unpinned vs pinned snapshot."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config-reads", type=int, default=400, help="editable config reads per turn")
+    parser.add_argument("--flag-reads", type=int, default=150, help="feature flag reads per turn")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default="", help="optional JSON output path")
+    args = parser.parse_args()
+
+    from bot_agent.config import config
+    from bot_agent.config_context import pinned_config
+    from bot_agent.feature_flags import _DEFAULTS, feature_flags
+
+    editable = list(config.EDITABLE_CONFIG)
+    flags = list(_DEFAULTS)
+    config_names = [editable[i % len(editable)] for i in range(args.config_reads)]
+    flag_names = [flags[i % len(flags)] for i in range(args.flag_reads)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        overrides_path = Path(tmp) / "admin_overrides.json"
+        overrides_path.write_text(
+            json.dumps({"config": {"MAX_TOKENS_SOFT_CAP": 4096, "LLM_TEMPERATURE": 0.5}, "prompts": {}}),
+            encoding="utf-8",
+        )
+        original_path = config.__dict__.get("OVERRIDES_PATH")
+        config.OVERRIDES_PATH = overrides_path
+        try:
+
+            def turn() -> None:
+                for name in config_names:
+                    getattr(config, name)
+                for name in flag_names:
+                    feature_flags.enabled(name)
+
+            def pinned_turn() -> None:
+                with pinned_config():
+                    turn()
+
+            def measure(fn) -> float:
+                samples = []
+                for _ in range(args.repeats):
+                    started = time.perf_counter()
+                    for _ in range(args.turns):
+                        fn()
+                    samples.append((time.perf_counter() - started) * 1e6 / args.turns)
+                return statistics.median(samples)
+
+            measure(turn)  # прогрев снимка и импортов
+            unpinned_us = measure(turn)
+            pinned_us = measure(pinned_turn)
+        finally:
+            if original_path is None:
+                config.__dict__.pop("OVERRIDES_PATH", None)
+            else:
+                config.OVERRIDES_PATH = original_path
+
+    reads = args.config_reads + args.flag_reads
+    result = {
+        "config_reads_per_turn": args.config_reads,
+        "flag_reads_per_turn": args.flag_reads,
+        "unpinned_us_per_turn": round(unpinned_us, 1),
+        "pinned_us_per_turn": round(pinned_us, 1),
+        "unpinned_ns_per_read": round(unpinned_us * 1000 / reads, 1),
+        "pinned_ns_per_read": round(pinned_us * 1000 / reads, 1),
+        "speedup": round(unpinned_us / pinned_us, 2) if pinned_us else None,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
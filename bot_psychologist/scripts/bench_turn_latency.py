@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""Offline end-to-end turn latency benchmark with a deterministic fake LLM provider.
+
+Прогоняет диалоговые сценарии (по умолчанию eval/prd_047_26_live_quality_cases.json)
+через MultiAgentOrchestrator.run с заданной параллельностью. Все LLM-вызовы
+(create_agent_completion) уходят в локальный fake-провайдер с seeded-распределением
+задержек и заготовленными ответами, поэтому прогон воспроизводим и не требует
+сети/ключей. Отчет — p50/p95/p99 по стадиям, end-to-end и pipeline_overhead
+(end-to-end минус задержки fake-провайдера в этой реплике; параллельные вызовы
+делают его оценкой снизу) — именно он чувствителен к регрессиям кода. При сравнении с
+сохраненным baseline скрипт возвращает 1, если перцентиль вырос сверх допуска.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+DEFAULT_DATASET = PROJECT_ROOT / "eval" / "prd_047_26_live_quality_cases.json"
+DEFAULT_BASELINE = PROJECT_ROOT / "eval" / "turn_latency_baseline.json"
+BASELINE_SCHEMA_VERSION = "turn_latency_baseline_v1"
+FAKE_API_KEY = "sk-offline-bench"
+PERCENTILES = (50, 95, 99)
+
+# Стадии оркестратора: ключи debug.timings -> имя стадии в отчете.
+TIMING_STAGES = {
+    "state_analyzer_ms": "state_analyzer",
+    "thread_manager_ms": "thread_manager",
+    "retrieval_planner_ms": "hybrid_retrieval_planner",
+    "memory_retrieval_ms": "memory_retrieval",
+    "writer_ms": "writer_agent",
+    "validator_ms": "validator",
+}
+
+
+@dataclass
+class _TurnLatency:
+    """Контекст реплики: ключ для seeded-задержек и сумма задержек fake-провайдера."""
+
+    key: str
+    injected_ms: list[float] = field(default_factory=list)
+    call_index: dict[str, int] = field(default_factory=dict)
+
+
+# Контекст наследуется задачами, которые оркестратор создает внутри реплики.
+_TURN_CONTEXT: "contextvars.ContextVar[Optional[_TurnLatency]]" = contextvars.ContextVar(
+    "bench_turn_context", default=None
+)
+
+# Модуль агента, вызвавшего create_agent_completion -> стадия fake-провайдера.
+_CALLER_STAGES = {
+    "state_analyzer": "state_analyzer",
+    "hybrid_retrieval_planner": "hybrid_retrieval_planner",
+    "writer_agent": "writer_agent",
+    "turn_summary_service": "turn_summary_service",
+}
+
+# Медиана и разброс (sigma логнормального распределения) задержки вызова, мс.
+DEFAULT_LATENCY_PROFILE: dict[str, dict[str, float]] = {
+    "state_analyzer": {"median_ms": 450.0, "sigma": 0.35},
+    "hybrid_retrieval_planner": {"median_ms": 600.0, "sigma": 0.35},
+    "writer_agent": {"median_ms": 1800.0, "sigma": 0.4},
+    "turn_summary_service": {"median_ms": 900.0, "sigma": 0.3},
+    "default": {"median_ms": 300.0, "sigma": 0.3},
+}
+
+DEFAULT_CANNED_OUTPUTS: dict[str, str] = {
+    "state_analyzer": json.dumps(
+        {
+            "nervous_state": "window",
+            "intent": "explore",
+            "openness": "open",
+            "ok_position": "I+W+",
+            "confidence": 0.82,
+        }
+    ),
+    "state_analyzer_safety": "NO",
+    "hybrid_retrieval_planner": json.dumps(
+        {
+            "no_user_facing_text_created": True,
+            "retrieval_action": "trace_only",
+            "retrieval_needed": False,
+            "composed_query": "",
+            "confidence": 0.7,
+        }
+    ),
+    "writer_agent": (
+        "Похоже, сейчас в этом много напряжения. Давай посмотрим, что именно "
+        "в этой ситуации задевает сильнее всего — с этого и начнем."
+    ),
+    "turn_summary_service": json.dumps(
+        {
+            "summary": "Пользователь описал ситуацию, ассистент отразил и уточнил.",
+            "important_quote": None,
+            "open_loop": None,
+            "user_need": "понять себя",
+            "assistant_move": "reflect",
+            "emotional_tone": "calm",
+        },
+        ensure_ascii=False,
+    ),
+    "default": "{}",
+}
+
+
+@dataclass
+class FakeLLMProvider:
+    """
+    Локальный stand-in для AsyncOpenAI: ``chat.completions.create`` и
+    ``responses.create`` (обычный и stream-режим).
+
+    Стадия определяется по модулю агента в стеке вызова; задержка берется из
+    логнормального распределения стадии и масштабируется ``latency_scale``.
+    Внутри реплики генератор сидируется ключом (seed, сценарий, реплика, стадия,
+    номер вызова), поэтому задержки не зависят от порядка параллельных реплик.
+    """
+
+    latency_profile: dict[str, dict[str, float]] = field(default_factory=lambda: dict(DEFAULT_LATENCY_PROFILE))
+    canned_outputs: dict[str, str] = field(default_factory=lambda: dict(DEFAULT_CANNED_OUTPUTS))
+    latency_scale: float = 1.0
+    seed: int = 0
+    calls: dict[str, int] = field(default_factory=dict)
+    injected_ms: dict[str, list[float]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._rng = random.Random(self.seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat_create))
+        self.responses = SimpleNamespace(create=self._responses_create)
+
+    @staticmethod
+    def _caller_stage() -> str:
+        frame = sys._getframe(1)
+        while frame is not None:
+            module = str(frame.f_globals.get("__name__", ""))
+            stage = _CALLER_STAGES.get(module.rsplit(".", 1)[-1])
+            if stage is not None:
+                return stage
+            frame = frame.f_back
+        return "default"
+
+    def _output_for(self, stage: str, prompt_text: str) -> str:
+        if stage == "state_analyzer" and "safety classifier" in prompt_text:
+            return self.canned_outputs.get("state_analyzer_safety", "NO")
+        return self.canned_outputs.get(stage, self.canned_outputs.get("default", "{}"))
+
+    def _sample_delay_s(self, stage: str) -> float:
+        profile = self.latency_profile.get(stage) or self.latency_profile.get("default") or {}
+        median_ms = float(profile.get("median_ms", 0.0) or 0.0)
+        sigma = float(profile.get("sigma", 0.0) or 0.0)
+        turn = _TURN_CONTEXT.get()
+        rng = self._rng
+        if turn is not None:
+            index = turn.call_index.get(stage, 0)
+            turn.call_index[stage] = index + 1
+            rng = random.Random(f"{self.seed}:{turn.key}:{stage}:{index}")
+        delay_ms = median_ms * math.exp(rng.gauss(0.0, sigma)) if median_ms > 0 else 0.0
+        delay_ms *= self.latency_scale
+        self.injected_ms.setdefault(stage, []).append(delay_ms)
+        if turn is not None:
+            turn.injected_ms.append(delay_ms)
+        return delay_ms / 1000.0
+
+    async def _respond(self, stage: str, prompt_text: str) -> str:
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        delay_s = self._sample_delay_s(stage)
+        if delay_s > 0:
+            await asyncio.sleep(delay_s)
+        return self._output_for(stage, prompt_text)
+
+    @staticmethod
+    def _usage(prompt_text: str, text: str) -> dict[str, int]:
+        prompt_tokens, completion_tokens = max(1, len(prompt_text) // 4), max(1, len(text) // 4)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def _chat_create(self, **kwargs: Any) -> Any:
+        stage = self._caller_stage()
+        prompt_text = "\n".join(str(m.get("content", "")) for m in kwargs.get("messages") or [])
+        text = await self._respond(stage, prompt_text)
+        usage = self._usage(prompt_text, text)
+        if kwargs.get("stream"):
+            return _ChatStream(text, usage)
+        return {"choices": [{"message": {"content": text}}], "usage": usage}
+
+    async def _responses_create(self, **kwargs: Any) -> Any:
+        stage = self._caller_stage()
+        prompt_text = str(kwargs.get("input", "") or "")
+        text = await self._respond(stage, prompt_text)
+        response = {"output_text": text, "usage": self._usage(prompt_text, text)}
+        if kwargs.get("stream"):
+            return _ResponsesStream(text, response)
+        return response
+
+    async def close(self) -> None:
+        return None
+
+
+class _ChatStream:
+    def __init__(self, text: str, usage: dict[str, int]) -> None:
+        self._chunks = [{"choices": [{"delta": {"content": word}}]} for word in _split_words(text)]
+        self._chunks.append({"choices": [], "usage": usage})
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+class _ResponsesStream:
+    def __init__(self, text: str, response: dict[str, Any]) -> None:
+        self._events = [{"type": "response.output_text.delta", "delta": word} for word in _split_words(text)]
+        self._events.append({"type": "response.completed", "response": response})
+
+    async def __aiter__(self):
+        for event in self._events:
+            yield event
+
+
+def _split_words(text: str) -> list[str]:
+    words = text.split(" ")
+    return [word + (" " if idx < len(words) - 1 else "") for idx, word in enumerate(words)]
+
+
+def install_fake_provider(provider: FakeLLMProvider) -> None:
+    """Подменить общий AsyncOpenAI-клиент текущего event loop на fake-провайдер."""
+    from bot_agent.config import config
+    from bot_agent.multiagent.agents import agent_llm_client
+
+    config.OPENAI_API_KEY = FAKE_API_KEY
+    with agent_llm_client._SHARED_CLIENTS_LOCK:
+        agent_llm_client._shared_clients_bucket()[FAKE_API_KEY] = provider
+
+
+def isolate_storage(root: Path) -> None:
+    """Направить треды, сессии и кэш памяти во временный каталог (до импорта bot_agent)."""
+    os.environ["THREAD_STORAGE_DIR"] = str(root / "threads")
+    from bot_agent.config import config
+
+    config.BOT_DB_PATH = root / "bot_sessions.db"
+    config.CACHE_DIR = root / "cache"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Перцентиль с линейной интерполяцией (как numpy 'linear')."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples: dict[str, list[float]]) -> dict[str, dict[str, float]]:
+    return {
+        stage: {
+            "count": len(values),
+            **{f"p{pct}": round(percentile(values, pct), 2) for pct in PERCENTILES},
+        }
+        for stage, values in sorted(samples.items())
+    }
+
+
+def compare_to_baseline(
+    report: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    *,
+    tolerance: float,
+    slack_ms: float,
+) -> list[str]:
+    """Список регрессий: перцентиль > baseline * (1 + tolerance) + slack_ms."""
+    regressions: list[str] = []
+    for stage, reference in sorted(baseline.items()):
+        current = report.get(stage)
+        if current is None:
+            regressions.append(f"{stage}: missing in current run")
+            continue
+        for pct in PERCENTILES:
+            key = f"p{pct}"
+            if key not in reference:
+                continue
+            limit = float(reference[key]) * (1.0 + tolerance) + slack_ms
+            if float(current.get(key, 0.0)) > limit:
+                regressions.append(
+                    f"{stage}.{key}: {current[key]:.2f}ms > {limit:.2f}ms (baseline {float(reference[key]):.2f}ms)"
+                )
+    return regressions
+
+
+def load_scripts(path: Path, limit: int = 0) -> list[dict[str, Any]]:
+    """Сценарии: [{case_id, turns: [user-реплики]}] из dataset с ключом ``cases``."""
+    payload = json.loads(path.read_text(encoding="utf-8-sig"))
+    cases = payload.get("cases", []) if isinstance(payload, dict) else payload
+    scripts: list[dict[str, Any]] = []
+    for case in cases:
+        if not isinstance(case, dict):
+            continue
+        turns = [
+            str(turn.get("content", ""))
+            for turn in case.get("turns", []) or []
+            if isinstance(turn, dict) and turn.get("role", "user") == "user" and str(turn.get("content", "")).strip()
+        ]
+        if turns:
+            scripts.append({"case_id": str(case.get("case_id", f"case_{len(scripts)}")), "turns": turns})
+    return scripts[:limit] if limit > 0 else scripts
+
+
+async def run_benchmark(
+    scripts: list[dict[str, Any]],
+    provider: FakeLLMProvider,
+    *,
+    concurrency: int = 4,
+    iterations: int = 1,
+    warmup_turns: int = 1,
+) -> dict[str, Any]:
+    """Прогнать сценарии через оркестратор; реплики одного сценария — последовательно.
+
+    Первые ``warmup_turns`` реплик прогоняются до замеров: холодная загрузка
+    индексов и моделей не должна попадать в перцентили.
+    """
+    from bot_agent.multiagent.orchestrator import orchestrator
+
+    install_fake_provider(provider)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    samples: dict[str, list[float]] = {}
+    errors: list[dict[str, str]] = []
+    run_id = uuid.uuid4().hex[:8]
+
+    warmup_queries = [query for script in scripts for query in script["turns"]][: max(0, warmup_turns)]
+    for query in warmup_queries:
+        await orchestrator.run(query=query, user_id=f"bench_{run_id}_warmup")
+    provider.calls.clear()
+    provider.injected_ms.clear()
+
+    async def _replay(script: dict[str, Any], iteration: int) -> None:
+        user_id = f"bench_{run_id}_{script['case_id']}_{iteration}"
+        async with semaphore:
+            for turn_index, query in enumerate(script["turns"]):
+                turn = _TurnLatency(key=f"{script['case_id']}:{iteration}:{turn_index}")
+                token = _TURN_CONTEXT.set(turn)
+                started = time.perf_counter()
+                try:
+                    result = await orchestrator.run(query=query, user_id=user_id)
+                except Exception as exc:  # noqa: BLE001 - ошибка сценария попадает в отчет
+                    errors.append({"case_id": script["case_id"], "turn": str(turn_index), "error": repr(exc)})
+                    continue
+                finally:
+                    _TURN_CONTEXT.reset(token)
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                samples.setdefault("end_to_end", []).append(elapsed_ms)
+                samples.setdefault("pipeline_overhead", []).append(max(0.0, elapsed_ms - sum(turn.injected_ms)))
+                timings = dict(dict(result.get("debug", {}) or {}).get("timings", {}) or {})
+                for key, stage in TIMING_STAGES.items():
+                    if key in timings:
+                        samples.setdefault(stage, []).append(float(timings[key]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_replay(script, it) for it in range(max(1, iterations)) for script in scripts))
+    wall_ms = (time.perf_counter() - started) * 1000.0
+    turns = len(samples.get("end_to_end", []))
+    return {
+        "turns": turns,
+        "errors": errors,
+        "wall_ms": round(wall_ms, 2),
+        "throughput_turns_per_s": round(turns / (wall_ms / 1000.0), 2) if wall_ms > 0 else 0.0,
+        "llm_calls": dict(sorted(provider.calls.items())),
+        "stages": summarize(samples),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=str(DEFAULT_DATASET))
+    parser.add_argument("--limit", type=int, default=0, help="max scripts from dataset (0 = all)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=3, help="replays of the whole dataset")
+    parser.add_argument("--warmup-turns", type=int, default=1, help="unmeasured turns before the run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for fake LLM latency")
+    parser.add_argument("--latency-profile", default="", help="JSON file: {stage: {median_ms, sigma}}")
+    parser.add_argument("--canned-outputs", default="", help="JSON file: {stage: text}")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative growth vs baseline")
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="allowed absolute growth vs baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", default="", help="optional JSON report path")
+    args = parser.parse_args()
+
+    # Без сети: модели берутся только из локального кэша HF.
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    tmp_dir = tempfile.TemporaryDirectory(prefix="bench_turn_latency_")
+    isolate_storage(Path(tmp_dir.name))
+
+    latency_profile = dict(DEFAULT_LATENCY_PROFILE)
+    if args.latency_profile:
+        latency_profile.update(json.loads(Path(args.latency_profile).read_text(encoding="utf-8")))
+    canned_outputs = dict(DEFAULT_CANNED_OUTPUTS)
+    if args.canned_outputs:
+        canned_outputs.update(json.loads(Path(args.canned_outputs).read_text(encoding="utf-8")))
+
+    provider = FakeLLMProvider(
+        latency_profile=latency_profile,
+        canned_outputs=canned_outputs,
+        latency_scale=args.latency_scale,
+        seed=args.seed,
+    )
+    scripts = load_scripts(Path(args.dataset), limit=args.limit)
+    try:
+        report = asyncio.run(
+            run_benchmark(
+                scripts,
+                provider,
+                concurrency=args.concurrency,
+                iterations=args.iterations,
+                warmup_turns=args.warmup_turns,
+            )
+        )
+    finally:
+        tmp_dir.cleanup()
+    report["params"] = {
+        "dataset": Path(args.dataset).name,
+        "scripts": len(scripts),
+        "concurrency": args.concurrency,
+        "iterations": args.iterations,
+        "warmup_turns": args.warmup_turns,
+        "seed": args.seed,
+        "latency_scale": args.latency_scale,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(
+            json.dumps(
+                {"schema_version": BASELINE_SCHEMA_VERSION, "params": report["params"], "stages": report["stages"]},
+                ensure_ascii=False,
+                indent=2,
+            )
+            + "\n",
+            encoding="utf-8",
+        )
+        print(f"baseline updated: {baseline_path}")
+        return 0
+    if report["errors"]:
+        print(f"FAIL: {len(report['errors'])} turn(s) raised", file=sys.stderr)
+        return 1
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path}; run with --update-baseline", file=sys.stderr)
+        return 0
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if baseline.get("params") != report["params"]:
+        print("WARNING: baseline params differ from current run", file=sys.stderr)
+    regressions = compare_to_baseline(
+        report["stages"],
+        dict(baseline.get("stages", {}) or {}),
+        tolerance=args.tolerance,
+        slack_ms=args.slack_ms,
+    )
+    if regressions:
+        print("REGRESSION:\n  " + "\n  ".join(regressions), file=sys.stderr)
+        return 1
+    print("OK: no latency regression vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
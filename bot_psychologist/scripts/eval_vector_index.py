@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Validate approximate semantic index recall@k against the exact backend."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def _load_queries(eval_set_path: Path) -> list[str]:
+    dataset = json.loads(eval_set_path.read_text(encoding="utf-8"))
+    if not isinstance(dataset, list):
+        raise ValueError(f"Eval set must be a JSON list: {eval_set_path}")
+    return [item["query"] for item in dataset if isinstance(item.get("query"), str) and item["query"].strip()]
+
+
+def hashed_embedding(text: str, dim: int = 64) -> np.ndarray:
+    """Детерминированный офлайн-эмбеддинг (символьные триграммы -> dim), без модели."""
+    vec = np.zeros(dim, dtype=np.float32)
+    padded = f"  {text.lower()}  "
+    for i in range(len(padded) - 2):
+        digest = hashlib.blake2b(padded[i : i + 3].encode("utf-8"), digest_size=4).digest()
+        vec[int.from_bytes(digest, "little") % dim] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def synthetic_corpus(queries: list[str], size: int, dim: int = 64, seed: int = 7) -> np.ndarray:
+    """Кластеризованный корпус вокруг эмбеддингов запросов + случайные темы."""
+    rng = np.random.default_rng(seed)
+    anchors = np.stack([hashed_embedding(q, dim) for q in queries] + list(rng.normal(size=(64, dim))))
+    anchors /= np.linalg.norm(anchors, axis=1, keepdims=True)
+    matrix = anchors[rng.integers(0, len(anchors), size=size)] + rng.normal(scale=0.35, size=(size, dim))
+    matrix = matrix.astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def evaluate_vector_index(
+    matrix: np.ndarray,
+    query_vectors: list[np.ndarray],
+    *,
+    top_k: int = 10,
+    n_lists: int | None = None,
+    nprobe: int = 32,
+) -> dict[str, Any]:
+    from bot_agent.retrieval.vector_index import ExactVectorIndex, IVFVectorIndex, recall_at_k
+
+    exact = ExactVectorIndex(matrix)
+    started = time.perf_counter()
+    ivf = IVFVectorIndex.build(matrix, n_lists=n_lists, nprobe=nprobe)
+    build_ms = (time.perf_counter() - started) * 1000.0
+
+    def _latency(index) -> float:
+        started = time.perf_counter()
+        for query in query_vectors:
+            index.search(query, top_k)
+        return (time.perf_counter() - started) * 1000.0 / max(1, len(query_vectors))
+
+    return {
+        "blocks": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "queries": len(query_vectors),
+        "top_k": top_k,
+        "ivf": ivf.stats(),
+        "ivf_build_ms": round(build_ms, 2),
+        f"recall_at_{top_k}": round(recall_at_k(exact, ivf, query_vectors, top_k), 4),
+        "exact_latency_ms": round(_latency(exact), 4),
+        "ivf_latency_ms": round(_latency(ivf), 4),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--eval-set", default="tests/eval/retrieval_eval_set.json")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=32)
+    parser.add_argument("--lists", type=int, default=0, help="IVF lists (0 -> sqrt(N))")
+    parser.add_argument(
+        "--synthetic-blocks",
+        type=int,
+        default=0,
+        help="use a synthetic corpus of N blocks with hashed embeddings instead of the live KB",
+    )
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--output", default="tests/eval/vector_index_metrics.json")
+    args = parser.parse_args()
+
+    eval_set = Path(args.eval_set)
+    eval_set = eval_set if eval_set.is_absolute() else PROJECT_ROOT / eval_set
+    queries = _load_queries(eval_set)
+
+    if args.synthetic_blocks > 0:
+        matrix = synthetic_corpus(queries, args.synthetic_blocks)
+        query_vectors = [hashed_embedding(q) for q in queries]
+        source = "synthetic"
+    else:
+        from bot_agent.retriever import get_retriever
+
+        retriever = get_retriever()
+        retriever.build_index()
+        if retriever.semantic_matrix is None:
+            print("[FAIL] semantic index is not available (ENABLE_EMBEDDING_PROVIDER / embeddings)")
+            return 2
+        provider = retriever._get_embedding_provider()
+        matrix = retriever.semantic_matrix
+        query_vectors = []
+        for query in queries:
+            vec = np.asarray(provider.embed_query(query), dtype=np.float32).reshape(-1)
+            query_vectors.append(vec / (np.linalg.norm(vec) or 1.0))
+        source = "knowledge_base"
+
+    metrics = evaluate_vector_index(
+        matrix,
+        query_vectors,
+        top_k=args.top_k,
+        n_lists=args.lists or None,
+        nprobe=args.nprobe,
+    )
+    metrics.update(
+        {
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "eval_set": str(eval_set),
+            "corpus": source,
+        }
+    )
+    recall = metrics[f"recall_at_{args.top_k}"]
+    metrics["pass_gate"] = recall >= args.min_recall
+
+    output_path = Path(args.output)
+    output_path = output_path if output_path.is_absolute() else PROJECT_ROOT / output_path
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(metrics, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"[OK] vector index metrics saved: {output_path}")
+    print(
+        f"[METRIC] recall@{args.top_k}={recall} exact={metrics['exact_latency_ms']}ms "
+        f"ivf={metrics['ivf_latency_ms']}ms gate={'PASS' if metrics['pass_gate'] else 'FAIL'}"
+    )
+    return 0 if metrics["pass_gate"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
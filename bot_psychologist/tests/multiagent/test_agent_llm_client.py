@@ -160,3 +160,111 @@ def test_messages_to_input_formats_roles() -> None:
     assert "USER:" in text
     assert "A" in text
     assert "B" in text
+
+
+class _AsyncEventStream:
+    def __init__(self, events: list) -> None:
+        self._events = list(events)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._events:
+            raise StopAsyncIteration
+        return self._events.pop(0)
+
+
+class _StreamingResponses(_FakeResponses):
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if not kwargs.get("stream"):
+            return SimpleNamespace(output_text="plain", usage=None)
+        return _AsyncEventStream(
+            [
+                SimpleNamespace(type="response.output_text.delta", delta="Привет, "),
+                SimpleNamespace(type="response.output_text.delta", delta="мир"),
+                SimpleNamespace(
+                    type="response.completed",
+                    response=SimpleNamespace(
+                        output_text="Привет, мир",
+                        usage=SimpleNamespace(input_tokens=5, output_tokens=3, total_tokens=8),
+                    ),
+                ),
+            ]
+        )
+
+
+class _StreamingCompletions(_FakeCompletions):
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return _AsyncEventStream(
+            [
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="chat "))], usage=None),
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="stream"))], usage=None),
+                SimpleNamespace(
+                    choices=[],
+                    usage=SimpleNamespace(prompt_tokens=4, completion_tokens=2, total_tokens=6),
+                ),
+            ]
+        )
+
+
+@pytest.mark.asyncio
+async def test_create_agent_completion_streams_responses_deltas() -> None:
+    client = _FakeClient()
+    client.responses = _StreamingResponses()
+    deltas: list[str] = []
+
+    result = await create_agent_completion(
+        client=client,
+        model="gpt-5-mini",
+        messages=[{"role": "user", "content": "u"}],
+        on_delta=deltas.append,
+    )
+
+    assert deltas == ["Привет, ", "мир"]
+    assert result.text == "Привет, мир"
+    assert result.streamed is True
+    assert result.api_mode == "responses"
+    assert result.tokens_total == 8
+    assert client.responses.calls[0]["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_create_agent_completion_streams_chat_deltas_with_usage() -> None:
+    client = _FakeClient()
+    client.chat = SimpleNamespace(completions=_StreamingCompletions())
+    deltas: list[str] = []
+
+    result = await create_agent_completion(
+        client=client,
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "u"}],
+        on_delta=deltas.append,
+    )
+
+    assert deltas == ["chat ", "stream"]
+    assert result.text == "chat stream"
+    assert result.streamed is True
+    assert (result.tokens_prompt, result.tokens_completion, result.tokens_total) == (4, 2, 6)
+    request = client.chat.completions.calls[0]
+    assert request["stream"] is True
+    assert request["stream_options"] == {"include_usage": True}
+
+
+@pytest.mark.asyncio
+async def test_create_agent_completion_on_delta_falls_back_for_non_stream_client() -> None:
+    client = _FakeClient()
+    deltas: list[str] = []
+
+    result = await create_agent_completion(
+        client=client,
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "u"}],
+        on_delta=deltas.append,
+    )
+
+    assert result.text == "chat answer"
+    assert result.streamed is False
+    assert deltas == []
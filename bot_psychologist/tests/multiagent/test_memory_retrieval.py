@@ -597,3 +597,66 @@ async def test_mr_33_update_error_non_blocking(monkeypatch) -> None:
         thread_state=_thread(),
     )
 
+
+
+@pytest.mark.asyncio
+async def test_load_rag_awaits_async_retriever(monkeypatch) -> None:
+    retriever_module = importlib.import_module("bot_agent.retriever")
+    calls: list[str] = []
+
+    class _AsyncRetriever:
+        async def aretrieve(self, query: str, top_k: int | None = None):
+            calls.append("aretrieve")
+            return [(SimpleNamespace(block_id="b1", content="text", document_title="doc"), 0.8)]
+
+        def retrieve(self, *_args, **_kwargs):  # pragma: no cover - must not be used
+            calls.append("retrieve")
+            return []
+
+        def get_last_retrieval_debug(self) -> dict:
+            return {"retrieval_source_used": "api"}
+
+    monkeypatch.setattr(retriever_module, "get_retriever", lambda: _AsyncRetriever())
+
+    hits, debug = await MemoryRetrievalAgent._load_rag("запрос")
+
+    assert calls == ["aretrieve"]
+    assert [hit.chunk_id for hit in hits] == ["b1"]
+    assert debug["retrieval_source_used"] == "api"
+
+
+@pytest.mark.asyncio
+async def test_assemble_runs_blocking_loaders_concurrently(monkeypatch) -> None:
+    import time
+
+    def _slow(result):
+        def _fn(*_args, **_kwargs):
+            time.sleep(0.15)
+            return result
+
+        return staticmethod(_fn)
+
+    monkeypatch.setattr(MemoryRetrievalAgent, "_load_conversation_sync", _slow("User: hi\n---"))
+    monkeypatch.setattr(MemoryRetrievalAgent, "_load_profile_sync", _slow(UserProfile()))
+    monkeypatch.setattr(MemoryRetrievalAgent, "_load_recent_turns_sync", _slow([]))
+    monkeypatch.setattr(MemoryRetrievalAgent, "_load_personal_history_context_sync", _slow([]))
+    monkeypatch.setattr(MemoryRetrievalAgent, "_load_semantic_memory_hits_sync", _slow([]))
+    agent = MemoryRetrievalAgent()
+    monkeypatch.setattr(agent, "_load_rag", AsyncMock(return_value=[_hit("1", 0.7)]))
+
+    started = time.perf_counter()
+    bundle = await agent.assemble(user_message="привет", thread_state=_thread(), user_id="u1")
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.5
+    timings = bundle.rag_retrieval_trace["loader_timings_ms"]
+    assert set(timings) == {
+        "conversation",
+        "profile",
+        "rag",
+        "recent_turns",
+        "personal_history",
+        "semantic_memory",
+    }
+    assert timings["conversation"] >= 140
+    assert bundle.rag_retrieval_trace["loaders_sum_ms"] > bundle.rag_retrieval_trace["loaders_wall_ms"]
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from bot_agent.multiagent import runtime_adapter
+from bot_agent.multiagent.agents import agent_llm_client
+
+
+def test_sync_bridge_reuses_single_long_lived_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    seen: list[tuple[int, str]] = []
+
+    async def _fake_run(*, query: str, user_id: str) -> dict:
+        seen.append((id(asyncio.get_running_loop()), threading.current_thread().name))
+        return {"answer": f"{user_id}:{query}", "debug": {}}
+
+    monkeypatch.setattr(runtime_adapter.orchestrator, "run", _fake_run, raising=False)
+    try:
+        first = runtime_adapter.run_multiagent_adaptive_sync(query="a", user_id="u1")
+        second = runtime_adapter.run_multiagent_adaptive_sync(query="b", user_id="u2")
+    finally:
+        runtime_adapter.shutdown_runtime_loop()
+
+    assert first["answer"] == "u1:a"
+    assert second["answer"] == "u2:b"
+    assert len(seen) == 2
+    assert seen[0] == seen[1]
+    assert seen[0][1] == "multiagent-runtime-loop"
+
+
+@pytest.mark.asyncio
+async def test_async_path_awaits_orchestrator_on_caller_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    caller_loop = asyncio.get_running_loop()
+    seen_loops: list[object] = []
+
+    async def _fake_run(*, query: str, user_id: str) -> dict:
+        seen_loops.append(asyncio.get_running_loop())
+        return {"answer": "ok", "debug": {"confidence": 0.5}}
+
+    monkeypatch.setattr(runtime_adapter.orchestrator, "run", _fake_run, raising=False)
+    result = await runtime_adapter.run_multiagent_adaptive_async(query="q", user_id="u")
+
+    assert result["answer"] == "ok"
+    assert result["metadata"]["runtime_entrypoint"] == "multiagent_adapter"
+    assert seen_loops == [caller_loop]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_async_turns_do_not_serialize(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def _slow_run(*, query: str, user_id: str) -> dict:
+        await asyncio.sleep(0.05)
+        return {"answer": query, "debug": {}}
+
+    monkeypatch.setattr(runtime_adapter.orchestrator, "run", _slow_run, raising=False)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    results = await asyncio.gather(
+        *(
+            runtime_adapter.run_multiagent_adaptive_async(query=f"q{i}", user_id=f"u{i}")
+            for i in range(10)
+        )
+    )
+    elapsed = loop.time() - started
+
+    assert [item["answer"] for item in results] == [f"q{i}" for i in range(10)]
+    assert elapsed < 0.3
+
+
+@pytest.mark.asyncio
+async def test_shared_async_client_is_reused_per_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    created: list[str] = []
+
+    class _FakeAsyncOpenAI:
+        def __init__(self, *, api_key: str) -> None:
+            created.append(api_key)
+            self.closed = False
+
+        async def close(self) -> None:
+            self.closed = True
+
+    fake_openai = ModuleType("openai")
+    fake_openai.AsyncOpenAI = _FakeAsyncOpenAI
+    monkeypatch.setitem(sys.modules, "openai", fake_openai)
+
+    first = agent_llm_client.get_shared_async_client("sk-shared-loop")
+    second = agent_llm_client.get_shared_async_client("sk-shared-loop")
+    assert first is second
+    assert created == ["sk-shared-loop"]
+
+    closed = await agent_llm_client.aclose_shared_async_clients()
+    assert closed == 1
+    assert first.closed is True
+    assert agent_llm_client.get_shared_async_client("sk-shared-loop") is not first
+
+
+def test_shared_async_client_returns_none_without_key() -> None:
+    assert agent_llm_client.get_shared_async_client("") is None
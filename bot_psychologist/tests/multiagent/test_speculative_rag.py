@@ -0,0 +1,109 @@
+"""Speculative RAG retrieval started in parallel with the retrieval planner."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from bot_agent.multiagent.agents import memory_retrieval
+from bot_agent.multiagent.agents.memory_retrieval import MemoryRetrievalAgent, speculative_rag_stats
+from bot_agent.multiagent.contracts.memory_bundle import SemanticHit, UserProfile
+from bot_agent.multiagent.contracts.thread_state import ThreadState
+
+
+def _thread() -> ThreadState:
+    return ThreadState(
+        thread_id="spec_thread",
+        user_id="u1",
+        core_direction="тревога перед встречей",
+        phase="clarify",  # type: ignore[arg-type]
+        relation_to_thread="continue",  # type: ignore[arg-type]
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    )
+
+
+@pytest.fixture()
+def agent(monkeypatch):
+    monkeypatch.setenv("APP_ENV", "local")
+    monkeypatch.setattr(
+        memory_retrieval,
+        "_SPECULATIVE_RAG_STATS",
+        {"started": 0, "hits": 0, "misses": 0, "saved_ms": 0.0, "wasted_ms": 0.0},
+    )
+    agent = MemoryRetrievalAgent()
+    monkeypatch.setattr(agent, "_load_conversation", AsyncMock(return_value="ctx"))
+    monkeypatch.setattr(agent, "_load_profile", AsyncMock(return_value=UserProfile()))
+    monkeypatch.setattr(agent, "_load_recent_turns", AsyncMock(return_value=[]))
+    monkeypatch.setattr(agent, "_load_personal_history_context", AsyncMock(return_value=[]))
+    monkeypatch.setattr(agent, "_load_semantic_memory_hits", AsyncMock(return_value=[]))
+    agent.rag_calls = []
+
+    async def _fake_load_rag(query: str):
+        agent.rag_calls.append(query)
+        await asyncio.sleep(0.02)
+        return [SemanticHit(chunk_id=f"c{len(agent.rag_calls)}", content="text", source="src", score=0.8)], {}
+
+    monkeypatch.setattr(agent, "_load_rag", _fake_load_rag)
+    return agent
+
+
+async def _assemble(agent: MemoryRetrievalAgent, retrieval_plan: dict | None):
+    speculative = agent.start_speculative_rag(user_message="как успокоиться", thread_state=_thread())
+    await asyncio.sleep(0.03)  # «планировщик» думает дольше загрузки
+    bundle = await agent.assemble(
+        user_message="как успокоиться",
+        thread_state=_thread(),
+        user_id="u1",
+        retrieval_plan=retrieval_plan,
+        speculative_rag=speculative,
+    )
+    return speculative, bundle
+
+
+@pytest.mark.asyncio
+async def test_trace_only_plan_reuses_speculative_result(agent) -> None:
+    plan = {"mode": "shadow", "valid": True, "plan": {"retrieval_action": "trace_only", "composed_query": ""}}
+    speculative, bundle = await _assemble(agent, plan)
+
+    trace = bundle.rag_retrieval_trace["speculative_rag"]
+    assert len(agent.rag_calls) == 1 and speculative.query == agent.rag_calls[0]
+    assert trace["hit"] is True and trace["reason"] == "query_match"
+    assert trace["completed_before_claim"] is True and trace["saved_ms"] > 0
+    assert [hit.chunk_id for hit in bundle.semantic_hits] == ["c1"]
+
+
+@pytest.mark.asyncio
+async def test_suppressed_plan_cancels_speculation_and_counts_miss(agent) -> None:
+    plan = {"mode": "apply", "valid": True, "plan": {"retrieval_action": "suppress_rag", "composed_query": ""}}
+    _, bundle = await _assemble(agent, plan)
+
+    trace = bundle.rag_retrieval_trace["speculative_rag"]
+    assert trace["hit"] is False and trace["reason"] == "rag_skipped_by_plan"
+    assert bundle.semantic_hits == []
+    stats = speculative_rag_stats()
+    assert stats["started"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.0
+    assert stats["wasted_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_changed_query_discards_speculation(agent) -> None:
+    plan = {
+        "mode": "apply",
+        "valid": True,
+        "plan": {"retrieval_action": "query_kb", "composed_query": "успокоиться дыхание"},
+    }
+    speculative, bundle = await _assemble(agent, plan)
+
+    trace = bundle.rag_retrieval_trace["speculative_rag"]
+    executed = bundle.hybrid_retrieval_trace["executed_rag_query"]
+    assert executed != speculative.query
+    assert trace["hit"] is False and trace["reason"] == "query_mismatch"
+    assert agent.rag_calls == [speculative.query, executed]
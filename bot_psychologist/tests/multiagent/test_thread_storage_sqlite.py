@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from bot_agent.multiagent.contracts.thread_state import ThreadState
+from bot_agent.multiagent.thread_storage import ThreadStorage
+
+
+def _state(user_id: str, thread_id: str, core_direction: str = "topic") -> ThreadState:
+    return ThreadState(
+        thread_id=thread_id,
+        user_id=user_id,
+        core_direction=core_direction,
+        phase="clarify",
+    )
+
+
+def test_sqlite_active_roundtrip_and_cache(tmp_path: Path) -> None:
+    storage = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite", cache_size=2)
+    storage.save_active(_state("u1", "t1"))
+
+    loaded = storage.load_active("u1")
+    assert loaded is not None and loaded.thread_id == "t1"
+    loaded.open_loops.append("mutated by caller")
+    assert storage.load_active("u1").open_loops == []
+    assert storage.stats()["cache_hits"] == 2
+
+    fresh = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite")
+    assert fresh.load_active("u1").thread_id == "t1"
+    assert fresh.load_active("missing") is None
+    assert not (tmp_path / "threads" / "u1_active.json").exists()
+
+    for idx in range(5):
+        storage.save_active(_state(f"u{idx}", f"t{idx}"))
+    assert storage.stats()["cache_size"] == 2
+
+    assert storage.delete_active("u1") is True
+    assert storage.load_active("u1") is None
+    assert storage.delete_active("u1") is False
+
+
+def test_sqlite_archive_is_append_only_and_paged(tmp_path: Path) -> None:
+    storage = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite", archive_recent_limit=3)
+    for idx in range(7):
+        storage.archive_thread(_state("u1", f"t{idx}"))
+    storage.archive_thread(_state("u2", "other"))
+
+    assert [item.thread_id for item in storage.load_archived("u1")] == ["t4", "t5", "t6"]
+    assert [item.thread_id for item in storage.load_archived("u1", limit=2, offset=3)] == ["t2", "t3"]
+    assert len(storage.load_archived("u1", limit=0)) == 7
+    assert [user for user, _ in storage.list_archived_payloads()].count("u1") == 7
+
+
+def test_json_backend_archive_paging_matches_sqlite(tmp_path: Path) -> None:
+    storage = ThreadStorage(storage_dir=tmp_path / "threads", backend="json", archive_recent_limit=3)
+    for idx in range(7):
+        storage.archive_thread(_state("u1", f"t{idx}"))
+
+    assert [item.thread_id for item in storage.load_archived("u1")] == ["t4", "t5", "t6"]
+    assert [item.thread_id for item in storage.load_archived("u1", limit=2, offset=3)] == ["t2", "t3"]
+    assert len(json.loads((tmp_path / "threads" / "u1_archive.json").read_text(encoding="utf-8"))) == 7
+
+
+def test_sqlite_backend_migrates_existing_json_files_once(tmp_path: Path) -> None:
+    legacy = ThreadStorage(storage_dir=tmp_path / "threads", backend="json")
+    legacy.save_active(_state("u1", "active-1", core_direction="тревога"))
+    legacy.archive_thread(_state("u1", "old-1"))
+    legacy.archive_thread(_state("u1", "old-2"))
+
+    storage = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite")
+    loaded = storage.load_active("u1")
+    assert loaded is not None and loaded.core_direction == "тревога"
+    assert [item.thread_id for item in storage.load_archived("u1")] == ["old-1", "old-2"]
+    assert [payload["thread_id"] for payload in storage.list_active_payloads()] == ["active-1"]
+
+    legacy.archive_thread(_state("u1", "old-3"))
+    reopened = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite")
+    assert len(reopened.load_archived("u1", limit=0)) == 2
+
+
+def test_sqlite_parallel_writes_are_serialized(tmp_path: Path) -> None:
+    storage = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite")
+
+    def _write(idx: int) -> None:
+        storage.save_active(_state(f"u{idx % 4}", f"t{idx}"))
+        storage.archive_thread(_state(f"u{idx % 4}", f"a{idx}"))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(_write, range(40)))
+
+    assert len(storage.list_active_payloads()) == 4
+    assert len(storage.list_archived_payloads()) == 40
+
+
+def test_sqlite_cache_sees_writes_from_another_worker(tmp_path: Path) -> None:
+    # Два экземпляра со своими LRU над одним файлом — как два воркера uvicorn.
+    worker_a = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite")
+    worker_b = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite")
+    worker_a.save_active(_state("u1", "t1"))
+    assert worker_a.load_active("u1").phase == "clarify"
+
+    updated = _state("u1", "t1")
+    updated.phase = "explore"
+    updated.open_loops.append("loop from worker b")
+    worker_b.save_active(updated)
+
+    reloaded = worker_a.load_active("u1")
+    assert reloaded.phase == "explore" and reloaded.open_loops == ["loop from worker b"]
+    assert worker_a.load_active("u1").phase == "explore"
+
+    worker_b.delete_active("u1")
+    assert worker_a.load_active("u1") is None
+    assert worker_a.stats()["cache_hits"] >= 2
+
+
+def test_sqlite_cache_hit_skips_payload_parsing(tmp_path: Path, monkeypatch) -> None:
+    storage = ThreadStorage(storage_dir=tmp_path / "threads", backend="sqlite")
+    saved = _state("u1", "t1")
+    saved.active_frame["topic"] = "сон"
+    storage.save_active(saved)
+    saved.open_loops.append("mutated after save")
+
+    parsed: list[dict] = []
+    original = ThreadState.from_dict.__func__
+    monkeypatch.setattr(
+        ThreadState,
+        "from_dict",
+        classmethod(lambda cls, data: parsed.append(data) or original(cls, data)),
+    )
+
+    first = storage.load_active("u1")
+    first.active_frame["topic"] = "mutated by caller"
+    second = storage.load_active("u1")
+
+    assert parsed == []
+    assert first is not second
+    assert second.open_loops == [] and second.active_frame == {"topic": "сон"}
+    assert storage.stats()["cache_hits"] == 2
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from bot_agent.llm_streaming import stream_answer_tokens
+from bot_agent.multiagent.writer_stream import (
+    AnswerReplacement,
+    WriterStreamChannel,
+    open_writer_stream_attempt,
+    writer_stream_scope,
+)
+
+
+def _contract(*, safety_active: bool = False, must_avoid: list[str] | None = None) -> SimpleNamespace:
+    return SimpleNamespace(
+        thread_state=SimpleNamespace(
+            safety_active=safety_active,
+            must_avoid=list(must_avoid or []),
+            response_mode="reflect",
+        ),
+        dialogue_policy={},
+        final_answer_directive={},
+    )
+
+
+def _drain(channel: WriterStreamChannel) -> list[str]:
+    chunks: list[str] = []
+    while not channel._queue.empty():
+        chunks.append(channel._queue.get_nowait())
+    return chunks
+
+
+def test_channel_holds_back_tail_and_releases_on_word_boundary() -> None:
+    channel = WriterStreamChannel()
+    sink = channel.begin_attempt(holdback_chars=16)
+    assert sink is not None
+
+    sink("Первое предложение ответа, ")
+    sink("и еще немного текста дальше")
+
+    released = "".join(_drain(channel))
+    assert released == channel.released_text
+    assert released.endswith(" ")
+    assert len(channel._buffer) - len(released) >= 16
+
+
+def test_channel_streams_only_first_attempt() -> None:
+    channel = WriterStreamChannel()
+    assert channel.begin_attempt() is not None
+    channel.end_attempt()
+    assert channel.begin_attempt() is None
+
+
+def test_channel_halts_on_validator_hit_before_release() -> None:
+    channel = WriterStreamChannel()
+    sink = open_writer_stream_attempt_for(channel, _contract())
+    sink("Это нормально чувствовать так. Но я языковая модель и ")
+    sink("поэтому дальше будет очень длинный безопасный хвост текста")
+
+    released = "".join(_drain(channel))
+    assert "языковая модель" not in released
+    assert channel.halted_reason and channel.halted_reason.startswith("bot_reveal")
+
+
+def test_open_attempt_skips_safety_override_turns() -> None:
+    channel = WriterStreamChannel()
+    with writer_stream_scope(channel):
+        assert open_writer_stream_attempt(_contract(safety_active=True)) is None
+    assert open_writer_stream_attempt(_contract()) is None
+
+
+def test_reconcile_returns_tail_or_replacement() -> None:
+    channel = WriterStreamChannel()
+    sink = channel.begin_attempt(holdback_chars=16)
+    sink("Привет, давай разберем это спокойно и по шагам вместе")
+    released = channel.released_text
+    assert released
+
+    tail = channel.reconcile(released + "финал.")
+    assert tail == ["финал."]
+
+    replaced = channel.reconcile("Совсем другой ответ.")
+    assert len(replaced) == 1
+    assert isinstance(replaced[0], AnswerReplacement)
+    assert replaced[0] == "Совсем другой ответ."
+
+
+def open_writer_stream_attempt_for(channel: WriterStreamChannel, contract: SimpleNamespace):
+    with writer_stream_scope(channel):
+        sink = open_writer_stream_attempt(contract)
+    assert sink is not None
+    return sink
+
+
+@pytest.mark.asyncio
+async def test_stream_answer_tokens_yields_writer_deltas_before_completion() -> None:
+    contract = _contract()
+    timeline: list[str] = []
+    answer = "Я рядом и слышу тебя. Давай посмотрим, что сейчас важнее всего для тебя."
+
+    async def _fake_runtime(**_kwargs) -> dict:
+        sink = open_writer_stream_attempt(contract)
+        assert sink is not None
+        for word in answer.split(" "):
+            sink(word + " ")
+            await asyncio.sleep(0)
+        timeline.append("runtime_done")
+        return {"answer": answer, "debug": {}}
+
+    def _on_complete(result: dict) -> None:
+        timeline.append("complete")
+        assert result["debug"]["writer_stream"]["version"] == "writer_stream_v1"
+
+    tokens: list[str] = []
+    async for token in stream_answer_tokens(
+        "q",
+        user_id="u-stream",
+        on_complete=_on_complete,
+        answer_fn=_fake_runtime,
+    ):
+        if "runtime_done" not in timeline:
+            timeline.append("token_before_done")
+        tokens.append(token)
+
+    assert timeline[0] == "token_before_done"
+    assert "".join(tokens) == answer
+    assert not any(isinstance(token, AnswerReplacement) for token in tokens)
+
+
+@pytest.mark.asyncio
+async def test_stream_answer_tokens_replaces_when_final_answer_differs() -> None:
+    contract = _contract()
+
+    async def _fake_runtime(**_kwargs) -> dict:
+        sink = open_writer_stream_attempt(contract)
+        sink("Черновик ответа, который потом заменит валидатор целиком ")
+        return {"answer": "Безопасная замена.", "debug": {}}
+
+    tokens = [token async for token in stream_answer_tokens("q", user_id="u", answer_fn=_fake_runtime)]
+
+    assert tokens[0].startswith("Черновик")
+    assert isinstance(tokens[-1], AnswerReplacement)
+    assert tokens[-1] == "Безопасная замена."
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from api.telegram_adapter.config import TelegramAdapterSettings
+from api.telegram_adapter.dispatcher import TelegramUpdateDispatcher, chat_key, telegram_dispatcher_stats
+from api.telegram_adapter.transport import TelegramPollingTransport
+
+
+def _update(update_id: int, chat_id: str) -> dict:
+    return {"update_id": update_id, "chat_id": chat_id, "message_id": str(update_id), "text": "t"}
+
+
+def test_chat_key_supports_contract_and_native_payloads() -> None:
+    assert chat_key({"chat_id": 5}) == "5"
+    assert chat_key({"update_id": 1, "message": {"chat": {"id": 42}}}) == "42"
+    assert chat_key({"update_id": 7}) == "update:7"
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_keeps_chat_order_and_runs_chats_concurrently() -> None:
+    events: list[tuple[str, str, int]] = []
+    active = {"now": 0, "peak": 0}
+
+    async def _handler(raw_update: dict) -> None:
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        events.append(("start", raw_update["chat_id"], raw_update["update_id"]))
+        await asyncio.sleep(0.02 if raw_update["chat_id"] == "slow" else 0.001)
+        events.append(("end", raw_update["chat_id"], raw_update["update_id"]))
+        active["now"] -= 1
+
+    dispatcher = TelegramUpdateDispatcher(_handler, max_concurrency=2)
+    for update_id, chat_id in enumerate(["slow", "slow", "fast", "slow", "fast"], start=1):
+        await dispatcher.submit(_update(update_id, chat_id))
+    assert await dispatcher.drain(timeout=2.0)
+
+    slow_order = [update_id for kind, chat, update_id in events if kind == "start" and chat == "slow"]
+    assert slow_order == [1, 2, 4]
+    fast_done = [index for index, event in enumerate(events) if event[:2] == ("end", "fast")]
+    first_slow_done = events.index(("end", "slow", 1))
+    assert fast_done[-1] < first_slow_done  # быстрый чат не ждет медленный
+    assert active["peak"] == 2
+
+    stats = dispatcher.stats()
+    assert stats["processed"] == 5 and stats["pending"] == 0 and stats["active_chats"] == 0
+    assert stats["latency_ms"]["count"] == 5 and stats["latency_ms"]["max"] >= 20
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_applies_backpressure_when_pending_limit_reached() -> None:
+    release = asyncio.Event()
+
+    async def _handler(_raw_update: dict) -> None:
+        await release.wait()
+
+    dispatcher = TelegramUpdateDispatcher(_handler, max_concurrency=4, per_chat_queue_size=8, max_pending=2)
+    await dispatcher.submit(_update(1, "a"))
+    await dispatcher.submit(_update(2, "b"))
+    third = asyncio.create_task(dispatcher.submit(_update(3, "c")))
+    await asyncio.sleep(0.01)
+    assert not third.done() and dispatcher.stats()["backpressure_waits"] == 1
+
+    release.set()
+    await asyncio.wait_for(third, timeout=1.0)
+    assert await dispatcher.drain(timeout=1.0)
+    assert dispatcher.stats()["processed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_polling_transport_dispatches_batch_and_reports_stats(monkeypatch: pytest.MonkeyPatch) -> None:
+    handled: list[int] = []
+    settings = TelegramAdapterSettings(enabled=True, mode="polling", bot_token="token")
+    transport = TelegramPollingTransport(
+        bot_token="token",
+        adapter_service=object(),  # type: ignore[arg-type]
+        outbound_sender=object(),  # type: ignore[arg-type]
+        settings=settings,
+    )
+
+    async def _process_update(raw_update: dict) -> None:
+        assert telegram_dispatcher_stats()["running"] is True
+        handled.append(raw_update["update_id"])
+
+    calls = {"count": 0}
+
+    async def _poll_once(_offset: int):
+        calls["count"] += 1
+        if calls["count"] == 1:
+            return [_update(10, "a"), _update(11, "b"), _update(12, "a")]
+        await transport.stop()
+        return []
+
+    monkeypatch.setattr(transport, "_process_update", _process_update)
+    monkeypatch.setattr(transport, "_poll_once", _poll_once)
+    await transport.start()
+
+    assert sorted(handled) == [10, 11, 12] and handled.index(10) < handled.index(12)
+    assert telegram_dispatcher_stats() == {"running": False}
+    assert transport.dispatcher is not None and transport.dispatcher.stats()["processed"] == 3
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from telegram_adapter.api_client import http_client
+
+
+@pytest.mark.asyncio
+async def test_http_client_is_reused_within_loop_and_closed_on_shutdown() -> None:
+    client = http_client.get_http_client()
+    assert http_client.get_http_client() is client
+
+    await http_client.aclose_http_client()
+    assert client.is_closed
+    await http_client.aclose_http_client()  # повторный вызов безопасен
+
+    fresh = http_client.get_http_client()
+    assert fresh is not client and not fresh.is_closed
+    await http_client.aclose_http_client()
+
+
+def test_http_client_is_cached_per_event_loop() -> None:
+    async def _client_and_close():
+        client = http_client.get_http_client()
+        await http_client.aclose_http_client()
+        return client
+
+    first = asyncio.run(_client_and_close())
+    second = asyncio.run(_client_and_close())
+    assert first is not second
+    assert first.is_closed and second.is_closed
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import threading
 from typing import Any
 
 import pytest
@@ -13,13 +14,13 @@ async def test_default_chat_executor_uses_multiagent_runtime(
 ) -> None:
     captured: dict[str, Any] = {}
 
-    def _fake_runtime(**kwargs: Any) -> dict[str, Any]:
-        captured.update(kwargs)
+    async def _fake_runtime(**kwargs: Any) -> dict[str, Any]:
+        captured.update(kwargs, thread=threading.current_thread())
         return {"answer": "multiagent reply"}
 
     monkeypatch.setattr(
         telegram_service,
-        "run_multiagent_adaptive_sync",
+        "run_multiagent_adaptive_async",
         _fake_runtime,
         raising=True,
     )
@@ -38,3 +39,4 @@ async def test_default_chat_executor_uses_multiagent_runtime(
     assert captured["include_path_recommendation"] is False
     assert captured["include_feedback_prompt"] is False
     assert captured["debug"] is False
+    assert captured["thread"] is threading.current_thread()  # без worker thread
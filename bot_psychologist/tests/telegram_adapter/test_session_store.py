@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import sqlite3
 from pathlib import Path
 
 import pytest
@@ -13,6 +14,7 @@ def temp_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
     monkeypatch.setenv("SESSION_DB_PATH", str(db_path))
     session_store._db_initialized_path = None
     yield db_path
+    session_store.close_db()
     session_store._db_initialized_path = None
 
 
@@ -36,3 +38,35 @@ def test_t6_4_persists_across_connections(temp_db: Path) -> None:
     session_store._db_initialized_path = None  # emulate process restart
     assert session_store._get_cached_session("user_persist") == "sess_persist"
 
+
+
+def test_t6_5_reopens_connection_when_db_path_changes(
+    temp_db: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    session_store._save_session("user_a", "sess_a")
+    first_conn = session_store._conn
+
+    other_db = tmp_path / "other_sessions.db"
+    monkeypatch.setenv("SESSION_DB_PATH", str(other_db))
+    assert session_store._get_cached_session("user_a") is None
+    assert session_store._conn is not first_conn
+    assert session_store._conn_path == str(other_db)
+    with pytest.raises(sqlite3.ProgrammingError):
+        first_conn.execute("SELECT 1")
+
+    monkeypatch.setenv("SESSION_DB_PATH", str(temp_db))
+    assert session_store._get_cached_session("user_a") == "sess_a"
+
+
+def test_t6_6_close_db_closes_and_lazily_reopens(temp_db: Path) -> None:
+    session_store._save_session("user_close", "sess_close")
+    conn = session_store._conn
+
+    session_store.close_db()
+    assert session_store._conn is None and session_store._conn_path is None
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    session_store.close_db()  # повторный вызов безопасен
+
+    assert session_store._get_cached_session("user_close") == "sess_close"
+    assert session_store._conn is not None
@@ -130,3 +130,17 @@ async def test_done_payload_with_answer_fallback() -> None:
         result = await consume_adaptive_stream("тест", "user_1", "sess_1")
     assert result == "Финальный ответ"
 
+
+
+@pytest.mark.asyncio
+async def test_replace_event_overrides_streamed_text() -> None:
+    replace_payload = json.dumps({"replace": "Безопасный ответ"}, ensure_ascii=False)
+    lines = [
+        'data: {"token":"Черновик "}',
+        f"data: {replace_payload}",
+        'data: {"token":"."}',
+        "data: [DONE]",
+    ]
+    with patch("httpx.AsyncClient", _mock_client_factory(lines)):
+        result = await consume_adaptive_stream("тест", "user_1", "sess_1")
+    assert result == "Безопасный ответ."
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from telegram import Chat, Message, Update  # noqa: E402
+
+from telegram_adapter.dispatch import PerChatUpdateProcessor  # noqa: E402
+
+
+def _update(update_id: int, chat_id: int) -> Update:
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(timezone.utc),
+        chat=Chat(id=chat_id, type=Chat.PRIVATE),
+        text="t",
+    )
+    return Update(update_id=update_id, message=message)
+
+
+@pytest.mark.asyncio
+async def test_processor_keeps_chat_order_and_runs_chats_concurrently() -> None:
+    processor = PerChatUpdateProcessor(max_concurrency=4, max_pending=16)
+    release_first = asyncio.Event()
+    events: list[tuple[str, int]] = []
+
+    async def _handle(update_id: int) -> None:
+        events.append(("start", update_id))
+        if update_id == 1:
+            await release_first.wait()
+        events.append(("end", update_id))
+
+    tasks = [
+        asyncio.create_task(processor.do_process_update(_update(update_id, chat_id), _handle(update_id)))
+        for update_id, chat_id in ((1, 10), (2, 10), (3, 20))
+    ]
+    await asyncio.sleep(0.05)
+
+    # Чат 20 не ждет заблокированный чат 10, второй апдейт чата 10 — ждет.
+    assert ("end", 3) in events
+    assert ("start", 2) not in events
+    stats = processor.stats()
+    assert stats["in_flight"] == 1 and stats["queued"] == 2 and stats["max_queue_depth"] == 2
+
+    release_first.set()
+    await asyncio.gather(*tasks)
+
+    chat_10 = [event for event in events if event[1] in (1, 2)]
+    assert chat_10 == [("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+    assert processor.stats()["processed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_processor_drops_chat_locks_after_queue_drains() -> None:
+    processor = PerChatUpdateProcessor(max_concurrency=1, max_pending=4)
+
+    async def _fails() -> None:
+        raise RuntimeError("handler failed")
+
+    async def _noop() -> None:
+        return None
+
+    await processor.do_process_update(_update(1, 10), _noop())
+    with pytest.raises(RuntimeError, match="handler failed"):
+        await processor.do_process_update(_update(2, 20), _fails())
+
+    assert processor._chat_locks == {}
+    assert processor._waiting == {}
+    stats = processor.stats()
+    assert stats["active_chats"] == 0 and stats["in_flight"] == 0 and stats["processed"] == 2
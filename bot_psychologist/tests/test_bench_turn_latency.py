@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from bot_agent.multiagent.agents.agent_llm_client import create_agent_completion
+from scripts.bench_turn_latency import (
+    DEFAULT_BASELINE,
+    FakeLLMProvider,
+    compare_to_baseline,
+    load_scripts,
+    percentile,
+    summarize,
+)
+
+
+def test_percentile_interpolates_and_summarize_reports_all_stages() -> None:
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert percentile([], 95) == 0.0
+
+    report = summarize({"writer_agent": values, "end_to_end": [10.0]})
+    assert list(report) == ["end_to_end", "writer_agent"]
+    assert report["writer_agent"]["count"] == 100 and report["end_to_end"]["p99"] == 10.0
+
+
+def test_compare_to_baseline_flags_only_growth_beyond_tolerance() -> None:
+    baseline = {"end_to_end": {"p50": 100.0, "p95": 200.0, "p99": 300.0}, "writer_agent": {"p50": 50.0}}
+    ok = {"end_to_end": {"p50": 119.0, "p95": 120.0, "p99": 330.0}, "writer_agent": {"p50": 10.0}}
+    assert compare_to_baseline(ok, baseline, tolerance=0.2, slack_ms=0.0) == []
+
+    slow = {"end_to_end": {"p50": 100.0, "p95": 260.0, "p99": 300.0}}
+    regressions = compare_to_baseline(slow, baseline, tolerance=0.2, slack_ms=0.0)
+    assert regressions[0].startswith("end_to_end.p95: 260.00ms > 240.00ms")
+    assert regressions[1] == "writer_agent: missing in current run"
+    assert compare_to_baseline(slow, {"end_to_end": baseline["end_to_end"]}, tolerance=0.2, slack_ms=25.0) == []
+
+
+def test_load_scripts_keeps_user_turns_in_order(tmp_path: Path) -> None:
+    dataset = tmp_path / "cases.json"
+    dataset.write_text(
+        json.dumps(
+            {
+                "cases": [
+                    {
+                        "case_id": "c1",
+                        "turns": [
+                            {"role": "user", "content": "первый"},
+                            {"role": "assistant", "content": "ответ"},
+                            {"role": "user", "content": "второй"},
+                        ],
+                    },
+                    {"case_id": "empty", "turns": []},
+                ]
+            },
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    assert load_scripts(dataset) == [{"case_id": "c1", "turns": ["первый", "второй"]}]
+
+
+def test_default_baseline_covers_end_to_end_and_overhead() -> None:
+    baseline = json.loads(DEFAULT_BASELINE.read_text(encoding="utf-8"))
+    assert baseline["schema_version"] == "turn_latency_baseline_v1"
+    for stage in ("end_to_end", "pipeline_overhead", "state_analyzer", "writer_agent"):
+        assert {"p50", "p95", "p99"} <= set(baseline["stages"][stage])
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_serves_both_api_modes_with_seeded_latency() -> None:
+    provider = FakeLLMProvider(
+        latency_profile={"default": {"median_ms": 1.0, "sigma": 0.5}},
+        canned_outputs={"default": '{"ok": true}'},
+        seed=7,
+    )
+    messages = [{"role": "user", "content": "привет"}]
+
+    chat = await create_agent_completion(client=provider, model="gpt-4o-mini", messages=messages)
+    responses = await create_agent_completion(client=provider, model="gpt-5-mini", messages=messages)
+    assert (chat.api_mode, chat.text) == ("chat_completions", '{"ok": true}')
+    assert (responses.api_mode, responses.text) == ("responses", '{"ok": true}')
+    assert chat.tokens_total and responses.tokens_total
+
+    deltas: list[str] = []
+    streamed = await create_agent_completion(
+        client=provider,
+        model="gpt-4o-mini",
+        messages=messages,
+        on_delta=deltas.append,
+    )
+    assert streamed.streamed is True and "".join(deltas) == '{"ok": true}'
+    assert provider.calls == {"default": 3}
+
+    replay = FakeLLMProvider(latency_profile={"default": {"median_ms": 1.0, "sigma": 0.5}}, seed=7)
+    await asyncio.gather(*(replay._chat_create(messages=messages) for _ in range(3)))
+    assert replay.injected_ms["default"] == provider.injected_ms["default"]
@@ -0,0 +1,69 @@
+"""Request-scoped pinned config snapshot (RuntimeConfig + FeatureFlags)."""
+
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from bot_agent.config import config
+from bot_agent.config_context import current_pinned_config, pinned_config
+from bot_agent.feature_flags import feature_flags
+from bot_agent.runtime_config import RuntimeConfig
+
+
+@pytest.fixture()
+def override_path(tmp_path, monkeypatch):
+    path = tmp_path / "admin_overrides.json"
+    monkeypatch.setattr(RuntimeConfig, "OVERRIDES_PATH", path, raising=False)
+    monkeypatch.setattr(RuntimeConfig, "_cache_mtime", 0.0, raising=False)
+    monkeypatch.setattr(RuntimeConfig, "_cache", {}, raising=False)
+    monkeypatch.setattr(RuntimeConfig, "_snapshot", None, raising=False)
+    monkeypatch.setattr(config, "OVERRIDES_PATH", path, raising=False)
+    return path
+
+
+def _write(path, top_k: int, mtime_ns: int) -> None:
+    path.write_text(json.dumps({"config": {"MAX_TOKENS_SOFT_CAP": top_k}}), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_snapshot_is_rebuilt_only_on_file_change(override_path):
+    _write(override_path, 1000, 10**18)
+    first = config.current_snapshot()
+
+    assert config.current_snapshot() is first
+    assert first.config["MAX_TOKENS_SOFT_CAP"] == 1000 and config.MAX_TOKENS_SOFT_CAP == 1000
+
+    _write(override_path, 2000, 2 * 10**18)
+    second = config.current_snapshot()
+    assert second.version > first.version and config.MAX_TOKENS_SOFT_CAP == 2000
+    with pytest.raises(TypeError):
+        second.config["MAX_TOKENS_SOFT_CAP"] = 1
+
+
+def test_pinned_turn_sees_one_version_and_its_own_writes(override_path):
+    _write(override_path, 1000, 10**18)
+
+    with pinned_config() as view:
+        _write(override_path, 3000, 2 * 10**18)
+        assert config.MAX_TOKENS_SOFT_CAP == 1000
+        assert current_pinned_config() is view
+
+        config.set_config_override("MAX_TOKENS_SOFT_CAP", 4000)
+        assert config.MAX_TOKENS_SOFT_CAP == 4000
+
+    assert current_pinned_config() is None
+    assert config.MAX_TOKENS_SOFT_CAP == 4000
+
+
+def test_feature_flags_resolve_once_per_pinned_view(monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CARDS_PILOT_ENABLED", "false")
+
+    with pinned_config():
+        assert feature_flags.enabled("SEMANTIC_CARDS_PILOT_ENABLED") is False
+        monkeypatch.setenv("SEMANTIC_CARDS_PILOT_ENABLED", "true")
+        assert feature_flags.enabled("SEMANTIC_CARDS_PILOT_ENABLED") is False
+
+    assert feature_flags.enabled("SEMANTIC_CARDS_PILOT_ENABLED") is True
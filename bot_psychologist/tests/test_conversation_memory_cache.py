@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests for bounded LRU/TTL cache of ConversationMemory instances."""
+
+import shutil
+import uuid
+from pathlib import Path
+
+import pytest
+
+from bot_agent import conversation_memory as conv_module
+from bot_agent.config import config
+from bot_agent.conversation_memory import ConversationMemoryCache
+
+
+_LOCAL_TMP_ROOT = Path(__file__).resolve().parent / "_tmp_memory_persistence"
+
+
+@pytest.fixture
+def isolated_storage(monkeypatch):
+    tmp_path = _LOCAL_TMP_ROOT / uuid.uuid4().hex
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    monkeypatch.setattr(config, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(config, "ENABLE_SEMANTIC_MEMORY", False)
+    monkeypatch.setattr(config, "ENABLE_CONVERSATION_SUMMARY", False)
+    monkeypatch.setattr(config, "ENABLE_SESSION_STORAGE", True)
+    monkeypatch.setattr(config, "BOT_DB_PATH", tmp_path / "bot_sessions.db")
+    try:
+        yield tmp_path
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def test_lru_evicts_least_recent_and_rehydrates(isolated_storage) -> None:
+    cache = ConversationMemoryCache(max_size=2, idle_ttl_seconds=0)
+
+    first = cache.get_or_load("lru_user_a")
+    first.add_turn(user_input="Первый вопрос", bot_response="Первый ответ")
+    cache.get_or_load("lru_user_b")
+    assert cache.get_or_load("lru_user_a") is first  # a становится самым свежим
+    cache.get_or_load("lru_user_c")  # вытесняет b
+
+    assert "lru_user_a" in cache
+    assert "lru_user_b" not in cache
+    assert len(cache) == 2
+
+    cache.get_or_load("lru_user_d")  # вытесняет a
+    assert "lru_user_a" not in cache
+
+    restored = cache.get_or_load("lru_user_a")
+    assert restored is not first
+    assert [turn.user_input for turn in restored.turns] == ["Первый вопрос"]
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 5
+    assert stats["evictions"] == 3
+    assert stats["rehydrations"] == 1
+    assert stats["size"] == 2
+
+
+def test_idle_ttl_evicts_and_checkpoints(isolated_storage, monkeypatch) -> None:
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(conv_module.time, "monotonic", lambda: clock["now"])
+    cache = ConversationMemoryCache(max_size=0, idle_ttl_seconds=60)
+
+    memory = cache.get_or_load("idle_user")
+    memory.metadata["primary_interests"] = ["границы"]
+    clock["now"] += 61
+    cache.get_or_load("other_user")
+
+    assert "idle_user" not in cache
+    assert cache.stats()["idle_evictions"] == 1
+
+    restored = cache.get_or_load("idle_user")
+    assert restored.metadata["primary_interests"] == ["границы"]
+
+
+def test_eviction_releases_semantic_memory(isolated_storage, monkeypatch) -> None:
+    released: list[str] = []
+    monkeypatch.setattr(conv_module, "release_semantic_memory", released.append)
+    cache = ConversationMemoryCache(max_size=1, idle_ttl_seconds=0)
+
+    memory = cache.get_or_load("semantic_user")
+    memory.semantic_memory = object()
+    cache.get_or_load("next_user")
+
+    assert released == ["semantic_user"]
+
+
+def test_module_accessor_uses_shared_cache(isolated_storage, monkeypatch) -> None:
+    cache = ConversationMemoryCache(max_size=4, idle_ttl_seconds=0)
+    monkeypatch.setattr(conv_module, "_memory_instances", cache)
+
+    first = conv_module.get_conversation_memory("shared_user")
+    second = conv_module.get_conversation_memory("shared_user")
+
+    assert first is second
+    stats = conv_module.get_conversation_memory_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_in_flight_user_is_not_evicted(isolated_storage) -> None:
+    cache = ConversationMemoryCache(max_size=1, idle_ttl_seconds=0)
+
+    with cache.in_flight("busy_user"):
+        busy = cache.get_or_load("busy_user")
+        cache.get_or_load("other_user")  # вытесняется other, а не busy
+        assert cache.get_or_load("busy_user") is busy
+    assert "other_user" not in cache
+
+    cache.get_or_load("next_user")
+    assert "busy_user" not in cache
+
+
+def test_checkpoint_runs_outside_cache_lock(isolated_storage, monkeypatch) -> None:
+    import threading
+
+    cache = ConversationMemoryCache(max_size=1, idle_ttl_seconds=0)
+    evicted = cache.get_or_load("slow_user")
+    started, release = threading.Event(), threading.Event()
+    lookups: list[object] = []
+
+    def _slow_checkpoint(**_kwargs):
+        started.set()
+        release.wait(timeout=5)
+
+    monkeypatch.setattr(evicted, "checkpoint", _slow_checkpoint)
+    worker = threading.Thread(target=cache.get_or_load, args=("fresh_user",))
+    worker.start()
+    assert started.wait(timeout=5)
+
+    # Пока checkpoint идет, кэш доступен и отдает тот же инстанс, а не копию с диска.
+    lookup = threading.Thread(target=lambda: lookups.append(cache.get_or_load("slow_user")))
+    lookup.start()
+    lookup.join(timeout=5)
+    release.set()
+    worker.join(timeout=5)
+
+    assert lookups == [evicted]
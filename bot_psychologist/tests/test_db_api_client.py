@@ -1,3 +1,4 @@
+import asyncio
 import sys
 from pathlib import Path
 import httpx
@@ -7,6 +8,7 @@ import pytest
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+from bot_agent import db_api_client
 from bot_agent.db_api_client import DBApiClient, DBApiUnavailableError, RetrievedChunk
 
 
@@ -33,56 +35,99 @@ MOCK_RESPONSE = {
 }
 
 
+def _pooled(post_return=None, post_side_effect=None) -> MagicMock:
+    http_client = MagicMock()
+    if post_side_effect is not None:
+        http_client.post.side_effect = post_side_effect
+    else:
+        http_client.post.return_value = post_return
+    return http_client
+
+
 class TestDBApiClient:
     def test_successful_query_returns_chunks(self):
-        with patch("httpx.Client") as mock_http:
-            mock_http.return_value.__enter__.return_value.post.return_value = MagicMock(
-                status_code=200, json=lambda: MOCK_RESPONSE
-            )
-            client = DBApiClient()
-            result = client.query("осознанность", sd_level=3)
+        http_client = _pooled(MagicMock(status_code=200, json=lambda: MOCK_RESPONSE))
+        client = DBApiClient(http_client=http_client)
+        result = client.query("осознанность", sd_level=3)
         assert len(result) == 1
         assert isinstance(result[0], RetrievedChunk)
         assert result[0].chunk_id == "c1"
 
     def test_connect_error_raises_unavailable(self):
-        with patch("httpx.Client") as mock_http:
-            mock_http.return_value.__enter__.return_value.post.side_effect = \
-                httpx.ConnectError("Connection refused")
-            client = DBApiClient()
-            with pytest.raises(DBApiUnavailableError) as exc_info:
-                client.query("test")
+        http_client = _pooled(post_side_effect=httpx.ConnectError("Connection refused"))
+        client = DBApiClient(http_client=http_client)
+        with pytest.raises(DBApiUnavailableError) as exc_info:
+            client.query("test")
         assert exc_info.value.kind == "connect"
         assert exc_info.value.status_code is None
 
     def test_timeout_raises_unavailable(self):
-        with patch("httpx.Client") as mock_http:
-            mock_http.return_value.__enter__.return_value.post.side_effect = \
-                httpx.TimeoutException("Timeout")
-            client = DBApiClient()
-            with pytest.raises(DBApiUnavailableError) as exc_info:
-                client.query("test")
+        http_client = _pooled(post_side_effect=httpx.TimeoutException("Timeout"))
+        client = DBApiClient(http_client=http_client)
+        with pytest.raises(DBApiUnavailableError) as exc_info:
+            client.query("test")
         assert exc_info.value.kind == "timeout"
         assert exc_info.value.status_code is None
 
     def test_http_status_error_contains_status_code(self):
         request = httpx.Request("POST", "http://localhost:8003/api/query/")
         response = httpx.Response(status_code=503, request=request, text="service unavailable")
-        with patch("httpx.Client") as mock_http:
-            mock_http.return_value.__enter__.return_value.post.return_value = response
-            client = DBApiClient(retries=1)
-            with pytest.raises(DBApiUnavailableError) as exc_info:
-                client.query("test")
+        client = DBApiClient(retries=1, http_client=_pooled(response))
+        with pytest.raises(DBApiUnavailableError) as exc_info:
+            client.query("test")
         assert exc_info.value.kind == "http_status"
         assert exc_info.value.status_code == 503
         assert "503" in str(exc_info.value)
 
     def test_sd_level_is_ignored_in_payload_v101(self):
+        http_client = _pooled(MagicMock(status_code=200, json=lambda: MOCK_RESPONSE))
+        client = DBApiClient(http_client=http_client)
+        client.query("тест", sd_level=5)
+        payload = http_client.post.call_args[1]["json"]
+        assert "sd_level" not in payload
+
+
+class TestDBApiConnectionPool:
+    def test_query_reuses_shared_pooled_client(self, monkeypatch):
+        monkeypatch.setattr(db_api_client, "_SHARED_SYNC_CLIENT", None)
         with patch("httpx.Client") as mock_http:
-            mock_post = MagicMock(status_code=200, json=lambda: MOCK_RESPONSE)
-            mock_http.return_value.__enter__.return_value.post.return_value = mock_post
+            mock_http.return_value.is_closed = False
+            mock_http.return_value.post.return_value = MagicMock(status_code=200, json=lambda: MOCK_RESPONSE)
             client = DBApiClient()
-            client.query("тест", sd_level=5)
-            call_kwargs = mock_http.return_value.__enter__.return_value.post.call_args
-            payload = call_kwargs[1]["json"]
-            assert "sd_level" not in payload
+            client.query("a")
+            DBApiClient().query("b")
+        assert mock_http.call_count == 1
+        assert isinstance(mock_http.call_args.kwargs["limits"], httpx.Limits)
+        assert mock_http.return_value.post.call_count == 2
+        db_api_client.close_shared_http_clients()
+        mock_http.return_value.close.assert_called_once()
+
+    def test_async_pool_keep_alive_over_real_transport(self):
+        seen: list[str] = []
+
+        def _handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request.url.path)
+            return httpx.Response(200, json=MOCK_RESPONSE)
+
+        async def _run() -> tuple[int, int]:
+            async_client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+            client = DBApiClient(async_http_client=async_client)
+            first = await client.aquery(query="a")
+            second = await client.aquery(query="b")
+            await async_client.aclose()
+            return len(first), len(second)
+
+        assert asyncio.run(_run()) == (1, 1)
+        assert seen == ["/api/query/", "/api/query/"]
+
+    def test_shared_async_client_is_per_loop_and_closed(self, monkeypatch):
+        async def _get_twice():
+            first = db_api_client.get_shared_async_http_client()
+            second = db_api_client.get_shared_async_http_client()
+            closed = await db_api_client.aclose_shared_http_clients()
+            return first, second, closed
+
+        first, second, closed = asyncio.run(_get_twice())
+        assert first is second
+        assert first.is_closed
+        assert closed >= 1
@@ -8,6 +8,7 @@ import types
 import numpy as np
 import pytest
 
+from bot_agent.embedding_cache import QueryEmbeddingCache, get_query_embedding_cache
 from bot_agent.embedding_provider import (
     E5EmbeddingProvider,
     SentenceTransformerEmbeddingProvider,
@@ -29,6 +30,13 @@ class _FakeSentenceTransformer:
         return np.array([0.1, 0.2, 0.3], dtype=np.float32)
 
 
+@pytest.fixture(autouse=True)
+def _clear_query_embedding_cache():
+    get_query_embedding_cache().clear()
+    yield
+    get_query_embedding_cache().clear()
+
+
 def _install_fake_ml_modules(monkeypatch: pytest.MonkeyPatch, gpu: bool = False) -> None:
     st_mod = types.ModuleType("sentence_transformers")
     st_mod.SentenceTransformer = _FakeSentenceTransformer
@@ -76,3 +84,74 @@ def test_e5_large_requires_gpu_unless_cpu_device(monkeypatch: pytest.MonkeyPatch
     provider = E5EmbeddingProvider(model_name="intfloat/multilingual-e5-large", device="cpu")
     assert provider.model_name().endswith("e5-large")
 
+
+
+def test_query_embeddings_are_cached_across_provider_instances(monkeypatch: pytest.MonkeyPatch) -> None:
+    _install_fake_ml_modules(monkeypatch, gpu=False)
+    calls: list = []
+    original_encode = _FakeSentenceTransformer.encode
+
+    def _counting_encode(self, inputs, **kwargs):
+        calls.append(inputs)
+        return original_encode(self, inputs, **kwargs)
+
+    monkeypatch.setattr(_FakeSentenceTransformer, "encode", _counting_encode)
+    first = E5EmbeddingProvider(model_name="intfloat/multilingual-e5-base", device="cpu")
+    second = E5EmbeddingProvider(model_name="intfloat/multilingual-e5-base", device="cpu")
+    legacy = SentenceTransformerEmbeddingProvider("intfloat/multilingual-e5-base", device="cpu")
+
+    assert first.embed_query("Мне  тревожно ") == second.embed_query("Мне тревожно")
+    assert calls == ["query: Мне тревожно"]
+
+    legacy.embed_query("Мне тревожно")
+    assert calls[-1] == "Мне тревожно"  # другой prefix mode -> отдельный ключ
+
+    stats = get_query_embedding_cache().stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-3)
+
+
+def test_query_embedding_cache_spills_evicted_vectors_to_disk(tmp_path) -> None:
+    computed: list[str] = []
+
+    def _compute(batch: list[str]) -> list[list[float]]:
+        computed.extend(batch)
+        return [[float(len(text)), 1.0] for text in batch]
+
+    cache = QueryEmbeddingCache(max_entries=2, spill_path=tmp_path / "spill.sqlite")
+    try:
+        cache.get_or_compute_many("m", "raw", ["a", "bb", "ccc"], _compute)
+        assert cache.stats()["evictions"] == 1
+
+        again = cache.get_or_compute_many("m", "raw", ["a", "a"], _compute)
+    finally:
+        cache.close()
+
+    assert again == [[1.0, 1.0], [1.0, 1.0]]
+    assert computed == ["a", "bb", "ccc"]
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["spilled"] >= 1
+
+
+def test_query_embedding_cache_disk_hit_refreshes_spill_touched(tmp_path) -> None:
+    spill = tmp_path / "spill.sqlite"
+    cache = QueryEmbeddingCache(max_entries=1, spill_path=spill)
+    compute = lambda batch: [[float(len(text))] for text in batch]  # noqa: E731
+    try:
+        cache.get_or_compute_many("m", "raw", ["a", "bb"], compute)
+        conn = cache._spill_conn()
+        conn.execute("UPDATE query_embeddings SET touched = 0")
+        conn.commit()
+
+        cache.get_or_compute_many("m", "raw", ["a"], compute)
+        touched = conn.execute(
+            "SELECT touched FROM query_embeddings WHERE key = ?",
+            (cache._spill_key(("m", "raw", "a")),),
+        ).fetchone()[0]
+    finally:
+        cache.close()
+
+    assert cache.stats()["disk_hits"] == 1
+    assert touched > 0
@@ -159,11 +159,12 @@ async def test_stream_default_answer_fn_uses_multiagent_not_legacy(monkeypatch:
     def _boom(*_args, **_kwargs):
         raise AssertionError("legacy answer_adaptive must not be called")
 
-    def _fake_multiagent_adapter(**_kwargs):
+    async def _fake_multiagent_adapter(**_kwargs):
         return {"answer": "from multiagent adapter"}
 
     monkeypatch.setattr(legacy_adaptive, "answer_question_adaptive", _boom, raising=True)
-    monkeypatch.setattr(runtime_adapter, "run_multiagent_adaptive_sync", _fake_multiagent_adapter, raising=True)
+    monkeypatch.setattr(runtime_adapter, "run_multiagent_adaptive_sync", _boom, raising=True)
+    monkeypatch.setattr(runtime_adapter, "run_multiagent_adaptive_async", _fake_multiagent_adapter, raising=True)
 
     tokens = [
         token
@@ -174,3 +175,27 @@ async def test_stream_default_answer_fn_uses_multiagent_not_legacy(monkeypatch:
     ]
 
     assert "".join(tokens) == "from multiagent adapter"
+
+
+@pytest.mark.asyncio
+async def test_stream_answer_tokens_awaits_async_answer_fn_on_current_loop() -> None:
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    seen_loops: list[object] = []
+
+    async def _fake_async_answer(**_kwargs) -> dict:
+        seen_loops.append(asyncio.get_running_loop())
+        return {"answer": "native async"}
+
+    tokens = [
+        token
+        async for token in stream_answer_tokens(
+            "q",
+            user_id="u-async",
+            answer_fn=_fake_async_answer,
+        )
+    ]
+
+    assert "".join(tokens) == "native async"
+    assert seen_loops == [loop]
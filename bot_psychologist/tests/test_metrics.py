@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from bot_agent import metrics as metrics_module
+from bot_agent.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    collect_merged,
+    counter_family,
+    render_latest,
+)
+from bot_agent.multiagent.agents.agent_llm_client import create_agent_completion, estimate_llm_cost
+
+
+def _sample(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} not found in:\n{text}")
+
+
+def test_histogram_and_counter_render_prometheus_text() -> None:
+    registry = MetricsRegistry()
+    latency = Histogram("t_latency_seconds", "Latency", ("agent",), buckets=(0.1, 1.0), registry=registry)
+    errors = Counter("t_errors_total", "Errors", ("agent",), registry=registry)
+    circuit = Gauge("t_circuit_open", "Circuit", registry=registry, mode="max")
+
+    for value in (0.05, 0.5, 3.0):
+        latency.observe(value, "writer")
+    errors.inc("writer")
+    errors.inc("writer", amount=2)
+    circuit.set(1)
+    with pytest.raises(ValueError):
+        errors.inc("writer", amount=-1)
+
+    text = render_latest(registry)
+    assert "# TYPE t_latency_seconds histogram" in text
+    assert _sample(text, 't_latency_seconds_bucket{agent="writer",le="0.1"}') == 1
+    assert _sample(text, 't_latency_seconds_bucket{agent="writer",le="1.0"}') == 2
+    assert _sample(text, 't_latency_seconds_bucket{agent="writer",le="+Inf"}') == 3
+    assert _sample(text, 't_latency_seconds_count{agent="writer"}') == 3
+    assert _sample(text, 't_latency_seconds_sum{agent="writer"}') == pytest.approx(3.55)
+    assert _sample(text, 't_errors_total{agent="writer"}') == 3
+    assert _sample(text, "t_circuit_open") == 1
+
+
+def test_recording_from_many_threads_is_not_lost(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(metrics_module, "_DRAIN_THRESHOLD", 64)
+    registry = MetricsRegistry()
+    latency = Histogram("t_threads_seconds", "Latency", ("agent",), registry=registry)
+
+    def _observe(_: int) -> None:
+        for _ in range(500):
+            latency.observe(0.01, "state_analyzer")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(_observe, range(8)))
+
+    family = registry.snapshot()["t_threads_seconds"]
+    assert family["samples"][0][1]["count"] == 4000
+
+
+def test_multiprocess_snapshots_are_merged(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(metrics_module.config, "METRICS_MULTIPROC_DIR", str(tmp_path), raising=False)
+    registry = MetricsRegistry()
+    latency = Histogram("t_mp_seconds", "Latency", ("agent",), buckets=(1.0,), registry=registry)
+    circuit = Gauge("t_mp_circuit", "Circuit", registry=registry, mode="max")
+    latency.observe(0.5, "writer")
+    registry.register_collector(lambda: [counter_family("t_hits_total", "Hits", ("cache",), [(("emb",), 3)])])
+    registry.register_collector(lambda: [counter_family("t_misses_total", "Misses", ("cache",), [(("emb",), 1)])])
+    registry.register_ratio("t_hit_ratio", "Ratio", hits="t_hits_total", misses="t_misses_total")
+
+    other = registry.snapshot()
+    other["t_mp_circuit"]["samples"] = [[[], 1.0]]
+    (tmp_path / "metrics_999999.json").write_text(
+        json.dumps({"pid": 999999, "written_at": 0.0, "families": other}), encoding="utf-8"
+    )
+    merged = collect_merged(registry)
+    assert merged["t_mp_seconds"]["samples"][0][1]["count"] == 2
+    assert merged["t_hit_ratio"]["samples"][0][1] == pytest.approx(0.75)
+    assert merged["t_mp_circuit"]["samples"] == []  # gauge устаревшего воркера не учитывается
+    assert (tmp_path / f"metrics_{os.getpid()}.json").exists()
+
+    fresh = json.loads((tmp_path / "metrics_999999.json").read_text(encoding="utf-8"))
+    fresh["written_at"] = 10**12
+    (tmp_path / "metrics_999999.json").write_text(json.dumps(fresh), encoding="utf-8")
+    circuit.set(0)
+    assert collect_merged(registry)["t_mp_circuit"]["samples"] == [[[], 1.0]]
+
+
+class _ChatClient:
+    def __init__(self) -> None:
+        async def _create(**_kwargs):
+            return {
+                "choices": [{"message": {"content": "ok"}}],
+                "usage": {"prompt_tokens": 1000, "completion_tokens": 500},
+            }
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=_create))
+
+
+def test_agent_completion_records_tokens_and_cost() -> None:
+    def _value(prefix: str) -> float:
+        try:
+            return _sample(render_latest(), prefix)
+        except AssertionError:
+            return 0.0
+
+    calls = 'bot_llm_calls_total{model="gpt-4o-mini",api_mode="chat_completions"}'
+    prompt = 'bot_llm_tokens_total{model="gpt-4o-mini",kind="prompt"}'
+    cost = 'bot_llm_cost_usd_total{model="gpt-4o-mini"}'
+    before = (_value(calls), _value(prompt), _value(cost))
+
+    result = asyncio.run(
+        create_agent_completion(client=_ChatClient(), model="gpt-4o-mini", messages=[{"role": "user", "content": "x"}])
+    )
+
+    assert result.text == "ok"
+    assert _value(calls) - before[0] == 1
+    assert _value(prompt) - before[1] == 1000
+    assert _value(cost) - before[2] == pytest.approx(0.00045)
+    assert estimate_llm_cost("unknown", tokens_prompt=None, tokens_completion=None) is None
+
+
+def test_metrics_endpoint_exposes_pipeline_and_runtime_families() -> None:
+    from api.routes.metrics import metrics
+
+    response = asyncio.run(metrics())
+    body = response.body.decode("utf-8")
+    assert response.media_type.startswith("text/plain; version=0.0.4")
+    for family in (
+        "bot_agent_latency_seconds",
+        "bot_retrieval_latency_seconds",
+        "bot_llm_tokens_total",
+        "bot_cache_hit_ratio",
+        "bot_retrieval_circuit_open",
+        "bot_chat_questions_total",
+    ):
+        assert f"# TYPE {family} " in body
+    assert 'bot_cache_hits_total{cache="query_embedding"}' in body
@@ -1,6 +1,7 @@
+import asyncio
 import sys
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import numpy as np
 
@@ -126,3 +127,44 @@ class TestRetrieverFallback:
         semantic.assert_not_called()
         tfidf.assert_called_once()
         assert len(results) == 1
+
+    def test_aretrieve_uses_async_api_client(self, monkeypatch):
+        monkeypatch.setattr(config, "KNOWLEDGE_SOURCE", "api", raising=False)
+        chunk = MagicMock(
+            score=0.8,
+            chunk_id="c-async",
+            content="x",
+            sd_level=0,
+            author_id="",
+            author_name="",
+            source_type="book",
+            youtube_url=None,
+            start_time=None,
+            end_time=None,
+            block_title=None,
+            keywords=[],
+        )
+        with patch("bot_agent.db_api_client.DBApiClient.aquery", new=AsyncMock(return_value=[chunk])) as aquery:
+            with patch("bot_agent.db_api_client.DBApiClient.query") as sync_query:
+                retriever = SimpleRetriever()
+                results = asyncio.run(retriever.aretrieve("query", top_k=1))
+
+        aquery.assert_awaited_once()
+        sync_query.assert_not_called()
+        assert results[0][0].block_id == "c-async"
+        assert retriever.get_last_retrieval_debug()["retrieval_source_used"] == "api"
+
+    def test_aretrieve_falls_back_when_api_down(self, monkeypatch):
+        monkeypatch.setattr(config, "KNOWLEDGE_SOURCE", "api", raising=False)
+        with patch(
+            "bot_agent.db_api_client.DBApiClient.aquery",
+            new=AsyncMock(side_effect=DBApiUnavailableError("down")),
+        ):
+            with patch.object(SimpleRetriever, "_semantic_fallback", return_value=[]):
+                with patch.object(SimpleRetriever, "_tfidf_fallback", return_value=[MagicMock()]) as tfidf:
+                    retriever = SimpleRetriever()
+                    results = asyncio.run(retriever.aretrieve("query", top_k=1))
+
+        tfidf.assert_called_once()
+        assert len(results) == 1
+        assert retriever.get_last_retrieval_debug()["retrieval_source_used"] == "tfidf_fallback"
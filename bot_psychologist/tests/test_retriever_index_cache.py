@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bot_agent import retriever as retriever_module
+from bot_agent.config import config
+from bot_agent.data_loader import Block
+from bot_agent.index_cache import LazyBlockList, fingerprint_sources
+from bot_agent.retriever import SimpleRetriever
+
+
+def _blocks():
+    return [
+        Block(block_id="b1", title="Осознанность", content="Осознанность и внимание к телу."),
+        Block(block_id="b2", title="Тревога", content="Тревога и дыхание в моменте."),
+        Block(block_id="b3", title="Границы", content="Личные границы в отношениях."),
+    ]
+
+
+def _setup(monkeypatch, tmp_path, calls):
+    export_file = tmp_path / "blocks.json"
+    export_file.write_text(json.dumps({"blocks": ["v1"]}), encoding="utf-8")
+    monkeypatch.setattr(config, "KNOWLEDGE_SOURCE", "db_json")
+    monkeypatch.setattr(config, "DB_EXPORT_FILE", str(export_file))
+    monkeypatch.setattr(config, "MIN_RELEVANCE_SCORE", 0.0)
+    monkeypatch.setattr(retriever_module, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(retriever_module, "INDEX_CACHE_DIR", tmp_path / "cache" / "retriever_index")
+    monkeypatch.setattr(retriever_module.feature_flags, "enabled", lambda _name: False)
+
+    def _get_all_blocks():
+        calls.append(1)
+        return _blocks()
+
+    monkeypatch.setattr(retriever_module.data_loader, "get_all_blocks", _get_all_blocks)
+    return export_file
+
+
+def test_second_start_maps_cache_and_hydrates_lazily(monkeypatch, tmp_path):
+    calls = []
+    _setup(monkeypatch, tmp_path, calls)
+
+    built = SimpleRetriever()
+    built.build_index()
+    expected = [(block.block_id, round(score, 6)) for block, score in built._tfidf_fallback("тревога дыхание", 2)]
+
+    cached = SimpleRetriever()
+    cached.build_index()
+    results = [(block.block_id, round(score, 6)) for block, score in cached._tfidf_fallback("тревога дыхание", 2)]
+
+    assert len(calls) == 1
+    assert isinstance(cached.blocks, LazyBlockList)
+    # CSR-компоненты — read-only представления mmap, а не копии в памяти процесса.
+    assert not cached.tfidf_matrix.data.flags.owndata and not cached.tfidf_matrix.data.flags.writeable
+    assert results == expected and results[0][0] == "b2"
+    assert cached.blocks.hydrated_count == 2
+
+
+def test_source_change_invalidates_cache_and_reuses_unchanged_hashes(monkeypatch, tmp_path):
+    calls = []
+    export_file = _setup(monkeypatch, tmp_path, calls)
+    SimpleRetriever().build_index()
+
+    export_file.write_text(json.dumps({"blocks": ["v2"]}), encoding="utf-8")
+    os.utime(export_file, ns=(1, 1))
+    SimpleRetriever().build_index()
+
+    assert len(calls) == 2
+    entries = fingerprint_sources([export_file])
+    stale = [{**entries[0], "sha256": "cached"}]
+    assert fingerprint_sources([export_file], stale)[0]["sha256"] == "cached"
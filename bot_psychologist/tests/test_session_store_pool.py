@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pooled WAL access layer and raw float32 embeddings for SessionManager."""
+
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bot_agent.storage import SessionManager, get_sqlite_pool
+from bot_agent.storage.session_manager import EMBEDDING_DTYPE
+
+
+def test_managers_share_pool_and_run_ddl_once(monkeypatch, tmp_path) -> None:
+    db_path = str(tmp_path / "sessions.db")
+    calls = []
+    original = SessionManager._init_database
+    monkeypatch.setattr(
+        SessionManager,
+        "_init_database",
+        lambda self, conn: (calls.append(1), original(self, conn)),
+    )
+
+    first = SessionManager(db_path)
+    second = SessionManager(db_path)
+
+    assert len(calls) == 1
+    assert first._pool is second._pool is get_sqlite_pool(db_path)
+    assert first._connect().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert first._connect().execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+
+def test_embeddings_are_raw_float32_and_legacy_pickle_still_loads(tmp_path) -> None:
+    manager = SessionManager(str(tmp_path / "sessions.db"))
+    embedding = np.arange(12, dtype=np.float64) / 7.0
+    manager.save_turn("s1", 1, "вопрос", "ответ", "PRESENCE", embedding=embedding)
+
+    row = manager._connect().execute(
+        "SELECT embedding, embedding_dim FROM semantic_embeddings WHERE session_id = 's1'"
+    ).fetchone()
+    assert row["embedding_dim"] == 12 and len(row["embedding"]) == 12 * 4
+
+    with manager._connect() as conn:  # noqa: SLF001 - строка в старом формате
+        conn.execute(
+            "INSERT INTO semantic_embeddings (session_id, turn_number, embedding) VALUES ('s1', 2, ?)",
+            (pickle.dumps(np.ones(3, dtype=np.float32)),),
+        )
+
+    loaded = manager.load_session("s1")["semantic_embeddings"]
+    assert loaded[0]["embedding"].dtype == EMBEDDING_DTYPE
+    assert np.allclose(loaded[0]["embedding"], embedding.astype(np.float32))
+    assert loaded[1]["embedding"].tolist() == [1.0, 1.0, 1.0]
+
+
+def test_concurrent_writers_are_serialized(tmp_path) -> None:
+    db_path = str(tmp_path / "sessions.db")
+
+    def _write(worker: int) -> None:
+        manager = SessionManager(db_path)
+        for turn in range(1, 21):
+            manager.save_turn(f"s{worker}", turn, "in", "out", "PRESENCE", embedding=np.ones(4))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(_write, range(8)))
+
+    conn = SessionManager(db_path)._connect()
+    assert conn.execute("SELECT COUNT(*) FROM conversation_turns").fetchone()[0] == 160
+    assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 8
@@ -0,0 +1,58 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bot_agent.retrieval.vector_index import (
+    ExactVectorIndex,
+    IVFVectorIndex,
+    build_vector_index,
+    load_vector_index,
+    recall_at_k,
+)
+from scripts.eval_vector_index import hashed_embedding, synthetic_corpus
+
+EVAL_SET = Path(__file__).resolve().parent / "eval" / "retrieval_eval_set.json"
+
+
+def _queries():
+    return [item["query"] for item in json.loads(EVAL_SET.read_text(encoding="utf-8"))]
+
+
+def test_exact_backend_matches_full_sort():
+    matrix = synthetic_corpus(_queries(), 500)
+    query = hashed_embedding(_queries()[0])
+
+    indices, scores = ExactVectorIndex(matrix).search(query, 10)
+
+    expected = np.argsort(-(matrix @ query), kind="stable")[:10]
+    assert indices.tolist() == expected.tolist()
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_ivf_recall_against_exact_on_eval_queries():
+    queries = _queries()
+    matrix = synthetic_corpus(queries, 20000)
+    query_vectors = [hashed_embedding(q) for q in queries]
+
+    ivf = IVFVectorIndex.build(matrix, nprobe=32)
+
+    assert recall_at_k(ExactVectorIndex(matrix), ivf, query_vectors, top_k=10) >= 0.9
+
+
+def test_ivf_roundtrip_and_backend_selection(tmp_path):
+    matrix = synthetic_corpus(_queries(), 2000)
+    query = hashed_embedding(_queries()[1])
+    ivf = build_vector_index(matrix, "auto", ivf_min_size=1000, nprobe=4)
+    ivf.save(tmp_path)
+
+    loaded = load_vector_index(tmp_path, matrix, nprobe=4)
+
+    assert isinstance(loaded, IVFVectorIndex) and isinstance(loaded.order, np.memmap)
+    assert loaded.search(query, 5)[0].tolist() == ivf.search(query, 5)[0].tolist()
+    assert isinstance(build_vector_index(matrix, "auto", ivf_min_size=5000), ExactVectorIndex)
+    # Артефакты от другого корпуса не поднимаются — откат на exact.
+    assert isinstance(load_vector_index(tmp_path, matrix[:100]), ExactVectorIndex)
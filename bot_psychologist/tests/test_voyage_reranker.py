@@ -27,3 +27,45 @@ def test_voyage_reranker_pairs_fallback() -> None:
     top = reranker.rerank_pairs("query", candidates, top_k=1)
     assert len(top) == 2
     assert [score for _, score in top] == [0.8, 0.1]
+
+
+def test_voyage_reranker_reuses_client_and_caches_results(monkeypatch) -> None:
+    import sys
+    from types import ModuleType
+
+    from bot_agent.retrieval import voyage_reranker as module
+
+    created: list[str] = []
+    calls: list[list[str]] = []
+
+    class _FakeClient:
+        def __init__(self, api_key: str) -> None:
+            created.append(api_key)
+
+        def rerank(self, *, model, query, documents, top_k):
+            calls.append(list(documents))
+            order = sorted(range(len(documents)), key=lambda idx: documents[idx], reverse=True)[:top_k]
+            return SimpleNamespace(
+                results=[SimpleNamespace(index=idx, relevance_score=1.0 - rank / 10) for rank, idx in enumerate(order)]
+            )
+
+    fake_voyage = ModuleType("voyageai")
+    fake_voyage.Client = _FakeClient
+    monkeypatch.setitem(sys.modules, "voyageai", fake_voyage)
+    monkeypatch.setattr(module, "_clients", {})
+    module.clear_rerank_cache()
+
+    items = [RerankItem(text=text, payload=SimpleNamespace(block_id=text), score=0.1) for text in ("a", "c", "b")]
+    first = VoyageReranker()
+    first.api_key = "key"
+    top = first.rerank("query", items, top_k=2)
+
+    second = VoyageReranker()
+    second.api_key = "key"
+    again = second.rerank("query", list(reversed(items)), top_k=2)
+
+    assert [x.text for x in top] == ["c", "b"]
+    assert [(x.text, x.score) for x in again] == [(x.text, x.score) for x in top]
+    assert created == ["key"]
+    assert len(calls) == 1
+    module.clear_rerank_cache()
@@ -54,3 +54,55 @@ def test_semantic_exclude_window_keeps_candidates(monkeypatch, tmp_path) -> None
     memory = SemanticMemory(user_id="u_sem_window")
     memory.turn_embeddings = [_embedding(1, [1.0, 0.0]), _embedding(2, [1.0, 0.0])]
     assert memory._resolve_exclude_window(5) == 0
+
+
+def _reference_search(memory: SemanticMemory, query_vec, *, top_k: int, min_similarity: float, exclude: int):
+    pool = memory.turn_embeddings[:-exclude] if exclude else memory.turn_embeddings
+    scored = [
+        (turn_emb.turn_index, SemanticMemory._cosine_similarity(query_vec, turn_emb.embedding))
+        for turn_emb in pool
+    ]
+    scored = [item for item in scored if item[1] >= min_similarity]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:top_k]
+
+
+def test_vectorized_search_matches_pairwise_reference(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(config, "CACHE_DIR", tmp_path)
+    rng = np.random.default_rng(7)
+    query_vec = rng.normal(size=16).astype(np.float32)
+
+    class _Model:
+        @staticmethod
+        def embed_query(_text: str):
+            return query_vec
+
+    memory = SemanticMemory(user_id="u_sem_matrix")
+    memory._model = _Model()
+    memory._model_loaded = True
+    memory.turn_embeddings = [_embedding(i, rng.normal(size=16)) for i in range(1, 41)]
+    # Рост матрицы после первого поиска: append в тот же список тоже учитывается.
+    memory.search_similar_turns("q", top_k=2, min_similarity=-1.0)
+    memory.turn_embeddings.extend(_embedding(i, rng.normal(size=16)) for i in range(41, 61))
+
+    hits = memory.search_similar_turns("q", top_k=5, min_similarity=0.0, exclude_last_n=3)
+    expected = _reference_search(memory, query_vec, top_k=5, min_similarity=0.0, exclude=3)
+
+    assert [turn_emb.turn_index for turn_emb, _ in hits] == [index for index, _ in expected]
+    assert np.allclose([score for _, score in hits], [score for _, score in expected], atol=1e-5)
+    assert all(turn_emb.turn_index <= 57 for turn_emb, _ in hits)
+
+
+def test_vectorized_search_handles_zero_vectors_and_reset(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(config, "CACHE_DIR", tmp_path)
+    memory = SemanticMemory(user_id="u_sem_zero")
+    memory._model = _DummyEmbeddingModel()
+    memory._model_loaded = True
+    memory.turn_embeddings = [_embedding(1, [0.0, 0.0]), _embedding(2, [1.0, 0.0]), _embedding(3, [0.0, 1.0])]
+
+    hits = memory.search_similar_turns("q", top_k=3, min_similarity=0.5, exclude_last_n=1)
+    assert [(turn_emb.turn_index, round(score, 3)) for turn_emb, score in hits] == [(2, 1.0)]
+
+    memory.turn_embeddings = [_embedding(7, [1.0, 0.0]), _embedding(8, [1.0, 0.0]), _embedding(9, [1.0, 0.0])]
+    hits = memory.search_similar_turns("q", top_k=3, min_similarity=0.5, exclude_last_n=1)
+    assert [turn_emb.turn_index for turn_emb, _ in hits] == [7, 8]
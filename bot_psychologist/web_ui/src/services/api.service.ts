@@ -277,6 +277,7 @@ class APIService {
             text?: string;
             content?: string;
             delta?: string;
+            replace?: string;
             done?: boolean;
             error?: string;
             answer?: string;
@@ -307,6 +308,12 @@ class APIService {
             return;
           }
 
+          if (typeof payload.replace === 'string') {
+            // Server-side validator/acceptance gate changed the already streamed text.
+            fullText = payload.replace;
+            onToken(fullText);
+          }
+
           const delta = payload.token ?? payload.text ?? payload.content ?? payload.delta ?? '';
           if (delta) {
             fullText += String(delta);
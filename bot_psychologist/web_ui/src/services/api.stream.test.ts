@@ -276,6 +276,35 @@ describe('APIService.streamAdaptiveAnswer', () => {
     expect(result).toBe('partial stream answer');
   });
 
+  it('replaces streamed text when server sends replace event', async () => {
+    vi.stubGlobal(
+      'fetch',
+      vi.fn().mockResolvedValue(
+        buildResponseFromSSE(
+          buildSSEStream([
+            { dataLines: ['{"token":"draft "}'] },
+            { dataLines: ['{"replace":"safe final answer"}'] },
+            { dataLines: ['{"done":true,"answer":"safe final answer"}'] },
+          ])
+        )
+      )
+    );
+
+    const chunks: string[] = [];
+    let result = '';
+    await apiService.streamAdaptiveAnswer(
+      'test',
+      'u1',
+      (acc) => chunks.push(acc),
+      (meta) => {
+        result = meta.answer ?? '';
+      }
+    );
+
+    expect(chunks).toEqual(['draft ', 'safe final answer']);
+    expect(result).toBe('safe final answer');
+  });
+
   it('uses done.answer_fallback when no tokens were received', async () => {
     vi.stubGlobal(
       'fetch',
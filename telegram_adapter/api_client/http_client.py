@@ -0,0 +1,44 @@
+"""Shared pooled httpx client for calls to Neo MindBot API."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+
+import httpx
+
+from ..config import HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, STREAM_TIMEOUT_S
+
+
+# AsyncClient привязан к event loop, поэтому пул кэшируется по loop.
+_POOL_LOCK = threading.Lock()
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Пулированный AsyncClient (keep-alive) для текущего event loop."""
+    loop = asyncio.get_running_loop()
+    with _POOL_LOCK:
+        client = _CLIENTS.get(loop)
+        if client is None or getattr(client, "is_closed", False):
+            client = httpx.AsyncClient(
+                timeout=STREAM_TIMEOUT_S,
+                limits=httpx.Limits(
+                    max_connections=max(1, HTTP_MAX_CONNECTIONS),
+                    max_keepalive_connections=max(0, HTTP_MAX_KEEPALIVE),
+                ),
+            )
+            _CLIENTS[loop] = client
+        return client
+
+
+async def aclose_http_client() -> None:
+    """Закрыть клиент текущего loop (на shutdown приложения)."""
+    loop = asyncio.get_running_loop()
+    with _POOL_LOCK:
+        client = _CLIENTS.pop(loop, None)
+    if client is not None:
+        await client.aclose()
@@ -5,9 +5,8 @@ from __future__ import annotations
 import json
 from typing import Any
 
-import httpx
-
 from ..config import API_BASE_URL, API_KEY, STREAM_TIMEOUT_S
+from .http_client import get_http_client
 
 
 def _extract_data_payload(raw_line: str) -> str:
@@ -42,47 +41,57 @@ async def consume_adaptive_stream(
 
     full_text = ""
 
-    async with httpx.AsyncClient(timeout=STREAM_TIMEOUT_S) as client:
-        async with client.stream("POST", url, headers=headers, json=payload) as response:
-            response.raise_for_status()
-
-            async for line in response.aiter_lines():
-                if not line:
-                    continue
-                if line.startswith(":"):
-                    continue
-                if not line.startswith("data:"):
-                    continue
-
-                data = _extract_data_payload(line)
-                done_marker = data.strip().lower()
-                if done_marker in {"[done]", "done"}:
-                    break
-
-                try:
-                    parsed: dict[str, Any] = json.loads(data)
-                except json.JSONDecodeError:
-                    full_text += data
-                    continue
-
-                if parsed.get("error"):
-                    raise RuntimeError(str(parsed["error"]))
-
-                delta = (
-                    parsed.get("text")
-                    or parsed.get("content")
-                    or parsed.get("delta")
-                    or parsed.get("token")
-                    or ""
-                )
-                if isinstance(delta, str):
-                    full_text += delta
-
-                if bool(parsed.get("done")):
-                    answer = parsed.get("answer")
-                    if isinstance(answer, str) and answer.strip() and not full_text.strip():
-                        full_text = answer
-                    break
+    client = get_http_client()
+    async with client.stream(
+        "POST",
+        url,
+        headers=headers,
+        json=payload,
+        timeout=STREAM_TIMEOUT_S,
+    ) as response:
+        response.raise_for_status()
+
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            if line.startswith(":"):
+                continue
+            if not line.startswith("data:"):
+                continue
+
+            data = _extract_data_payload(line)
+            done_marker = data.strip().lower()
+            if done_marker in {"[done]", "done"}:
+                break
+
+            try:
+                parsed: dict[str, Any] = json.loads(data)
+            except json.JSONDecodeError:
+                full_text += data
+                continue
+
+            if parsed.get("error"):
+                raise RuntimeError(str(parsed["error"]))
+
+            replacement = parsed.get("replace")
+            if isinstance(replacement, str):
+                full_text = replacement
+
+            delta = (
+                parsed.get("text")
+                or parsed.get("content")
+                or parsed.get("delta")
+                or parsed.get("token")
+                or ""
+            )
+            if isinstance(delta, str):
+                full_text += delta
+
+            if bool(parsed.get("done")):
+                answer = parsed.get("answer")
+                if isinstance(answer, str) and answer.strip() and not full_text.strip():
+                    full_text = answer
+                break
 
     return full_text.strip()
 
@@ -4,11 +4,14 @@ from __future__ import annotations
 
 import logging
 
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, filters
 
-from .config import TELEGRAM_BOT_TOKEN
+from .api_client.http_client import aclose_http_client
+from .config import MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES, TELEGRAM_BOT_TOKEN
+from .dispatch import PerChatUpdateProcessor
 from .handlers.command_handler import handle_help, handle_reset, handle_start
 from .handlers.message_handler import handle_message
+from .persistence.session_store import close_db
 
 
 logging.basicConfig(
@@ -17,11 +20,22 @@ logging.basicConfig(
 )
 
 
+async def _post_shutdown(_app: Application) -> None:
+    await aclose_http_client()
+    close_db()
+
+
 def run() -> None:
     if not TELEGRAM_BOT_TOKEN:
         raise RuntimeError("TELEGRAM_BOT_TOKEN не задан в .env")
 
-    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(PerChatUpdateProcessor(MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES))
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", handle_start))
     app.add_handler(CommandHandler("reset", handle_reset))
@@ -10,4 +10,8 @@ API_BASE_URL = os.getenv("NEO_API_URL", "http://localhost:8000")
 API_KEY = os.getenv("NEO_API_KEY", "dev-key-00...")
 SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "./telegram_sessions.db")
 STREAM_TIMEOUT_S = float(os.getenv("STREAM_TIMEOUT_S", "60.0") or 60.0)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32") or 32)
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "16") or 16)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "8") or 8)
+MAX_PENDING_UPDATES = int(os.getenv("MAX_PENDING_UPDATES", "256") or 256)
 
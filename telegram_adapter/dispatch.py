@@ -0,0 +1,77 @@
+"""Per-chat ordered concurrent update processing for python-telegram-bot."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+logger = logging.getLogger(__name__)
+
+_LATENCY_WINDOW = 1024
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Update processor: апдейты разных чатов обрабатываются параллельно,
+    апдейты одного чата — строго по очереди.
+
+    Семафор базового класса ограничивает число принятых, но еще не
+    обработанных апдейтов (``max_pending``); реальная параллельность
+    ограничивается ``max_concurrency`` уже после захвата очереди чата, чтобы
+    апдейты, ждущие свой чат, не занимали слоты обработки.
+    """
+
+    def __init__(self, max_concurrency: int, max_pending: int) -> None:
+        super().__init__(max_concurrent_updates=max(max_pending, max_concurrency, 1))
+        self._concurrency = asyncio.Semaphore(max(1, max_concurrency))
+        self._chat_locks: dict[Any, asyncio.Lock] = {}
+        self._waiting: dict[Any, int] = {}
+        self._in_flight = 0
+        self._processed = 0
+        self._latencies_ms: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        key = chat.id if chat is not None else id(update)
+        lock = self._chat_locks.setdefault(key, asyncio.Lock())
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        started = time.perf_counter()
+        try:
+            async with lock, self._concurrency:
+                self._in_flight += 1
+                try:
+                    await coroutine
+                finally:
+                    self._in_flight -= 1
+                    self._processed += 1
+        finally:
+            self._latencies_ms.append((time.perf_counter() - started) * 1000.0)
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                self._chat_locks.pop(key, None)
+
+    async def initialize(self) -> None:
+        return None
+
+    async def shutdown(self) -> None:
+        logger.info("telegram.dispatch.shutdown stats=%s", self.stats())
+
+    def stats(self) -> dict[str, Any]:
+        latencies = sorted(self._latencies_ms)
+        return {
+            "queued": sum(self._waiting.values()),
+            "in_flight": self._in_flight,
+            "active_chats": len(self._waiting),
+            "max_queue_depth": max(self._waiting.values(), default=0),
+            "processed": self._processed,
+            "latency_ms_p50": round(latencies[len(latencies) // 2], 2) if latencies else 0.0,
+            "latency_ms_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 2) if latencies else 0.0,
+        }
@@ -4,49 +4,67 @@ from __future__ import annotations
 
 import os
 import sqlite3
+import threading
 from pathlib import Path
 from typing import Optional
 
-import httpx
-
+from ..api_client.http_client import get_http_client
 from ..config import API_BASE_URL, API_KEY, SESSION_DB_PATH
 
 
+# Одно долгоживущее соединение на процесс: lookup на каждое сообщение не
+# открывает файл заново. Сброс _db_initialized_path (смена SESSION_DB_PATH,
+# эмуляция рестарта в тестах) переоткрывает соединение.
 _db_initialized_path: Optional[str] = None
+_conn: Optional[sqlite3.Connection] = None
+_conn_path: Optional[str] = None
+_lock = threading.RLock()
 
 
 def _resolve_db_path() -> str:
     return os.getenv("SESSION_DB_PATH", SESSION_DB_PATH)
 
 
-def _init_db() -> None:
-    global _db_initialized_path
+def _init_db() -> sqlite3.Connection:
+    global _db_initialized_path, _conn, _conn_path
     db_path = _resolve_db_path()
-    if _db_initialized_path == db_path:
-        return
+    if _db_initialized_path == db_path and _conn is not None and _conn_path == db_path:
+        return _conn
 
+    close_db()
     parent = Path(db_path).expanduser().resolve().parent
     parent.mkdir(parents=True, exist_ok=True)
 
-    with sqlite3.connect(db_path) as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS sessions (
-                telegram_user_id TEXT PRIMARY KEY,
-                session_id TEXT NOT NULL,
-                created_at TEXT DEFAULT (datetime('now'))
-            )
-            """
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            telegram_user_id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now'))
         )
-        conn.commit()
+        """
+    )
+    conn.commit()
 
+    _conn, _conn_path = conn, db_path
     _db_initialized_path = db_path
+    return conn
+
+
+def close_db() -> None:
+    global _conn, _conn_path
+    with _lock:
+        conn, _conn, _conn_path = _conn, None, None
+    if conn is not None:
+        conn.close()
 
 
 def _get_cached_session(user_id: str) -> str | None:
-    _init_db()
-    with sqlite3.connect(_resolve_db_path()) as conn:
-        row = conn.execute(
+    with _lock:
+        row = _init_db().execute(
             "SELECT session_id FROM sessions WHERE telegram_user_id = ?",
             (user_id,),
         ).fetchone()
@@ -54,20 +72,20 @@ def _get_cached_session(user_id: str) -> str | None:
 
 
 def _save_session(user_id: str, session_id: str) -> None:
-    _init_db()
-    with sqlite3.connect(_resolve_db_path()) as conn:
-        conn.execute(
-            "INSERT OR REPLACE INTO sessions (telegram_user_id, session_id) VALUES (?, ?)",
-            (user_id, session_id),
-        )
-        conn.commit()
+    with _lock:
+        conn = _init_db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (telegram_user_id, session_id) VALUES (?, ?)",
+                (user_id, session_id),
+            )
 
 
 def _delete_session(user_id: str) -> None:
-    _init_db()
-    with sqlite3.connect(_resolve_db_path()) as conn:
-        conn.execute("DELETE FROM sessions WHERE telegram_user_id = ?", (user_id,))
-        conn.commit()
+    with _lock:
+        conn = _init_db()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE telegram_user_id = ?", (user_id,))
 
 
 async def get_or_create_session(user_id: str) -> str:
@@ -79,10 +97,9 @@ async def get_or_create_session(user_id: str) -> str:
     api_key = os.getenv("NEO_API_KEY", API_KEY)
     url = f"{api_base_url}/api/v1/users/{user_id}/sessions"
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        response = await client.post(url, headers={"X-API-Key": api_key})
-        response.raise_for_status()
-        payload = response.json()
+    response = await get_http_client().post(url, headers={"X-API-Key": api_key}, timeout=20.0)
+    response.raise_for_status()
+    payload = response.json()
 
     session_id = str(payload["session_id"])
     _save_session(user_id, session_id)